@@ -0,0 +1,6 @@
+"""Benchmarks for Claude Think Tool plugin.
+
+Run from the project root, e.g. ``python -m benchmarks.bench_sharding``.
+``python -m benchmarks.suite run`` covers the hot paths with latency
+percentiles and compares against ``benchmarks/baselines/suite.json``.
+"""
@@ -0,0 +1,125 @@
+"""AsyncContextManager with thousands of concurrent coroutine sessions.
+
+Every session is a coroutine that adds --ops thoughts, awaiting
+--think-ms between them (standing in for the model call that produces
+the next thought), and renders its context once; all of them run
+concurrently on one event loop. A ticker coroutine sleeping 1 ms records
+how late it wakes up, which shows how long the loop was blocked.
+
+Modes:
+- memory: in-memory store, operations run inline on the loop
+- memory+executor: in-memory store, every operation in the executor
+- sqlite: SQLite backend, operations in the executor (the default when durable)
+- sqlite-blocking: the synchronous ContextManager called directly from
+  coroutines, for comparison: each write blocks the loop
+
+    python -m benchmarks.bench_async [--sessions 5000] [--ops 5] [--think-ms 1]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.common import quiet_logging, summarize
+from src.async_context_manager import AsyncContextManager
+from src.context_manager import ContextManager
+from src.storage import SQLiteBackend
+
+MODES = ("memory", "memory+executor", "sqlite", "sqlite-blocking")
+
+
+async def _ticker(stop: asyncio.Event, lags: List[float]) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + 0.001
+        await asyncio.sleep(0.001)
+        lags.append(loop.time() - expected)
+
+
+async def run_mode(
+    mode: str, sessions: int, ops: int, think_s: float, path: str
+) -> Dict[str, float]:
+    backend = SQLiteBackend(path) if mode.startswith("sqlite") else None
+    if mode == "sqlite-blocking":
+        sync = ContextManager(max_thoughts=1000, backend=backend, auto_cleanup=False)
+        add, render = sync.add_thought, sync.get_formatted_context
+
+        async def add_op(session_id: str, thought: str) -> None:
+            add(session_id, thought)
+
+        async def render_op(session_id: str) -> None:
+            render(session_id)
+
+        close = sync.shutdown
+    else:
+        cm = AsyncContextManager(
+            max_thoughts=1000,
+            backend=backend,
+            auto_cleanup=False,
+            offload=True if mode == "memory+executor" else None,
+        )
+        add_op, render_op = cm.add_thought, cm.get_formatted_context
+        close = None
+
+    latencies: List[int] = []
+    clock = time.perf_counter_ns
+
+    async def session(index: int) -> None:
+        session_id = f"async-{index}"
+        for i in range(ops):
+            t0 = clock()
+            await add_op(session_id, f"Thought {i} for session {index}: " + "x" * 100)
+            latencies.append(clock() - t0)
+            await asyncio.sleep(think_s)
+        await render_op(session_id)
+
+    stop = asyncio.Event()
+    lags: List[float] = []
+    ticker = asyncio.create_task(_ticker(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+
+    if close is not None:
+        close()
+    else:
+        await cm.close()
+    stats = summarize(latencies, elapsed)
+    stats["max_loop_lag_ms"] = round(max(lags, default=0.0) * 1000, 2)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sessions", type=int, default=5000, help="concurrent coroutines")
+    parser.add_argument("--ops", type=int, default=5, help="thoughts per session")
+    parser.add_argument("--think-ms", type=float, default=1.0, help="await between thoughts")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    args = parser.parse_args()
+
+    quiet_logging()
+    print(f"{args.sessions} concurrent sessions x {args.ops} thoughts")
+    print(
+        f"{'mode':<16} {'adds/sec':>10} {'p50 us':>9} {'p99 us':>10} {'max loop lag ms':>16}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.modes:
+            path = os.path.join(tmp, f"{mode}.db")
+            stats = asyncio.run(
+                run_mode(mode, args.sessions, args.ops, args.think_ms / 1000, path)
+            )
+            print(
+                f"{mode:<16} {stats['ops_per_sec']:>10,.0f} {stats['p50_us']:>9.1f} "
+                f"{stats['p99_us']:>10.1f} {stats['max_loop_lag_ms']:>16.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
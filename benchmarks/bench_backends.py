@@ -0,0 +1,80 @@
+"""Storage backend comparison: in-process memory vs SQLite (WAL).
+
+Reports add_thought throughput and get_formatted_context latency from one
+process, then aggregate add_thought throughput with several worker
+processes writing to the same SQLite database.
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks.common import quiet_logging
+from src.context_manager import ContextManager
+from src.storage import SQLiteBackend
+
+
+def _make_manager(kind: str, path: str) -> ContextManager:
+    backend = SQLiteBackend(path) if kind == "sqlite" else None
+    return ContextManager(max_thoughts=1000, backend=backend)
+
+
+def single_process(kind: str, path: str, ops: int) -> None:
+    cm = _make_manager(kind, path)
+    session_id = f"bench-{kind}"
+    start = time.perf_counter()
+    for i in range(ops):
+        cm.add_thought(session_id, f"Thought {i}: " + "x" * 200)
+    add_rate = ops / (time.perf_counter() - start)
+
+    rounds = 200
+    start = time.perf_counter()
+    for _ in range(rounds):
+        cm.get_formatted_context(session_id)
+    render_ms = (time.perf_counter() - start) * 1000 / rounds
+    print(f"{kind:>8} {add_rate:>14,.0f} {render_ms:>12.3f}")
+    cm.shutdown()
+
+
+def _worker(path: str, index: int, ops: int) -> None:
+    quiet_logging()
+    cm = _make_manager("sqlite", path)
+    for i in range(ops):
+        cm.add_thought(f"worker-{index}", f"Thought {i}")
+    cm.shutdown()
+
+
+def multi_process(path: str, processes: int, ops: int) -> float:
+    workers = [
+        multiprocessing.Process(target=_worker, args=(path, i, ops)) for i in range(processes)
+    ]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return processes * ops / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    quiet_logging()
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'backend':>8} {'add ops/s':>14} {'render ms':>12}")
+        single_process("memory", "", args.ops)
+        single_process("sqlite", os.path.join(tmp, "single.db"), args.ops)
+
+        print(f"\n{'procs':>8} {'sqlite add ops/s':>18}")
+        for count in args.processes:
+            rate = multi_process(os.path.join(tmp, f"multi-{count}.db"), count, args.ops)
+            print(f"{count:>8} {rate:>18,.0f}")
+
+
+if __name__ == "__main__":
+    main()
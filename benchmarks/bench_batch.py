@@ -0,0 +1,62 @@
+"""Batch submission: add_thoughts vs one add_thought call per thought.
+
+For each batch size, submits --thoughts thoughts to fresh sessions either
+one call at a time or in batches, and reports per-thought cost for the
+in-memory store, SQLite and a write-ahead log. Each batch takes the
+session lock once, makes one backend append and one log write.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.common import quiet_logging
+from src.context_manager import ContextManager
+from src.storage import SQLiteBackend
+from src.wal import WriteAheadLog
+
+
+def _make_manager(kind: str, directory: str, run: str) -> ContextManager:
+    if kind == "sqlite":
+        return ContextManager(backend=SQLiteBackend(os.path.join(directory, f"{run}.db")))
+    if kind == "wal":
+        return ContextManager(wal=WriteAheadLog(os.path.join(directory, f"{run}-wal")))
+    return ContextManager()
+
+
+def per_thought_us(kind: str, directory: str, total: int, batch_size: int) -> float:
+    cm = _make_manager(kind, directory, f"{kind}-{batch_size}")
+    thoughts = [f"Thought {i}: " + "x" * 200 for i in range(total)]
+    session_id = f"bench-{kind}-{batch_size}"
+    start = time.perf_counter()
+    if batch_size == 1:
+        for thought in thoughts:
+            cm.add_thought(session_id, thought)
+    else:
+        for offset in range(0, total, batch_size):
+            cm.add_thoughts(session_id, thoughts[offset:offset + batch_size])
+    elapsed = time.perf_counter() - start
+    cm.shutdown()
+    return elapsed * 1e6 / total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--thoughts", type=int, default=2000)
+    parser.add_argument("--batch-sizes", default="1,10,100")
+    parser.add_argument("--kinds", default="memory,sqlite,wal")
+    args = parser.parse_args()
+
+    quiet_logging()
+    sizes = [int(size) for size in args.batch_sizes.split(",")]
+    print(f"us per thought ({args.thoughts} thoughts; batch 1 = add_thought calls)")
+    print(f"{'store':>8}" + "".join(f"{f'batch {size}':>12}" for size in sizes))
+    with tempfile.TemporaryDirectory() as directory:
+        for kind in args.kinds.split(","):
+            row = [per_thought_us(kind, directory, args.thoughts, size) for size in sizes]
+            print(f"{kind:>8}" + "".join(f"{us:>12.1f}" for us in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Cold-thought compression: stored bytes vs read latency.
+
+Fills one session with realistic, somewhat repetitive reasoning text and
+reports the compression ratio of the stored thought payloads together with
+the latency of get_all_thoughts (reading every thought's text) and
+get_formatted_context, with compression off and on.
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks.common import quiet_logging
+from src.context_manager import ContextManager
+
+_WORDS = (
+    "user wants to cancel reservation verify policy membership tier baggage "
+    "allowance payment method refund insurance segment flown check rules plan "
+    "confirm eligibility calculate total fee window booking within hours"
+).split()
+
+
+def make_thought(rng: random.Random, size: int) -> str:
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(_WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def run(compress: bool, args, texts) -> None:
+    cm = ContextManager(max_thoughts=args.thoughts)
+    cm.enable_context_compression = compress
+    cm.compression_hot_thoughts = args.hot
+    session_id = "bench-compression"
+    for text in texts:
+        cm.add_thought(session_id, text)
+
+    records = cm.get_all_thoughts(session_id)
+    stored = sum(r.stored_size for r in records)
+    raw = sum(len(t.encode("utf-8")) for t in texts)
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for record in cm.get_all_thoughts(session_id):
+            record["thought"]
+    read_ms = (time.perf_counter() - start) * 1000 / args.rounds
+
+    cm.get_formatted_context(session_id)
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        cm.get_formatted_context(session_id)
+    render_ms = (time.perf_counter() - start) * 1000 / args.rounds
+
+    label = "on" if compress else "off"
+    print(
+        f"{label:>11} {stored / 1024:>10.1f} {raw / stored:>7.2f}x "
+        f"{read_ms:>14.3f} {render_ms:>12.3f}"
+    )
+    cm.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--thoughts", type=int, default=1000)
+    parser.add_argument("--size", type=int, default=1000, help="characters per thought")
+    parser.add_argument("--hot", type=int, default=20, help="uncompressed recent thoughts")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    quiet_logging()
+    rng = random.Random(42)
+    texts = [make_thought(rng, args.size) for _ in range(args.thoughts)]
+
+    print(f"{args.thoughts} thoughts x ~{args.size} chars, {args.hot} hot")
+    print(f"{'compression':>11} {'stored KiB':>10} {'ratio':>8} {'all_thoughts ms':>14} {'render ms':>12}")
+    run(False, args, texts)
+    run(True, args, texts)
+
+
+if __name__ == "__main__":
+    main()
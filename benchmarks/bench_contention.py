@@ -0,0 +1,101 @@
+"""Concurrent stress run with the lock contention profiler.
+
+Extends tests/test_performance.py::test_concurrent_access: worker threads
+append to one shared session and to their own sessions, read contexts,
+render them and poll get_stats, while a sweeper thread keeps creating
+idle sessions and expiring them with cleanup_old_sessions. The run is
+repeated without and with profiled locks to show the profiler's
+overhead, then the worst lock call sites are printed.
+
+    python -m benchmarks.bench_contention [--threads 16] [--sort hold_max]
+"""
+
+import argparse
+import threading
+import time
+
+from benchmarks.common import gil_status, quiet_logging, run_threads
+from src.context_manager import ContextManager
+from src.lockprof import LockProfiler
+
+SHARED_SESSION = "stress-shared"
+IDLE_SECONDS = 0.2
+
+
+def stress(cm: ContextManager, num_threads: int, ops_per_thread: int) -> float:
+    """Run the mixed workload; return worker operations per second."""
+    stop = threading.Event()
+
+    def sweeper() -> None:
+        batch = 0
+        while not stop.is_set():
+            for i in range(200):
+                cm.add_thought(f"idle-{batch}-{i}", "Idle session waiting to expire")
+            batch += 1
+            time.sleep(IDLE_SECONDS / 4)
+            cm.cleanup_old_sessions(max_age_hours=IDLE_SECONDS / 3600)
+
+    def worker(index: int) -> None:
+        own = f"stress-{index}"
+        for i in range(ops_per_thread):
+            cm.add_thought(SHARED_SESSION, f"Thread {index} thought {i}")
+            cm.add_thought(own, f"Thought {i}")
+            cm.get_context(SHARED_SESSION)
+            if i % 10 == 0:
+                cm.get_formatted_context(own)
+            if i % 50 == 0:
+                cm.get_stats()
+
+    sweep = threading.Thread(target=sweeper, name="stress-sweeper")
+    sweep.start()
+    try:
+        elapsed = run_threads(worker, num_threads)
+    finally:
+        stop.set()
+        sweep.join()
+
+    shared = cm.get_context(SHARED_SESSION)["metadata"]["total_steps"]
+    assert shared == num_threads * ops_per_thread, f"lost writes: {shared}"
+    # Each iteration: two adds and one read, plus the periodic renders and stats
+    return num_threads * ops_per_thread * 3 / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--threads", type=int, default=10)
+    parser.add_argument("--ops", type=int, default=2000, help="iterations per thread")
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--limit", type=int, default=10, help="call sites reported")
+    parser.add_argument(
+        "--sort",
+        default="wait_total",
+        choices=("wait_total", "wait_max", "hold_total", "hold_max", "contended"),
+    )
+    args = parser.parse_args()
+
+    quiet_logging()
+    print(f"GIL: {gil_status()}, threads: {args.threads}, shards: {args.shards}")
+
+    cm = ContextManager(max_thoughts=1000, num_shards=args.shards)
+    try:
+        plain = stress(cm, args.threads, args.ops)
+    finally:
+        cm.shutdown()
+
+    profiler = LockProfiler()
+    cm = ContextManager(max_thoughts=1000, num_shards=args.shards, lock_profiler=profiler)
+    try:
+        profiled = stress(cm, args.threads, args.ops)
+    finally:
+        cm.shutdown()
+
+    print(f"plain locks:    {plain:>12,.0f} ops/s")
+    print(f"profiled locks: {profiled:>12,.0f} ops/s ({profiled / plain - 1:+.0%})")
+    print()
+    print(profiler.format_report(args.limit, args.sort))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Session forking: copy-on-write branches vs copying the window.
+
+Fills a session, then starts --branches branches of it two ways:
+- fork_session, which shares the window copy-on-write
+- a deep copy of the window replayed into a new session with add_thoughts
+
+and reports the time per branch, the memory retained by all branches
+(tracemalloc) and the time to render a branch after a few thoughts of
+its own.
+
+    python -m benchmarks.bench_fork [--window 1000] [--branches 200]
+"""
+
+import argparse
+import copy
+import gc
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+from benchmarks.common import quiet_logging, summarize
+from src.context_manager import ContextManager
+
+
+def _copy_branch(cm: ContextManager, session_id: str, branch_id: str) -> None:
+    records = copy.deepcopy(cm.get_all_thoughts(session_id))
+    cm.add_thoughts(branch_id, [record.thought for record in records])
+
+
+def _fork_branch(cm: ContextManager, session_id: str, branch_id: str) -> None:
+    cm.fork_session(session_id, branch_id)
+
+
+def run(
+    name: str,
+    branch: Callable[[ContextManager, str, str], None],
+    window: int,
+    branches: int,
+) -> Dict[str, float]:
+    """Branch a full session and return timing and memory figures."""
+    cm = ContextManager(max_thoughts=window, auto_cleanup=False)
+    cm.max_memory_bytes = 0  # Copies would evict the trunk under the default budget
+    cm.add_thoughts("trunk", [f"Thought {i}: " + "x" * 200 for i in range(window)])
+
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    latencies = []
+    clock = time.perf_counter_ns
+    start = time.perf_counter()
+    for i in range(branches):
+        t0 = clock()
+        branch(cm, "trunk", f"branch-{i}")
+        latencies.append(clock() - t0)
+    elapsed = time.perf_counter() - start
+    retained = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    stats = summarize(latencies, elapsed)
+    cm.add_thoughts("branch-0", ["Own thought 1", "Own thought 2"])
+    t0 = time.perf_counter()
+    cm.get_formatted_context("branch-0")
+    stats["render_ms"] = (time.perf_counter() - t0) * 1000
+    stats["retained_kb_per_branch"] = retained / branches / 1024
+    cm.shutdown()
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--window", type=int, default=1000)
+    parser.add_argument("--branches", type=int, default=200)
+    args = parser.parse_args()
+
+    quiet_logging()
+    print(
+        f"{'method':<8} {'p50 us':>10} {'p99 us':>10} {'KB/branch':>10} {'render ms':>10}"
+    )
+    for name, branch in (("copy", _copy_branch), ("fork", _fork_branch)):
+        stats = run(name, branch, args.window, args.branches)
+        print(
+            f"{name:<8} {stats['p50_us']:>10.1f} {stats['p99_us']:>10.1f} "
+            f"{stats['retained_kb_per_branch']:>10.1f} {stats['render_ms']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
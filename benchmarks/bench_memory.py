@@ -0,0 +1,64 @@
+"""Memory footprint of stored thoughts: legacy dict layout vs ThoughtRecord.
+
+Builds the same sessions twice and measures retained bytes with
+tracemalloc, reporting bytes per thought excluding the thought text
+itself (which both layouts share).
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from src.thought_record import ThoughtRecord
+
+
+def _legacy_entry(step: int, thought: str, created: float) -> dict:
+    return {
+        "timestamp": datetime.fromtimestamp(created, timezone.utc)
+        .replace(tzinfo=None)
+        .isoformat(),
+        "thought": thought,
+        "step": step,
+    }
+
+
+def measure(factory, sessions: int, thoughts: int, texts: list) -> int:
+    """Return bytes retained by sessions x thoughts entries built by factory."""
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    now = time.time()
+    store = [
+        [factory(step, texts[step - 1], now + step) for step in range(1, thoughts + 1)]
+        for _ in range(sessions)
+    ]
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del store
+    return used
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--thoughts", type=int, default=1000)
+    args = parser.parse_args()
+
+    # Thought text is allocated up front so only record overhead is measured
+    texts = [f"Thought {i}: " + "x" * 200 for i in range(args.thoughts)]
+    total = args.sessions * args.thoughts
+
+    legacy = measure(_legacy_entry, args.sessions, args.thoughts, texts)
+    compact = measure(ThoughtRecord, args.sessions, args.thoughts, texts)
+
+    print(f"entries: {total:,} ({args.sessions} sessions x {args.thoughts} thoughts)")
+    print(f"{'layout':>14} {'total MiB':>10} {'bytes/thought':>14}")
+    print(f"{'dict + ISO':>14} {legacy / 2**20:>10.2f} {legacy / total:>14.1f}")
+    print(f"{'ThoughtRecord':>14} {compact / 2**20:>10.2f} {compact / total:>14.1f}")
+    print(f"saving: {100 * (1 - compact / legacy):.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""get_formatted_context latency: legacy string += vs incremental render cache.
+
+Measures the steady state an agent sees: one new thought followed by a
+render, on a session already holding --thoughts entries.
+"""
+
+import argparse
+import time
+
+from benchmarks.common import quiet_logging
+from src.context_manager import ContextManager
+from src.rendering import RENDERERS
+
+
+def legacy_render(thoughts) -> str:
+    """The original quadratic implementation, kept for comparison."""
+    if not thoughts:
+        return "No thoughts yet in this session."
+    formatted = "Previous thoughts in this session:\n\n"
+    for thought_entry in thoughts:
+        formatted += f"Step {thought_entry['step']} ({thought_entry['timestamp']}):\n"
+        formatted += f"{thought_entry['thought']}\n\n"
+    return formatted
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--thoughts", type=int, default=1000)
+    parser.add_argument("--size", type=int, default=200, help="characters per thought")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    quiet_logging()
+    cm = ContextManager(max_thoughts=args.thoughts)
+    session_id = "bench-render"
+    for i in range(args.thoughts):
+        cm.add_thought(session_id, f"Thought {i}: " + "x" * args.size)
+
+    print(f"{args.thoughts} thoughts x {args.size} chars, {args.rounds} rounds (add + render)")
+    print(f"{'variant':>10} {'mean ms':>10}")
+
+    start = time.perf_counter()
+    for i in range(args.rounds):
+        cm.add_thought(session_id, f"Extra {i}: " + "x" * args.size)
+        legacy_render(cm.get_all_thoughts(session_id))
+    print(f"{'legacy':>10} {(time.perf_counter() - start) * 1000 / args.rounds:>10.3f}")
+
+    for output_format in RENDERERS:
+        cm.get_formatted_context(session_id, output_format)  # Warm the cache
+        start = time.perf_counter()
+        for i in range(args.rounds):
+            cm.add_thought(session_id, f"Extra {i}: " + "x" * args.size)
+            cm.get_formatted_context(session_id, output_format)
+        print(f"{output_format:>10} {(time.perf_counter() - start) * 1000 / args.rounds:>10.3f}")
+
+    cm.shutdown()
+
+
+if __name__ == "__main__":
+    main()
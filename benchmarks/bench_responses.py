@@ -0,0 +1,66 @@
+"""Think tool response size and latency per response mode.
+
+Runs the body of ThinkTool._invoke without the Dify runtime (which this
+benchmark does not need): submit_thought, build and shape the response,
+then encode it to JSON the way the response reaches the agent. Reports
+bytes per response and microseconds per call for each mode, with orjson
+(when installed) and the stdlib encoder.
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.common import quiet_logging
+from src.context_manager import ContextManager
+from src.responses import json_encoder, shape_response
+
+_STDLIB = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def run(mode: str, encode, thought: str, calls: int) -> tuple:
+    cm = ContextManager(max_thoughts=100)
+    session_id = f"bench-{mode}"
+    static = {"session_id": session_id, "max_thoughts": cm.max_thoughts}
+    total_bytes = 0
+    start = time.perf_counter()
+    for _ in range(calls):
+        context = cm.get_context(session_id)
+        result = cm.submit_thought(session_id, thought, context)
+        response = {
+            "status": "success",
+            "step": result.step,
+            "context_size": len(context["thoughts"]),
+            "decision": result.decision,
+        }
+        if mode == "full":
+            response["thought"] = thought
+        response = shape_response(response, mode, static, new_session=result.step == 1)
+        total_bytes += len(encode(response).encode("utf-8"))
+    elapsed = time.perf_counter() - start
+    cm.shutdown()
+    return total_bytes / calls, elapsed * 1e6 / calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--thought-chars", type=int, default=2000)
+    args = parser.parse_args()
+
+    quiet_logging()
+    thought = ("Consider the retry budget and the queue depth. " * 100)[: args.thought_chars]
+    encoders = [("json", _STDLIB)]
+    if json_encoder()[0] != "json":
+        encoders.append(json_encoder())
+    run("full", _STDLIB, thought, args.calls // 10)  # warm up caches and allocator
+    print(f"thought: {args.thought_chars} chars, {args.calls} calls per row")
+    print(f"{'mode':>6} {'encoder':>8} {'bytes/resp':>11} {'us/call':>9}")
+    for mode in ("full", "ack", "delta"):
+        for name, encode in encoders:
+            size, us = run(mode, encode, thought, args.calls)
+            print(f"{mode:>6} {name:>8} {size:>11.1f} {us:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Full-text search latency: inverted index vs linear scan.
+
+Fills one session with --thoughts synthetic thoughts, then reports the
+one-off index build time, add_thought cost with the index live, and mean
+search latency through search_thoughts compared with scanning
+get_all_thoughts for the query terms.
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks.common import quiet_logging
+from src.context_manager import ContextManager
+from src.search import tokenize
+
+WORDS = (
+    "cache database sqlite redis latency budget session thread lock shard "
+    "decision retry timeout queue index token render buffer snapshot schema "
+    "migration rollback deploy metric alert owner review plan risk cost"
+).split()
+
+
+def _thought(rng: random.Random, i: int) -> str:
+    return f"Step {i}: " + " ".join(rng.choice(WORDS) for _ in range(40))
+
+
+def linear_search(cm: ContextManager, session_id: str, query: str, limit: int = 10):
+    terms = set(tokenize(query))
+    hits = []
+    for record in cm.get_all_thoughts(session_id):
+        words = tokenize(record["thought"])
+        score = sum(1 for word in words if word in terms)
+        if score:
+            hits.append((score, record["step"]))
+    hits.sort(reverse=True)
+    return hits[:limit]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--thoughts", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    quiet_logging()
+    rng = random.Random(42)
+    cm = ContextManager(max_thoughts=args.thoughts)
+    session_id = "bench-search"
+    for i in range(args.thoughts):
+        cm.add_thought(session_id, _thought(rng, i))
+    queries = [" ".join(rng.sample(WORDS, 3)) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    cm.search_thoughts(session_id, queries[0])
+    build_ms = (time.perf_counter() - start) * 1000
+
+    # add_thought with the index live (evicts the oldest at capacity)
+    adds = 200
+    start = time.perf_counter()
+    for i in range(adds):
+        cm.add_thought(session_id, _thought(rng, args.thoughts + i))
+    add_us = (time.perf_counter() - start) * 1e6 / adds
+
+    start = time.perf_counter()
+    for query in queries:
+        cm.search_thoughts(session_id, query)
+    indexed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    for query in queries:
+        linear_search(cm, session_id, query)
+    linear_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    print(f"thoughts per session: {args.thoughts}")
+    print(f"index build (first search): {build_ms:.2f} ms")
+    print(f"add_thought with index:     {add_us:.1f} us")
+    print(f"search (index, BM25):       {indexed_ms:.3f} ms")
+    print(f"search (linear scan):       {linear_ms:.3f} ms")
+    print(f"speedup:                    {linear_ms / indexed_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
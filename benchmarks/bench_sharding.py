@@ -0,0 +1,49 @@
+"""Throughput of concurrent add_thought as thread count grows.
+
+Compares a single-partition session map (equivalent to one global lock)
+with the default lock-striped map. On a free-threaded CPython build the
+striped map should keep scaling with threads; with the GIL both curves
+stay roughly flat and the comparison shows lock overhead only.
+"""
+
+import argparse
+
+from benchmarks.common import gil_status, quiet_logging, run_threads
+from src.context_manager import ContextManager
+
+
+def measure(num_shards: int, num_threads: int, ops_per_thread: int) -> float:
+    """Return add_thought operations per second."""
+    cm = ContextManager(max_thoughts=1000, num_shards=num_shards)
+    try:
+        def worker(index: int) -> None:
+            session_id = f"bench-session-{index}"
+            for i in range(ops_per_thread):
+                cm.add_thought(session_id, f"Thought {i}")
+
+        elapsed = run_threads(worker, num_threads)
+        return num_threads * ops_per_thread / elapsed
+    finally:
+        cm.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ops", type=int, default=5000, help="operations per thread")
+    parser.add_argument(
+        "--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32]
+    )
+    parser.add_argument("--shards", type=int, default=16)
+    args = parser.parse_args()
+
+    quiet_logging()
+    print(f"GIL: {gil_status()}")
+    print(f"{'threads':>8} {'1 shard ops/s':>16} {f'{args.shards} shards ops/s':>18} {'speedup':>8}")
+    for num_threads in args.threads:
+        single = measure(1, num_threads, args.ops)
+        striped = measure(args.shards, num_threads, args.ops)
+        print(f"{num_threads:>8} {single:>16,.0f} {striped:>18,.0f} {striped / single:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
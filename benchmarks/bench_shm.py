@@ -0,0 +1,113 @@
+"""Multi-process throughput of the shared session stores.
+
+Several worker processes add thoughts to the same set of sessions, the
+way a workflow's tool calls land on whichever plugin worker is free.
+Reports aggregate add_thought throughput per backend and process count,
+and how much of each session's history one worker can see afterwards:
+with the in-process store every worker only sees its own thoughts.
+
+    python -m benchmarks.bench_shm [--ops 2000] [--sessions 50] [--processes 1 2 4]
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import Dict
+
+from benchmarks.common import quiet_logging
+from src.context_manager import ContextManager
+from src.errors import ContextError
+from src.shm_storage import SharedMemoryBackend
+from src.storage import SQLiteBackend
+
+BACKENDS = ("memory", "sqlite", "shm")
+
+
+def _make_manager(kind: str, path: str) -> ContextManager:
+    if kind == "sqlite":
+        backend = SQLiteBackend(path)
+    elif kind == "shm":
+        backend = SharedMemoryBackend(path, size_bytes=64 * 1024 * 1024)
+    else:
+        backend = None
+    return ContextManager(max_thoughts=1000, backend=backend, auto_cleanup=False)
+
+
+def _worker(kind, path, index, ops, sessions, start, done, results) -> None:
+    quiet_logging()
+    cm = _make_manager(kind, path)
+    errors = 0
+    start.wait()
+    t0 = time.perf_counter()
+    for i in range(ops):
+        try:
+            cm.add_thought(f"wf-{(i + index) % sessions}", f"Worker {index} thought {i}")
+        except ContextError:
+            errors += 1
+    elapsed = time.perf_counter() - t0
+    # Count what this worker can read once every worker has finished
+    done.wait()
+    visible = sum(len(cm.get_all_thoughts(f"wf-{s}")) for s in range(sessions))
+    results.put((elapsed, errors, visible))
+    cm.shutdown()
+
+
+def run(kind: str, path: str, processes: int, ops: int, sessions: int) -> Dict[str, float]:
+    start = multiprocessing.Event()
+    done = multiprocessing.Barrier(processes)
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(
+            target=_worker, args=(kind, path, i, ops, sessions, start, done, results)
+        )
+        for i in range(processes)
+    ]
+    for w in workers:
+        w.start()
+    # Let every worker open its store before the clock starts
+    time.sleep(0.5)
+    start.set()
+    outcomes = [results.get() for _ in workers]
+    for w in workers:
+        w.join()
+    total = processes * ops
+    return {
+        "ops_per_sec": total / max(elapsed for elapsed, _, _ in outcomes),
+        "errors": sum(errors for _, errors, _ in outcomes),
+        # Share of all stored thoughts the worst-informed worker can read
+        "visible": min(visible for _, _, visible in outcomes) / total,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--ops", type=int, default=2000, help="thoughts per process")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    args = parser.parse_args()
+
+    quiet_logging()
+    print(f"{os.cpu_count()} CPU(s), {args.ops} thoughts per process, {args.sessions} sessions")
+    print(f"{'backend':>8} {'procs':>6} {'add ops/s':>12} {'errors':>7} {'visible':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in args.backends:
+            for count in args.processes:
+                path = os.path.join(tmp, f"{kind}-{count}.db")
+                stats = run(kind, path, count, args.ops, args.sessions)
+                print(
+                    f"{kind:>8} {count:>6} {stats['ops_per_sec']:>12,.0f} "
+                    f"{stats['errors']:>7} {stats['visible']:>8.0%}"
+                )
+                if kind == "shm":
+                    backend = SharedMemoryBackend(path)
+                    backend.unlink()
+                    backend.close()
+
+
+if __name__ == "__main__":
+    main()
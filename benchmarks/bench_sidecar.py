@@ -0,0 +1,131 @@
+"""Context server round trips and pipelining vs the in-process store.
+
+Starts a context server in its own process and reports:
+- round-trip latency of a ping and of session_state
+- append latency, one record per round trip, against a MemoryBackend
+  called in-process
+- append throughput with --depth appends pipelined per round trip
+- ContextManager.add_thought with no backend, the socket backend, and the
+  socket backend behind write-behind (which pipelines its batches)
+
+    python -m benchmarks.bench_sidecar [--ops 5000] [--depth 1 8 64 256]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict
+
+from benchmarks.common import quiet_logging, summarize
+from src.context_manager import ContextManager
+from src.context_server import SocketBackend
+from src.errors import StorageError
+from src.storage import MemoryBackend, WriteBehindBackend
+from src.thought_record import ThoughtRecord
+
+
+def _timed(op: Callable[[int], object], ops: int) -> Dict[str, float]:
+    latencies = []
+    clock = time.perf_counter_ns
+    start = time.perf_counter()
+    for i in range(ops):
+        t0 = clock()
+        op(i)
+        latencies.append(clock() - t0)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def _print(name: str, stats: Dict[str, float]) -> None:
+    print(
+        f"{name:<34} {stats['ops_per_sec']:>12,.0f} {stats['p50_us']:>9.1f} "
+        f"{stats['p99_us']:>9.1f}"
+    )
+
+
+def _record(step: int) -> ThoughtRecord:
+    return ThoughtRecord(step, f"Thought {step}: " + "x" * 200, time.time())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--ops", type=int, default=5000)
+    parser.add_argument("--depth", type=int, nargs="+", default=[1, 8, 64, 256])
+    args = parser.parse_args()
+
+    quiet_logging()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "think.sock")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "src.context_server", path, "--log-level", "WARNING"]
+        )
+        client = SocketBackend(path)
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                client.ping()
+                break
+            except StorageError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+        try:
+            print(f"{'case':<34} {'ops/sec':>12} {'p50 us':>9} {'p99 us':>9}")
+            _print("ping (socket)", _timed(lambda i: client.ping(), args.ops))
+            _print("session_state (socket)", _timed(lambda i: client.session_state("s"), args.ops))
+
+            local = MemoryBackend()
+            _print(
+                "append (in-process MemoryBackend)",
+                _timed(lambda i: local.append("local", [_record(i + 1)], 0.0), args.ops),
+            )
+            _print(
+                "append (socket)",
+                _timed(lambda i: client.append("single", [_record(i + 1)], 0.0), args.ops),
+            )
+
+            for depth in args.depth:
+                rounds = max(1, args.ops // depth)
+
+                def pipelined(i: int, depth: int = depth) -> None:
+                    step = i + 1
+                    client.append_batch(
+                        [(f"pipe-{depth}-{s}", [_record(step)], 0.0) for s in range(depth)]
+                    )
+
+                stats = _timed(pipelined, rounds)
+                # Report appends per second, latency per round trip
+                stats["ops_per_sec"] *= depth
+                _print(f"append pipelined x{depth} (socket)", stats)
+
+            managers = {
+                "add_thought (in-process)": ContextManager(max_thoughts=1000, auto_cleanup=False),
+                "add_thought (socket)": ContextManager(
+                    max_thoughts=1000, backend=SocketBackend(path), auto_cleanup=False
+                ),
+                "add_thought (socket, write-behind)": ContextManager(
+                    max_thoughts=1000,
+                    backend=WriteBehindBackend(SocketBackend(path)),
+                    auto_cleanup=False,
+                ),
+            }
+            for name, cm in managers.items():
+                session = name.replace(" ", "")
+                stats = _timed(
+                    lambda i: cm.add_thought(f"{session}-{i % 100}", "x" * 200), args.ops
+                )
+                cm.shutdown()
+                _print(name, stats)
+        finally:
+            client.close()
+            server.terminate()
+            server.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Cold-start cost of a plugin worker, checked against a recorded baseline.
+
+Each run starts a fresh interpreter and measures two points:
+
+- ready: the tool module (and what it imports) is loaded
+- first invoke: the first thought has been stored, which creates the
+  shared context store
+
+When dify_plugin is installed, the real ThinkTool is loaded and invoked.
+Without it, the same path is exercised through the modules the tool
+imports and ContextManager.submit_thought. Times are medians over --runs
+interpreters, net of bare interpreter startup.
+
+A `python -X importtime` pass lists the slowest project modules to
+import. With --check the script exits with status 1 if either time is
+more than --tolerance above benchmarks/baselines/startup.json; record a
+new baseline with --update-baseline (baselines are per machine).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE = Path(__file__).resolve().parent / "baselines" / "startup.json"
+
+_HAS_DIFY = "import importlib.util, sys; sys.exit(importlib.util.find_spec('dify_plugin') is None)"
+
+# Each snippet prints "<ready seconds> <first invoke seconds>" from its own clock
+_TOOL_SNIPPET = """
+import time
+start = time.perf_counter()
+from unittest.mock import Mock
+from tools.think_tool import ThinkTool
+ready = time.perf_counter()
+runtime = Mock()
+runtime.workflow_id = "bench-startup"
+list(ThinkTool(runtime, Mock())._invoke({"thought": "first thought"}))
+print(ready - start, time.perf_counter() - start)
+"""
+
+_CORE_SNIPPET = """
+import time
+start = time.perf_counter()
+import src.config, src.errors, src.registry, src.responses
+ready = time.perf_counter()
+src.registry.get_context_manager().submit_thought("bench-startup", "first thought")
+print(ready - start, time.perf_counter() - start)
+"""
+
+
+def _python(*args: str, **kwargs) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    return subprocess.run(
+        [sys.executable, *args], cwd=ROOT, env=env, capture_output=True, text=True, **kwargs
+    )
+
+
+def interpreter_ms(runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        _python("-c", "pass", check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def startup_ms(snippet: str, runs: int) -> tuple:
+    ready, first = [], []
+    for _ in range(runs):
+        out = _python("-c", snippet, check=True).stdout.split()
+        ready.append(float(out[-2]) * 1000)
+        first.append(float(out[-1]) * 1000)
+    return statistics.median(ready), statistics.median(first)
+
+
+def slowest_imports(snippet: str, top: int) -> list:
+    """(cumulative us, module) of project modules from -X importtime."""
+    stderr = _python("-X", "importtime", "-c", snippet).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        name = module.strip()
+        if name.split(".")[0] in ("src", "tools", "provider", "dify_plugin"):
+            rows.append((int(cumulative), name))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=9)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    has_dify = _python("-c", _HAS_DIFY).returncode == 0
+    snippet = _TOOL_SNIPPET if has_dify else _CORE_SNIPPET
+    path = "ThinkTool" if has_dify else "core (dify_plugin not installed)"
+
+    print(f"path: {path}")
+    print("slowest project imports (cumulative):")
+    for cumulative, name in slowest_imports(snippet, args.top):
+        print(f"  {cumulative / 1000:>8.2f} ms  {name}")
+
+    base_ms = interpreter_ms(args.runs)
+    ready, first = startup_ms(snippet, args.runs)
+    result = {"path": path, "ready_ms": round(ready, 2), "first_invoke_ms": round(first, 2)}
+    print(f"interpreter startup:  {base_ms:.1f} ms (not included below)")
+    print(f"ready (tool loaded):  {ready:.1f} ms")
+    print(f"first invoke done:    {first:.1f} ms")
+
+    if args.update_baseline:
+        BASELINE.parent.mkdir(exist_ok=True)
+        BASELINE.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"baseline written to {BASELINE.relative_to(ROOT)}")
+        return
+    if not BASELINE.exists():
+        return
+    baseline = json.loads(BASELINE.read_text())
+    if baseline.get("path") != path:
+        print(f"baseline was recorded for path {baseline.get('path')!r}; not compared")
+        return
+    failed = False
+    for key in ("ready_ms", "first_invoke_ms"):
+        limit = baseline[key] * (1 + args.tolerance)
+        verdict = "ok" if result[key] <= limit else "REGRESSION"
+        failed = failed or verdict != "ok"
+        print(f"{key}: {result[key]:.1f} vs baseline {baseline[key]:.1f} (limit {limit:.1f}) {verdict}")
+    if args.check and failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Write-ahead log overhead and recovery time.
+
+Reports per-write latency of add_thought without a log, with a log that
+waits for its group-commit fsync, and with a log that returns before the
+fsync; aggregate throughput when several threads share the fsyncs; and
+how long a new manager takes to replay a log tail and a snapshot.
+"""
+
+import argparse
+import tempfile
+import time
+
+from benchmarks.common import quiet_logging, run_threads
+from src.context_manager import ContextManager
+from src.wal import WriteAheadLog
+
+THOUGHT = "x" * 200
+
+
+def _make_manager(path: str, mode: str) -> ContextManager:
+    if mode == "off":
+        return ContextManager(max_thoughts=1000)
+    return ContextManager(
+        max_thoughts=1000, wal=WriteAheadLog(path, wait_for_sync=(mode == "sync"))
+    )
+
+
+def write_overhead(path: str, mode: str, ops: int) -> None:
+    cm = _make_manager(path, mode)
+    start = time.perf_counter()
+    for i in range(ops):
+        cm.add_thought("overhead", f"Thought {i}: {THOUGHT}")
+    per_write_us = (time.perf_counter() - start) * 1e6 / ops
+    print(f"{mode:>8} {per_write_us:>14.1f}")
+    cm.shutdown()
+
+
+def group_commit(path: str, threads: int, ops: int) -> None:
+    cm = _make_manager(path, "sync")
+
+    def worker(index: int) -> None:
+        for i in range(ops):
+            cm.add_thought(f"writer-{index}", f"Thought {i}: {THOUGHT}")
+
+    elapsed = run_threads(worker, threads)
+    writes = threads * ops
+    syncs = cm.get_stats()["wal"]["syncs"]
+    print(f"{threads:>8} {writes / elapsed:>14,.0f} {writes / max(syncs, 1):>16.1f}")
+    cm.shutdown()
+
+
+def recovery(path: str, sessions: int, thoughts: int, snapshot: bool) -> None:
+    cm = _make_manager(path, "async")
+    for s in range(sessions):
+        for i in range(thoughts):
+            cm.add_thought(f"session-{s}", f"Thought {i}: {THOUGHT}")
+    if snapshot:
+        cm._wal.snapshot()
+    cm.shutdown()
+
+    start = time.perf_counter()
+    restored = _make_manager(path, "async")
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    source = "snapshot" if snapshot else "log"
+    total = sessions * thoughts
+    print(f"{source:>8} {total:>10,} {elapsed_ms:>12.1f} {total / elapsed_ms * 1000:>14,.0f}")
+    restored.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--thoughts", type=int, default=100)
+    args = parser.parse_args()
+
+    quiet_logging()
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'wal':>8} {'us/write':>14}")
+        for mode in ("off", "async", "sync"):
+            write_overhead(f"{tmp}/overhead-{mode}", mode, args.ops)
+
+        print(f"\n{'threads':>8} {'ops/s':>14} {'writes/fsync':>16}")
+        for count in args.threads:
+            group_commit(f"{tmp}/group-{count}", count, max(args.ops // count, 1))
+
+        print(f"\n{'replay':>8} {'thoughts':>10} {'startup ms':>12} {'thoughts/s':>14}")
+        recovery(f"{tmp}/recover-log", args.sessions, args.thoughts, snapshot=False)
+        recovery(f"{tmp}/recover-snap", args.sessions, args.thoughts, snapshot=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""add_thought latency with synchronous vs write-behind persistence on a slow disk.
+
+Every write transaction to the SQLite backend is delayed by --disk-ms to
+simulate slow storage. Reports p50/p99/max add_thought latency for each
+mode, the number of write batches and the time flush() took to drain.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.common import quiet_logging
+from src.context_manager import ContextManager
+from src.storage import SQLiteBackend, WriteBehindBackend
+
+
+class SlowSQLiteBackend(SQLiteBackend):
+    """SQLite backend with a fixed extra delay per write transaction."""
+
+    def __init__(self, path: str, delay: float):
+        super().__init__(path)
+        self.delay = delay
+
+    def append(self, session_id, records, created_at):
+        time.sleep(self.delay)
+        super().append(session_id, records, created_at)
+
+    def append_batch(self, batch):
+        time.sleep(self.delay)
+        return super().append_batch(batch)
+
+
+def _percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(mode: str, path: str, ops: int, delay: float, interval: float) -> None:
+    backend = SlowSQLiteBackend(path, delay)
+    if mode == "write-behind":
+        backend = WriteBehindBackend(backend, flush_interval=interval)
+    cm = ContextManager(max_thoughts=1000, backend=backend)
+
+    latencies = []
+    for i in range(ops):
+        start = time.perf_counter()
+        cm.add_thought(f"session-{i % 10}", f"Thought {i}: " + "x" * 200)
+        latencies.append((time.perf_counter() - start) * 1000)
+        # Roughly the gap between two tool invocations
+        time.sleep(interval / 10)
+
+    start = time.perf_counter()
+    backend.flush()
+    flush_ms = (time.perf_counter() - start) * 1000
+    batches = (
+        backend.stats()["write_behind"]["batches"]
+        if isinstance(backend, WriteBehindBackend)
+        else ops
+    )
+    cm.shutdown()
+    print(
+        f"{mode:>13} {_percentile(latencies, 0.5):>9.3f} {_percentile(latencies, 0.99):>9.3f} "
+        f"{max(latencies):>9.3f} {batches:>9} {flush_ms:>10.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ops", type=int, default=500)
+    parser.add_argument("--disk-ms", type=float, default=5.0)
+    parser.add_argument("--flush-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    quiet_logging()
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'mode':>13} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'batches':>9} {'flush ms':>10}")
+        for mode in ("sync", "write-behind"):
+            run(
+                mode,
+                os.path.join(tmp, f"{mode}.db"),
+                args.ops,
+                args.disk_ms / 1000,
+                args.flush_ms / 1000,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Shared helpers for benchmark scripts."""
+
+from typing import Callable, Dict, List, Sequence
+import logging
+import math
+import sys
+import threading
+import time
+
+
+def quiet_logging() -> None:
+    """Silence library logging so it does not skew timings."""
+    logging.disable(logging.CRITICAL)
+
+
+def gil_status() -> str:
+    """Describe whether the running interpreter has the GIL enabled."""
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    if is_gil_enabled is None:
+        return "enabled (no free-threading support)"
+    return "enabled" if is_gil_enabled() else "disabled (free-threaded build)"
+
+
+def run_threads(worker: Callable[[int], None], num_threads: int) -> float:
+    """
+    Run worker(index) on num_threads threads released by a common barrier.
+
+    Returns:
+        Wall-clock seconds from release until the last thread finished
+    """
+    barrier = threading.Barrier(num_threads + 1)
+
+    def target(index: int) -> None:
+        barrier.wait()
+        worker(index)
+
+    threads: List[threading.Thread] = [
+        threading.Thread(target=target, args=(i,)) for i in range(num_threads)
+    ]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def percentile(sorted_samples: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile (q in [0, 100]) of already sorted samples."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def summarize(samples_ns: Sequence[int], elapsed_s: float) -> Dict[str, float]:
+    """
+    Latency distribution and throughput of timed operations.
+
+    Args:
+        samples_ns: Per-operation latencies in nanoseconds
+        elapsed_s: Wall-clock seconds spent running the operations
+
+    Returns:
+        p50/p95/p99/mean in microseconds, ops_per_sec and the sample count
+    """
+    ordered = sorted(samples_ns)
+    return {
+        "p50_us": round(percentile(ordered, 50) / 1000, 3),
+        "p95_us": round(percentile(ordered, 95) / 1000, 3),
+        "p99_us": round(percentile(ordered, 99) / 1000, 3),
+        "mean_us": round(sum(ordered) / len(ordered) / 1000, 3) if ordered else 0.0,
+        "ops_per_sec": round(len(ordered) / elapsed_s, 1) if elapsed_s else 0.0,
+        "samples": len(ordered),
+    }
@@ -0,0 +1,266 @@
+"""Benchmark suite for the hot paths, with JSON baselines.
+
+Covers add_thought, get_context, get_formatted_context,
+cleanup_old_sessions and ThinkTool._invoke, each across session counts
+and thought sizes. Every case runs warm-up rounds, then timed rounds that
+record the latency of each call; results report p50/p95/p99 latency and
+ops/sec.
+
+    python -m benchmarks.suite run [--quick] [--filter add_thought] [--save out.json]
+    python -m benchmarks.suite run --compare benchmarks/baselines/suite.json
+    python -m benchmarks.suite compare baseline.json current.json [--threshold 0.2]
+
+compare (and run --compare) exits with status 1 if any case's p50 or p95
+latency grew by more than --threshold. Baselines are machine specific:
+record them on the machine that compares against them.
+"""
+
+import argparse
+import gc
+import importlib.util
+import json
+import platform
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from benchmarks.common import gil_status, quiet_logging, summarize
+from src.context_manager import ContextManager
+
+Op = Callable[[], object]
+Teardown = Callable[[], None]
+
+
+class Case(NamedTuple):
+    """One benchmark: setup() builds fresh state and returns (op, teardown)."""
+
+    name: str
+    setup: Callable[[], Tuple[Op, Teardown]]
+    ops: int  # timed samples per round
+    # Calls per sample; a sample's latency is their mean. Raise it for ops
+    # near the ~100 ns cost of reading the clock
+    inner: int = 1
+
+
+def _thought(size: int, i: int = 0) -> str:
+    prefix = f"Thought {i}: "
+    return prefix + ("considering the retry budget " * (size // 29 + 1))[: size - len(prefix)]
+
+
+def _filled(sessions: int, thoughts: int, size: int, max_thoughts: int = 100) -> ContextManager:
+    cm = ContextManager(max_thoughts=max_thoughts)
+    for s in range(sessions):
+        for i in range(thoughts):
+            cm.add_thought(f"session-{s}", _thought(size, i))
+    return cm
+
+
+def add_thought_case(sessions: int, size: int, ops: int) -> Case:
+    def setup():
+        cm = ContextManager()
+        text = _thought(size)
+        counter = iter(range(10**9))
+
+        def op():
+            cm.add_thought(f"session-{next(counter) % sessions}", text)
+
+        return op, cm.shutdown
+
+    return Case(f"add_thought[sessions={sessions},size={size}]", setup, ops)
+
+
+def get_context_case(sessions: int, ops: int) -> Case:
+    def setup():
+        cm = _filled(sessions, 5, 100)
+        counter = iter(range(10**9))
+
+        def op():
+            cm.get_context(f"session-{next(counter) % sessions}")
+
+        return op, cm.shutdown
+
+    return Case(f"get_context[sessions={sessions}]", setup, ops, inner=20)
+
+
+def formatted_case(thoughts: int, size: int, ops: int) -> Case:
+    def setup():
+        cm = _filled(1, thoughts, size, max_thoughts=max(thoughts, 1))
+        counter = iter(range(10**9))
+
+        def op():
+            # Every other call follows a new thought, so both the cached
+            # render and the incremental refresh are measured
+            if next(counter) % 2:
+                cm.add_thought("session-0", _thought(size))
+            return cm.get_formatted_context("session-0")
+
+        return op, cm.shutdown
+
+    return Case(f"get_formatted_context[thoughts={thoughts},size={size}]", setup, ops)
+
+
+def cleanup_case(sessions: int) -> Case:
+    def setup():
+        cm = _filled(sessions, 1, 100)
+
+        def op():
+            # Negative age: every session is expired
+            return cm.cleanup_old_sessions(max_age_hours=-1)
+
+        return op, cm.shutdown
+
+    return Case(f"cleanup_old_sessions[sessions={sessions}]", setup, 1)
+
+
+def invoke_case(size: int, ops: int) -> Optional[Case]:
+    if importlib.util.find_spec("dify_plugin") is None:
+        return None
+
+    def setup():
+        from unittest.mock import Mock
+
+        from src.registry import shutdown_context_manager
+        from tools.think_tool import ThinkTool
+
+        runtime = Mock()
+        runtime.workflow_id = "bench-invoke"
+        tool = ThinkTool(runtime, Mock())
+        params = {"thought": _thought(size)}
+
+        def op():
+            return list(tool._invoke(params))
+
+        return op, shutdown_context_manager
+
+    return Case(f"ThinkTool._invoke[size={size}]", setup, ops)
+
+
+def build_cases(quick: bool) -> List[Case]:
+    ops = 500 if quick else 2000
+    sessions = (1, 100) if quick else (1, 100, 1000)
+    sizes = (100, 2000) if quick else (100, 2000, 10000)
+    cases = [add_thought_case(s, size, ops) for s in sessions for size in sizes]
+    cases += [get_context_case(s, ops) for s in sessions]
+    cases += [formatted_case(n, 200, ops // 4) for n in ((10, 100) if quick else (10, 100, 1000))]
+    cases += [cleanup_case(n) for n in ((100, 1000) if quick else (100, 1000, 10000))]
+    cases += [invoke_case(size, ops) for size in sizes]
+    return [case for case in cases if case is not None]
+
+
+def run_case(case: Case, warmup: int, rounds: int) -> Dict[str, float]:
+    samples: List[int] = []
+    elapsed = 0.0
+    clock = time.perf_counter_ns
+    for round_index in range(warmup + rounds):
+        op, teardown = case.setup()
+        gc.collect()
+        times = [0] * case.ops
+        inner = range(case.inner)
+        start = time.perf_counter()
+        for i in range(case.ops):
+            t0 = clock()
+            for _ in inner:
+                op()
+            times[i] = (clock() - t0) // case.inner
+        took = time.perf_counter() - start
+        teardown()
+        if round_index >= warmup:
+            samples.extend(times)
+            elapsed += took / case.inner
+    return summarize(samples, elapsed)
+
+
+def run(args: argparse.Namespace) -> Dict:
+    quiet_logging()
+    results = {}
+    print(f"{'case':<52} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9} {'ops/sec':>12}")
+    for case in build_cases(args.quick):
+        if args.filter and args.filter not in case.name:
+            continue
+        rounds = args.rounds if case.ops > 1 else args.rounds * 5
+        stats = results[case.name] = run_case(case, args.warmup, rounds)
+        print(
+            f"{case.name:<52} {stats['p50_us']:>9.2f} {stats['p95_us']:>9.2f} "
+            f"{stats['p99_us']:>9.2f} {stats['ops_per_sec']:>12,.0f}"
+        )
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "gil": gil_status(),
+            "quick": args.quick,
+            "rounds": args.rounds,
+            "warmup": args.warmup,
+        },
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"saved to {args.save}")
+    return report
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> bool:
+    """Print per-case changes; return True if any case regressed."""
+    regressed = False
+    print(f"{'case':<52} {'p50':>16} {'p95':>16}  verdict")
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:<52} {'(new case)':>16}")
+            continue
+        cells = []
+        worse = False
+        for key in ("p50_us", "p95_us"):
+            change = now[key] / before[key] - 1 if before[key] else 0.0
+            worse = worse or change > threshold
+            cells.append(f"{now[key]:.2f} ({change:+.0%})")
+        regressed = regressed or worse
+        print(f"{name:<52} {cells[0]:>16} {cells[1]:>16}  {'REGRESSION' if worse else 'ok'}")
+    missing = baseline["results"].keys() - current["results"].keys()
+    if missing:
+        print(f"{len(missing)} baseline cases not run")
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the suite")
+    run_parser.add_argument("--quick", action="store_true", help="fewer cases and calls")
+    run_parser.add_argument("--filter", default="", help="only cases whose name contains this")
+    run_parser.add_argument("--warmup", type=int, default=1, help="discarded rounds per case")
+    run_parser.add_argument("--rounds", type=int, default=5, help="timed rounds per case")
+    run_parser.add_argument("--save", help="write results as JSON to this path")
+    run_parser.add_argument("--compare", help="baseline JSON to compare the results against")
+    run_parser.add_argument("--threshold", type=float, default=0.2)
+
+    compare_parser = commands.add_parser("compare", help="diff two saved results")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = run(args)
+        if not args.compare:
+            return
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            report = json.load(f)
+    print()
+    if compare(baseline, report, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,10 +9,13 @@ from pathlib import Path
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
-from dotenv import load_dotenv
+# Load environment variables; the daemon passes them in the environment,
+# so python-dotenv is only imported when a local .env file exists
+env_file = project_root / ".env"
+if env_file.exists():
+    from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+    load_dotenv(env_file)
 
 # Configure logging
 logging.basicConfig(
@@ -28,7 +31,22 @@ logger = logging.getLogger(__name__)
 
 def main():
     """Main entry point for the plugin."""
+    watcher = None
     try:
+        from src.config import ConfigWatcher, get_config
+
+        plugin_config = get_config()
+        reload_seconds = plugin_config.config_reload_seconds
+        if env_file.exists() and reload_seconds:
+            # Edits to .env reach live sessions without a restart
+            watcher = ConfigWatcher(str(env_file), reload_seconds)
+
+        if plugin_config.storage_backend == "socket" and plugin_config.context_server_autostart:
+            from src.context_server import ensure_server
+
+            # The server runs detached, so sessions outlive worker restarts
+            ensure_server(plugin_config.storage_path)
+
         from dify_plugin import Plugin, DifyPluginEnv
 
         logger.info("Initializing Claude Think Tool plugin...")
@@ -52,6 +70,12 @@ def main():
     except Exception as e:
         logger.error(f"Failed to start plugin: {e}", exc_info=True)
         sys.exit(1)
+    finally:
+        from src.registry import shutdown_context_manager
+
+        if watcher is not None:
+            watcher.close()
+        shutdown_context_manager()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,281 @@
+"""asyncio front end for ContextManager."""
+
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+import asyncio
+import logging
+import weakref
+
+from src.config import PluginConfig, get_config
+from src.context_manager import ContextManager, ThoughtResult
+from src.lockprof import LockProfiler
+from src.storage import StorageBackend
+from src.wal import WriteAheadLog
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AsyncContextManager:
+    """
+    ContextManager API as coroutines, safe to await from an event loop.
+
+    In-memory operations run inline: they hold the store's locks for
+    microseconds, never wait on I/O and complete without suspending (like
+    asyncio.Queue.put on a queue with room). When the store is durable
+    (storage backend or write-ahead log), every operation runs in an
+    executor so disk writes and fsync waits never block the loop, and
+    writers to the same session queue on an asyncio.Lock rather than
+    each occupying an executor thread. Periodic cleanup is an asyncio
+    task instead of the cleanup scheduler thread.
+
+    Use as ``async with AsyncContextManager() as cm:`` or call start()
+    and close() from the loop.
+    """
+
+    def __init__(
+        self,
+        max_thoughts: Optional[int] = None,
+        num_shards: Optional[int] = None,
+        backend: Optional[StorageBackend] = None,
+        wal: Optional[WriteAheadLog] = None,
+        lock_profiler: Optional[LockProfiler] = None,
+        auto_cleanup: Optional[bool] = None,
+        executor: Optional[Executor] = None,
+        offload: Optional[bool] = None,
+    ):
+        """
+        Initialize AsyncContextManager.
+
+        Args:
+            max_thoughts: Maximum number of thoughts per session (uses config if None)
+            num_shards: Number of session map lock partitions (uses config if None)
+            backend: Durable storage backend (uses config storage_backend if None)
+            wal: Write-ahead log (uses config wal_dir if None)
+            lock_profiler: Profiler wrapping the store's locks
+            auto_cleanup: Run the cleanup task (uses config if None)
+            executor: Runs blocking operations (a private thread pool if None)
+            offload: Run operations in the executor (default: only when durable)
+        """
+        config = get_config()
+        # The cleanup task below replaces the scheduler thread
+        self._manager = ContextManager(
+            max_thoughts=max_thoughts,
+            num_shards=num_shards,
+            backend=backend,
+            wal=wal,
+            lock_profiler=lock_profiler,
+            auto_cleanup=False,
+        )
+        self.enable_auto_cleanup = (
+            auto_cleanup if auto_cleanup is not None else config.enable_auto_cleanup
+        )
+        self._offload = offload if offload is not None else self._manager.is_durable
+        self._executor = executor
+        self._owns_executor = executor is None
+        # Per-session write locks; dropped once no coroutine holds or awaits them
+        self._session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = (
+            weakref.WeakValueDictionary()
+        )
+        self._cleanup_task: Optional[asyncio.Task] = None
+
+    @property
+    def manager(self) -> ContextManager:
+        """The underlying ContextManager (metrics, lock reports, sync access)."""
+        return self._manager
+
+    async def __aenter__(self) -> "AsyncContextManager":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def start(self) -> None:
+        """Start the cleanup task on the running loop (if auto cleanup is enabled)."""
+        if self.enable_auto_cleanup and self._cleanup_task is None:
+            self._cleanup_task = asyncio.get_running_loop().create_task(
+                self._cleanup_loop(), name="ContextManager-Cleanup"
+            )
+
+    async def close(self) -> None:
+        """Stop the cleanup task, then flush and close the store off the loop."""
+        task, self._cleanup_task = self._cleanup_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self._in_executor(self._manager.shutdown)
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def _cleanup_loop(self) -> None:
+        """Run cleanup_old_sessions every cleanup_interval_hours."""
+        while True:
+            await asyncio.sleep(self._manager.cleanup_interval_hours * 3600)
+            try:
+                cleaned = await self.cleanup_old_sessions()
+                if cleaned > 0:
+                    logger.info(f"Auto-cleanup: Removed {cleaned} old session(s)")
+            except Exception as e:
+                logger.error(f"Error in auto-cleanup: {e}", exc_info=True)
+
+    def _in_executor(
+        self, fn: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> "asyncio.Future[T]":
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(thread_name_prefix="ContextManager-IO")
+        return asyncio.get_running_loop().run_in_executor(
+            self._executor, partial(fn, *args, **kwargs)
+        )
+
+    async def _run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        if not self._offload:
+            return fn(*args, **kwargs)
+        return await self._in_executor(fn, *args, **kwargs)
+
+    async def _write(
+        self, session_id: str, fn: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        if not self._offload:
+            # Runs to completion without suspending, so it is atomic for the loop
+            return fn(*args, **kwargs)
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            lock = self._session_locks[session_id] = asyncio.Lock()
+        async with lock:
+            return await self._in_executor(fn, *args, **kwargs)
+
+    async def get_context(self, session_id: str) -> Dict:
+        """See ContextManager.get_context."""
+        return await self._run(self._manager.get_context, session_id)
+
+    async def add_thought(
+        self, session_id: str, thought: str, context: Optional[Dict] = None
+    ) -> int:
+        """See ContextManager.add_thought."""
+        return await self._write(
+            session_id, self._manager.add_thought, session_id, thought, context
+        )
+
+    async def submit_thought(
+        self,
+        session_id: str,
+        thought: str,
+        context: Optional[Dict] = None,
+        config: Optional[PluginConfig] = None,
+    ) -> ThoughtResult:
+        """See ContextManager.submit_thought."""
+        return await self._write(
+            session_id, self._manager.submit_thought, session_id, thought, context, config
+        )
+
+    async def add_thoughts(
+        self, session_id: str, thoughts: List[str], context: Optional[Dict] = None
+    ) -> range:
+        """See ContextManager.add_thoughts."""
+        return await self._write(
+            session_id, self._manager.add_thoughts, session_id, thoughts, context
+        )
+
+    async def submit_thoughts(
+        self,
+        session_id: str,
+        thoughts: List[str],
+        context: Optional[Dict] = None,
+        config: Optional[PluginConfig] = None,
+    ) -> List[ThoughtResult]:
+        """See ContextManager.submit_thoughts."""
+        return await self._write(
+            session_id, self._manager.submit_thoughts, session_id, thoughts, context, config
+        )
+
+    async def get_all_thoughts(
+        self,
+        session_id: str,
+        max_tokens: Optional[int] = None,
+        include_pinned: bool = True,
+    ) -> List[Dict]:
+        """See ContextManager.get_all_thoughts."""
+        return await self._run(
+            self._manager.get_all_thoughts, session_id, max_tokens, include_pinned
+        )
+
+    async def search_thoughts(self, session_id: str, query: str, limit: int = 10) -> List[Dict]:
+        """See ContextManager.search_thoughts."""
+        return await self._run(self._manager.search_thoughts, session_id, query, limit)
+
+    async def pin_thought(self, session_id: str, step: int, pinned: bool = True) -> bool:
+        """See ContextManager.pin_thought."""
+        return await self._write(
+            session_id, self._manager.pin_thought, session_id, step, pinned
+        )
+
+    async def get_thought(self, session_id: str, step: int) -> Optional[Dict]:
+        """See ContextManager.get_thought."""
+        return await self._run(self._manager.get_thought, session_id, step)
+
+    async def get_formatted_context(
+        self,
+        session_id: str,
+        output_format: str = "markdown",
+        max_tokens: Optional[int] = None,
+        include_pinned: bool = True,
+    ) -> str:
+        """See ContextManager.get_formatted_context."""
+        return await self._run(
+            self._manager.get_formatted_context,
+            session_id,
+            output_format,
+            max_tokens,
+            include_pinned,
+        )
+
+    async def clear_context(self, session_id: str) -> bool:
+        """See ContextManager.clear_context."""
+        return await self._write(session_id, self._manager.clear_context, session_id)
+
+    async def fork_session(self, session_id: str, branch_id: str) -> Dict:
+        """See ContextManager.fork_session."""
+        return await self._write(
+            branch_id, self._manager.fork_session, session_id, branch_id
+        )
+
+    async def merge_session(self, branch_id: str, into: Optional[str] = None) -> range:
+        """See ContextManager.merge_session."""
+        return await self._write(branch_id, self._manager.merge_session, branch_id, into)
+
+    async def discard_session(self, branch_id: str) -> bool:
+        """See ContextManager.discard_session."""
+        return await self._write(branch_id, self._manager.discard_session, branch_id)
+
+    async def set_session_ttl(
+        self, session_id: str, ttl_seconds: Optional[float], sliding: bool = True
+    ) -> bool:
+        """See ContextManager.set_session_ttl."""
+        return await self._write(
+            session_id, self._manager.set_session_ttl, session_id, ttl_seconds, sliding
+        )
+
+    async def get_context_summary(self, session_id: str) -> Dict:
+        """See ContextManager.get_context_summary."""
+        return await self._run(self._manager.get_context_summary, session_id)
+
+    async def get_stats(self) -> Dict:
+        """See ContextManager.get_stats."""
+        stats = await self._run(self._manager.get_stats)
+        stats["auto_cleanup_enabled"] = self.enable_auto_cleanup
+        return stats
+
+    async def cleanup_old_sessions(self, max_age_hours: Optional[int] = None) -> int:
+        """
+        See ContextManager.cleanup_old_sessions.
+
+        Always runs in the executor: a sweep can cover many sessions.
+        """
+        return await self._in_executor(self._manager.cleanup_old_sessions, max_age_hours)
@@ -2,24 +2,76 @@
 
 import os
 from typing import Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(frozen=True)
 class PluginConfig:
-    """Plugin configuration settings."""
+    """
+    Plugin configuration settings.
+
+    Instances are immutable snapshots: set_config and reload_config publish
+    a new snapshot with a higher version instead of changing the current
+    one, so a reader that took a snapshot sees consistent values.
+    """
 
     # Context Manager settings
     max_thoughts: int = 100
     cleanup_interval_hours: int = 24
     enable_auto_cleanup: bool = True
+    cleanup_batch_size: int = 100  # Sessions removed per lock acquisition
+
+    # Near-duplicate thoughts: off, merge (refresh the earlier step) or reject
+    dedup_mode: str = "off"
+    dedup_threshold: float = 0.8  # Estimated Jaccard similarity of the word shingles
+
+    # Tool responses: full (echo the thought), ack (step and context_size)
+    # or delta (ack plus dedup decisions and first-call session fields)
+    response_mode: str = "full"
 
     # Performance settings
     enable_context_compression: bool = False
+    compression_hot_thoughts: int = 20  # Most recent thoughts kept uncompressed
+    compression_min_length: int = 256  # Shorter thoughts are never compressed
+    compression_level: int = 6  # zlib level (1-9)
     max_thought_length: int = 10000  # Max characters per thought
+    max_thought_tokens: int = 0  # Max estimated tokens per thought (0 disables)
+    lock_shards: int = 16  # Independently locked session map partitions
+    # Profile shard and session locks per call site (diagnosis only: slow)
+    lock_profiling: bool = False
+    # Global budget for stored thoughts; half the manifest's 64MB, leaving
+    # headroom for the interpreter and SDK (0 disables)
+    max_memory_bytes: int = 32 * 1024 * 1024
+
+    # Storage settings
+    # memory (in-process only), sqlite, shm (shared by this host's processes)
+    # or socket (a context server at storage_path)
+    storage_backend: str = "memory"
+    storage_path: str = "think_context.db"
+    # Start a context server at storage_path if none answers (socket backend)
+    context_server_autostart: bool = False
+    # Shared memory segment size, fixed by the first process to create it
+    shm_size_bytes: int = 32 * 1024 * 1024
+    # Queue backend writes and apply them from a background worker
+    write_behind: bool = False
+    write_behind_queue_size: int = 10000  # Pending writes before add_thought blocks
+    write_behind_flush_ms: int = 50  # Max delay before a partial batch is written
+    write_behind_batch_size: int = 500  # Writes coalesced per batch
+    # Write-ahead log replayed on startup (empty disables it)
+    wal_dir: str = ""
+    wal_sync_interval_ms: int = 10  # Group commit window
+    wal_wait_for_sync: bool = True  # Block add_thought until its fsync
+    wal_snapshot_bytes: int = 16 * 1024 * 1024  # Log size that triggers a snapshot
+
+    # Metrics exposition (Prometheus text format); both off by default
+    metrics_port: int = 0  # Local HTTP port serving /metrics (0 disables)
+    metrics_host: str = "127.0.0.1"
+    metrics_file: str = ""  # File rewritten periodically (empty disables)
+    metrics_file_interval_seconds: int = 15
 
     # Logging settings
     log_level: str = "INFO"
@@ -29,6 +81,12 @@ class PluginConfig:
     allow_empty_thoughts: bool = False
     sanitize_input: bool = True
 
+    # Seconds between checks of the .env file for changes (0 disables)
+    config_reload_seconds: int = 5
+
+    # Snapshot number assigned when published (not part of equality)
+    version: int = field(default=0, compare=False)
+
     @classmethod
     def from_env(cls) -> "PluginConfig":
         """
@@ -38,9 +96,45 @@ class PluginConfig:
         - THINK_MAX_THOUGHTS: Maximum thoughts per session (default: 100)
         - THINK_CLEANUP_HOURS: Cleanup interval in hours (default: 24)
         - THINK_AUTO_CLEANUP: Enable auto cleanup (default: true)
+        - THINK_CLEANUP_BATCH_SIZE: Sessions removed per cleanup batch (default: 100)
+        - THINK_DEDUP_MODE: off, merge or reject near-duplicate thoughts (default: off)
+        - THINK_DEDUP_THRESHOLD: Similarity treated as duplicate (default: 0.8)
+        - THINK_RESPONSE_MODE: full, ack or delta tool responses (default: full)
+        - THINK_STORAGE_BACKEND: memory, sqlite, shm or socket (default: memory)
+        - THINK_STORAGE_PATH: Database path for durable backends; for shm it names
+          the shared segment, for socket it is the context server's socket
+          (default: think_context.db)
+        - THINK_CONTEXT_SERVER_AUTOSTART: Start the context server from main.py
+          if it is not running (default: false)
+        - THINK_SHM_SIZE_BYTES: Shared memory segment size (default: 33554432)
+        - THINK_WRITE_BEHIND: Queue backend writes off the request path (default: false)
+        - THINK_WRITE_BEHIND_QUEUE_SIZE: Pending writes before writers block (default: 10000)
+        - THINK_WRITE_BEHIND_FLUSH_MS: Max delay of a partial batch (default: 50)
+        - THINK_WRITE_BEHIND_BATCH_SIZE: Writes coalesced per batch (default: 500)
+        - THINK_WAL_DIR: Write-ahead log directory, empty to disable (default: empty)
+        - THINK_WAL_SYNC_INTERVAL_MS: WAL group commit window (default: 10)
+        - THINK_WAL_WAIT_FOR_SYNC: Wait for fsync before returning (default: true)
+        - THINK_WAL_SNAPSHOT_BYTES: WAL size that triggers a snapshot (default: 16777216)
+        - THINK_METRICS_PORT: Port serving /metrics, 0 to disable (default: 0)
+        - THINK_METRICS_HOST: Address the metrics server binds (default: 127.0.0.1)
+        - THINK_METRICS_FILE: File the metrics are dumped to, empty to disable
+          (default: empty)
+        - THINK_METRICS_FILE_INTERVAL: Seconds between metrics dumps (default: 15)
         - THINK_LOG_LEVEL: Log level (default: INFO)
+        - THINK_CONFIG_RELOAD_SECONDS: .env change polling interval, 0 to
+          disable (default: 5)
         - THINK_LOG_THOUGHTS: Log thought content (default: false)
         - THINK_MAX_THOUGHT_LENGTH: Max characters per thought (default: 10000)
+        - THINK_MAX_THOUGHT_TOKENS: Max estimated tokens per thought, 0 to
+          disable (default: 0)
+        - THINK_CONTEXT_COMPRESSION: Compress older thoughts (default: false)
+        - THINK_COMPRESSION_HOT_THOUGHTS: Recent thoughts kept uncompressed (default: 20)
+        - THINK_COMPRESSION_MIN_LENGTH: Min characters to compress a thought (default: 256)
+        - THINK_COMPRESSION_LEVEL: zlib compression level (default: 6)
+        - THINK_LOCK_SHARDS: Session map lock partitions (default: 16)
+        - THINK_LOCK_PROFILING: Record lock wait/hold per call site (default: false)
+        - THINK_MAX_MEMORY_BYTES: Global byte budget for stored thoughts,
+          0 to disable (default: 33554432)
 
         Returns:
             PluginConfig instance
@@ -55,9 +149,84 @@ class PluginConfig:
             enable_auto_cleanup=os.getenv(
                 "THINK_AUTO_CLEANUP", "true"
             ).lower() in ("true", "1", "yes"),
+            cleanup_batch_size=int(
+                os.getenv("THINK_CLEANUP_BATCH_SIZE", str(cls.cleanup_batch_size))
+            ),
+            dedup_mode=os.getenv("THINK_DEDUP_MODE", cls.dedup_mode).lower(),
+            dedup_threshold=float(
+                os.getenv("THINK_DEDUP_THRESHOLD", str(cls.dedup_threshold))
+            ),
+            response_mode=os.getenv("THINK_RESPONSE_MODE", cls.response_mode).lower(),
             max_thought_length=int(
                 os.getenv("THINK_MAX_THOUGHT_LENGTH", str(cls.max_thought_length))
             ),
+            max_thought_tokens=int(
+                os.getenv("THINK_MAX_THOUGHT_TOKENS", str(cls.max_thought_tokens))
+            ),
+            enable_context_compression=os.getenv(
+                "THINK_CONTEXT_COMPRESSION", "false"
+            ).lower() in ("true", "1", "yes"),
+            compression_hot_thoughts=int(
+                os.getenv(
+                    "THINK_COMPRESSION_HOT_THOUGHTS", str(cls.compression_hot_thoughts)
+                )
+            ),
+            compression_min_length=int(
+                os.getenv("THINK_COMPRESSION_MIN_LENGTH", str(cls.compression_min_length))
+            ),
+            compression_level=int(
+                os.getenv("THINK_COMPRESSION_LEVEL", str(cls.compression_level))
+            ),
+            lock_shards=int(
+                os.getenv("THINK_LOCK_SHARDS", str(cls.lock_shards))
+            ),
+            lock_profiling=os.getenv(
+                "THINK_LOCK_PROFILING", "false"
+            ).lower() in ("true", "1", "yes"),
+            max_memory_bytes=int(
+                os.getenv("THINK_MAX_MEMORY_BYTES", str(cls.max_memory_bytes))
+            ),
+            storage_backend=os.getenv(
+                "THINK_STORAGE_BACKEND", cls.storage_backend
+            ).lower(),
+            storage_path=os.getenv("THINK_STORAGE_PATH", cls.storage_path),
+            context_server_autostart=os.getenv(
+                "THINK_CONTEXT_SERVER_AUTOSTART", "false"
+            ).lower() in ("true", "1", "yes"),
+            shm_size_bytes=int(os.getenv("THINK_SHM_SIZE_BYTES", str(cls.shm_size_bytes))),
+            write_behind=os.getenv(
+                "THINK_WRITE_BEHIND", "false"
+            ).lower() in ("true", "1", "yes"),
+            write_behind_queue_size=int(
+                os.getenv("THINK_WRITE_BEHIND_QUEUE_SIZE", str(cls.write_behind_queue_size))
+            ),
+            write_behind_flush_ms=int(
+                os.getenv("THINK_WRITE_BEHIND_FLUSH_MS", str(cls.write_behind_flush_ms))
+            ),
+            write_behind_batch_size=int(
+                os.getenv("THINK_WRITE_BEHIND_BATCH_SIZE", str(cls.write_behind_batch_size))
+            ),
+            wal_dir=os.getenv("THINK_WAL_DIR", cls.wal_dir),
+            wal_sync_interval_ms=int(
+                os.getenv("THINK_WAL_SYNC_INTERVAL_MS", str(cls.wal_sync_interval_ms))
+            ),
+            wal_wait_for_sync=os.getenv(
+                "THINK_WAL_WAIT_FOR_SYNC", "true"
+            ).lower() in ("true", "1", "yes"),
+            wal_snapshot_bytes=int(
+                os.getenv("THINK_WAL_SNAPSHOT_BYTES", str(cls.wal_snapshot_bytes))
+            ),
+            metrics_port=int(os.getenv("THINK_METRICS_PORT", str(cls.metrics_port))),
+            metrics_host=os.getenv("THINK_METRICS_HOST", cls.metrics_host),
+            metrics_file=os.getenv("THINK_METRICS_FILE", cls.metrics_file),
+            metrics_file_interval_seconds=int(
+                os.getenv(
+                    "THINK_METRICS_FILE_INTERVAL", str(cls.metrics_file_interval_seconds)
+                )
+            ),
+            config_reload_seconds=int(
+                os.getenv("THINK_CONFIG_RELOAD_SECONDS", str(cls.config_reload_seconds))
+            ),
             log_level=os.getenv("THINK_LOG_LEVEL", cls.log_level).upper(),
             log_thoughts=os.getenv("THINK_LOG_THOUGHTS", "false").lower()
             in ("true", "1", "yes"),
@@ -81,16 +250,68 @@ class PluginConfig:
             raise ValueError("max_thoughts cannot exceed 1000")
         if self.cleanup_interval_hours < 1:
             raise ValueError("cleanup_interval_hours must be at least 1")
+        if self.cleanup_batch_size < 1:
+            raise ValueError("cleanup_batch_size must be at least 1")
+        if self.dedup_mode not in ("off", "merge", "reject"):
+            raise ValueError(f"Invalid dedup_mode: {self.dedup_mode}")
+        if not 0 < self.dedup_threshold <= 1:
+            raise ValueError("dedup_threshold must be in (0, 1]")
+        if self.response_mode not in ("full", "ack", "delta"):
+            raise ValueError(f"Invalid response_mode: {self.response_mode}")
         if self.max_thought_length < 100:
             raise ValueError("max_thought_length must be at least 100")
         if self.max_thought_length > 100000:
             raise ValueError("max_thought_length cannot exceed 100000")
+        if self.max_thought_tokens < 0:
+            raise ValueError("max_thought_tokens cannot be negative")
+        if self.compression_hot_thoughts < 0:
+            raise ValueError("compression_hot_thoughts cannot be negative")
+        if self.compression_min_length < 0:
+            raise ValueError("compression_min_length cannot be negative")
+        if not 1 <= self.compression_level <= 9:
+            raise ValueError("compression_level must be between 1 and 9")
+        if self.lock_shards < 1:
+            raise ValueError("lock_shards must be at least 1")
+        if self.lock_shards > 1024:
+            raise ValueError("lock_shards cannot exceed 1024")
+        if self.max_memory_bytes < 0:
+            raise ValueError("max_memory_bytes cannot be negative")
+        if self.storage_backend not in ("memory", "sqlite", "shm", "socket"):
+            raise ValueError(f"Invalid storage_backend: {self.storage_backend}")
+        if self.shm_size_bytes < 4 * 1024 * 1024:
+            raise ValueError("shm_size_bytes must be at least 4194304")
+        if self.write_behind_queue_size < 1:
+            raise ValueError("write_behind_queue_size must be at least 1")
+        if self.write_behind_flush_ms < 1:
+            raise ValueError("write_behind_flush_ms must be at least 1")
+        if self.write_behind_batch_size < 1:
+            raise ValueError("write_behind_batch_size must be at least 1")
+        if self.wal_sync_interval_ms < 1:
+            raise ValueError("wal_sync_interval_ms must be at least 1")
+        if self.wal_snapshot_bytes < 4096:
+            raise ValueError("wal_snapshot_bytes must be at least 4096")
+        if not 0 <= self.metrics_port <= 65535:
+            raise ValueError("metrics_port must be between 0 and 65535")
+        if self.metrics_file_interval_seconds < 1:
+            raise ValueError("metrics_file_interval_seconds must be at least 1")
+        if self.config_reload_seconds < 0:
+            raise ValueError("config_reload_seconds cannot be negative")
         if self.log_level not in ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"):
             raise ValueError(f"Invalid log_level: {self.log_level}")
 
 
-# Global configuration instance
+# Global configuration snapshot, replaced (never mutated) on every change
 _config: Optional[PluginConfig] = None
+_config_lock = threading.Lock()
+_last_version = 0
+
+
+def _publish(config: PluginConfig) -> PluginConfig:
+    """Install config as the next snapshot; the caller holds _config_lock."""
+    global _config, _last_version
+    _last_version += 1
+    _config = replace(config, version=_last_version)
+    return _config
 
 
 def get_config() -> PluginConfig:
@@ -98,29 +319,122 @@ def get_config() -> PluginConfig:
     Get global plugin configuration.
 
     Returns:
-        PluginConfig instance
+        The current PluginConfig snapshot; take it once per operation so
+        every setting comes from the same version
     """
-    global _config
-    if _config is None:
-        _config = PluginConfig.from_env()
-        try:
-            _config.validate()
-        except ValueError as e:
-            logger.error(f"Invalid configuration: {e}")
-            # Use default config if validation fails
-            _config = PluginConfig()
-    return _config
+    config = _config
+    if config is None:
+        with _config_lock:
+            if _config is None:
+                config = PluginConfig.from_env()
+                try:
+                    config.validate()
+                except ValueError as e:
+                    logger.error(f"Invalid configuration: {e}")
+                    # Use default config if validation fails
+                    config = PluginConfig()
+                _publish(config)
+            config = _config
+    return config
 
 
 def set_config(config: PluginConfig) -> None:
     """
     Set global plugin configuration.
 
+    Live ContextManagers adopt the new snapshot on their next operation.
+
     Args:
         config: PluginConfig instance
     """
-    global _config
     config.validate()
-    _config = config
-    logger.info("Plugin configuration updated")
+    with _config_lock:
+        published = _publish(config)
+    logger.info(f"Plugin configuration updated (version {published.version})")
+
+
+def reload_config() -> PluginConfig:
+    """
+    Re-read THINK_* environment variables and publish them if they changed.
+
+    Invalid values are logged and the current snapshot stays in effect.
+
+    Returns:
+        The snapshot in effect after the reload
+    """
+    current = get_config()
+    try:
+        candidate = PluginConfig.from_env()
+        candidate.validate()
+    except ValueError as e:
+        logger.error(f"Invalid configuration, keeping version {current.version}: {e}")
+        return current
+    with _config_lock:
+        if candidate == _config:
+            return _config
+        published = _publish(candidate)
+    logger.info(f"Plugin configuration reloaded (version {published.version})")
+    return published
+
+
+class ConfigWatcher:
+    """
+    Reloads the configuration when an env file changes.
+
+    Polls the file's modification time from a daemon thread; on a change
+    the file is loaded over the environment (python-dotenv) and
+    reload_config() publishes the result. Variables removed from the file
+    keep their previous value until restart.
+    """
+
+    def __init__(self, path: str, interval: float = 5.0):
+        """
+        Initialize ConfigWatcher and start polling.
+
+        Args:
+            path: Env file to watch
+            interval: Seconds between modification time checks
+        """
+        self.path = path
+        self._interval = interval
+        self._mtime = self._stat()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="ContextManager-ConfigWatcher", daemon=True
+        )
+        self._thread.start()
+
+    def _stat(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def check(self) -> bool:
+        """
+        Reload now if the file changed since the last check.
+
+        Returns:
+            True if the file changed
+        """
+        mtime = self._stat()
+        if mtime is None or mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        from dotenv import load_dotenv
+
+        load_dotenv(self.path, override=True)
+        reload_config()
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Config reload from {self.path} failed: {e}")
 
+    def close(self) -> None:
+        """Stop polling."""
+        self._stop.set()
+        self._thread.join()
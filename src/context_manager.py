@@ -1,15 +1,59 @@
 """Context Manager for accumulating thoughts across tool calls."""
 
-from typing import Dict, List, Optional
-from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
 import logging
 import threading
 import time
 
-from src.config import get_config
+from src.config import PluginConfig, get_config
+from src.dedup import DuplicateIndex, minhash_signature
+from src.errors import ContextError, StepConflictError
+from src.lockprof import LockProfiler
+from src.metrics import MetricsRegistry
+from src.rendering import RenderCache, get_renderer
+from src.scheduler import get_scheduler
+from src.search import SessionIndex
+from src.sharding import ShardedSessionMap
+from src.storage import StorageBackend, WriteBehindBackend, create_backend
+from src.thought_buffer import BranchBuffer, ThoughtBuffer
+from src.thought_record import RECORD_OVERHEAD_BYTES, ThoughtRecord, format_timestamp
+from src.tokens import estimate_tokens, select_within_budget
+from src.wal import OP_APPEND, OP_CLEAR, OP_SESSION, OP_TRIM, WriteAheadLog
 
 logger = logging.getLogger(__name__)
 
+# Approximate fixed cost of one session (context and metadata dicts, caches)
+SESSION_OVERHEAD_BYTES = 1024
+
+
+class ThoughtResult(NamedTuple):
+    """Outcome of submitting a thought."""
+
+    step: int
+    # "added", or with dedup enabled "merged"/"rejected" for near-duplicates
+    decision: str
+    # Step of the near-duplicate that caused a merge or rejection
+    duplicate_of: Optional[int] = None
+
+
+# Settings a live manager adopts from newer config snapshots (see refresh_config);
+# storage, log, shard and metrics settings only take effect in a new manager
+LIVE_SETTINGS = (
+    "max_thoughts",
+    "cleanup_interval_hours",
+    "enable_auto_cleanup",
+    "cleanup_batch_size",
+    "max_thought_length",
+    "max_thought_tokens",
+    "dedup_mode",
+    "dedup_threshold",
+    "enable_context_compression",
+    "compression_hot_thoughts",
+    "compression_min_length",
+    "compression_level",
+    "max_memory_bytes",
+)
+
 
 class ContextManager:
     """
@@ -18,60 +62,372 @@ class ContextManager:
     Thread-safe implementation with automatic cleanup.
     """
 
-    def __init__(self, max_thoughts: Optional[int] = None):
+    # Attempts to append when another process keeps taking the same step
+    _APPEND_RETRIES = 5
+
+    def __init__(
+        self,
+        max_thoughts: Optional[int] = None,
+        num_shards: Optional[int] = None,
+        backend: Optional[StorageBackend] = None,
+        wal: Optional[WriteAheadLog] = None,
+        lock_profiler: Optional[LockProfiler] = None,
+        auto_cleanup: Optional[bool] = None,
+    ):
         """
         Initialize ContextManager.
 
         Args:
             max_thoughts: Maximum number of thoughts per session (uses config if None)
+            num_shards: Number of session map lock partitions (uses config if None)
+            backend: Durable storage backend (uses config storage_backend if None)
+            wal: Write-ahead log to recover from and append to (uses
+                config wal_dir if None; disabled when that is empty)
+            lock_profiler: Profiler wrapping the shard and session locks
+                (created if None and config lock_profiling is set)
+            auto_cleanup: Register with the cleanup scheduler thread (uses
+                config if None; False when the caller schedules cleanup)
         """
         config = get_config()
-        # In-memory storage (can be replaced with persistent storage)
-        self._contexts: Dict[str, Dict] = {}
-        # Thread lock for thread-safety
-        self._lock = threading.RLock()
+        # Opt-in: per call site lock wait/hold statistics (see lock_report)
+        if lock_profiler is None and config.lock_profiling:
+            lock_profiler = LockProfiler()
+        self.lock_profiler = lock_profiler
+        # In-memory working set, lock-striped so unrelated sessions never contend
+        self._contexts = ShardedSessionMap(
+            num_shards if num_shards is not None else config.lock_shards,
+            lock_factory=self.lock_profiler.lock if self.lock_profiler else None,
+        )
+        # Durable store behind the working set (None: in-process only)
+        if backend is None:
+            backend = create_backend(
+                config.storage_backend, config.storage_path, config.shm_size_bytes
+            )
+            if backend is not None and config.write_behind:
+                # Keep disk writes off the add_thought latency path
+                backend = WriteBehindBackend(
+                    backend,
+                    max_queue=config.write_behind_queue_size,
+                    flush_interval=config.write_behind_flush_ms / 1000,
+                    batch_size=config.write_behind_batch_size,
+                )
+        self._backend = backend
         # Max thoughts per session (configurable)
         self.max_thoughts = max_thoughts if max_thoughts is not None else config.max_thoughts
         self.cleanup_interval_hours = config.cleanup_interval_hours
-        self.enable_auto_cleanup = config.enable_auto_cleanup
+        self.enable_auto_cleanup = (
+            auto_cleanup if auto_cleanup is not None else config.enable_auto_cleanup
+        )
         self.max_thought_length = config.max_thought_length
-        
-        # Auto cleanup thread (if enabled)
-        self._cleanup_thread: Optional[threading.Thread] = None
-        self._stop_cleanup = threading.Event()
+        self.max_thought_tokens = config.max_thought_tokens
+        # Near-duplicate detection: off, merge or reject
+        self.dedup_mode = config.dedup_mode
+        self.dedup_threshold = config.dedup_threshold
+        self.cleanup_batch_size = config.cleanup_batch_size
+        # Cold-thought compression: all but the newest N thoughts are zlib-packed
+        self.enable_context_compression = config.enable_context_compression
+        self.compression_hot_thoughts = config.compression_hot_thoughts
+        self.compression_min_length = config.compression_min_length
+        self.compression_level = config.compression_level
+        # Global memory budget; least recently used sessions are evicted first
+        self.max_memory_bytes = config.max_memory_bytes
+        # Config snapshot in effect; newer ones are adopted by refresh_config
+        self._config_version = config.version
+        self._config_lock = threading.Lock()
+        # Constructor arguments win over every later snapshot
+        self._overrides = {
+            name
+            for name, value in (
+                ("max_thoughts", max_thoughts),
+                ("enable_auto_cleanup", auto_cleanup),
+            )
+            if value is not None
+        }
+        # Maintained incrementally on the hot paths; reading never scans sessions
+        self.metrics = MetricsRegistry()
+        self._register_metrics()
+
+        # Crash recovery: rebuild the working set, then log every change
+        if wal is None and config.wal_dir:
+            wal = WriteAheadLog(
+                config.wal_dir,
+                sync_interval=config.wal_sync_interval_ms / 1000,
+                wait_for_sync=config.wal_wait_for_sync,
+                snapshot_bytes=config.wal_snapshot_bytes,
+            )
+        self._wal = wal
+        if self._wal is not None:
+            self._wal.replay(self._replay)
+            self._wal.start(self._snapshot_sessions)
         
         if self.enable_auto_cleanup:
-            self._start_cleanup_thread()
+            # A single process-wide scheduler thread serves every manager
+            get_scheduler().register(self)
         
         logger.info(
             f"ContextManager initialized: max_thoughts={self.max_thoughts}, "
             f"cleanup_interval={self.cleanup_interval_hours}h, "
-            f"auto_cleanup={self.enable_auto_cleanup}"
+            f"auto_cleanup={self.enable_auto_cleanup}, "
+            f"compression={self.enable_context_compression}, "
+            f"backend={type(self._backend).__name__ if self._backend else 'memory'}, "
+            f"wal={self._wal.directory if self._wal else None}"
         )
     
-    def _start_cleanup_thread(self) -> None:
-        """Start background cleanup thread."""
-        def cleanup_worker():
-            while not self._stop_cleanup.wait(self.cleanup_interval_hours * 3600):
-                try:
-                    cleaned = self.cleanup_old_sessions(self.cleanup_interval_hours)
-                    if cleaned > 0:
-                        logger.info(f"Auto-cleanup: Removed {cleaned} old session(s)")
-                except Exception as e:
-                    logger.error(f"Error in auto-cleanup: {e}", exc_info=True)
-        
-        self._cleanup_thread = threading.Thread(
-            target=cleanup_worker, daemon=True, name="ContextManager-Cleanup"
+    def _register_metrics(self) -> None:
+        """Create the metrics updated by this manager and its gauges."""
+        metrics = self.metrics
+        duration = "think_operation_duration_seconds"
+        duration_help = "Latency of think tool and context store operations."
+        self._invoke_seconds = metrics.histogram(duration, duration_help, operation="invoke")
+        self._add_seconds = metrics.histogram(duration, duration_help, operation="add")
+        self._render_seconds = metrics.histogram(duration, duration_help, operation="render")
+        self._cleanup_seconds = metrics.histogram(duration, duration_help, operation="cleanup")
+        self._lock_wait_seconds = metrics.histogram(
+            "think_session_lock_wait_seconds", "Time adds waited to acquire a session lock."
         )
-        self._cleanup_thread.start()
-        logger.debug("Auto-cleanup thread started")
-    
+        self._lock_hold_seconds = metrics.histogram(
+            "think_session_lock_hold_seconds", "Time adds held a session lock."
+        )
+
+        errors_help = "Operations that failed with an unexpected error."
+        self._errors = {
+            operation: metrics.counter("think_errors_total", errors_help, operation=operation)
+            for operation in ("invoke", "add", "render", "cleanup")
+        }
+        self._added_thoughts = metrics.counter(
+            "think_added_thoughts_total", "Thoughts stored."
+        )
+        rejected_help = "Thoughts not stored: invalid input or near-duplicates in reject mode."
+        self._rejected_invalid = metrics.counter(
+            "think_rejected_thoughts_total", rejected_help, reason="invalid"
+        )
+        self._rejected_duplicate = metrics.counter(
+            "think_rejected_thoughts_total", rejected_help, reason="duplicate"
+        )
+        self._merged_duplicates = metrics.counter(
+            "think_merged_thoughts_total", "Near-duplicates merged into an earlier step."
+        )
+        self._dedup_saved_bytes = metrics.counter(
+            "think_dedup_saved_bytes_total", "Bytes not stored thanks to dedup."
+        )
+        self._dedup_saved_tokens = metrics.counter(
+            "think_dedup_saved_tokens_total", "Estimated tokens not stored thanks to dedup."
+        )
+        evicted_help = "Thoughts dropped from memory: window overflow or memory budget."
+        self._evicted_window_thoughts = metrics.counter(
+            "think_evicted_thoughts_total", evicted_help, reason="window"
+        )
+        self._evicted_memory_thoughts = metrics.counter(
+            "think_evicted_thoughts_total", evicted_help, reason="memory"
+        )
+        sessions_help = "Sessions dropped from memory: memory budget or expiry."
+        self._evicted_memory_sessions = metrics.counter(
+            "think_evicted_sessions_total", sessions_help, reason="memory"
+        )
+        self._expired_sessions = metrics.counter(
+            "think_evicted_sessions_total", sessions_help, reason="expired"
+        )
+        branches_help = "Session branch operations (see fork_session)."
+        self._branch_ops = {
+            operation: metrics.counter(
+                "think_branch_operations_total", branches_help, operation=operation
+            )
+            for operation in ("fork", "merge", "discard")
+        }
+
+        metrics.gauge("think_sessions", "Sessions in memory.", lambda: len(self._contexts))
+        metrics.gauge("think_thoughts", "Thoughts in memory.", self._contexts.total_thoughts)
+        metrics.gauge(
+            "think_stored_bytes", "Approximate bytes held by sessions.", self._contexts.total_bytes
+        )
+        metrics.gauge(
+            "think_memory_budget_bytes",
+            "Memory budget for sessions (0: unlimited).",
+            lambda: self.max_memory_bytes,
+        )
+
+    def observe_invoke(self, seconds: float) -> None:
+        """Record the duration of one think tool invocation."""
+        self._invoke_seconds.observe(seconds)
+
+    def record_error(self, operation: str) -> None:
+        """
+        Count an unexpected error.
+
+        Args:
+            operation: invoke, add, render or cleanup
+        """
+        self._errors[operation].inc()
+
+    def lock_report(self, limit: int = 10, sort_by: str = "wait_total") -> List[Dict]:
+        """
+        Worst lock call sites, when lock profiling is enabled.
+
+        Args:
+            limit: Maximum rows returned
+            sort_by: wait_total, wait_max, hold_total, hold_max or contended
+
+        Returns:
+            Rows as described in LockProfiler.report (empty when disabled)
+        """
+        if self.lock_profiler is None:
+            return []
+        return self.lock_profiler.report(limit, sort_by)
+
+    def render_metrics(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        return self.metrics.render_prometheus()
+
+    def refresh_config(self, config: Optional[PluginConfig] = None) -> bool:
+        """
+        Adopt a config snapshot newer than the one in effect.
+
+        Only LIVE_SETTINGS change. A lower max_thoughts reaches existing
+        sessions lazily: each is trimmed on its next write or render
+        rather than in one pass over every session. Settings passed to the
+        constructor (max_thoughts, auto_cleanup) are kept.
+
+        Args:
+            config: Snapshot to adopt (the current one if None)
+
+        Returns:
+            True if the snapshot was newer and has been applied
+        """
+        if config is None:
+            config = get_config()
+        if config.version <= self._config_version:
+            return False
+        with self._config_lock:
+            if config.version <= self._config_version:
+                return False
+            changed = {}
+            for name in LIVE_SETTINGS:
+                if name in self._overrides:
+                    continue
+                value = getattr(config, name)
+                if getattr(self, name) != value:
+                    changed[name] = value
+                    setattr(self, name, value)
+            if "enable_auto_cleanup" in changed:
+                if self.enable_auto_cleanup:
+                    get_scheduler().register(self)
+                else:
+                    get_scheduler().unregister(self)
+            self._config_version = config.version
+        if changed:
+            logger.info(f"Applied configuration version {config.version}: {changed}")
+        return True
+
+    def _fit_window(self, session_id: str, context: Dict) -> None:
+        """
+        Resize a session's window to the current max_thoughts.
+
+        Drops the oldest thoughts if the limit was lowered. The caller
+        holds the session lock.
+        """
+        thoughts = context["thoughts"]
+        capacity = self.max_thoughts
+        released = 0
+        dropped = 0
+        while len(thoughts) > capacity:
+            oldest = thoughts.pop_oldest()
+            released += oldest.nbytes + self._unindex_record(context, oldest.step)
+            dropped += 1
+        # Empty slots are counted in the session's bytes (see _new_context)
+        delta_bytes = 8 * (capacity - thoughts.capacity) - released
+        thoughts.resize(capacity)
+        self._contexts.add_bytes(session_id, delta_bytes, -dropped, context)
+        if dropped:
+            self._evicted_window_thoughts.inc(dropped)
+            if self._wal is not None:
+                self._wal.trim(session_id, thoughts.first_step)
+            if self._backend is not None:
+                self._backend.trim(session_id, thoughts.first_step)
+            logger.info(
+                f"max_thoughts lowered to {capacity}, removed {dropped} oldest "
+                f"thoughts from session {session_id}"
+            )
+
+    @property
+    def is_durable(self) -> bool:
+        """Whether writes reach a storage backend or write-ahead log (may block on I/O)."""
+        return self._backend is not None or self._wal is not None
+
     def shutdown(self) -> None:
-        """Shutdown the context manager and cleanup thread."""
-        if self._cleanup_thread:
-            self._stop_cleanup.set()
-            self._cleanup_thread.join(timeout=5)
-            logger.info("ContextManager shutdown complete")
+        """Shutdown the context manager, its scheduled cleanup and backend."""
+        if self.enable_auto_cleanup:
+            get_scheduler().unregister(self)
+        if self._backend is not None:
+            self._backend.flush()
+            self._backend.close()
+        if self._wal is not None:
+            self._wal.close()
+        logger.info("ContextManager shutdown complete")
+
+    def _replay(self, op: int, session_id: str, value: object) -> None:
+        """
+        Apply one write-ahead log frame during startup recovery.
+
+        Runs before the manager is shared, so no session lock is taken.
+        Appends at or below the session's last step are already applied
+        (snapshots overlap the log segment that follows them).
+        """
+        if op == OP_CLEAR:
+            self._contexts.pop(session_id)
+            return
+        if op == OP_TRIM:
+            context = self._contexts.get(session_id)
+            if context is not None:
+                thoughts = context["thoughts"]
+                while len(thoughts) and thoughts.first_step < value:
+                    self._contexts.add_bytes(
+                        session_id, -thoughts.pop_oldest().nbytes, -1, context
+                    )
+            return
+
+        context = self._contexts.get_or_create(session_id, self._new_context)
+        thoughts = context["thoughts"]
+        metadata = context["metadata"]
+        if op == OP_SESSION:
+            metadata["created_at"] = value
+            return
+        if op != OP_APPEND or value.step <= thoughts.last_step:
+            return
+
+        record = value
+        delta_bytes = record.nbytes
+        before = len(thoughts)
+        if not thoughts.last_step:
+            metadata["created_at"] = min(metadata["created_at"], record.created)
+        if record.step != thoughts.next_step:
+            delta_bytes -= sum(entry.nbytes for entry in thoughts)
+            thoughts.reset(record.step)
+        removed = thoughts.append(record)
+        if removed is not None:
+            delta_bytes -= removed.nbytes
+        if self.enable_context_compression:
+            cold = thoughts.by_step(record.step - self.compression_hot_thoughts)
+            if cold is not None and not thoughts.is_shared(cold.step):
+                cold_before = cold.nbytes
+                cold.compress(self.compression_min_length, self.compression_level)
+                delta_bytes += cold.nbytes - cold_before
+        metadata["last_updated"] = record.created
+        metadata["total_steps"] = record.step
+        # Restored sessions start a fresh idle period from recovery time
+        self._contexts.touch(
+            session_id, time.time(), delta_bytes, len(thoughts) - before, context
+        )
+
+    def _snapshot_sessions(self) -> Iterator[Tuple[str, float, List[ThoughtRecord]]]:
+        """Yield (session_id, created_at, records) for a write-ahead log snapshot."""
+        for session_id in self._contexts:
+            context = self._contexts.get(session_id)
+            if context is None:
+                continue
+            with self._contexts.lock_session(session_id):
+                records = list(context["thoughts"])
+                created_at = context["metadata"]["created_at"]
+            yield session_id, created_at, records
 
     def get_context(self, session_id: str) -> Dict:
         """
@@ -83,19 +439,181 @@ class ContextManager:
         Returns:
             Dict containing session context
         """
-        with self._lock:
-            if session_id not in self._contexts:
-                self._contexts[session_id] = {
-                    "session_id": session_id,
-                    "thoughts": [],
-                    "metadata": {
-                        "created_at": datetime.utcnow().isoformat(),
-                        "last_updated": datetime.utcnow().isoformat(),
-                        "total_steps": 0,
-                    },
-                }
-                logger.debug(f"Created new context for session: {session_id}")
-            return self._contexts[session_id]
+        context = self._contexts.get_or_create(session_id, self._new_context)
+        if self._backend is not None and not (
+            self._backend.single_writer and context["loaded"]
+        ):
+            with self._contexts.lock_session(session_id):
+                self._sync(session_id, context)
+                context["loaded"] = True
+        return context
+
+    def _sync(self, session_id: str, context: Dict) -> None:
+        """
+        Pull thoughts other processes stored since this context was last synced.
+
+        The caller holds the session lock.
+        """
+        state = self._backend.session_state(session_id)
+        if state is None:
+            return
+        thoughts = context["thoughts"]
+        metadata = context["metadata"]
+        if state.created_at < metadata["created_at"]:
+            metadata["created_at"] = state.created_at
+        if state.last_step <= thoughts.last_step:
+            return
+
+        records = self._backend.load(
+            session_id, after_step=thoughts.last_step, limit=thoughts.capacity
+        )
+        delta_bytes = 0
+        before = len(thoughts)
+        if records and records[0].step != thoughts.next_step:
+            # The gap is wider than the window: reload the window from scratch
+            delta_bytes -= sum(record.nbytes for record in thoughts)
+            delta_bytes -= self._drop_indexes(context)
+            thoughts.reset(records[0].step)
+        for record in records:
+            removed = thoughts.append(record)
+            delta_bytes += record.nbytes + self._index_record(context, record)
+            if removed is not None:
+                delta_bytes -= removed.nbytes + self._unindex_record(context, removed.step)
+
+        metadata["total_steps"] = thoughts.last_step
+        metadata["last_updated"] = max(metadata["last_updated"], state.last_updated)
+        self._contexts.touch(
+            session_id, metadata["last_updated"], delta_bytes, len(thoughts) - before, context
+        )
+        logger.debug(
+            f"Synced session {session_id} from storage: {len(records)} thought(s), "
+            f"now at step {thoughts.last_step}"
+        )
+
+    def _index_record(
+        self, context: Dict, record: ThoughtRecord, signature: Optional[bytes] = None
+    ) -> int:
+        """
+        Add a record to the session's search and dedup indexes, if built.
+
+        Returns:
+            Approximate bytes added
+        """
+        added = 0
+        search_index = context["search_index"]
+        if search_index is not None:
+            added += search_index.add(record.step, record.thought)
+        dedup_index = context["dedup_index"]
+        if dedup_index is not None:
+            if signature is None:
+                signature = minhash_signature(record.thought)
+            added += dedup_index.add(record.step, signature)
+        return added
+
+    def _unindex_record(self, context: Dict, step: int) -> int:
+        """
+        Remove an evicted step from the session's indexes.
+
+        Returns:
+            Approximate bytes released
+        """
+        released = 0
+        for key in ("search_index", "dedup_index"):
+            index = context[key]
+            if index is not None:
+                released += index.remove(step)
+        return released
+
+    def _drop_indexes(self, context: Dict) -> int:
+        """
+        Discard the session's indexes (they are rebuilt on next use).
+
+        Returns:
+            Approximate bytes released
+        """
+        released = 0
+        for key in ("search_index", "dedup_index"):
+            index = context[key]
+            if index is not None:
+                released += index.nbytes
+                context[key] = None
+        return released
+
+    def _persist(
+        self,
+        session_id: str,
+        context: Dict,
+        entries: List[Tuple[str, int]],
+        now: float,
+    ) -> List[ThoughtRecord]:
+        """
+        Store new thoughts in the backend and return their records.
+
+        The entries get consecutive steps and go to storage in one append.
+        The first attempt is optimistic; on a step conflict the context is
+        synced from storage and the batch is renumbered after the last
+        stored step. The caller holds the session lock.
+
+        Args:
+            entries: (thought, tokens) pairs in submission order
+
+        Raises:
+            ContextError: If concurrent writers keep claiming the steps
+        """
+        for attempt in range(self._APPEND_RETRIES):
+            if attempt:
+                self._sync(session_id, context)
+            first = context["thoughts"].next_step
+            records = [
+                ThoughtRecord(first + offset, thought, now, tokens)
+                for offset, (thought, tokens) in enumerate(entries)
+            ]
+            try:
+                self._backend.append(session_id, records, context["metadata"]["created_at"])
+                return records
+            except StepConflictError:
+                logger.debug(
+                    f"Step {first} of session {session_id} taken by another writer"
+                )
+        raise ContextError(
+            f"Could not store thought for session {session_id}: "
+            f"step conflicts after {self._APPEND_RETRIES} attempts"
+        )
+
+    def _new_context(
+        self, session_id: str, thoughts: Optional[BranchBuffer] = None
+    ) -> Dict:
+        """Build a context for a new session (empty unless thoughts is given)."""
+        logger.debug(f"Created new context for session: {session_id}")
+        now = time.time()
+        return {
+            "session_id": session_id,
+            "thoughts": thoughts if thoughts is not None else ThoughtBuffer(self.max_thoughts),
+            # Output format -> RenderCache, filled on first render
+            "render_cache": {},
+            # Steps always included in token-budgeted renders, ascending
+            "pinned": [],
+            # Full-text index, built on first search_thoughts call
+            "search_index": None,
+            # Near-duplicate index, built on first add with dedup enabled
+            "dedup_index": None,
+            # Synced from the storage backend at least once
+            "loaded": False,
+            # {"parent", "fork_step"} for sessions created by fork_session
+            "branch": None,
+            "metadata": {
+                # Epoch seconds; formatted to ISO only in summaries
+                "created_at": now,
+                "last_updated": now,
+                "total_steps": 0,
+                # Approximate bytes and thoughts held, maintained by the session map
+                "bytes": SESSION_OVERHEAD_BYTES + 8 * self.max_thoughts,
+                "thought_count": 0,
+                # Per-session TTL override (see set_session_ttl)
+                "ttl_seconds": None,
+                "ttl_mode": None,
+            },
+        }
 
     def add_thought(
         self, session_id: str, thought: str, context: Optional[Dict] = None
@@ -106,60 +624,286 @@ class ContextManager:
         Args:
             session_id: Session identifier
             thought: Thought content
-            context: Existing context (optional, will be retrieved if None)
+            context: Context from get_context (optional; the session's current
+                context is looked up again under its lock)
 
         Returns:
-            Step number (1-based)
+            Step number (1-based); with dedup enabled, the step of the
+            near-duplicate if the thought was merged or rejected
 
         Raises:
             ValueError: If thought exceeds max length or is empty (if not allowed)
         """
-        # Validate thought
-        if not thought:
+        return self.submit_thought(session_id, thought, context).step
+
+    def submit_thought(
+        self,
+        session_id: str,
+        thought: str,
+        context: Optional[Dict] = None,
+        config: Optional[PluginConfig] = None,
+    ) -> ThoughtResult:
+        """
+        Add a thought and report what happened to it (thread-safe).
+
+        With dedup_mode set, a thought whose estimated similarity to one in
+        the session's window reaches dedup_threshold is not stored: in
+        "merge" mode it refreshes the session as activity on the earlier
+        step, in "reject" mode it is dropped. Either way the caller gets
+        the earlier step back.
+
+        Args:
+            session_id: Session identifier
+            thought: Thought content
+            context: Context from get_context (optional; the session's current
+                context is looked up again under its lock)
+            config: Config snapshot to apply (the current one if None)
+
+        Returns:
+            ThoughtResult with the step, decision and duplicate step
+
+        Raises:
+            ValueError: If thought exceeds max length or is empty (if not allowed)
+        """
+        return self.submit_thoughts(session_id, [thought], context, config)[0]
+
+    def add_thoughts(
+        self, session_id: str, thoughts: List[str], context: Optional[Dict] = None
+    ) -> range:
+        """
+        Add several thoughts to a session in one call (thread-safe).
+
+        Args:
+            session_id: Session identifier
+            thoughts: Thought contents, in order
+            context: Context from get_context (optional; the session's current
+                context is looked up again under its lock)
+
+        Returns:
+            Steps of the stored thoughts (empty if none was stored)
+
+        Raises:
+            ValueError: If any thought exceeds max length or is empty (if not
+                allowed); nothing from the batch is stored
+        """
+        steps = [
+            result.step
+            for result in self.submit_thoughts(session_id, thoughts, context)
+            if result.decision == "added"
+        ]
+        return range(steps[0], steps[-1] + 1) if steps else range(0)
+
+    def submit_thoughts(
+        self,
+        session_id: str,
+        thoughts: List[str],
+        context: Optional[Dict] = None,
+        config: Optional[PluginConfig] = None,
+    ) -> List[ThoughtResult]:
+        """
+        Add several thoughts and report what happened to each (thread-safe).
+
+        The whole batch is validated before anything is stored, then
+        appended under a single acquisition of the session lock: stored
+        thoughts get consecutive steps, reach the backend in one append and
+        the write-ahead log in one write. Near-duplicates are detected
+        against the session and against earlier thoughts of the batch.
+
+        Args:
+            session_id: Session identifier
+            thoughts: Thought contents, in order
+            context: Context from get_context (optional; the session's current
+                context is looked up again under its lock)
+            config: Config snapshot to apply (the current one if None); the
+                whole call uses this one snapshot
+
+        Returns:
+            One ThoughtResult per thought, in order
+
+        Raises:
+            ValueError: If any thought exceeds max length or is empty (if not
+                allowed); nothing from the batch is stored
+        """
+        start = time.perf_counter()
+        if config is None:
             config = get_config()
-            if not config.allow_empty_thoughts:
-                raise ValueError("Thought cannot be empty")
-        
+        if config.version > self._config_version:
+            self.refresh_config(config)
+        thoughts = list(thoughts)
+        entries: List[Tuple[str, int]] = []
+        for position, thought in enumerate(thoughts, 1):
+            try:
+                entries.append(self._prepare_thought(thought, config))
+            except ValueError as e:
+                self._rejected_invalid.inc(len(thoughts))
+                if len(thoughts) == 1:
+                    raise
+                raise ValueError(f"Thought {position} of {len(thoughts)}: {e}") from None
+        if not entries:
+            return []
+
+        # Fingerprint outside the lock; only the bucket lookup needs it
+        signatures = None
+        if self.dedup_mode != "off":
+            signatures = [minhash_signature(thought) for thought, _ in entries]
+
+        # Only writers to the same session serialize on this lock
+        waiting = time.perf_counter()
+        lock = self._contexts.acquire_session(session_id)
+        acquired = time.perf_counter()
+        try:
+            # A context looked up earlier may have been cleared or expired since
+            context = self._contexts.get_or_create(session_id, self._new_context)
+            if self._backend is not None and not context["loaded"]:
+                # Continue numbering after what storage already holds
+                self._sync(session_id, context)
+                context["loaded"] = True
+            if context["thoughts"].capacity != self.max_thoughts:
+                self._fit_window(session_id, context)
+            results = self._append_batch(session_id, context, entries, signatures, config)
+        except Exception:
+            self._errors["add"].inc()
+            raise
+        finally:
+            lock.release()
+            released = time.perf_counter()
+            self._lock_wait_seconds.observe(acquired - waiting)
+            self._lock_hold_seconds.observe(released - acquired)
+        self._add_seconds.observe(released - start)
+        return results
+
+    def _prepare_thought(self, thought: str, config: PluginConfig) -> Tuple[str, int]:
+        """
+        Validate and sanitize one thought.
+
+        Returns:
+            (thought, estimated tokens)
+
+        Raises:
+            ValueError: If thought exceeds max length or is empty (if not allowed)
+        """
+        # Validate thought
+        if not thought and not config.allow_empty_thoughts:
+            raise ValueError("Thought cannot be empty")
+
         # Check thought length
         if len(thought) > self.max_thought_length:
             raise ValueError(
                 f"Thought length ({len(thought)}) exceeds maximum "
                 f"({self.max_thought_length} characters)"
             )
-        
+
+        # Estimated once here and cached on the record for budgeted renders
+        tokens = estimate_tokens(thought)
+        if self.max_thought_tokens and tokens > self.max_thought_tokens:
+            raise ValueError(
+                f"Thought length (~{tokens} tokens) exceeds maximum "
+                f"({self.max_thought_tokens} tokens)"
+            )
+
         # Sanitize input if enabled
-        config = get_config()
         if config.sanitize_input:
             # Basic sanitization: remove null bytes and control characters
             thought = thought.replace("\x00", "").replace("\r\n", "\n")
-        
-        with self._lock:
-            if context is None:
-                context = self.get_context(session_id)
+        return thought, tokens
 
-            # Check max thoughts limit
-            if len(context["thoughts"]) >= self.max_thoughts:
-                # Remove oldest thought (FIFO)
-                removed = context["thoughts"].pop(0)
+    def _append_batch(
+        self,
+        session_id: str,
+        context: Dict,
+        entries: List[Tuple[str, int]],
+        signatures: Optional[List[Optional[bytes]]],
+        config: PluginConfig,
+    ) -> List[ThoughtResult]:
+        """
+        Store prepared thoughts in a loaded context.
+
+        The caller holds the session lock.
+
+        Args:
+            entries: (thought, tokens) pairs in submission order
+            signatures: MinHash signatures of the entries (None for entries
+                without words), or None without dedup
+
+        Returns:
+            One ThoughtResult per entry, in order
+        """
+        thoughts = context["thoughts"]
+        now = time.time()
+        before = len(thoughts)
+
+        # Decide which entries are stored before numbering them
+        accepted: List[int] = []
+        duplicates: List[Tuple[int, Optional[int], Optional[int]]] = []
+        if signatures is None:
+            accepted = list(range(len(entries)))
+        else:
+            # Earlier thoughts of this batch are not in the session index yet;
+            # the whole batch is checked against one threshold
+            threshold = self.dedup_threshold
+            pending = DuplicateIndex(threshold)
+            for position, signature in enumerate(signatures):
+                step = self._find_duplicate(session_id, context, signature, threshold)
+                earlier = None
+                if step is None:
+                    match = pending.find(signature)
+                    earlier = None if match is None else match[0]
+                if step is None and earlier is None:
+                    accepted.append(position)
+                    pending.add(position, signature)
+                else:
+                    duplicates.append((position, step, earlier))
+
+        # Add new thoughts; step numbers keep counting after eviction
+        stored = [entries[position] for position in accepted]
+        if not stored:
+            records = []
+        elif self._backend is not None:
+            records = self._persist(session_id, context, stored, now)
+        else:
+            first = thoughts.next_step
+            records = [
+                ThoughtRecord(first + offset, thought, now, tokens)
+                for offset, (thought, tokens) in enumerate(stored)
+            ]
+        if records and self._wal is not None:
+            # Durable (per wal_wait_for_sync) before they become visible
+            self._wal.append_thoughts(session_id, records)
+
+        results: List[Optional[ThoughtResult]] = [None] * len(entries)
+        delta_bytes = 0
+        evicted = 0
+        for position, record in zip(accepted, records):
+            step = record.step
+            delta_bytes += record.nbytes
+            # Ring buffer evicts the oldest thought (FIFO) in O(1) when full
+            removed = thoughts.append(record)
+            delta_bytes += self._index_record(
+                context, record, None if signatures is None else signatures[position]
+            )
+            if removed is not None:
+                evicted += 1
+                delta_bytes -= removed.nbytes + self._unindex_record(context, removed.step)
                 logger.warning(
                     f"Max thoughts reached for session {session_id}, "
                     f"removed oldest thought (step {removed['step']})"
                 )
+                if self._backend is not None and step % thoughts.capacity == 0:
+                    # Bound stored history to the window, once per window
+                    self._backend.trim(session_id, thoughts.first_step)
 
-            # Add new thought
-            step = len(context["thoughts"]) + 1
-            now = datetime.utcnow()
-            thought_entry = {
-                "timestamp": now.isoformat(),
-                "thought": thought,
-                "step": step,
-            }
-
-            context["thoughts"].append(thought_entry)
-            context["metadata"]["last_updated"] = now.isoformat()
-            context["metadata"]["total_steps"] = step
+            if self.enable_context_compression:
+                # The thought that just left the hot window goes cold; records
+                # shared with another branch stay as they are, since packing
+                # them would change that branch's byte total behind its back
+                cold = thoughts.by_step(step - self.compression_hot_thoughts)
+                if cold is not None and not thoughts.is_shared(cold.step):
+                    cold_before = cold.nbytes
+                    cold.compress(self.compression_min_length, self.compression_level)
+                    delta_bytes += cold.nbytes - cold_before
 
             # Log thought if configured (be careful with sensitive data)
+            thought = entries[position][0]
             if config.log_thoughts:
                 logger.debug(
                     f"Added thought to session {session_id}: step {step}, "
@@ -170,56 +914,484 @@ class ContextManager:
                     f"Added thought to session {session_id}: step {step}, "
                     f"thought length={len(thought)} (content not logged)"
                 )
-            return step
+            results[position] = ThoughtResult(step, "added")
+
+        if records:
+            context["metadata"]["last_updated"] = now
+            context["metadata"]["total_steps"] = records[-1].step
+            self._contexts.touch(
+                session_id, now, delta_bytes, len(thoughts) - before, context
+            )
+            self._added_thoughts.inc(len(records))
+            if evicted:
+                self._evicted_window_thoughts.inc(evicted)
+            if self.max_memory_bytes:
+                self._enforce_memory_budget(session_id, context)
+
+        if duplicates:
+            stored_steps = {
+                position: record.step for position, record in zip(accepted, records)
+            }
+        for position, step, earlier in duplicates:
+            if step is None:
+                step = stored_steps[earlier]
+            thought, tokens = entries[position]
+            results[position] = self._skip_duplicate(
+                session_id, context, thought, tokens, step, now
+            )
+        return results
+
+    def _find_duplicate(
+        self, session_id: str, context: Dict, signature: Optional[bytes], threshold: float
+    ) -> Optional[int]:
+        """
+        Return the step of a near-duplicate in the session's window, or None.
+
+        Builds the dedup index over the current window on first use. The
+        threshold is passed in rather than fixed at build time, so a
+        reloaded dedup_threshold applies to existing sessions. The caller
+        holds the session lock.
+        """
+        index = context["dedup_index"]
+        if index is None:
+            index = context["dedup_index"] = DuplicateIndex(self.dedup_threshold)
+            added = sum(
+                index.add(record.step, minhash_signature(record.thought))
+                for record in context["thoughts"]
+            )
+            self._contexts.add_bytes(session_id, added, context=context)
+        match = index.find(signature, threshold)
+        return None if match is None else match[0]
+
+    def _skip_duplicate(
+        self,
+        session_id: str,
+        context: Dict,
+        thought: str,
+        tokens: int,
+        duplicate: int,
+        now: float,
+    ) -> ThoughtResult:
+        """Merge or reject a near-duplicate; the caller holds the session lock."""
+        saved_bytes = RECORD_OVERHEAD_BYTES + len(thought.encode("utf-8"))
+        merged = self.dedup_mode == "merge"
+        if merged:
+            self._merged_duplicates.inc()
+        else:
+            self._rejected_duplicate.inc()
+        self._dedup_saved_bytes.inc(saved_bytes)
+        self._dedup_saved_tokens.inc(tokens)
+        if merged:
+            # The repeat still counts as activity on the session
+            context["metadata"]["last_updated"] = now
+            self._contexts.touch(session_id, now, context=context)
+        logger.info(
+            f"Near-duplicate of step {duplicate} in session {session_id} "
+            f"{'merged' if merged else 'rejected'}"
+        )
+        return ThoughtResult(duplicate, "merged" if merged else "rejected", duplicate)
+
+    def _enforce_memory_budget(self, session_id: str, context: Dict) -> None:
+        """
+        Evict until total bytes fit max_memory_bytes.
+
+        Least recently used sessions go first; if the current session alone
+        is over budget, its oldest thoughts are dropped (the newest is kept).
+        The caller holds the session lock for session_id.
+        """
+        budget = self.max_memory_bytes
+        thoughts = context["thoughts"]
+        while self._contexts.total_bytes() > budget:
+            victim = self._contexts.least_recent(exclude=session_id)
+            if victim is None:
+                break
+            if self._contexts.pop(victim) is not None:
+                if self._wal is not None:
+                    self._wal.clear(victim)
+                self._evicted_memory_sessions.inc()
+                logger.warning(
+                    f"Memory budget exceeded, evicted least recently used session: {victim}"
+                )
 
-    def get_all_thoughts(self, session_id: str) -> List[Dict]:
+        trimmed = False
+        while self._contexts.total_bytes() > budget and len(thoughts) > 1:
+            trimmed = True
+            oldest = thoughts.pop_oldest()
+            released = oldest.nbytes + self._unindex_record(context, oldest.step)
+            self._contexts.add_bytes(session_id, -released, -1, context)
+            self._evicted_memory_thoughts.inc()
+            logger.warning(
+                f"Memory budget exceeded, removed oldest thought "
+                f"(step {oldest.step}) from session {session_id}"
+            )
+        if trimmed and self._wal is not None:
+            self._wal.trim(session_id, thoughts.first_step)
+
+    def get_all_thoughts(
+        self,
+        session_id: str,
+        max_tokens: Optional[int] = None,
+        include_pinned: bool = True,
+    ) -> List[Dict]:
         """
-        Get all thoughts for a session.
+        Get all thoughts for a session, or the newest that fit a token budget.
 
         Args:
             session_id: Session identifier
+            max_tokens: Token budget for the thought texts (None for all)
+            include_pinned: Always include pinned thoughts (see pin_thought)
 
         Returns:
-            List of thought entries
+            List of thought entries, oldest first
         """
         context = self.get_context(session_id)
-        return context.get("thoughts", [])
+        with self._contexts.lock_session(session_id):
+            thoughts = context["thoughts"]
+            if max_tokens is None:
+                return list(thoughts)
+            steps = select_within_budget(
+                thoughts, max_tokens, pinned=context["pinned"] if include_pinned else ()
+            )
+            return [thoughts.by_step(step) for step in steps]
 
-    def get_formatted_context(self, session_id: str) -> str:
+    def search_thoughts(self, session_id: str, query: str, limit: int = 10) -> List[Dict]:
+        """
+        Full-text search over a session's thoughts, ranked by BM25.
+
+        The session's inverted index is built on the first search and then
+        kept current by add_thought and eviction, so later searches only
+        touch the postings of the query terms.
+
+        Args:
+            session_id: Session identifier
+            query: Free-text query (matched case-insensitively by word)
+            limit: Maximum number of results
+
+        Returns:
+            List of dicts with step, score, thought and timestamp, best first
+        """
+        context = self.get_context(session_id)
+        with self._contexts.lock_session(session_id):
+            thoughts = context["thoughts"]
+            index = context["search_index"]
+            if index is None:
+                index = context["search_index"] = SessionIndex()
+                added = sum(index.add(record.step, record.thought) for record in thoughts)
+                self._contexts.add_bytes(session_id, added, context=context)
+            results = []
+            for step, score in index.search(query, limit):
+                record = thoughts.by_step(step)
+                results.append(
+                    {
+                        "step": step,
+                        "score": score,
+                        "thought": record.thought,
+                        "timestamp": record.timestamp,
+                    }
+                )
+            return results
+
+    def pin_thought(self, session_id: str, step: int, pinned: bool = True) -> bool:
+        """
+        Pin a thought so token-budgeted retrieval always includes it.
+
+        Pins are for a few early thoughts such as the task statement; a
+        pinned thought is still evicted with the rest of the window.
+
+        Args:
+            session_id: Session identifier
+            step: 1-based step number
+            pinned: True to pin, False to unpin
+
+        Returns:
+            True if the thought exists in the session's window
+        """
+        context = self._contexts.get(session_id)
+        if context is None:
+            return False
+        with self._contexts.lock_session(session_id):
+            thoughts = context["thoughts"]
+            if thoughts.by_step(step) is None:
+                return False
+            # Drop pins of evicted thoughts while we are here
+            steps = {s for s in context["pinned"] if s >= thoughts.first_step}
+            if pinned:
+                steps.add(step)
+            else:
+                steps.discard(step)
+            context["pinned"] = sorted(steps)
+            return True
+
+    def get_thought(self, session_id: str, step: int) -> Optional[Dict]:
+        """
+        Get a single thought by step number in O(1).
+
+        Args:
+            session_id: Session identifier
+            step: 1-based step number
+
+        Returns:
+            Thought entry, or None if the step was evicted or never added
+        """
+        if self._backend is not None:
+            context = self.get_context(session_id)
+        else:
+            context = self._contexts.get(session_id)
+            if context is None:
+                return None
+        return context["thoughts"].by_step(step)
+
+    def get_formatted_context(
+        self,
+        session_id: str,
+        output_format: str = "markdown",
+        max_tokens: Optional[int] = None,
+        include_pinned: bool = True,
+    ) -> str:
         """
         Get formatted context string for Node Agent.
 
+        Rendering is incremental: only thoughts added since the previous
+        call are formatted, and evicted thoughts are trimmed from the cache.
+
+        With max_tokens, only the most recent thoughts whose estimated
+        tokens (including the format's per-thought overhead) fit the budget
+        are rendered, plus any pinned thoughts. The selection reads token
+        counts cached at insert, so the cost is O(k) in the thoughts
+        returned.
+
         Args:
             session_id: Session identifier
+            output_format: markdown (default), compact, or jsonl
+            max_tokens: Estimated token budget for the output (None for all)
+            include_pinned: Always include pinned thoughts (see pin_thought)
 
         Returns:
-            Formatted string of all thoughts
+            Formatted string of the selected thoughts
+
+        Raises:
+            ValueError: If output_format is unknown
         """
-        thoughts = self.get_all_thoughts(session_id)
-        if not thoughts:
-            return "No thoughts yet in this session."
+        start = time.perf_counter()
+        try:
+            return self._format_context(session_id, output_format, max_tokens, include_pinned)
+        except ValueError:
+            raise
+        except Exception:
+            self._errors["render"].inc()
+            raise
+        finally:
+            self._render_seconds.observe(time.perf_counter() - start)
 
-        formatted = "Previous thoughts in this session:\n\n"
-        for thought_entry in thoughts:
-            formatted += (
-                f"Step {thought_entry['step']} "
-                f"({thought_entry['timestamp']}):\n"
+    def _format_context(
+        self,
+        session_id: str,
+        output_format: str,
+        max_tokens: Optional[int],
+        include_pinned: bool,
+    ) -> str:
+        """Render a session's thoughts; see get_formatted_context."""
+        renderer = get_renderer(output_format)
+        self.refresh_config()
+        context = self.get_context(session_id)
+        with self._contexts.lock_session(session_id):
+            if context["thoughts"].capacity != self.max_thoughts:
+                self._fit_window(session_id, context)
+            caches = context["render_cache"]
+            cache = caches.get(output_format)
+            if cache is None:
+                # With compression on, only hot thoughts keep rendered chunks
+                # so the cache does not hold a second uncompressed copy
+                max_chunks = (
+                    self.compression_hot_thoughts
+                    if self.enable_context_compression
+                    else None
+                )
+                cache = caches[output_format] = RenderCache(renderer, max_chunks)
+            thoughts = context["thoughts"]
+            if max_tokens is None:
+                return cache.render(thoughts)
+            steps = select_within_budget(
+                thoughts,
+                max_tokens - renderer.header_tokens,
+                renderer.entry_tokens,
+                context["pinned"] if include_pinned else (),
             )
-            formatted += f"{thought_entry['thought']}\n\n"
-
-        return formatted
+            return cache.render_steps(thoughts, steps)
 
-    def clear_context(self, session_id: str) -> None:
+    def clear_context(self, session_id: str) -> bool:
         """
         Clear context for a session (thread-safe).
 
         Args:
             session_id: Session identifier
+
+        Returns:
+            True if the session existed in memory or storage
         """
-        with self._lock:
-            if session_id in self._contexts:
-                del self._contexts[session_id]
-                logger.info(f"Cleared context for session: {session_id}")
+        cleared = self._contexts.pop(session_id) is not None
+        if cleared and self._wal is not None:
+            self._wal.clear(session_id)
+        if self._backend is not None:
+            cleared = self._backend.delete(session_id) or cleared
+        if cleared:
+            logger.info(f"Cleared context for session: {session_id}")
+        return cleared
+
+    def fork_session(self, session_id: str, branch_id: str) -> Dict:
+        """
+        Start a branch of a session that shares its thoughts copy-on-write.
+
+        The branch starts with the session's window and pins, then both
+        evolve independently. No thought is copied: the window becomes a
+        chain of frozen segments shared by both sessions, so forking costs
+        O(1) in the window size (O(depth) for branches of branches) and
+        each session renders and searches only its own path. Indexes and
+        render caches of the branch are built on first use.
+
+        The branch is charged the session's bytes at the fork, so shared
+        thoughts count once per branch and memory budgets err on the safe
+        side. With compression enabled, thoughts that are still shared stay
+        uncompressed, so one branch never changes another's byte total.
+        With a storage backend or write-ahead log, the inherited
+        window is also written under the branch's id, which is O(window).
+
+        Args:
+            session_id: Session to fork (created if missing)
+            branch_id: Identifier of the new session
+
+        Returns:
+            Dict with the branch's session_id, parent and fork_step
+
+        Raises:
+            ValueError: If branch_id is session_id or already exists
+        """
+        if branch_id == session_id:
+            raise ValueError("A session cannot be forked onto itself")
+        if branch_id in self._contexts or (
+            self._backend is not None and self._backend.session_state(branch_id) is not None
+        ):
+            raise ValueError(f"Session {branch_id} already exists")
+
+        context = self.get_context(session_id)
+        with self._contexts.lock_session(session_id):
+            if context["thoughts"].capacity != self.max_thoughts:
+                self._fit_window(session_id, context)
+            thoughts = context["thoughts"]
+            if not isinstance(thoughts, BranchBuffer):
+                # The session's render caches stay valid: steps are unchanged
+                thoughts = context["thoughts"] = BranchBuffer.from_ring(thoughts)
+            branch = self._new_context(branch_id, thoughts.fork())
+            branch["pinned"] = list(context["pinned"])
+            branch["loaded"] = True
+            branch["branch"] = {"parent": session_id, "fork_step": thoughts.last_step}
+            metadata = context["metadata"]
+            index_bytes = sum(
+                context[key].nbytes
+                for key in ("search_index", "dedup_index")
+                if context[key] is not None
+            )
+            branch["metadata"].update(
+                total_steps=metadata["total_steps"],
+                bytes=metadata["bytes"] - index_bytes,
+                thought_count=len(thoughts),
+                ttl_seconds=metadata["ttl_seconds"],
+                ttl_mode=metadata["ttl_mode"],
+            )
+
+        with self._contexts.lock_session(branch_id):
+            if self._contexts.get_or_create(branch_id, lambda _: branch) is not branch:
+                raise ValueError(f"Session {branch_id} already exists")
+            records = list(branch["thoughts"]) if self.is_durable else []
+            if records and self._wal is not None:
+                self._wal.append_thoughts(branch_id, records)
+            if records and self._backend is not None:
+                try:
+                    self._backend.append(branch_id, records, branch["metadata"]["created_at"])
+                except StepConflictError:
+                    self._contexts.pop(branch_id)
+                    raise ValueError(f"Session {branch_id} already exists") from None
+            if branch["metadata"]["ttl_seconds"] is not None:
+                self._contexts.set_ttl(
+                    branch_id,
+                    branch["metadata"]["ttl_seconds"],
+                    branch["metadata"]["ttl_mode"] == "sliding",
+                    time.time(),
+                )
+            if self.max_memory_bytes:
+                self._enforce_memory_budget(branch_id, branch)
+        fork_step = branch["branch"]["fork_step"]
+        self._branch_ops["fork"].inc()
+        logger.info(f"Forked session {session_id} at step {fork_step} into {branch_id}")
+        return {"session_id": branch_id, "parent": session_id, "fork_step": fork_step}
+
+    def merge_session(self, branch_id: str, into: Optional[str] = None) -> range:
+        """
+        Append a branch's own thoughts to another session and drop the branch.
+
+        The thoughts the branch added after its fork point (those still in
+        its window) are stored in the target session with new steps, in
+        order, as one batch; near-duplicate detection does not apply. The
+        cost is O(k) in those thoughts, never in the shared history.
+
+        Args:
+            branch_id: Session created by fork_session
+            into: Target session (the branch's parent if None)
+
+        Returns:
+            Steps of the merged thoughts in the target (empty if none)
+
+        Raises:
+            ValueError: If the branch does not exist, or into is None and
+                the session is not a branch
+        """
+        branch = self._contexts.get(branch_id)
+        if branch is None:
+            raise ValueError(f"Unknown session: {branch_id}")
+        origin = branch["branch"]
+        target = into if into is not None else (origin and origin["parent"])
+        if target is None:
+            raise ValueError(f"Session {branch_id} is not a fork; pass the target session")
+        if target == branch_id:
+            raise ValueError("A session cannot be merged into itself")
+
+        fork_step = origin["fork_step"] if origin is not None else 0
+        with self._contexts.lock_session(branch_id):
+            entries = [
+                (record.thought, record.tokens)
+                for record in branch["thoughts"]
+                if record.step > fork_step
+            ]
+
+        results: List[ThoughtResult] = []
+        if entries:
+            context = self.get_context(target)
+            with self._contexts.lock_session(target):
+                if context["thoughts"].capacity != self.max_thoughts:
+                    self._fit_window(target, context)
+                results = self._append_batch(target, context, entries, None, get_config())
+        self.clear_context(branch_id)
+        self._branch_ops["merge"].inc()
+        logger.info(f"Merged {len(entries)} thought(s) of {branch_id} into {target}")
+        return range(results[0].step, results[-1].step + 1) if results else range(0)
+
+    def discard_session(self, branch_id: str) -> bool:
+        """
+        Drop a branch without merging it (thread-safe).
+
+        Thoughts it shares with other sessions stay with them; only its
+        own are released.
+
+        Args:
+            branch_id: Session identifier
+
+        Returns:
+            True if the session existed
+        """
+        discarded = self.clear_context(branch_id)
+        if discarded:
+            self._branch_ops["discard"].inc()
+        return discarded
     
     def get_stats(self) -> Dict:
         """
@@ -228,63 +1400,114 @@ class ContextManager:
         Returns:
             Dict with statistics
         """
-        with self._lock:
-            total_sessions = len(self._contexts)
-            total_thoughts = sum(
-                len(ctx.get("thoughts", [])) for ctx in self._contexts.values()
-            )
-            return {
-                "total_sessions": total_sessions,
-                "total_thoughts": total_thoughts,
-                "max_thoughts": self.max_thoughts,
-                "cleanup_interval_hours": self.cleanup_interval_hours,
-                "auto_cleanup_enabled": self.enable_auto_cleanup,
-            }
+        return {
+            # Both maintained per shard: O(num_shards), no session scan
+            "total_sessions": len(self._contexts),
+            "total_thoughts": self._contexts.total_thoughts(),
+            "max_thoughts": self.max_thoughts,
+            "config_version": self._config_version,
+            "cleanup_interval_hours": self.cleanup_interval_hours,
+            "auto_cleanup_enabled": self.enable_auto_cleanup,
+            "lock_shards": self._contexts.num_shards,
+            "compression_enabled": self.enable_context_compression,
+            "total_bytes": self._contexts.total_bytes(),
+            "max_memory_bytes": self.max_memory_bytes,
+            "memory_evicted_sessions": self._evicted_memory_sessions.value,
+            "memory_evicted_thoughts": self._evicted_memory_thoughts.value,
+            "storage": (
+                self._backend.stats() if self._backend is not None else {"backend": "memory"}
+            ),
+            "wal": self._wal.stats() if self._wal is not None else None,
+            "dedup_mode": self.dedup_mode,
+            "dedup_merged": self._merged_duplicates.value,
+            "dedup_rejected": self._rejected_duplicate.value,
+            "dedup_saved_bytes": self._dedup_saved_bytes.value,
+            "dedup_saved_tokens": self._dedup_saved_tokens.value,
+        }
 
     def cleanup_old_sessions(self, max_age_hours: Optional[int] = None) -> int:
         """
         Clean up old sessions (thread-safe).
 
+        Sessions on the default TTL expire once idle for max_age_hours;
+        sessions with their own TTL (see set_session_ttl) expire on their
+        own deadline. Stored sessions idle for max_age_hours are deleted
+        from the backend too, unless this process still holds them.
+
         Args:
-            max_age_hours: Maximum age in hours (uses config default if None)
+            max_age_hours: Maximum idle time in hours (uses config default if None)
 
         Returns:
             Number of sessions cleaned up
         """
+        # Runs periodically, so idle managers also pick up new settings
+        self.refresh_config()
         if max_age_hours is None:
             max_age_hours = self.cleanup_interval_hours
-        
-        current_time = datetime.utcnow()
-        sessions_to_remove = []
-
-        with self._lock:
-            for session_id, context in self._contexts.items():
-                last_updated_str = context["metadata"].get("last_updated")
-                if not last_updated_str:
-                    continue
 
-                try:
-                    last_updated = datetime.fromisoformat(
-                        last_updated_str.replace("Z", "+00:00")
-                    )
-                    age_hours = (current_time - last_updated).total_seconds() / 3600
+        start = time.perf_counter()
+        try:
+            return self._cleanup(max_age_hours)
+        except Exception:
+            self._errors["cleanup"].inc()
+            raise
+        finally:
+            self._cleanup_seconds.observe(time.perf_counter() - start)
 
-                    if age_hours > max_age_hours:
-                        sessions_to_remove.append(session_id)
-                except (ValueError, AttributeError) as e:
-                    logger.warning(
-                        f"Error parsing timestamp for session {session_id}: {e}"
-                    )
-                    # Remove sessions with invalid timestamps
-                    sessions_to_remove.append(session_id)
+    def _cleanup(self, max_age_hours: float) -> int:
+        """Remove expired sessions; see cleanup_old_sessions."""
+        now = time.time()
 
-            # Remove old sessions
-            for session_id in sessions_to_remove:
-                del self._contexts[session_id]
-                logger.info(f"Cleaned up old session: {session_id}")
+        # The expiry index yields only expired sessions, in bounded batches
+        idle_cutoff = now - max_age_hours * 3600
+        sessions_to_remove = self._contexts.pop_expired(
+            now, idle_cutoff, self.cleanup_batch_size
+        )
+        self._expired_sessions.inc(len(sessions_to_remove))
+        if sessions_to_remove and self._wal is not None:
+            self._wal.clear_many(sessions_to_remove)
+        if self._backend is not None:
+            # Stored sessions may be idle without being in this process's memory;
+            # sessions still held here are live (their TTL has not run out)
+            stored = self._backend.expire(idle_cutoff, set(self._contexts))
+            sessions_to_remove = list(dict.fromkeys(sessions_to_remove + stored))
+        for session_id in sessions_to_remove:
+            logger.info(f"Cleaned up old session: {session_id}")
 
         return len(sessions_to_remove)
 
+    def set_session_ttl(
+        self, session_id: str, ttl_seconds: Optional[float], sliding: bool = True
+    ) -> bool:
+        """
+        Give a session its own time-to-live (thread-safe).
+
+        Args:
+            session_id: Session identifier
+            ttl_seconds: Lifetime in seconds, or None to return to the default
+            sliding: Restart the TTL on every new thought (True) or count
+                from session creation (False)
+
+        Returns:
+            True if the session exists and was updated
+
+        Raises:
+            ValueError: If ttl_seconds is not positive
+        """
+        if ttl_seconds is not None and ttl_seconds <= 0:
+            raise ValueError("ttl_seconds must be positive")
+
+        context = self._contexts.get(session_id)
+        if context is None:
+            return False
+        with self._contexts.lock_session(session_id):
+            self._contexts.set_ttl(session_id, ttl_seconds, sliding, time.time())
+            context["metadata"]["ttl_seconds"] = ttl_seconds
+            context["metadata"]["ttl_mode"] = (
+                None if ttl_seconds is None else ("sliding" if sliding else "absolute")
+            )
+        return True
+
     def get_context_summary(self, session_id: str) -> Dict:
         """
         Get summary of context for a session.
@@ -299,7 +1522,8 @@ class ContextManager:
         return {
             "session_id": session_id,
             "total_steps": context["metadata"]["total_steps"],
-            "created_at": context["metadata"]["created_at"],
-            "last_updated": context["metadata"]["last_updated"],
+            "created_at": format_timestamp(context["metadata"]["created_at"]),
+            "last_updated": format_timestamp(context["metadata"]["last_updated"]),
+            "bytes": context["metadata"]["bytes"],
         }
 
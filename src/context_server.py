@@ -0,0 +1,660 @@
+"""Context server: one session store shared over a Unix domain socket.
+
+Run standalone with ``python -m src.context_server /run/think.sock`` (or
+let main.py start it, see ensure_server), then point the workers'
+ContextManagers at it with THINK_STORAGE_BACKEND=socket and
+THINK_STORAGE_PATH=/run/think.sock.
+
+Wire format: every frame is a 9-byte header (body length u32, request id
+u32, opcode or status u8) followed by the body. Strings are a u16 length
+and UTF-8 bytes; records are step i64, created f64, flags u8 and a u32
+length plus the payload. Requests on one connection are answered in
+order, so a client may send many before reading any response
+(pipelining).
+"""
+
+from typing import Collection, Dict, List, Optional, Sequence, Tuple
+import argparse
+import fcntl
+import json
+import logging
+import os
+import select
+import selectors
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+from src.errors import StepConflictError, StorageError
+from src.storage import MemoryBackend, SessionState, StorageBackend, create_backend
+from src.thought_record import ThoughtRecord
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("<IIB")
+_STR_LEN = struct.Struct("<H")
+_RECORD = struct.Struct("<qdBI")
+_COUNT = struct.Struct("<I")
+_STATE = struct.Struct("<Bddq")
+_LOAD = struct.Struct("<qi")
+_STEP = struct.Struct("<q")
+_CUTOFF = struct.Struct("<d")
+_FLAG = struct.Struct("<B")
+
+# Larger frames are a protocol error (a thought is at most 100k characters)
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+OP_PING = 0
+OP_APPEND = 1
+OP_STATE = 2
+OP_LOAD = 3
+OP_TRIM = 4
+OP_DELETE = 5
+OP_EXPIRE = 6
+OP_STATS = 7
+OP_FLUSH = 8
+
+STATUS_OK = 0
+STATUS_CONFLICT = 1
+STATUS_ERROR = 2
+
+# Safe to resend on a fresh connection when a pooled one turns out dead
+_IDEMPOTENT = frozenset((OP_PING, OP_STATE, OP_LOAD, OP_TRIM, OP_STATS))
+
+_BYTES = 1  # Record payload is zlib-compressed bytes
+
+
+def _pack_str(parts: List[bytes], text: str) -> None:
+    data = text.encode("utf-8")
+    parts.append(_STR_LEN.pack(len(data)))
+    parts.append(data)
+
+
+def _unpack_str(body: bytes, offset: int) -> Tuple[str, int]:
+    (length,) = _STR_LEN.unpack_from(body, offset)
+    offset += _STR_LEN.size
+    return body[offset : offset + length].decode("utf-8"), offset + length
+
+
+def _pack_records(parts: List[bytes], records: Sequence[ThoughtRecord]) -> None:
+    parts.append(_COUNT.pack(len(records)))
+    for record in records:
+        payload = record.payload
+        if type(payload) is bytes:
+            parts.append(_RECORD.pack(record.step, record.created, _BYTES, len(payload)))
+            parts.append(payload)
+        else:
+            data = payload.encode("utf-8")
+            parts.append(_RECORD.pack(record.step, record.created, 0, len(data)))
+            parts.append(data)
+
+
+def _unpack_records(body: bytes, offset: int) -> Tuple[List[ThoughtRecord], int]:
+    (count,) = _COUNT.unpack_from(body, offset)
+    offset += _COUNT.size
+    records = []
+    for _ in range(count):
+        step, created, flags, length = _RECORD.unpack_from(body, offset)
+        offset += _RECORD.size
+        data = body[offset : offset + length]
+        offset += length
+        records.append(
+            ThoughtRecord(step, data if flags & _BYTES else data.decode("utf-8"), created)
+        )
+    return records, offset
+
+
+def _frame(request_id: int, code: int, parts: Sequence[bytes]) -> bytes:
+    body = b"".join(parts)
+    return _HEADER.pack(len(body), request_id, code) + body
+
+
+class ContextServer:
+    """
+    Serves a StorageBackend to ContextManagers in other processes.
+
+    Each connection gets a thread that answers its requests in order;
+    every request the client has pipelined into one read is dispatched
+    and the responses are sent back with a single write. Only one server
+    per socket path runs at a time, enforced by a lock on path + ".lock".
+    """
+
+    def __init__(self, path: str, backend: Optional[StorageBackend] = None):
+        """
+        Initialize ContextServer and bind its socket.
+
+        Args:
+            path: Unix domain socket path
+            backend: Store to serve (a MemoryBackend if None)
+
+        Raises:
+            StorageError: If another server already serves path
+        """
+        self.path = path
+        self._lock_fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(self._lock_fd)
+            raise StorageError(f"A context server is already serving {path}")
+        self.backend = backend if backend is not None else MemoryBackend()
+        # Holding the lock, any socket file left behind is stale
+        if os.path.exists(path):
+            os.unlink(path)
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._listener.bind(path)
+            os.chmod(path, 0o600)
+            self._listener.listen(128)
+        except OSError as e:
+            self._listener.close()
+            os.close(self._lock_fd)
+            raise StorageError(f"Cannot listen on {path}: {e}") from e
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        self._connections: Dict[int, socket.socket] = {}
+        self._connections_lock = threading.Lock()
+        self._stopping = False
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._handlers = {
+            OP_PING: self._ping,
+            OP_APPEND: self._append,
+            OP_STATE: self._state,
+            OP_LOAD: self._load,
+            OP_TRIM: self._trim,
+            OP_DELETE: self._delete,
+            OP_EXPIRE: self._expire,
+            OP_STATS: self._stats,
+            OP_FLUSH: self._flush,
+        }
+        logger.info(f"Context server listening on {path} ({type(self.backend).__name__})")
+
+    def start(self) -> "ContextServer":
+        """Serve from a background thread; returns self."""
+        self._thread = threading.Thread(
+            target=self.serve_forever, daemon=True, name="ContextServer"
+        )
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Accept connections until stop() or close()."""
+        with selectors.DefaultSelector() as selector:
+            selector.register(self._listener, selectors.EVENT_READ)
+            selector.register(self._wakeup_r, selectors.EVENT_READ)
+            while not self._stopping:
+                for key, _ in selector.select():
+                    if key.fileobj is not self._listener or self._stopping:
+                        return
+                    try:
+                        conn, _ = self._listener.accept()
+                    except OSError:
+                        continue
+                    with self._connections_lock:
+                        self._connections[conn.fileno()] = conn
+                    threading.Thread(
+                        target=self._serve_connection,
+                        args=(conn,),
+                        daemon=True,
+                        name="ContextServer-Connection",
+                    ).start()
+
+    def stop(self) -> None:
+        """Make serve_forever return (safe to call from a signal handler)."""
+        if not self._stopping:
+            self._stopping = True
+            os.write(self._wakeup_w, b"x")
+
+    def close(self) -> None:
+        """Stop serving, drop client connections and close the backend."""
+        if self._closed:
+            return
+        self._closed = True
+        self.stop()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        with self._connections_lock:
+            connections = list(self._connections.values())
+        for conn in connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._listener.close()
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+        self.backend.flush()
+        self.backend.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        os.close(self._lock_fd)
+        logger.info(f"Context server on {self.path} stopped")
+
+    def _serve_connection(self, conn: socket.socket) -> None:
+        fileno = conn.fileno()
+        buffer = bytearray()
+        try:
+            while True:
+                chunk = conn.recv(256 * 1024)
+                if not chunk:
+                    return
+                buffer += chunk
+                responses = []
+                offset = 0
+                while len(buffer) - offset >= _HEADER.size:
+                    length, request_id, op = _HEADER.unpack_from(buffer, offset)
+                    if length > MAX_FRAME_BYTES:
+                        logger.warning(f"Context server: {length}-byte frame, dropping client")
+                        return
+                    end = offset + _HEADER.size + length
+                    if end > len(buffer):
+                        break
+                    body = bytes(buffer[offset + _HEADER.size : end])
+                    responses.append(self._dispatch(request_id, op, body))
+                    offset = end
+                del buffer[:offset]
+                if responses:
+                    conn.sendall(b"".join(responses))
+        except OSError as e:
+            if not self._stopping:
+                logger.debug(f"Context server connection closed: {e}")
+        finally:
+            with self._connections_lock:
+                self._connections.pop(fileno, None)
+            conn.close()
+
+    def _dispatch(self, request_id: int, op: int, body: bytes) -> bytes:
+        handler = self._handlers.get(op)
+        if handler is None:
+            return _frame(request_id, STATUS_ERROR, [f"Unknown opcode {op}".encode("utf-8")])
+        parts: List[bytes] = []
+        try:
+            handler(body, parts)
+        except StepConflictError as e:
+            return _frame(request_id, STATUS_CONFLICT, [str(e).encode("utf-8")])
+        except (StorageError, ValueError, struct.error) as e:
+            return _frame(request_id, STATUS_ERROR, [str(e).encode("utf-8")])
+        except Exception as e:
+            logger.error(f"Context server error in opcode {op}: {e}", exc_info=True)
+            return _frame(request_id, STATUS_ERROR, [f"Internal error: {e}".encode("utf-8")])
+        return _frame(request_id, STATUS_OK, parts)
+
+    def _ping(self, body: bytes, parts: List[bytes]) -> None:
+        pass
+
+    def _append(self, body: bytes, parts: List[bytes]) -> None:
+        session_id, offset = _unpack_str(body, 0)
+        (created_at,) = _CUTOFF.unpack_from(body, offset)
+        records, _ = _unpack_records(body, offset + _CUTOFF.size)
+        self.backend.append(session_id, records, created_at)
+
+    def _state(self, body: bytes, parts: List[bytes]) -> None:
+        session_id, _ = _unpack_str(body, 0)
+        state = self.backend.session_state(session_id)
+        if state is None:
+            parts.append(_STATE.pack(0, 0.0, 0.0, 0))
+        else:
+            parts.append(_STATE.pack(1, *state))
+
+    def _load(self, body: bytes, parts: List[bytes]) -> None:
+        session_id, offset = _unpack_str(body, 0)
+        after_step, limit = _LOAD.unpack_from(body, offset)
+        records = self.backend.load(session_id, after_step, None if limit < 0 else limit)
+        _pack_records(parts, records)
+
+    def _trim(self, body: bytes, parts: List[bytes]) -> None:
+        session_id, offset = _unpack_str(body, 0)
+        (before_step,) = _STEP.unpack_from(body, offset)
+        parts.append(_COUNT.pack(self.backend.trim(session_id, before_step)))
+
+    def _delete(self, body: bytes, parts: List[bytes]) -> None:
+        session_id, _ = _unpack_str(body, 0)
+        parts.append(_FLAG.pack(self.backend.delete(session_id)))
+
+    def _expire(self, body: bytes, parts: List[bytes]) -> None:
+        (cutoff,) = _CUTOFF.unpack_from(body, 0)
+        keep = set()
+        if len(body) > _CUTOFF.size:
+            (count,) = _COUNT.unpack_from(body, _CUTOFF.size)
+            offset = _CUTOFF.size + _COUNT.size
+            for _ in range(count):
+                session_id, offset = _unpack_str(body, offset)
+                keep.add(session_id)
+        expired = self.backend.expire(cutoff, keep)
+        parts.append(_COUNT.pack(len(expired)))
+        for session_id in expired:
+            _pack_str(parts, session_id)
+
+    def _stats(self, body: bytes, parts: List[bytes]) -> None:
+        with self._connections_lock:
+            clients = len(self._connections)
+        stats = dict(self.backend.stats(), server={"path": self.path, "clients": clients})
+        parts.append(json.dumps(stats).encode("utf-8"))
+
+    def _flush(self, body: bytes, parts: List[bytes]) -> None:
+        self.backend.flush()
+
+
+class _Connection:
+    """One client socket with its receive buffer."""
+
+    __slots__ = ("sock", "buffer", "next_id", "_poller")
+
+    def __init__(self, path: str, timeout: float):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(path)
+        except OSError:
+            self.sock.close()
+            raise
+        self.buffer = bytearray()
+        self.next_id = 0
+        self._poller = select.poll()
+        self._poller.register(self.sock, select.POLLIN)
+
+    def alive(self) -> bool:
+        """False if the server closed this connection while it sat idle."""
+        # Readable while idle: end of stream, an error, or unsolicited
+        # bytes that would desynchronize the responses
+        return not self._poller.poll(0)
+
+    def exchange(self, requests: Sequence[Tuple[int, bytes]]) -> List[Tuple[int, bytes]]:
+        """Send every request, then read their (status, body) responses in order."""
+        first_id = self.next_id
+        frames = []
+        for index, (op, body) in enumerate(requests):
+            request_id = (first_id + index) & 0xFFFFFFFF
+            frames.append(_HEADER.pack(len(body), request_id, op))
+            frames.append(body)
+        self.next_id = (first_id + len(requests)) & 0xFFFFFFFF
+        self.sock.sendall(b"".join(frames))
+
+        responses = []
+        buffer = self.buffer
+        while len(responses) < len(requests):
+            if len(buffer) >= _HEADER.size:
+                length, request_id, status = _HEADER.unpack_from(buffer, 0)
+                end = _HEADER.size + length
+                if len(buffer) >= end:
+                    if request_id != (first_id + len(responses)) & 0xFFFFFFFF:
+                        raise OSError(f"Out-of-order response {request_id}")
+                    responses.append((status, bytes(buffer[_HEADER.size : end])))
+                    del buffer[:end]
+                    continue
+            chunk = self.sock.recv(256 * 1024)
+            if not chunk:
+                raise ConnectionResetError("Context server closed the connection")
+            buffer += chunk
+        return responses
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+class SocketBackend(StorageBackend):
+    """
+    Client of a ContextServer, used as a ContextManager storage backend.
+
+    Calls borrow a connection from a pool (at most pool_size, opened on
+    demand), so threads of one worker do not queue behind each other's
+    round trips. append_batch pipelines its appends over one connection.
+    Reads are retried once on a fresh connection if a pooled one died
+    (for instance because the server restarted); writes are not, since
+    the server may already have applied them.
+    """
+
+    def __init__(self, path: str, pool_size: int = 8, timeout: float = 5.0):
+        """
+        Initialize SocketBackend. Connections are opened on first use.
+
+        Args:
+            path: Server socket path
+            pool_size: Maximum concurrent connections
+            timeout: Seconds to wait for the server (connect, send, receive)
+        """
+        self.path = path
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._idle: List[_Connection] = []
+        self._idle_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._closed = False
+
+    def _acquire(self) -> Tuple[_Connection, bool]:
+        """Return (connection, reused); the caller must _release it."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise StorageError(f"No free connection to context server {self.path}")
+        with self._idle_lock:
+            if self._closed:
+                self._slots.release()
+                raise StorageError("Socket backend is closed")
+            while self._idle:
+                conn = self._idle.pop()
+                if conn.alive():
+                    return conn, True
+                conn.close()
+        try:
+            return _Connection(self.path, self.timeout), False
+        except OSError as e:
+            self._slots.release()
+            raise StorageError(f"Cannot connect to context server {self.path}: {e}") from e
+
+    def _release(self, conn: _Connection, healthy: bool) -> None:
+        with self._idle_lock:
+            if healthy and not self._closed:
+                self._idle.append(conn)
+                conn = None
+        if conn is not None:
+            conn.close()
+        self._slots.release()
+
+    def _call_many(self, requests: Sequence[Tuple[int, bytes]]) -> List[Tuple[int, bytes]]:
+        retry = all(op in _IDEMPOTENT for op, _ in requests)
+        while True:
+            conn, reused = self._acquire()
+            try:
+                responses = conn.exchange(requests)
+            except OSError as e:
+                self._release(conn, healthy=False)
+                if reused and retry:
+                    retry = False
+                    continue
+                raise StorageError(f"Context server request failed: {e}") from e
+            self._release(conn, healthy=True)
+            return responses
+
+    def _call(self, op: int, parts: Sequence[bytes] = ()) -> bytes:
+        [(status, body)] = self._call_many([(op, b"".join(parts))])
+        _raise_for_status(status, body)
+        return body
+
+    def ping(self) -> None:
+        """Round trip to the server; raises StorageError if it does not answer."""
+        self._call(OP_PING)
+
+    def append(
+        self, session_id: str, records: Sequence[ThoughtRecord], created_at: float
+    ) -> None:
+        if records:
+            self._call(OP_APPEND, _append_body(session_id, records, created_at))
+
+    def append_batch(
+        self, batch: Sequence[Tuple[str, Sequence[ThoughtRecord], float]]
+    ) -> List[Tuple[str, StorageError]]:
+        batch = [item for item in batch if item[1]]
+        if not batch:
+            return []
+        requests = [
+            (OP_APPEND, b"".join(_append_body(session_id, records, created_at)))
+            for session_id, records, created_at in batch
+        ]
+        failures = []
+        for (session_id, _, _), (status, body) in zip(batch, self._call_many(requests)):
+            try:
+                _raise_for_status(status, body)
+            except StorageError as e:
+                failures.append((session_id, e))
+        return failures
+
+    def session_state(self, session_id: str) -> Optional[SessionState]:
+        parts: List[bytes] = []
+        _pack_str(parts, session_id)
+        found, created_at, last_updated, last_step = _STATE.unpack(self._call(OP_STATE, parts))
+        return SessionState(created_at, last_updated, last_step) if found else None
+
+    def load(
+        self, session_id: str, after_step: int = 0, limit: Optional[int] = None
+    ) -> List[ThoughtRecord]:
+        parts: List[bytes] = []
+        _pack_str(parts, session_id)
+        parts.append(_LOAD.pack(after_step, -1 if limit is None else limit))
+        return _unpack_records(self._call(OP_LOAD, parts), 0)[0]
+
+    def trim(self, session_id: str, before_step: int) -> int:
+        parts: List[bytes] = []
+        _pack_str(parts, session_id)
+        parts.append(_STEP.pack(before_step))
+        return _COUNT.unpack(self._call(OP_TRIM, parts))[0]
+
+    def delete(self, session_id: str) -> bool:
+        parts: List[bytes] = []
+        _pack_str(parts, session_id)
+        return bool(_FLAG.unpack(self._call(OP_DELETE, parts))[0])
+
+    def expire(self, cutoff: float, keep: Collection[str] = ()) -> List[str]:
+        parts = [_CUTOFF.pack(cutoff), _COUNT.pack(len(keep))]
+        for session_id in keep:
+            _pack_str(parts, session_id)
+        body = self._call(OP_EXPIRE, parts)
+        (count,) = _COUNT.unpack_from(body, 0)
+        offset = _COUNT.size
+        expired = []
+        for _ in range(count):
+            session_id, offset = _unpack_str(body, offset)
+            expired.append(session_id)
+        return expired
+
+    def stats(self) -> Dict:
+        stats = json.loads(self._call(OP_STATS).decode("utf-8"))
+        with self._idle_lock:
+            stats["client"] = {"idle_connections": len(self._idle), "pool_size": self.pool_size}
+        return stats
+
+    def flush(self) -> None:
+        self._call(OP_FLUSH)
+
+    def close(self) -> None:
+        """Close pooled connections (the server keeps running)."""
+        with self._idle_lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+def _append_body(
+    session_id: str, records: Sequence[ThoughtRecord], created_at: float
+) -> List[bytes]:
+    parts: List[bytes] = []
+    _pack_str(parts, session_id)
+    parts.append(_CUTOFF.pack(created_at))
+    _pack_records(parts, records)
+    return parts
+
+
+def _raise_for_status(status: int, body: bytes) -> None:
+    if status == STATUS_OK:
+        return
+    message = body.decode("utf-8", "replace")
+    if status == STATUS_CONFLICT:
+        raise StepConflictError(message)
+    raise StorageError(f"Context server: {message}")
+
+
+def ensure_server(path: str, args: Sequence[str] = (), timeout: float = 5.0) -> bool:
+    """
+    Start a context server on path unless one already answers there.
+
+    The server runs detached in its own session, so it outlives the
+    worker that started it. Workers racing to start one are safe: the
+    losers exit on the server lock and everyone waits for the winner.
+
+    Args:
+        path: Socket path
+        args: Extra command-line arguments for the server
+        timeout: Seconds to wait for the server to answer
+
+    Returns:
+        True if this call started the server
+
+    Raises:
+        StorageError: If no server answers within timeout
+    """
+    client = SocketBackend(path, pool_size=1, timeout=timeout)
+    try:
+        try:
+            client.ping()
+            return False
+        except StorageError:
+            pass
+        subprocess.Popen(
+            [sys.executable, "-m", "src.context_server", path, *args],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stdin=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        deadline = time.monotonic() + timeout
+        while True:
+            time.sleep(0.05)
+            try:
+                client.ping()
+                logger.info(f"Started context server on {path}")
+                return True
+            except StorageError:
+                if time.monotonic() > deadline:
+                    raise
+    finally:
+        client.close()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Run a context server until SIGTERM or SIGINT."""
+    parser = argparse.ArgumentParser(description="Serve a think tool session store")
+    parser.add_argument("socket", help="Unix domain socket path")
+    parser.add_argument(
+        "--backend",
+        default="memory",
+        choices=("memory", "sqlite", "shm"),
+        help="store the server owns (default: memory)",
+    )
+    parser.add_argument("--path", default="think_context.db", help="store path for sqlite/shm")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=args.log_level.upper(),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    try:
+        server = ContextServer(args.socket, create_backend(args.backend, args.path))
+    except StorageError as e:
+        logger.info(str(e))
+        return
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
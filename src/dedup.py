@@ -0,0 +1,166 @@
+"""Near-duplicate thought detection with MinHash signatures and LSH buckets."""
+
+from functools import lru_cache
+from typing import Dict, Optional, Set, Tuple
+import hashlib
+import struct
+
+from src.search import tokenize
+
+NUM_PERMUTATIONS = 32
+# Words per shingle: word order matters, so "A beats B" differs from "B beats A"
+SHINGLE_WORDS = 2
+BANDS = 8  # LSH bands of NUM_PERMUTATIONS // BANDS rows each
+_ROWS = NUM_PERMUTATIONS // BANDS
+_PACK = struct.Struct(f"<{NUM_PERMUTATIONS}I")
+_BAND_BYTES = _ROWS * 4
+
+# Approximate memory of one indexed signature: the packed signature, its
+# dict slot and one bucket set entry per band
+ENTRY_BYTES = 512
+
+
+@lru_cache(maxsize=65536)
+def _shingle_hashes(shingle: str) -> Tuple[int, ...]:
+    """NUM_PERMUTATIONS independent 32-bit hashes of a shingle (one per permutation)."""
+    return _PACK.unpack(hashlib.shake_128(shingle.encode("utf-8")).digest(_PACK.size))
+
+
+def minhash_signature(text: str) -> Optional[bytes]:
+    """
+    Compute the MinHash signature of a text's set of word shingles.
+
+    Shingles are runs of SHINGLE_WORDS consecutive words (a shorter text
+    is one shingle), so the same words in another order do not match.
+    Two signatures agree in each position with probability equal to the
+    Jaccard similarity of the shingle sets. Each shingle's hash vector is
+    cached, so a signature is one element-wise min over the vectors.
+
+    Args:
+        text: Text to fingerprint
+
+    Returns:
+        Packed signature (NUM_PERMUTATIONS 32-bit minima), or None if the
+        text has no words (such thoughts are never duplicates)
+    """
+    words = tokenize(text)
+    if not words:
+        return None
+    count = max(1, len(words) - SHINGLE_WORDS + 1)
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(count)}
+    vectors = [_shingle_hashes(shingle) for shingle in shingles]
+    return _PACK.pack(*map(min, zip(*vectors)))
+
+
+def similarity(first: bytes, second: bytes) -> float:
+    """Estimate the Jaccard similarity of two signatures."""
+    matches = sum(x == y for x, y in zip(_PACK.unpack(first), _PACK.unpack(second)))
+    return matches / NUM_PERMUTATIONS
+
+
+class DuplicateIndex:
+    """
+    MinHash signatures of one session's thoughts, bucketed by LSH band.
+
+    Each signature is cut into BANDS bands; thoughts that share any band
+    exactly are candidates and only those are compared, so a lookup is
+    sub-linear in the session length. With 8 bands of 4 rows, a pair
+    with Jaccard similarity 0.8 becomes a candidate about 98.5% of the
+    time, and a pair at 0.3 about 6% of the time.
+
+    Not thread-safe: the owning session's lock guards it.
+    """
+
+    __slots__ = ("threshold", "_signatures", "_buckets", "nbytes")
+
+    def __init__(self, threshold: float = 0.8):
+        """
+        Initialize DuplicateIndex.
+
+        Args:
+            threshold: Estimated Jaccard similarity at which thoughts are duplicates
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in (0, 1]")
+        self.threshold = threshold
+        self._signatures: Dict[int, bytes] = {}
+        self._buckets: Dict[Tuple[int, bytes], Set[int]] = {}
+        self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    @staticmethod
+    def _keys(signature: bytes):
+        for band in range(BANDS):
+            start = band * _BAND_BYTES
+            yield band, signature[start:start + _BAND_BYTES]
+
+    def add(self, step: int, signature: Optional[bytes]) -> int:
+        """
+        Index a thought's signature (thoughts without one are not indexed).
+
+        Returns:
+            Approximate bytes added
+        """
+        if signature is None or step in self._signatures:
+            return 0
+        self._signatures[step] = signature
+        buckets = self._buckets
+        for key in self._keys(signature):
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = set()
+            bucket.add(step)
+        self.nbytes += ENTRY_BYTES
+        return ENTRY_BYTES
+
+    def remove(self, step: int) -> int:
+        """
+        Drop a thought's signature.
+
+        Returns:
+            Approximate bytes released (0 if the step was not indexed)
+        """
+        signature = self._signatures.pop(step, None)
+        if signature is None:
+            return 0
+        buckets = self._buckets
+        for key in self._keys(signature):
+            bucket = buckets[key]
+            bucket.discard(step)
+            if not bucket:
+                del buckets[key]
+        self.nbytes -= ENTRY_BYTES
+        return ENTRY_BYTES
+
+    def find(
+        self, signature: Optional[bytes], threshold: Optional[float] = None
+    ) -> Optional[Tuple[int, float]]:
+        """
+        Find the most similar indexed thought at or above the threshold.
+
+        Args:
+            signature: Signature of the candidate thought (None never matches)
+            threshold: Similarity to use instead of the index's own, such as
+                a threshold changed since the index was built
+
+        Returns:
+            (step, estimated similarity), newest step on ties, or None
+        """
+        if signature is None:
+            return None
+        if threshold is None:
+            threshold = self.threshold
+        best: Optional[Tuple[float, int]] = None
+        seen: Set[int] = set()
+        signatures = self._signatures
+        for key in self._keys(signature):
+            for step in self._buckets.get(key, ()):
+                if step in seen:
+                    continue
+                seen.add(step)
+                score = similarity(signatures[step], signature)
+                if score >= threshold and (best is None or (score, step) > best):
+                    best = (score, step)
+        return None if best is None else (best[1], best[0])
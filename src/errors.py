@@ -21,6 +21,16 @@ class ContextError(ThinkToolError):
     pass
 
 
+class StorageError(ContextError):
+    """Raised when a storage backend operation fails."""
+    pass
+
+
+class StepConflictError(StorageError):
+    """Raised when a step number is already stored for a session."""
+    pass
+
+
 class ConfigurationError(ThinkToolError):
     """Raised when configuration is invalid."""
     pass
@@ -0,0 +1,165 @@
+"""Expiry index so session cleanup only visits sessions that have expired."""
+
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import heapq
+
+
+class _SessionTTL(NamedTuple):
+    """Per-session TTL override."""
+
+    ttl_seconds: float
+    sliding: bool
+    deadline: float
+
+
+class ExpiryIndex:
+    """
+    Tracks when sessions expire.
+
+    Sessions on the default TTL live in an ordered last-touched list
+    (oldest first), so expiring them by idle time only walks the expired
+    prefix. Sessions with their own TTL live in a min-heap keyed by
+    deadline; sliding TTLs push a fresh deadline on every touch and stale
+    heap entries are skipped lazily.
+
+    Both groups also keep least-recently-touched order, which the memory
+    budget uses to pick eviction victims.
+
+    Not thread-safe: the owning shard guards it with its lock.
+    """
+
+    __slots__ = ("_idle", "_custom", "_custom_lru", "_deadlines")
+
+    def __init__(self):
+        """Initialize ExpiryIndex."""
+        # Session id -> last touch time, least recently touched first
+        self._idle: "OrderedDict[str, float]" = OrderedDict()
+        self._custom: Dict[str, _SessionTTL] = {}
+        # Same ordering for sessions with their own TTL
+        self._custom_lru: "OrderedDict[str, float]" = OrderedDict()
+        self._deadlines: List[Tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._idle) + len(self._custom)
+
+    def __contains__(self, session_id: object) -> bool:
+        return session_id in self._idle or session_id in self._custom
+
+    def touch(self, session_id: str, now: float) -> None:
+        """
+        Record activity on a session.
+
+        Args:
+            session_id: Session identifier
+            now: Current epoch time
+        """
+        custom = self._custom.get(session_id)
+        if custom is None:
+            self._idle[session_id] = now
+            self._idle.move_to_end(session_id)
+            return
+        self._custom_lru[session_id] = now
+        self._custom_lru.move_to_end(session_id)
+        if custom.sliding:
+            self._set_deadline(session_id, custom.ttl_seconds, True, now + custom.ttl_seconds)
+
+    def set_ttl(
+        self, session_id: str, ttl_seconds: float, sliding: bool, now: float, created: float
+    ) -> float:
+        """
+        Give a session its own TTL.
+
+        Args:
+            session_id: Session identifier
+            ttl_seconds: Lifetime in seconds
+            sliding: Measure from the last touch (True) or from creation (False)
+            now: Current epoch time
+            created: Session creation time
+
+        Returns:
+            The session's new deadline
+        """
+        last_touched = self._idle.pop(session_id, None)
+        if session_id not in self._custom_lru:
+            self._custom_lru[session_id] = now if last_touched is None else last_touched
+        deadline = (now if sliding else created) + ttl_seconds
+        self._set_deadline(session_id, ttl_seconds, sliding, deadline)
+        return deadline
+
+    def clear_ttl(self, session_id: str, now: float) -> None:
+        """Return a session to the default TTL."""
+        if self._custom.pop(session_id, None) is not None:
+            self._custom_lru.pop(session_id, None)
+            self._idle[session_id] = now
+
+    def discard(self, session_id: str) -> None:
+        """Forget a session (its heap entries become stale)."""
+        self._idle.pop(session_id, None)
+        self._custom.pop(session_id, None)
+        self._custom_lru.pop(session_id, None)
+
+    def least_recent(self, exclude: Optional[str] = None) -> Optional[Tuple[float, str]]:
+        """
+        Return the least recently touched session.
+
+        Args:
+            exclude: Session id to skip
+
+        Returns:
+            (last touch time, session id), or None if no candidate exists
+        """
+        best: Optional[Tuple[float, str]] = None
+        for order in (self._idle, self._custom_lru):
+            for session_id, last_touched in order.items():
+                if session_id == exclude:
+                    continue
+                if best is None or last_touched < best[0]:
+                    best = (last_touched, session_id)
+                break
+        return best
+
+    def pop_expired(self, now: float, idle_cutoff: float, limit: int) -> List[str]:
+        """
+        Remove and return up to limit expired sessions.
+
+        Args:
+            now: Current epoch time (for per-session deadlines)
+            idle_cutoff: Default-TTL sessions last touched before this expire
+            limit: Maximum number of sessions to return
+
+        Returns:
+            Expired session ids
+        """
+        expired: List[str] = []
+        idle = self._idle
+        while idle and len(expired) < limit:
+            session_id, last_touched = next(iter(idle.items()))
+            if last_touched >= idle_cutoff:
+                break
+            idle.popitem(last=False)
+            expired.append(session_id)
+
+        deadlines = self._deadlines
+        while deadlines and len(expired) < limit:
+            deadline, session_id = deadlines[0]
+            if deadline > now:
+                break
+            heapq.heappop(deadlines)
+            custom = self._custom.get(session_id)
+            if custom is None or custom.deadline != deadline:
+                continue  # Stale entry from an earlier touch
+            del self._custom[session_id]
+            self._custom_lru.pop(session_id, None)
+            expired.append(session_id)
+        return expired
+
+    def _set_deadline(
+        self, session_id: str, ttl_seconds: float, sliding: bool, deadline: float
+    ) -> None:
+        self._custom[session_id] = _SessionTTL(ttl_seconds, sliding, deadline)
+        heapq.heappush(self._deadlines, (deadline, session_id))
+        # Sliding TTLs leave stale entries behind; rebuild once they dominate
+        if len(self._deadlines) > 2 * len(self._custom) + 64:
+            self._deadlines = [(c.deadline, sid) for sid, c in self._custom.items()]
+            heapq.heapify(self._deadlines)
@@ -0,0 +1,186 @@
+"""Opt-in lock contention profiler: wait, hold and contention per call site."""
+
+from types import CodeType
+from typing import Dict, List, Optional, Tuple
+import os
+import sys
+import threading
+import time
+
+# Modules whose frames are skipped when attributing an acquisition to a call site
+DEFAULT_SKIP_MODULES = ("src.lockprof", "src.sharding")
+
+# (code object, line number) of an acquiring frame; formatted only in reports
+Site = Tuple[Optional[CodeType], int]
+
+
+def _format_site(site: Site) -> str:
+    code, line = site
+    if code is None:
+        return "<unknown>"
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{line})"
+
+
+class _SiteStats:
+    """Accumulated timings of one (lock kind, call site) pair."""
+
+    __slots__ = ("acquisitions", "contended", "wait_total", "wait_max", "hold_total", "hold_max")
+
+    def __init__(self):
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+
+
+class LockProfiler:
+    """
+    Collects per call site statistics from the ProfiledLocks it creates.
+
+    Only meant for diagnosis: every acquisition walks the stack to find
+    its call site and updates shared statistics. Code that does not
+    profile uses plain threading.Lock objects and pays nothing.
+    """
+
+    def __init__(self, skip_modules: Tuple[str, ...] = DEFAULT_SKIP_MODULES):
+        """
+        Initialize LockProfiler.
+
+        Args:
+            skip_modules: Module names whose frames are not reported as call
+                sites (lock wrappers and containers taking locks on behalf
+                of their callers)
+        """
+        self._skip = frozenset(skip_modules)
+        self._stats: Dict[Tuple[str, Site], _SiteStats] = {}
+        self._lock = threading.Lock()
+
+    def lock(self, kind: str) -> "ProfiledLock":
+        """Create a lock whose acquisitions are reported under kind."""
+        return ProfiledLock(kind, self)
+
+    def _call_site(self) -> Site:
+        frame = sys._getframe(2)
+        while frame is not None and frame.f_globals.get("__name__") in self._skip:
+            frame = frame.f_back
+        if frame is None:
+            return (None, 0)
+        return (frame.f_code, frame.f_lineno)
+
+    def _record(self, kind: str, site: Site, wait: float, hold: float, contended: bool) -> None:
+        with self._lock:
+            stats = self._stats.get((kind, site))
+            if stats is None:
+                stats = self._stats[(kind, site)] = _SiteStats()
+            stats.acquisitions += 1
+            stats.contended += contended
+            stats.wait_total += wait
+            stats.hold_total += hold
+            if wait > stats.wait_max:
+                stats.wait_max = wait
+            if hold > stats.hold_max:
+                stats.hold_max = hold
+
+    def reset(self) -> None:
+        """Discard everything recorded so far."""
+        with self._lock:
+            self._stats.clear()
+
+    def report(self, limit: Optional[int] = None, sort_by: str = "wait_total") -> List[Dict]:
+        """
+        Call sites ordered from worst to best.
+
+        Args:
+            limit: Maximum rows returned (None for all)
+            sort_by: wait_total, wait_max, hold_total, hold_max or contended
+
+        Returns:
+            List of dicts with lock, site, acquisitions, contended,
+            contention_rate and wait/hold totals and maxima in milliseconds
+        """
+        if sort_by not in ("wait_total", "wait_max", "hold_total", "hold_max", "contended"):
+            raise ValueError(f"Unknown sort key: {sort_by}")
+        with self._lock:
+            items = [(kind, site, stats) for (kind, site), stats in self._stats.items()]
+        rows = []
+        for kind, site, stats in items:
+            rows.append({
+                "lock": kind,
+                "site": _format_site(site),
+                "acquisitions": stats.acquisitions,
+                "contended": stats.contended,
+                "contention_rate": stats.contended / stats.acquisitions,
+                "wait_total_ms": stats.wait_total * 1000,
+                "wait_max_ms": stats.wait_max * 1000,
+                "hold_total_ms": stats.hold_total * 1000,
+                "hold_max_ms": stats.hold_max * 1000,
+            })
+        key = sort_by if sort_by == "contended" else f"{sort_by}_ms"
+        rows.sort(key=lambda row: row[key], reverse=True)
+        return rows[:limit] if limit is not None else rows
+
+    def format_report(self, limit: int = 10, sort_by: str = "wait_total") -> str:
+        """Render report() as a fixed-width text table."""
+        lines = [
+            f"{'lock':<8} {'site':<58} {'acq':>8} {'cont%':>6} "
+            f"{'wait ms':>9} {'wait max':>9} {'hold ms':>9} {'hold max':>9}"
+        ]
+        for row in self.report(limit, sort_by):
+            lines.append(
+                f"{row['lock']:<8} {row['site'][:58]:<58} {row['acquisitions']:>8} "
+                f"{row['contention_rate']:>6.1%} {row['wait_total_ms']:>9.2f} "
+                f"{row['wait_max_ms']:>9.3f} {row['hold_total_ms']:>9.2f} "
+                f"{row['hold_max_ms']:>9.3f}"
+            )
+        return "\n".join(lines)
+
+
+class ProfiledLock:
+    """
+    Drop-in threading.Lock replacement reporting to a LockProfiler.
+
+    An acquisition counts as contended when a non-blocking attempt fails;
+    wait is the time until the lock was obtained and hold the time until
+    release. Both are attributed to the acquiring call site.
+    """
+
+    __slots__ = ("kind", "_profiler", "_lock", "_site", "_wait", "_acquired", "_contended")
+
+    def __init__(self, kind: str, profiler: LockProfiler):
+        self.kind = kind
+        self._profiler = profiler
+        self._lock = threading.Lock()
+        # Describe the current holder; only written while the lock is held
+        self._site: Site = (None, 0)
+        self._wait = 0.0
+        self._acquired = 0.0
+        self._contended = False
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        start = time.perf_counter()
+        contended = not self._lock.acquire(False)
+        if contended and not (blocking and self._lock.acquire(True, timeout)):
+            return False
+        acquired = time.perf_counter()
+        self._site = self._profiler._call_site()
+        self._wait = acquired - start
+        self._acquired = acquired
+        self._contended = contended
+        return True
+
+    def release(self) -> None:
+        hold = time.perf_counter() - self._acquired
+        site, wait, contended = self._site, self._wait, self._contended
+        self._lock.release()
+        self._profiler._record(self.kind, site, wait, hold, contended)
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
@@ -0,0 +1,388 @@
+"""Low-overhead counters and latency histograms with Prometheus text exposition."""
+
+from bisect import bisect_left
+from collections import deque
+from typing import TYPE_CHECKING, Callable, Deque, Dict, List, Optional, Tuple
+import logging
+import os
+import threading
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Latency bucket upper bounds in seconds, from a dict lookup to a slow fsync
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+# Pending updates folded into a metric once this many accumulate (or on read)
+FOLD_THRESHOLD = 1024
+
+
+class Counter:
+    """
+    Monotonic count.
+
+    inc() only appends to a deque, which is atomic under the GIL, so the
+    hot path never takes a lock; pending amounts are folded into the total
+    under the counter's lock on read or every FOLD_THRESHOLD updates.
+    """
+
+    __slots__ = ("_value", "_pending", "_lock")
+
+    def __init__(self):
+        self._value = 0
+        self._pending: Deque[int] = deque()
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        """Add amount (must not be negative)."""
+        pending = self._pending
+        pending.append(amount)
+        if len(pending) >= FOLD_THRESHOLD:
+            self._fold()
+
+    def _fold(self) -> None:
+        with self._lock:
+            pending = self._pending
+            total = 0
+            while pending:
+                total += pending.popleft()
+            self._value += total
+
+    @property
+    def value(self) -> int:
+        self._fold()
+        return self._value
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram of observations (seconds for latencies).
+
+    observe() appends to a lock-free deque like Counter.inc; observations
+    are bucketed (O(log buckets) each) when folded, so reading costs at
+    most FOLD_THRESHOLD bucket lookups however many values were observed.
+    """
+
+    __slots__ = ("bounds", "_counts", "_sum", "_pending", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        """
+        Initialize Histogram.
+
+        Args:
+            bounds: Increasing bucket upper bounds; +Inf is implied
+        """
+        self.bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._pending: Deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        pending = self._pending
+        pending.append(value)
+        if len(pending) >= FOLD_THRESHOLD:
+            self._fold()
+
+    def _fold(self) -> None:
+        """Bucket pending observations; caller must not hold the lock."""
+        with self._lock:
+            pending = self._pending
+            counts = self._counts
+            bounds = self.bounds
+            while pending:
+                value = pending.popleft()
+                counts[bisect_left(bounds, value)] += 1
+                self._sum += value
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """
+        Returns:
+            (cumulative count per bucket including +Inf, sum, count)
+        """
+        self._fold()
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total, running
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile (q in [0, 1]) by interpolating within its bucket.
+
+        Returns:
+            Estimated value; the largest finite bound if it falls in +Inf,
+            0.0 without observations
+        """
+        cumulative, _, count = self.snapshot()
+        if not count:
+            return 0.0
+        rank = q * count
+        lower = 0.0
+        previous = 0
+        for bound, running in zip(self.bounds, cumulative):
+            if running >= rank:
+                in_bucket = running - previous
+                fraction = (rank - previous) / in_bucket if in_bucket else 1.0
+                return lower + (bound - lower) * fraction
+            lower = bound
+            previous = running
+        return self.bounds[-1]
+
+
+class _Family:
+    """Metrics sharing a name, type and help text, one per label set."""
+
+    __slots__ = ("name", "kind", "help", "members")
+
+    def __init__(self, name: str, kind: str, help_text: str):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.members: Dict[Labels, object] = {}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    Named counters, histograms and gauges of one ContextManager.
+
+    Metrics are created once (typically at construction) and updated
+    incrementally on the hot paths; gauges are read from callbacks at
+    exposition time. Reading any metric never scans sessions.
+    """
+
+    def __init__(self):
+        self._families: Dict[str, _Family] = {}
+        self._lock = threading.Lock()
+
+    def _member(self, name: str, kind: str, help_text: str, labels: Dict[str, str], factory):
+        key: Labels = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = _Family(name, kind, help_text)
+            elif family.kind != kind:
+                raise ValueError(f"Metric {name} is already a {family.kind}")
+            member = family.members.get(key)
+            if member is None:
+                member = family.members[key] = factory()
+            return member
+
+    def counter(self, name: str, help_text: str, **labels: str) -> Counter:
+        """Get or create a counter (name should end in _total)."""
+        return self._member(name, "counter", help_text, labels, Counter)
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        bounds: Tuple[float, ...] = LATENCY_BUCKETS,
+        **labels: str,
+    ) -> Histogram:
+        """Get or create a histogram."""
+        return self._member(name, "histogram", help_text, labels, lambda: Histogram(bounds))
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float], **labels: str) -> None:
+        """Register a gauge whose value is read from a callback."""
+        self._member(name, "gauge", help_text, labels, lambda: read)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Current values keyed by metric name, then by label string.
+
+        Counters and gauges map to numbers; histograms to count, sum,
+        p50, p95 and p99 (estimated from the buckets).
+        """
+        with self._lock:
+            families = [(f, list(f.members.items())) for f in self._families.values()]
+        result: Dict[str, Dict] = {}
+        for family, members in families:
+            values = result[family.name] = {}
+            for labels, member in members:
+                key = ",".join(f"{k}={v}" for k, v in labels)
+                if family.kind == "counter":
+                    values[key] = member.value
+                elif family.kind == "gauge":
+                    values[key] = member()
+                else:
+                    _, total, count = member.snapshot()
+                    values[key] = {
+                        "count": count,
+                        "sum": total,
+                        "p50": member.quantile(0.5),
+                        "p95": member.quantile(0.95),
+                        "p99": member.quantile(0.99),
+                    }
+        return result
+
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            families = [(f, list(f.members.items())) for f in self._families.values()]
+        lines: List[str] = []
+        for family, members in families:
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for labels, member in members:
+                if family.kind == "counter":
+                    lines.append(f"{family.name}{_format_labels(labels)} {member.value}")
+                elif family.kind == "gauge":
+                    value = _format_value(member())
+                    lines.append(f"{family.name}{_format_labels(labels)} {value}")
+                else:
+                    cumulative, total, count = member.snapshot()
+                    bounds = [_format_value(b) for b in member.bounds] + ["+Inf"]
+                    name = family.name
+                    for bound, running in zip(bounds, cumulative):
+                        bucket_labels = _format_labels(labels, ("le", bound))
+                        lines.append(f"{name}_bucket{bucket_labels} {running}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def write_textfile(text: str, path: str) -> None:
+    """
+    Atomically replace path with exposition text.
+
+    Suitable for the node_exporter textfile collector, which must never
+    see a partially written file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class MetricsExporter:
+    """
+    Serves metrics over local HTTP and/or dumps them to a file periodically.
+
+    Both run on daemon threads and only call render() when a scrape or a
+    dump happens, so an idle exporter costs nothing on the request path.
+    """
+
+    def __init__(
+        self,
+        render: Callable[[], str],
+        port: int = 0,
+        host: str = "127.0.0.1",
+        path: str = "",
+        interval: float = 15.0,
+    ):
+        """
+        Initialize MetricsExporter.
+
+        Args:
+            render: Returns the exposition text
+            port: HTTP port serving /metrics (0 disables the server)
+            host: Address to bind; keep it local unless scraped remotely
+            path: File rewritten every interval seconds (empty disables it)
+            interval: Seconds between file dumps
+        """
+        self._render = render
+        self._path = path
+        self._interval = interval
+        self._stop = threading.Event()
+        self._server: Optional["ThreadingHTTPServer"] = None
+        self._threads: List[threading.Thread] = []
+
+        if port:
+            # Imported only when serving: http.server is slow to import
+            from http.server import ThreadingHTTPServer
+
+            self._server = ThreadingHTTPServer((host, port), self._handler())
+            self._server.daemon_threads = True
+            self._start(self._server.serve_forever, "ContextManager-Metrics-HTTP")
+            logger.info(f"Serving metrics on http://{host}:{self.port}/metrics")
+        if path:
+            self._start(self._dump_loop, "ContextManager-Metrics-File")
+            logger.info(f"Writing metrics to {path} every {interval}s")
+
+    @property
+    def port(self) -> int:
+        """Bound HTTP port (0 when the server is disabled)."""
+        return self._server.server_address[1] if self._server is not None else 0
+
+    def _start(self, target: Callable[[], None], name: str) -> None:
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _handler(self):
+        from http.server import BaseHTTPRequestHandler
+
+        render = self._render
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"Metrics scrape: {format % args}")
+
+        return Handler
+
+    def _dump_loop(self) -> None:
+        while True:
+            try:
+                write_textfile(self._render(), self._path)
+            except OSError as e:
+                logger.warning(f"Could not write metrics to {self._path}: {e}")
+            if self._stop.wait(self._interval):
+                return
+
+    def close(self) -> None:
+        """Stop serving and write the file one last time."""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        if self._path:
+            try:
+                write_textfile(self._render(), self._path)
+            except OSError as e:
+                logger.warning(f"Could not write metrics to {self._path}: {e}")
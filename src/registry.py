@@ -0,0 +1,89 @@
+"""Process-wide registry handing every ThinkTool the same ContextManager."""
+
+from typing import TYPE_CHECKING, Optional
+import logging
+import threading
+
+if TYPE_CHECKING:
+    from src.context_manager import ContextManager
+    from src.metrics import MetricsExporter
+
+logger = logging.getLogger(__name__)
+
+# Shared context store for the whole process
+_manager: Optional["ContextManager"] = None
+# Serves or dumps the shared manager's metrics when configured
+_exporter: Optional["MetricsExporter"] = None
+_manager_lock = threading.Lock()
+
+
+def get_context_manager() -> "ContextManager":
+    """
+    Get the shared ContextManager, creating it on first use.
+
+    The context store (and the storage, log and index modules behind it)
+    is imported here rather than at module load, so importing the tool
+    does not pay for it; the first invocation does.
+
+    Returns:
+        ContextManager instance shared by all tool invocations
+    """
+    global _manager
+    manager = _manager
+    if manager is None:
+        with _manager_lock:
+            if _manager is None:
+                from src.context_manager import ContextManager
+
+                _manager = ContextManager()
+                logger.debug("Shared ContextManager created")
+                _start_exporter(_manager)
+            manager = _manager
+    return manager
+
+
+def _start_exporter(manager: "ContextManager") -> None:
+    """Expose the manager's metrics if a metrics port or file is configured."""
+    global _exporter
+    from src.config import get_config
+
+    config = get_config()
+    if not (config.metrics_port or config.metrics_file):
+        return
+    from src.metrics import MetricsExporter
+
+    try:
+        _exporter = MetricsExporter(
+            manager.render_metrics,
+            port=config.metrics_port,
+            host=config.metrics_host,
+            path=config.metrics_file,
+            interval=config.metrics_file_interval_seconds,
+        )
+    except OSError as e:
+        # Metrics are optional: never fail the tool because the port is taken
+        logger.warning(f"Metrics exporter not started: {e}")
+
+
+def shutdown_context_manager() -> None:
+    """
+    Shut down the shared ContextManager, its metrics exporter and the
+    cleanup scheduler.
+
+    Safe to call more than once; the next get_context_manager() call
+    creates a fresh store.
+    """
+    global _manager, _exporter
+    with _manager_lock:
+        manager = _manager
+        exporter = _exporter
+        _manager = None
+        _exporter = None
+    if exporter is not None:
+        exporter.close()
+    if manager is not None:
+        manager.shutdown()
+    from src.scheduler import get_scheduler
+
+    get_scheduler().shutdown()
+    logger.info("Shared ContextManager shut down")
@@ -0,0 +1,222 @@
+"""Renderers and incremental render cache for formatted session context."""
+
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Sequence
+
+from src.responses import dumps
+from src.thought_buffer import ThoughtBuffer
+from src.tokens import estimate_tokens
+
+
+class Renderer:
+    """
+    Output format for formatted context.
+
+    Each renderer turns one thought record into a text chunk; the
+    formatted context is header + the chunks of every thought in order.
+    """
+
+    __slots__ = ("name", "header", "empty", "render_entry", "entry_tokens", "header_tokens")
+
+    def __init__(
+        self,
+        name: str,
+        header: str,
+        empty: str,
+        render_entry: Callable[[Any], str],
+        entry_tokens: int = 0,
+    ):
+        """
+        Initialize Renderer.
+
+        Args:
+            name: Format name
+            header: Text placed before the first thought
+            empty: Text returned when the session has no thoughts
+            render_entry: Callable rendering one thought record to a chunk
+            entry_tokens: Estimated tokens a chunk adds around the thought text
+        """
+        self.name = name
+        self.header = header
+        self.empty = empty
+        self.render_entry = render_entry
+        self.entry_tokens = entry_tokens
+        self.header_tokens = estimate_tokens(header)
+
+
+# Format strings are bound once at import time
+_MARKDOWN_ENTRY = "Step {} ({}):\n{}\n\n".format
+_COMPACT_ENTRY = "[{}] {}\n".format
+
+
+def _render_markdown(record: Any) -> str:
+    return _MARKDOWN_ENTRY(record["step"], record["timestamp"], record["thought"])
+
+
+def _render_compact(record: Any) -> str:
+    return _COMPACT_ENTRY(record["step"], record["thought"])
+
+
+def _render_jsonl(record: Any) -> str:
+    return dumps(
+        {"step": record["step"], "timestamp": record["timestamp"], "thought": record["thought"]}
+    ) + "\n"
+
+
+EMPTY_CONTEXT_MESSAGE = "No thoughts yet in this session."
+
+RENDERERS: Dict[str, Renderer] = {
+    # entry_tokens: "Step N (ISO timestamp):" plus blank lines
+    "markdown": Renderer(
+        "markdown",
+        "Previous thoughts in this session:\n\n",
+        EMPTY_CONTEXT_MESSAGE,
+        _render_markdown,
+        entry_tokens=12,
+    ),
+    "compact": Renderer("compact", "", EMPTY_CONTEXT_MESSAGE, _render_compact, entry_tokens=3),
+    # Keys, quotes and the timestamp; escaping can add a little more
+    "jsonl": Renderer("jsonl", "", "", _render_jsonl, entry_tokens=20),
+}
+
+
+def get_renderer(output_format: str) -> Renderer:
+    """
+    Look up a renderer by format name.
+
+    Args:
+        output_format: One of RENDERERS (markdown, compact, jsonl)
+
+    Returns:
+        Renderer instance
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    try:
+        return RENDERERS[output_format]
+    except KeyError:
+        raise ValueError(
+            f"Unknown output format: {output_format!r} "
+            f"(expected one of {', '.join(RENDERERS)})"
+        ) from None
+
+
+class RenderCache:
+    """
+    Rendered chunks for one session and one format, aligned with step numbers.
+
+    Each render only formats thoughts added since the previous render and
+    drops chunks of evicted thoughts from the front in O(1) each, so the
+    remaining cost is a single join of the cached chunks.
+
+    With max_chunks set, only the newest max_chunks thoughts stay cached;
+    older thoughts are formatted from their records on every render.
+    """
+
+    __slots__ = ("renderer", "max_chunks", "_chunks", "_first_step", "_next_step")
+
+    def __init__(self, renderer: Renderer, max_chunks: Optional[int] = None):
+        """
+        Initialize RenderCache.
+
+        Args:
+            renderer: Renderer used for new chunks
+            max_chunks: Maximum number of cached chunks (None for unbounded)
+        """
+        self.renderer = renderer
+        self.max_chunks = max_chunks
+        self._chunks: Deque[str] = deque()
+        self._first_step = 0  # Step of _chunks[0]
+        self._next_step = 0  # Step after the last cached chunk
+
+    def invalidate(self) -> None:
+        """Drop all cached chunks."""
+        self._chunks.clear()
+        self._first_step = self._next_step = 0
+
+    def render(self, buffer: ThoughtBuffer) -> str:
+        """
+        Render the buffer, reusing chunks cached by earlier calls.
+
+        The caller must hold the session lock.
+
+        Args:
+            buffer: Session thought buffer
+
+        Returns:
+            Formatted context string
+        """
+        if not buffer:
+            self.invalidate()
+            return self.renderer.empty
+
+        self._refresh(buffer)
+        render_entry = self.renderer.render_entry
+        # Thoughts older than the cached window are rendered uncached
+        cold = [
+            render_entry(buffer.by_step(step))
+            for step in range(buffer.first_step, self._first_step)
+        ]
+        return self.renderer.header + "".join(cold) + "".join(self._chunks)
+
+    def render_steps(self, buffer: ThoughtBuffer, steps: Sequence[int]) -> str:
+        """
+        Render only the given steps (oldest first).
+
+        Chunks cached by earlier full renders are reused; other steps are
+        formatted directly and the cache is left as it is, so the cost is
+        O(len(steps)) regardless of session length. The caller must hold
+        the session lock.
+
+        Args:
+            buffer: Session thought buffer
+            steps: Step numbers in the buffer's window, ascending
+
+        Returns:
+            Formatted context string
+        """
+        if not buffer:
+            return self.renderer.empty
+
+        chunks = self._chunks
+        first_cached = self._first_step
+        next_cached = self._next_step
+        if next_cached > buffer.next_step:
+            first_cached = next_cached = 0  # Window was reloaded; cache is stale
+        render_entry = self.renderer.render_entry
+        parts = [self.renderer.header]
+        for step in steps:
+            if first_cached <= step < next_cached:
+                parts.append(chunks[step - first_cached])
+            else:
+                parts.append(render_entry(buffer.by_step(step)))
+        return "".join(parts)
+
+    def _refresh(self, buffer: ThoughtBuffer) -> None:
+        """Bring cached chunks in line with the buffer's window."""
+        first_step = buffer.first_step
+        next_step = buffer.next_step
+        chunks = self._chunks
+        max_chunks = self.max_chunks
+
+        if self._next_step < first_step or self._next_step > next_step:
+            # Nothing reusable: start over from the buffer's window
+            chunks.clear()
+            start = first_step if max_chunks is None else max(first_step, next_step - max_chunks)
+            self._first_step = self._next_step = start
+        elif first_step > self._first_step:
+            # Trim chunks for thoughts evicted since the last render
+            for _ in range(first_step - self._first_step):
+                chunks.popleft()
+            self._first_step = first_step
+
+        render_entry = self.renderer.render_entry
+        for step in range(self._next_step, next_step):
+            chunks.append(render_entry(buffer.by_step(step)))
+        self._next_step = next_step
+
+        if max_chunks is not None:
+            while len(chunks) > max_chunks:
+                chunks.popleft()
+                self._first_step += 1
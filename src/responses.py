@@ -0,0 +1,77 @@
+"""Tool response shaping and JSON encoding."""
+
+from functools import lru_cache
+from typing import Any, Callable, Dict, Mapping, Tuple
+
+RESPONSE_MODES = ("full", "ack", "delta")
+
+# Fields every mode returns: enough for the agent to continue numbering
+_ACK_FIELDS = ("status", "step", "count", "results", "context_size")
+
+
+@lru_cache(maxsize=None)
+def json_encoder() -> Tuple[str, Callable[[Any], str]]:
+    """
+    Pick the JSON encoder on first use.
+
+    orjson is used when installed. It is imported here rather than at
+    module load since it pulls in uuid, zoneinfo and platform, which would
+    add about 10 ms to every worker start. The stdlib fallback produces
+    the same text.
+
+    Returns:
+        (encoder name, function encoding an object to compact JSON)
+    """
+    try:
+        import orjson
+    except ImportError:
+        import json
+
+        return "json", json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+    def encode(obj: Any) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+    return "orjson", encode
+
+
+def dumps(obj: Any) -> str:
+    """Encode obj as compact JSON (non-ASCII kept as is)."""
+    return json_encoder()[1](obj)
+
+
+def shape_response(
+    response: Dict[str, Any],
+    mode: str,
+    static_fields: Mapping[str, Any],
+    new_session: bool = False,
+) -> Dict[str, Any]:
+    """
+    Trim a think tool response to what the response mode sends.
+
+    - full: the response plus the static fields (session_id, max_thoughts)
+    - ack: status, step (or count and results for a batch) and context_size
+    - delta: ack plus what the agent cannot infer from its own call: the
+      dedup decision when the thought was not simply added, and the static
+      fields on the first response of a session
+
+    Args:
+        response: Full per-call fields (without the static fields)
+        mode: One of RESPONSE_MODES
+        static_fields: Fields that do not change between calls, built once
+        new_session: Whether this call started the session
+
+    Returns:
+        Response dict for the mode
+    """
+    if mode == "full":
+        response.update(static_fields)
+        return response
+    shaped = {key: response[key] for key in _ACK_FIELDS if key in response}
+    if mode == "delta":
+        if response.get("decision", "added") != "added":
+            shaped["decision"] = response["decision"]
+            shaped["duplicate_of"] = response["duplicate_of"]
+        if new_session:
+            shaped.update(static_fields)
+    return shaped
@@ -0,0 +1,131 @@
+"""Process-wide cleanup scheduler shared by all ContextManager instances."""
+
+from typing import Any, Optional
+import logging
+import threading
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+
+class CleanupScheduler:
+    """
+    Runs periodic session cleanup for every registered ContextManager
+    from a single daemon thread.
+
+    Managers are held by weak reference, so a manager that is dropped
+    without calling shutdown() simply stops being scheduled.
+    """
+
+    def __init__(self):
+        """Initialize CleanupScheduler (the worker thread starts lazily)."""
+        self._cond = threading.Condition()
+        # Manager -> monotonic time of its next cleanup run
+        self._jobs: "weakref.WeakKeyDictionary[Any, float]" = weakref.WeakKeyDictionary()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    @staticmethod
+    def _interval_seconds(manager: Any) -> float:
+        return manager.cleanup_interval_hours * 3600
+
+    def register(self, manager: Any) -> None:
+        """
+        Schedule periodic cleanup for a manager.
+
+        Args:
+            manager: Object exposing cleanup_interval_hours and cleanup_old_sessions()
+        """
+        with self._cond:
+            self._jobs[manager] = time.monotonic() + self._interval_seconds(manager)
+            self._stopped = False
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, daemon=True, name="ContextManager-Cleanup"
+                )
+                self._thread.start()
+                logger.debug("Cleanup scheduler thread started")
+            self._cond.notify()
+
+    def unregister(self, manager: Any) -> None:
+        """
+        Stop scheduling cleanup for a manager.
+
+        Args:
+            manager: Previously registered manager
+        """
+        with self._cond:
+            self._jobs.pop(manager, None)
+            self._cond.notify()
+
+    def is_registered(self, manager: Any) -> bool:
+        """Return True if the manager is currently scheduled."""
+        with self._cond:
+            return manager in self._jobs
+
+    @property
+    def thread(self) -> Optional[threading.Thread]:
+        """The worker thread, if running."""
+        return self._thread
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """
+        Stop the worker thread and drop all scheduled managers.
+
+        Args:
+            timeout: Seconds to wait for the worker thread to exit
+        """
+        with self._cond:
+            self._stopped = True
+            self._jobs.clear()
+            thread = self._thread
+            self._thread = None
+            self._cond.notify()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=timeout)
+            logger.debug("Cleanup scheduler thread stopped")
+
+    def _run(self) -> None:
+        """Worker loop: sleep until the earliest job is due, then run it."""
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                now = time.monotonic()
+                due = [m for m, next_run in self._jobs.items() if next_run <= now]
+                if not due:
+                    next_run = min(self._jobs.values(), default=None)
+                    self._cond.wait(None if next_run is None else next_run - now)
+                    continue
+                for manager in due:
+                    self._jobs[manager] = now + self._interval_seconds(manager)
+
+            for manager in due:
+                try:
+                    cleaned = manager.cleanup_old_sessions(manager.cleanup_interval_hours)
+                    if cleaned > 0:
+                        logger.info(f"Auto-cleanup: Removed {cleaned} old session(s)")
+                except Exception as e:
+                    logger.error(f"Error in auto-cleanup: {e}", exc_info=True)
+            del due
+
+
+# Global scheduler instance
+_scheduler: Optional[CleanupScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> CleanupScheduler:
+    """
+    Get the process-wide cleanup scheduler.
+
+    Returns:
+        CleanupScheduler instance
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = CleanupScheduler()
+    return _scheduler
@@ -0,0 +1,148 @@
+"""Per-session inverted index with BM25 ranking."""
+
+from typing import Dict, List, Tuple
+import heapq
+import math
+import re
+
+# Unicode word characters; thoughts are matched case-insensitively
+_TOKEN_RE = re.compile(r"\w+")
+
+# Approximate memory of one (term, step) posting: dict slot, int key and
+# term frequency, plus a share of the per-term dict
+POSTING_BYTES = 96
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase search terms.
+
+    Args:
+        text: Text to split
+
+    Returns:
+        Terms in order of appearance (with repeats)
+    """
+    return _TOKEN_RE.findall(text.lower())
+
+
+class SessionIndex:
+    """
+    Inverted index over one session's thoughts, keyed by step number.
+
+    Postings map each term to {step: term frequency}; a forward map keeps
+    each step's distinct terms so removal does not re-read the thought.
+    Adding or removing a thought is O(distinct terms in it), and a search
+    only visits the postings of the query terms.
+
+    Not thread-safe: the owning session's lock guards it.
+    """
+
+    __slots__ = ("_postings", "_terms", "_lengths", "_total_length", "k1", "b", "nbytes")
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        Initialize SessionIndex.
+
+        Args:
+            k1: BM25 term frequency saturation
+            b: BM25 document length normalization
+        """
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._terms: Dict[int, Tuple[str, ...]] = {}
+        self._lengths: Dict[int, int] = {}
+        self._total_length = 0
+        self.k1 = k1
+        self.b = b
+        # Approximate memory held by postings
+        self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def __contains__(self, step: object) -> bool:
+        return step in self._lengths
+
+    def add(self, step: int, text: str) -> int:
+        """
+        Index a thought.
+
+        Args:
+            step: Step number
+            text: Thought text
+
+        Returns:
+            Approximate bytes added
+        """
+        if step in self._lengths:
+            return 0
+        terms = tokenize(text)
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        postings = self._postings
+        for term, count in counts.items():
+            posting = postings.get(term)
+            if posting is None:
+                posting = postings[term] = {}
+            posting[step] = count
+        self._terms[step] = tuple(counts)
+        self._lengths[step] = len(terms)
+        self._total_length += len(terms)
+        added = len(counts) * POSTING_BYTES
+        self.nbytes += added
+        return added
+
+    def remove(self, step: int) -> int:
+        """
+        Drop a thought from the index.
+
+        Args:
+            step: Step number
+
+        Returns:
+            Approximate bytes released (0 if the step was not indexed)
+        """
+        terms = self._terms.pop(step, None)
+        if terms is None:
+            return 0
+        self._total_length -= self._lengths.pop(step)
+        postings = self._postings
+        for term in terms:
+            posting = postings[term]
+            del posting[step]
+            if not posting:
+                del postings[term]
+        released = len(terms) * POSTING_BYTES
+        self.nbytes -= released
+        return released
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[int, float]]:
+        """
+        Rank indexed thoughts against a query with BM25.
+
+        Args:
+            query: Free-text query
+            limit: Maximum number of results
+
+        Returns:
+            (step, score) pairs, best first; ties favour newer steps
+        """
+        count = len(self._lengths)
+        if not count or limit < 1:
+            return []
+        k1 = self.k1
+        b = self.b
+        average_length = self._total_length / count or 1.0
+        lengths = self._lengths
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if not posting:
+                continue
+            df = len(posting)
+            idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+            for step, tf in posting.items():
+                norm = k1 * (1 - b + b * lengths[step] / average_length)
+                scores[step] = scores.get(step, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
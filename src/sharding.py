@@ -0,0 +1,358 @@
+"""Lock-striped session map used by ContextManager."""
+
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import threading
+import zlib
+
+from src.expiry import ExpiryIndex
+
+# Called with "shard" or "session"; returns a lock (threading.Lock-compatible)
+LockFactory = Callable[[str], threading.Lock]
+
+
+def _plain_lock(kind: str) -> threading.Lock:
+    return threading.Lock()
+
+
+class _Shard:
+    """One independently locked partition of the session map."""
+
+    __slots__ = ("lock", "contexts", "session_locks", "expiry", "bytes", "thoughts")
+
+    def __init__(self, lock_factory: "LockFactory"):
+        self.lock = lock_factory("shard")
+        self.contexts: Dict[str, Dict] = {}
+        # Per-session write locks, created alongside the session context
+        self.session_locks: Dict[str, threading.Lock] = {}
+        self.expiry = ExpiryIndex()
+        # Approximate bytes and number of thoughts held by this shard's sessions
+        self.bytes = 0
+        self.thoughts = 0
+
+    def forget(self, session_id: str) -> Optional[Dict]:
+        """Remove a session from every structure; caller holds the lock."""
+        lock = self.session_locks.get(session_id)
+        if lock is not None and not lock.locked():
+            # A held lock stays mapped so the next writer waits for its holder
+            del self.session_locks[session_id]
+        self.expiry.discard(session_id)
+        context = self.contexts.pop(session_id, None)
+        if context is not None:
+            self.bytes -= context["metadata"].get("bytes", 0)
+            self.thoughts -= context["metadata"].get("thought_count", 0)
+        return context
+
+
+class ShardedSessionMap:
+    """
+    Session map partitioned into N shards keyed by a hash of the session id.
+
+    Operations on sessions that hash to different shards never contend,
+    and whole-map scans (cleanup, stats) lock one shard at a time.
+    Each session also gets its own lock for serializing writes.
+
+    Byte and thought accounting: each context's metadata["bytes"] and
+    metadata["thought_count"] are only changed under its shard lock (see
+    touch/add_bytes), so per-shard totals stay consistent with the
+    sessions they hold.
+    """
+
+    def __init__(self, num_shards: int = 16, lock_factory: Optional[LockFactory] = None):
+        """
+        Initialize ShardedSessionMap.
+
+        Args:
+            num_shards: Number of independently locked partitions
+            lock_factory: Creates shard and session locks, e.g. profiled
+                ones (plain threading.Lock if None)
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        self._new_lock = lock_factory or _plain_lock
+        self._shards: Tuple[_Shard, ...] = tuple(
+            _Shard(self._new_lock) for _ in range(num_shards)
+        )
+        self.num_shards = num_shards
+
+    def _shard(self, session_id: str) -> _Shard:
+        # crc32 is stable across processes, unlike the salted str hash
+        return self._shards[zlib.crc32(session_id.encode("utf-8")) % self.num_shards]
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        """Return the context for a session, or None if it does not exist."""
+        shard = self._shard(session_id)
+        with shard.lock:
+            return shard.contexts.get(session_id)
+
+    def get_or_create(self, session_id: str, factory: Callable[[str], Dict]) -> Dict:
+        """
+        Return the context for a session, creating it with factory if missing.
+
+        Args:
+            session_id: Session identifier
+            factory: Called with session_id to build a new context
+
+        Returns:
+            Session context
+        """
+        shard = self._shard(session_id)
+        with shard.lock:
+            context = shard.contexts.get(session_id)
+            if context is None:
+                context = factory(session_id)
+                shard.contexts[session_id] = context
+                if session_id not in shard.session_locks:
+                    shard.session_locks[session_id] = self._new_lock("session")
+                shard.expiry.touch(session_id, context["metadata"]["created_at"])
+                shard.bytes += context["metadata"].get("bytes", 0)
+                shard.thoughts += context["metadata"].get("thought_count", 0)
+            return context
+
+    def touch(
+        self,
+        session_id: str,
+        now: float,
+        delta_bytes: int = 0,
+        delta_thoughts: int = 0,
+        context: Optional[Dict] = None,
+    ) -> None:
+        """
+        Record activity on a session in its shard's expiry index.
+
+        Args:
+            session_id: Session identifier
+            now: Current epoch time
+            delta_bytes: Change in the session's approximate size
+            delta_thoughts: Change in the number of thoughts the session holds
+            context: The context the caller changed; nothing is recorded
+                unless it is still the session's mapped context
+        """
+        shard = self._shard(session_id)
+        with shard.lock:
+            mapped = shard.contexts.get(session_id)
+            if mapped is not None and (context is None or mapped is context):
+                context = mapped
+                shard.expiry.touch(session_id, now)
+                if delta_bytes:
+                    context["metadata"]["bytes"] += delta_bytes
+                    shard.bytes += delta_bytes
+                if delta_thoughts:
+                    context["metadata"]["thought_count"] += delta_thoughts
+                    shard.thoughts += delta_thoughts
+
+    def add_bytes(
+        self,
+        session_id: str,
+        delta_bytes: int,
+        delta_thoughts: int = 0,
+        context: Optional[Dict] = None,
+    ) -> None:
+        """
+        Adjust a session's approximate size without touching it.
+
+        Args:
+            session_id: Session identifier
+            delta_bytes: Change in bytes
+            delta_thoughts: Change in the number of thoughts
+            context: The context the caller changed; nothing is adjusted
+                unless it is still the session's mapped context
+        """
+        shard = self._shard(session_id)
+        with shard.lock:
+            mapped = shard.contexts.get(session_id)
+            if mapped is not None and (context is None or mapped is context):
+                context = mapped
+                context["metadata"]["bytes"] += delta_bytes
+                shard.bytes += delta_bytes
+                if delta_thoughts:
+                    context["metadata"]["thought_count"] += delta_thoughts
+                    shard.thoughts += delta_thoughts
+
+    def total_bytes(self) -> int:
+        """Approximate bytes held by all sessions (O(num_shards), lock-free)."""
+        return sum(shard.bytes for shard in self._shards)
+
+    def total_thoughts(self) -> int:
+        """Thoughts held by all sessions (O(num_shards), lock-free)."""
+        return sum(shard.thoughts for shard in self._shards)
+
+    def least_recent(self, exclude: Optional[str] = None) -> Optional[str]:
+        """
+        Find the least recently touched session across all shards.
+
+        Args:
+            exclude: Session id never returned
+
+        Returns:
+            Session id, or None if there is no other session
+        """
+        best = None
+        for shard in self._shards:
+            with shard.lock:
+                candidate = shard.expiry.least_recent(exclude)
+            if candidate is not None and (best is None or candidate < best):
+                best = candidate
+        return None if best is None else best[1]
+
+    def set_ttl(
+        self, session_id: str, ttl_seconds: Optional[float], sliding: bool, now: float
+    ) -> Optional[float]:
+        """
+        Set or clear a per-session TTL.
+
+        Args:
+            session_id: Session identifier
+            ttl_seconds: Lifetime in seconds, or None for the default TTL
+            sliding: Measure from the last touch (True) or from creation (False)
+            now: Current epoch time
+
+        Returns:
+            The session's deadline, or None if it uses the default TTL
+            or does not exist
+        """
+        shard = self._shard(session_id)
+        with shard.lock:
+            context = shard.contexts.get(session_id)
+            if context is None:
+                return None
+            if ttl_seconds is None:
+                shard.expiry.clear_ttl(session_id, now)
+                return None
+            return shard.expiry.set_ttl(
+                session_id, ttl_seconds, sliding, now, context["metadata"]["created_at"]
+            )
+
+    def pop_expired(self, now: float, idle_cutoff: float, batch_size: int) -> List[str]:
+        """
+        Remove expired sessions in bounded batches.
+
+        Each batch holds one shard lock and removes at most batch_size
+        sessions; the lock is released between batches so writers can
+        make progress during a large sweep.
+
+        Args:
+            now: Current epoch time (for per-session deadlines)
+            idle_cutoff: Default-TTL sessions last touched before this expire
+            batch_size: Maximum sessions removed per lock acquisition
+
+        Returns:
+            List of removed session ids
+        """
+        removed: List[str] = []
+        for shard in self._shards:
+            while True:
+                with shard.lock:
+                    expired = shard.expiry.pop_expired(now, idle_cutoff, batch_size)
+                    for sid in expired:
+                        shard.forget(sid)
+                removed.extend(expired)
+                if len(expired) < batch_size:
+                    break
+        return removed
+
+    def session_lock(self, session_id: str) -> threading.Lock:
+        """
+        Return the write lock for a session, creating it if needed.
+
+        Callers must never acquire a shard lock while holding a session lock
+        in the opposite order; the map itself only takes shard locks.
+        """
+        shard = self._shard(session_id)
+        with shard.lock:
+            lock = shard.session_locks.get(session_id)
+            if lock is None:
+                lock = shard.session_locks[session_id] = self._new_lock("session")
+            return lock
+
+    def acquire_session(self, session_id: str) -> threading.Lock:
+        """
+        Acquire a session's write lock and return it (the caller releases it).
+
+        If the session was removed between looking the lock up and
+        acquiring it, the lock may no longer be the one mapped to the id;
+        it is then released and the current lock acquired instead, so two
+        writers never hold different locks for the same session.
+        """
+        shard = self._shard(session_id)
+        while True:
+            lock = self.session_lock(session_id)
+            lock.acquire()
+            with shard.lock:
+                if shard.session_locks.setdefault(session_id, lock) is lock:
+                    return lock
+            lock.release()
+
+    def lock_session(self, session_id: str) -> "_SessionGuard":
+        """Return a context manager holding the session's write lock (see acquire_session)."""
+        return _SessionGuard(self, session_id)
+
+    def pop(self, session_id: str) -> Optional[Dict]:
+        """Remove a session and return its context (None if absent)."""
+        shard = self._shard(session_id)
+        with shard.lock:
+            return shard.forget(session_id)
+
+    def remove_where(self, predicate: Callable[[str, Dict], bool]) -> List[str]:
+        """
+        Remove every session matching predicate, locking one shard at a time.
+
+        Args:
+            predicate: Called with (session_id, context); True removes the session
+
+        Returns:
+            List of removed session ids
+        """
+        removed: List[str] = []
+        for shard in self._shards:
+            with shard.lock:
+                doomed = [sid for sid, ctx in shard.contexts.items() if predicate(sid, ctx)]
+                for sid in doomed:
+                    shard.forget(sid)
+            removed.extend(doomed)
+        return removed
+
+    def values(self) -> Iterator[Dict]:
+        """Iterate over a per-shard snapshot of all session contexts."""
+        for shard in self._shards:
+            with shard.lock:
+                snapshot = list(shard.contexts.values())
+            yield from snapshot
+
+    def __contains__(self, session_id: object) -> bool:
+        return isinstance(session_id, str) and self.get(session_id) is not None
+
+    def __getitem__(self, session_id: str) -> Dict:
+        context = self.get(session_id)
+        if context is None:
+            raise KeyError(session_id)
+        return context
+
+    def __delitem__(self, session_id: str) -> None:
+        if self.pop(session_id) is None:
+            raise KeyError(session_id)
+
+    def __len__(self) -> int:
+        return sum(len(shard.contexts) for shard in self._shards)
+
+    def __iter__(self) -> Iterator[str]:
+        for shard in self._shards:
+            with shard.lock:
+                keys = list(shard.contexts)
+            yield from keys
+
+
+class _SessionGuard:
+    """Holds a session's write lock for the duration of a with block."""
+
+    __slots__ = ("_sessions", "_session_id", "_lock")
+
+    def __init__(self, sessions: ShardedSessionMap, session_id: str):
+        self._sessions = sessions
+        self._session_id = session_id
+        self._lock: Optional[threading.Lock] = None
+
+    def __enter__(self) -> None:
+        self._lock = self._sessions.acquire_session(self._session_id)
+
+    def __exit__(self, *exc_info) -> None:
+        self._lock.release()
@@ -0,0 +1,596 @@
+"""Cross-process session store in POSIX shared memory."""
+
+from multiprocessing import resource_tracker, shared_memory
+from typing import Collection, Dict, List, Optional, Sequence, Tuple
+import fcntl
+import hashlib
+import logging
+import os
+import struct
+import sys
+import threading
+import zlib
+
+from src.errors import StepConflictError, StorageError
+from src.storage import SessionState, StorageBackend
+from src.thought_record import ThoughtRecord
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"THINKSHM"
+_LAYOUT_VERSION = 1
+
+# Segment layout:
+#   header (64 bytes): fixed parameters, then allocator state
+#   buckets: num_buckets x BUCKET_ENTRIES session entries
+#   arena: num_slots fixed-size thought slots
+# Slot ids are 1-based so that 0 (zero-filled memory) means "none".
+_HEADER = struct.Struct("<8sIIIII")  # magic, version, buckets, entries/bucket, slot size, slots
+# free list head, bump pointer (slots ever handed out), sessions, records, slots in use
+_ALLOC = struct.Struct("<IIIII")
+_ALLOC_OFFSET = _HEADER.size
+_HEADER_SIZE = 64
+
+# used, id length, id crc32, created_at, last_updated, last_step, first_step,
+# head slot, tail slot, records, slots; followed by the UTF-8 session id
+_ENTRY = struct.Struct("<BxHIddqqIIII")
+_ENTRY_KEY = struct.Struct("<BxHI")
+_ENTRY_STATE = struct.Struct("<ddq")
+_ENTRY_STATE_OFFSET = 8
+_ENTRY_SIZE = 192
+MAX_SESSION_ID_BYTES = _ENTRY_SIZE - _ENTRY.size
+BUCKET_ENTRIES = 8
+
+# next slot, previous slot, flags, bytes in this slot, record length, step,
+# created. A record spans consecutive slots of its session's chain; its
+# first slot carries _HEAD and the step/created/length fields. The chain
+# is doubly linked so loads of recent steps walk back from the tail
+_SLOT = struct.Struct("<IIBxHIqd")
+_SLOT_LINK = struct.Struct("<I")
+_SLOT_PREV_OFFSET = 4
+_SLOT_HEADER_SIZE = 32
+_HEAD = 1
+_BYTES = 2  # Payload is zlib-compressed bytes, not UTF-8 text
+
+_ALLOC_LOCK_OFFSET = 1
+_BUCKET_LOCK_OFFSET = 2
+
+
+class _RangeLock:
+    """
+    Exclusive lock across threads and processes.
+
+    fcntl record locks belong to the process, not the thread, so a thread
+    lock serializes this process's threads first; the lock on one byte of
+    the shared lock file then excludes other processes. The kernel drops
+    a dead process's record locks, so a crashed worker cannot wedge the
+    store.
+    """
+
+    __slots__ = ("_thread_lock", "_fd", "_offset")
+
+    def __init__(self, fd: int, offset: int):
+        self._thread_lock = threading.Lock()
+        self._fd = fd
+        self._offset = offset
+
+    def __enter__(self) -> None:
+        self._thread_lock.acquire()
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, self._offset)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, self._offset)
+        finally:
+            self._thread_lock.release()
+
+
+class _LockFile:
+    """
+    This process's handle on a store's lock file.
+
+    Shared by every backend in the process that opens the same path:
+    record locks are per process, so two handles would neither exclude
+    each other nor survive each other's close.
+    """
+
+    _open: Dict[str, "_LockFile"] = {}
+    _open_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self.refs = 0
+        self._locks: Dict[int, _RangeLock] = {}
+
+    @classmethod
+    def acquire(cls, path: str) -> "_LockFile":
+        """Return the shared handle for path, opening it on first use."""
+        key = os.path.abspath(path)
+        with cls._open_lock:
+            handle = cls._open.get(key)
+            if handle is None:
+                handle = cls._open[key] = cls(path)
+            handle.refs += 1
+            return handle
+
+    def lock(self, offset: int) -> _RangeLock:
+        """Return the lock on byte offset of the file."""
+        with self._open_lock:
+            lock = self._locks.get(offset)
+            if lock is None:
+                lock = self._locks[offset] = _RangeLock(self.fd, offset)
+            return lock
+
+    def release(self) -> None:
+        """Drop one reference; the last one closes the file."""
+        with self._open_lock:
+            self.refs -= 1
+            if self.refs:
+                return
+            del self._open[os.path.abspath(self.path)]
+        os.close(self.fd)
+
+
+def _open_segment(name: str, create: bool, size: int = 0) -> shared_memory.SharedMemory:
+    """Create or attach a segment that outlives this process."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, create=create, size=size, track=False)
+    shm = shared_memory.SharedMemory(name, create=create, size=size)
+    # The resource tracker unlinks tracked segments when this process
+    # exits, which would pull the store from under the other workers
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class SharedMemoryBackend(StorageBackend):
+    """
+    Session store shared by the worker processes of one host.
+
+    Sessions live in a fixed-layout hash table and their thoughts in an
+    arena of fixed-size slots, all inside one shared memory segment, so
+    every process that opens the same path reads and appends to the same
+    sessions without a database or a serialization round trip. Each hash
+    bucket has its own lock; the slot allocator has one more, taken only
+    while slots are handed out or returned.
+
+    The segment survives worker restarts and lives until unlink() (or a
+    reboot); its layout is fixed when the first process creates it. A
+    session whose bucket is full, or an append the arena cannot hold,
+    raises StorageError. A worker killed in the middle of a write can
+    leave that one session's chain inconsistent.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        size_bytes: int = 32 * 1024 * 1024,
+        num_buckets: int = 1024,
+        slot_size: int = 256,
+    ):
+        """
+        Initialize SharedMemoryBackend, creating the segment if needed.
+
+        Args:
+            path: Names the store: processes opening the same path share
+                it. Only a lock file (path + ".lock") is written there
+            size_bytes: Segment size when creating it
+            num_buckets: Hash buckets when creating it
+                (BUCKET_ENTRIES sessions each)
+            slot_size: Arena slot size in bytes when creating it
+
+        Raises:
+            StorageError: If the segment cannot be created or has another layout
+        """
+        if not _SLOT_HEADER_SIZE < slot_size <= _SLOT_HEADER_SIZE + 0xFFFF:
+            raise ValueError(f"slot_size must be in ({_SLOT_HEADER_SIZE}, 65567]")
+        if num_buckets < 1:
+            raise ValueError("num_buckets must be at least 1")
+        self.path = path
+        digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+        self.name = f"think_{digest[:20]}"
+        self._lock_file = _LockFile.acquire(f"{path}.lock")
+        try:
+            with self._lock_file.lock(0):
+                self._shm = self._attach(size_bytes, num_buckets, slot_size)
+        except BaseException:
+            self._lock_file.release()
+            raise
+        self._buf = self._shm.buf
+        _, _, self._num_buckets, _, self._slot_size, self._num_slots = _HEADER.unpack_from(
+            self._buf, 0
+        )
+        self._bucket_size = BUCKET_ENTRIES * _ENTRY_SIZE
+        self._arena_offset = _HEADER_SIZE + self._num_buckets * self._bucket_size
+        self._slot_data_size = self._slot_size - _SLOT_HEADER_SIZE
+        self._alloc_lock = self._lock_file.lock(_ALLOC_LOCK_OFFSET)
+        self._bucket_locks = [
+            self._lock_file.lock(_BUCKET_LOCK_OFFSET + i) for i in range(self._num_buckets)
+        ]
+        self._closed = False
+        logger.info(
+            f"Shared memory storage backend opened: {self.name} "
+            f"({self._shm.size} bytes, {self._num_slots} slots)"
+        )
+
+    def _attach(
+        self, size_bytes: int, num_buckets: int, slot_size: int
+    ) -> shared_memory.SharedMemory:
+        """Attach the segment, creating and formatting it first if needed."""
+        try:
+            shm = _open_segment(self.name, create=False)
+        except FileNotFoundError:
+            tables = _HEADER_SIZE + num_buckets * BUCKET_ENTRIES * _ENTRY_SIZE
+            if size_bytes < tables + slot_size:
+                raise StorageError(
+                    f"size_bytes {size_bytes} too small for {num_buckets} buckets"
+                )
+            try:
+                shm = _open_segment(self.name, create=True, size=size_bytes)
+            except OSError as e:
+                raise StorageError(f"Cannot create shared memory segment: {e}") from e
+        except OSError as e:
+            raise StorageError(f"Cannot attach shared memory segment: {e}") from e
+
+        magic, version = _HEADER.unpack_from(shm.buf, 0)[:2]
+        if magic == bytes(len(_MAGIC)):
+            # New, or its creator died before formatting it (we hold the
+            # init lock, so nobody else is formatting it now)
+            tables = _HEADER_SIZE + num_buckets * BUCKET_ENTRIES * _ENTRY_SIZE
+            num_slots = (shm.size - tables) // slot_size
+            _HEADER.pack_into(
+                shm.buf, 0, _MAGIC, _LAYOUT_VERSION, num_buckets, BUCKET_ENTRIES,
+                slot_size, num_slots,
+            )
+            logger.debug(f"Formatted shared memory segment {self.name}")
+        elif magic != _MAGIC or version != _LAYOUT_VERSION:
+            shm.close()
+            raise StorageError(
+                f"Shared memory segment {self.name} has an unknown layout "
+                f"({magic!r}, version {version})"
+            )
+        return shm
+
+    def _key(self, session_id: str) -> Tuple[bytes, int, int]:
+        """Return (encoded id, crc32, bucket index)."""
+        key = session_id.encode("utf-8")
+        if len(key) > MAX_SESSION_ID_BYTES:
+            raise StorageError(
+                f"Session id longer than {MAX_SESSION_ID_BYTES} bytes: {session_id[:40]!r}..."
+            )
+        crc = zlib.crc32(key)
+        return key, crc, crc % self._num_buckets
+
+    def _find(self, bucket: int, key: bytes, crc: int) -> int:
+        """Offset of the session's entry, or -1. The caller holds the bucket lock."""
+        buf = self._buf
+        offset = _HEADER_SIZE + bucket * self._bucket_size
+        end = offset + self._bucket_size
+        while offset < end:
+            used, id_len, id_crc = _ENTRY_KEY.unpack_from(buf, offset)
+            if (
+                used
+                and id_crc == crc
+                and id_len == len(key)
+                and buf[offset + _ENTRY.size : offset + _ENTRY.size + id_len] == key
+            ):
+                return offset
+            offset += _ENTRY_SIZE
+        return -1
+
+    def _free_entry(self, bucket: int) -> int:
+        """Offset of an unused entry in the bucket, or -1."""
+        buf = self._buf
+        offset = _HEADER_SIZE + bucket * self._bucket_size
+        for _ in range(BUCKET_ENTRIES):
+            if not buf[offset]:
+                return offset
+            offset += _ENTRY_SIZE
+        return -1
+
+    def _slot_offset(self, slot: int) -> int:
+        return self._arena_offset + (slot - 1) * self._slot_size
+
+    def _allocate(self, count: int, new_sessions: int, new_records: int) -> List[int]:
+        """
+        Take count slots and update the counters.
+
+        Raises:
+            StorageError: If the arena has fewer than count free slots
+        """
+        buf = self._buf
+        with self._alloc_lock:
+            free_head, bumped, sessions, records, used = _ALLOC.unpack_from(buf, _ALLOC_OFFSET)
+            if used + count > self._num_slots:
+                raise StorageError(
+                    f"Shared memory store {self.name} is full "
+                    f"({used} of {self._num_slots} slots in use)"
+                )
+            slots = []
+            while free_head and len(slots) < count:
+                slots.append(free_head)
+                free_head = _SLOT_LINK.unpack_from(buf, self._slot_offset(free_head))[0]
+            while len(slots) < count:
+                bumped += 1
+                slots.append(bumped)
+            _ALLOC.pack_into(
+                buf, _ALLOC_OFFSET, free_head, bumped, sessions + new_sessions,
+                records + new_records, used + count,
+            )
+        return slots
+
+    def _release(self, first: int, last: int, count: int, sessions: int, records: int) -> None:
+        """Return a chain of count slots (first..last) to the free list."""
+        buf = self._buf
+        with self._alloc_lock:
+            free_head, bumped, total_sessions, total_records, used = _ALLOC.unpack_from(
+                buf, _ALLOC_OFFSET
+            )
+            if count:
+                _SLOT_LINK.pack_into(buf, self._slot_offset(last), free_head)
+                free_head = first
+            _ALLOC.pack_into(
+                buf, _ALLOC_OFFSET, free_head, bumped, total_sessions - sessions,
+                total_records - records, used - count,
+            )
+
+    def _drop(self, offset: int) -> None:
+        """Free a session's slots and its entry. The caller holds the bucket lock."""
+        head, tail, records, slots = _ENTRY.unpack_from(self._buf, offset)[7:]
+        self._buf[offset] = 0
+        self._release(head, tail, slots, 1, records)
+
+    def _check_open(self) -> None:
+        if self._closed:
+            raise StorageError("Shared memory backend is closed")
+
+    def append(
+        self, session_id: str, records: Sequence[ThoughtRecord], created_at: float
+    ) -> None:
+        if not records:
+            return
+        self._check_open()
+        key, crc, bucket = self._key(session_id)
+        data_size = self._slot_data_size
+        encoded = []
+        needed = 0
+        for record in records:
+            payload = record.payload
+            if type(payload) is bytes:
+                encoded.append((record, payload, _BYTES))
+            else:
+                encoded.append((record, payload.encode("utf-8"), 0))
+            needed += max(1, -(-len(encoded[-1][1]) // data_size))
+
+        buf = self._buf
+        last = records[-1]
+        with self._bucket_locks[bucket]:
+            offset = self._find(bucket, key, crc)
+            if offset >= 0:
+                (
+                    _, _, _, created, updated, last_step, first_step, head, tail, count, used
+                ) = _ENTRY.unpack_from(buf, offset)
+                if records[0].step <= last_step:
+                    raise StepConflictError(
+                        f"Step {records[0].step} already stored for session {session_id}"
+                    )
+                new_session = 0
+            else:
+                offset = self._free_entry(bucket)
+                if offset < 0:
+                    raise StorageError(
+                        f"Shared memory bucket for session {session_id} is full "
+                        f"({BUCKET_ENTRIES} sessions)"
+                    )
+                created, updated, last_step, first_step = created_at, 0.0, 0, records[0].step
+                head = tail = count = used = 0
+                new_session = 1
+
+            slots = self._allocate(needed, new_session, len(records))
+            previous = tail
+            position = 0
+            for record, data, flags in encoded:
+                length = len(data)
+                start = 0
+                flag = flags | _HEAD
+                while True:
+                    slot = slots[position]
+                    position += 1
+                    following = slots[position] if position < needed else 0
+                    chunk = data[start : start + data_size]
+                    slot_offset = self._slot_offset(slot)
+                    _SLOT.pack_into(
+                        buf, slot_offset, following, previous, flag, len(chunk), length,
+                        record.step, record.created,
+                    )
+                    data_offset = slot_offset + _SLOT_HEADER_SIZE
+                    buf[data_offset : data_offset + len(chunk)] = chunk
+                    previous = slot
+                    start += data_size
+                    flag = flags
+                    if start >= length:
+                        break
+
+            if tail:
+                _SLOT_LINK.pack_into(buf, self._slot_offset(tail), slots[0])
+            else:
+                head = slots[0]
+                first_step = records[0].step
+            _ENTRY.pack_into(
+                buf, offset, 1, len(key), crc, created, max(updated, last.created),
+                max(last_step, last.step), first_step, head, slots[-1],
+                count + len(records), used + needed,
+            )
+            if new_session:
+                buf[offset + _ENTRY.size : offset + _ENTRY.size + len(key)] = key
+
+    def session_state(self, session_id: str) -> Optional[SessionState]:
+        self._check_open()
+        key, crc, bucket = self._key(session_id)
+        with self._bucket_locks[bucket]:
+            offset = self._find(bucket, key, crc)
+            if offset < 0:
+                return None
+            return SessionState(*_ENTRY_STATE.unpack_from(self._buf, offset + _ENTRY_STATE_OFFSET))
+
+    def load(
+        self, session_id: str, after_step: int = 0, limit: Optional[int] = None
+    ) -> List[ThoughtRecord]:
+        self._check_open()
+        key, crc, bucket = self._key(session_id)
+        buf = self._buf
+        with self._bucket_locks[bucket]:
+            offset = self._find(bucket, key, crc)
+            if offset < 0:
+                return []
+            entry = _ENTRY.unpack_from(buf, offset)
+            if entry[5] <= after_step:
+                return []
+            # Walk back from the tail to the first wanted record, so a sync
+            # only visits the steps it fetches
+            slot = entry[8]
+            heads = []
+            while slot and (limit is None or len(heads) < limit):
+                _, prev, flags, _, _, step, _ = _SLOT.unpack_from(buf, self._slot_offset(slot))
+                if flags & _HEAD:
+                    if step <= after_step:
+                        break
+                    heads.append(slot)
+                slot = prev
+            heads.reverse()
+
+            loaded = []
+            for slot in heads:
+                _, _, flags, _, length, step, created = _SLOT.unpack_from(
+                    buf, self._slot_offset(slot)
+                )
+                chunks = []
+                remaining = length
+                while True:
+                    slot_offset = self._slot_offset(slot)
+                    following, _, _, chunk_len = _SLOT.unpack_from(buf, slot_offset)[:4]
+                    data_offset = slot_offset + _SLOT_HEADER_SIZE
+                    chunks.append(bytes(buf[data_offset : data_offset + chunk_len]))
+                    remaining -= chunk_len
+                    if remaining <= 0:
+                        break
+                    slot = following
+                data = b"".join(chunks)
+                thought = data if flags & _BYTES else data.decode("utf-8")
+                loaded.append(ThoughtRecord(step, thought, created))
+        return loaded
+
+    def trim(self, session_id: str, before_step: int) -> int:
+        self._check_open()
+        key, crc, bucket = self._key(session_id)
+        buf = self._buf
+        with self._bucket_locks[bucket]:
+            offset = self._find(bucket, key, crc)
+            if offset < 0:
+                return 0
+            entry = list(_ENTRY.unpack_from(buf, offset))
+            head, tail, count, used = entry[7:]
+            slot = head
+            last_freed = 0
+            freed_slots = freed_records = 0
+            first_step = entry[6]
+            while slot:
+                following, _, flags, _, _, step, _ = _SLOT.unpack_from(
+                    buf, self._slot_offset(slot)
+                )
+                if flags & _HEAD:
+                    if step >= before_step:
+                        first_step = step
+                        break
+                    freed_records += 1
+                last_freed = slot
+                freed_slots += 1
+                slot = following
+            if not freed_records:
+                return 0
+            if slot:
+                _SLOT_LINK.pack_into(buf, self._slot_offset(slot) + _SLOT_PREV_OFFSET, 0)
+            else:
+                tail = 0
+                first_step = entry[5] + 1
+            entry[6:] = [first_step, slot, tail, count - freed_records, used - freed_slots]
+            _ENTRY.pack_into(buf, offset, *entry)
+            self._release(head, last_freed, freed_slots, 0, freed_records)
+            return freed_records
+
+    def delete(self, session_id: str) -> bool:
+        self._check_open()
+        key, crc, bucket = self._key(session_id)
+        with self._bucket_locks[bucket]:
+            offset = self._find(bucket, key, crc)
+            if offset < 0:
+                return False
+            self._drop(offset)
+            return True
+
+    def expire(self, cutoff: float, keep: Collection[str] = ()) -> List[str]:
+        self._check_open()
+        buf = self._buf
+        expired = []
+        for bucket, lock in enumerate(self._bucket_locks):
+            offset = _HEADER_SIZE + bucket * self._bucket_size
+            with lock:
+                for entry_offset in range(offset, offset + self._bucket_size, _ENTRY_SIZE):
+                    if not buf[entry_offset]:
+                        continue
+                    entry = _ENTRY.unpack_from(buf, entry_offset)
+                    if entry[4] >= cutoff:
+                        continue
+                    id_offset = entry_offset + _ENTRY.size
+                    session_id = bytes(buf[id_offset : id_offset + entry[1]]).decode("utf-8")
+                    if session_id in keep:
+                        continue
+                    expired.append(session_id)
+                    self._drop(entry_offset)
+        return expired
+
+    def stats(self) -> Dict:
+        self._check_open()
+        with self._alloc_lock:
+            _, _, sessions, records, used = _ALLOC.unpack_from(self._buf, _ALLOC_OFFSET)
+        return {
+            "backend": "shm",
+            "path": self.path,
+            "name": self.name,
+            "sessions": sessions,
+            "thoughts": records,
+            "slots_used": used,
+            "slots_total": self._num_slots,
+            "slot_size": self._slot_size,
+        }
+
+    def close(self) -> None:
+        """Detach from the segment; it stays available to other processes."""
+        if self._closed:
+            return
+        self._closed = True
+        self._buf = None
+        self._shm.close()
+        self._lock_file.release()
+
+    def unlink(self) -> None:
+        """Destroy the segment and its lock file (every process loses the store)."""
+        try:
+            if sys.version_info >= (3, 13):
+                shm = shared_memory.SharedMemory(self.name, track=False)
+            else:
+                # Tracked, so that unlink() can untrack it again
+                shm = shared_memory.SharedMemory(self.name)
+        except FileNotFoundError:
+            pass
+        else:
+            shm.unlink()
+            shm.close()
+        try:
+            os.unlink(f"{self.path}.lock")
+        except FileNotFoundError:
+            pass
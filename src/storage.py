@@ -0,0 +1,679 @@
+"""Durable storage backends for ContextManager."""
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import Collection, Deque, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import logging
+import sqlite3
+import threading
+import time
+
+from src.errors import StepConflictError, StorageError
+from src.thought_record import ThoughtRecord
+
+logger = logging.getLogger(__name__)
+
+
+class SessionState(NamedTuple):
+    """Session row as seen by a backend."""
+
+    created_at: float
+    last_updated: float
+    last_step: int
+
+
+class StorageBackend(ABC):
+    """
+    Durable store behind ContextManager's in-memory working set.
+
+    ContextManager assigns step numbers and keeps the hot window of every
+    session in memory; the backend is the source of truth that survives
+    restarts and is shared by every process pointing at the same store.
+    Appends are optimistic: a step that already exists raises
+    StepConflictError, and the caller resynchronizes and retries.
+
+    Implementations must be safe to call from multiple threads.
+    """
+
+    # True if this process is assumed to be the store's only writer:
+    # ContextManager then loads a session from storage once instead of
+    # checking for other writers' thoughts on every access
+    single_writer = False
+
+    @abstractmethod
+    def append(
+        self, session_id: str, records: Sequence[ThoughtRecord], created_at: float
+    ) -> None:
+        """
+        Append records (consecutive steps, oldest first) to a session.
+
+        Args:
+            session_id: Session identifier
+            records: Records to store
+            created_at: Session creation time, used if the session is new
+
+        Raises:
+            StepConflictError: If any step already exists for the session
+            StorageError: On backend failure
+        """
+
+    def append_batch(
+        self, batch: Sequence[Tuple[str, Sequence[ThoughtRecord], float]]
+    ) -> List[Tuple[str, StorageError]]:
+        """
+        Append records for several sessions.
+
+        Each item is (session_id, records, created_at) as for append. A
+        failing session does not prevent the others from being stored.
+
+        Returns:
+            (session_id, error) for every session that could not be stored
+        """
+        failures = []
+        for session_id, records, created_at in batch:
+            try:
+                self.append(session_id, records, created_at)
+            except StorageError as e:
+                failures.append((session_id, e))
+        return failures
+
+    @abstractmethod
+    def session_state(self, session_id: str) -> Optional[SessionState]:
+        """Return the stored session state, or None if the session is unknown."""
+
+    @abstractmethod
+    def load(
+        self, session_id: str, after_step: int = 0, limit: Optional[int] = None
+    ) -> List[ThoughtRecord]:
+        """
+        Load records with step > after_step, oldest first.
+
+        Args:
+            session_id: Session identifier
+            after_step: Only return steps after this one
+            limit: Return at most the newest limit records
+
+        Returns:
+            List of ThoughtRecord
+        """
+
+    @abstractmethod
+    def trim(self, session_id: str, before_step: int) -> int:
+        """Delete records with step < before_step; return the number deleted."""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """Delete a session and all its records; return True if it existed."""
+
+    @abstractmethod
+    def expire(self, cutoff: float, keep: Collection[str] = ()) -> List[str]:
+        """
+        Delete sessions last updated before cutoff; return their ids.
+
+        Args:
+            cutoff: Sessions last updated before this time are deleted
+            keep: Session ids to leave alone whatever their age, such as
+                sessions a caller still holds with a longer TTL
+        """
+
+    @abstractmethod
+    def stats(self) -> Dict:
+        """Return backend statistics."""
+
+    def flush(self) -> None:
+        """Make every accepted write durable (no-op for synchronous backends)."""
+
+    def close(self) -> None:
+        """Release backend resources."""
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    SQLite store in WAL mode.
+
+    WAL lets readers in any process proceed while one writer commits.
+    Every statement is a module constant, so sqlite3's per-connection
+    statement cache keeps them prepared; multi-record appends use one
+    executemany inside a single transaction. Thoughts are keyed by
+    (session_id, step), which doubles as the lookup index.
+    """
+
+    _SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            created_at REAL NOT NULL,
+            last_updated REAL NOT NULL,
+            last_step INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS sessions_last_updated ON sessions (last_updated)",
+        """
+        CREATE TABLE IF NOT EXISTS thoughts (
+            session_id TEXT NOT NULL,
+            step INTEGER NOT NULL,
+            created REAL NOT NULL,
+            thought BLOB NOT NULL,
+            PRIMARY KEY (session_id, step)
+        ) WITHOUT ROWID
+        """,
+    )
+
+    _UPSERT_SESSION = (
+        "INSERT INTO sessions (session_id, created_at, last_updated, last_step) "
+        "VALUES (?, ?, ?, ?) ON CONFLICT (session_id) DO UPDATE SET "
+        "last_updated = max(last_updated, excluded.last_updated), "
+        "last_step = max(last_step, excluded.last_step)"
+    )
+    _INSERT_THOUGHT = "INSERT INTO thoughts (session_id, step, created, thought) VALUES (?, ?, ?, ?)"
+    _SELECT_STATE = "SELECT created_at, last_updated, last_step FROM sessions WHERE session_id = ?"
+    _SELECT_AFTER = (
+        "SELECT step, thought, created FROM thoughts "
+        "WHERE session_id = ? AND step > ? ORDER BY step"
+    )
+    _SELECT_AFTER_LIMIT = (
+        "SELECT step, thought, created FROM ("
+        "SELECT step, thought, created FROM thoughts "
+        "WHERE session_id = ? AND step > ? ORDER BY step DESC LIMIT ?"
+        ") ORDER BY step"
+    )
+    _TRIM = "DELETE FROM thoughts WHERE session_id = ? AND step < ?"
+    _DELETE_THOUGHTS = "DELETE FROM thoughts WHERE session_id = ?"
+    _DELETE_SESSION = "DELETE FROM sessions WHERE session_id = ?"
+    _SELECT_EXPIRED = "SELECT session_id FROM sessions WHERE last_updated < ?"
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        """
+        Initialize SQLiteBackend.
+
+        Args:
+            path: Database file path (":memory:" is per-connection and only
+                useful for single-threaded tests)
+            timeout: Seconds to wait for another writer's lock
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._closed = False
+        with self._transaction() as conn:
+            for statement in self._SCHEMA:
+                conn.execute(statement)
+        logger.info(f"SQLite storage backend opened: {path}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self._closed:
+                raise StorageError("SQLite backend is closed")
+            conn = sqlite3.connect(
+                self.path,
+                timeout=self.timeout,
+                isolation_level=None,  # Explicit BEGIN/COMMIT below
+                check_same_thread=False,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _transaction(self) -> "_Transaction":
+        return _Transaction(self._connection())
+
+    def append(
+        self, session_id: str, records: Sequence[ThoughtRecord], created_at: float
+    ) -> None:
+        if not records:
+            return
+        last = records[-1]
+        try:
+            with self._transaction() as conn:
+                conn.executemany(
+                    self._INSERT_THOUGHT,
+                    [(session_id, r.step, r.created, r.payload) for r in records],
+                )
+                conn.execute(
+                    self._UPSERT_SESSION, (session_id, created_at, last.created, last.step)
+                )
+        except sqlite3.IntegrityError as e:
+            raise StepConflictError(
+                f"Step {records[0].step} already stored for session {session_id}"
+            ) from e
+        except sqlite3.Error as e:
+            raise StorageError(f"SQLite append failed: {e}") from e
+
+    def append_batch(
+        self, batch: Sequence[Tuple[str, Sequence[ThoughtRecord], float]]
+    ) -> List[Tuple[str, StorageError]]:
+        # One transaction for the whole batch; a conflict anywhere rolls it
+        # back and the sessions are retried one by one to isolate it
+        try:
+            with self._transaction() as conn:
+                for session_id, records, created_at in batch:
+                    if not records:
+                        continue
+                    conn.executemany(
+                        self._INSERT_THOUGHT,
+                        [(session_id, r.step, r.created, r.payload) for r in records],
+                    )
+                    last = records[-1]
+                    conn.execute(
+                        self._UPSERT_SESSION, (session_id, created_at, last.created, last.step)
+                    )
+            return []
+        except sqlite3.IntegrityError:
+            return super().append_batch(batch)
+        except sqlite3.Error as e:
+            raise StorageError(f"SQLite append failed: {e}") from e
+
+    def session_state(self, session_id: str) -> Optional[SessionState]:
+        try:
+            row = self._connection().execute(self._SELECT_STATE, (session_id,)).fetchone()
+        except sqlite3.Error as e:
+            raise StorageError(f"SQLite read failed: {e}") from e
+        return None if row is None else SessionState(*row)
+
+    def load(
+        self, session_id: str, after_step: int = 0, limit: Optional[int] = None
+    ) -> List[ThoughtRecord]:
+        try:
+            conn = self._connection()
+            if limit is None:
+                rows = conn.execute(self._SELECT_AFTER, (session_id, after_step))
+            else:
+                rows = conn.execute(self._SELECT_AFTER_LIMIT, (session_id, after_step, limit))
+            return [ThoughtRecord(step, thought, created) for step, thought, created in rows]
+        except sqlite3.Error as e:
+            raise StorageError(f"SQLite read failed: {e}") from e
+
+    def trim(self, session_id: str, before_step: int) -> int:
+        try:
+            with self._transaction() as conn:
+                return conn.execute(self._TRIM, (session_id, before_step)).rowcount
+        except sqlite3.Error as e:
+            raise StorageError(f"SQLite trim failed: {e}") from e
+
+    def delete(self, session_id: str) -> bool:
+        try:
+            with self._transaction() as conn:
+                conn.execute(self._DELETE_THOUGHTS, (session_id,))
+                return conn.execute(self._DELETE_SESSION, (session_id,)).rowcount > 0
+        except sqlite3.Error as e:
+            raise StorageError(f"SQLite delete failed: {e}") from e
+
+    def expire(self, cutoff: float, keep: Collection[str] = ()) -> List[str]:
+        try:
+            with self._transaction() as conn:
+                expired = [
+                    row[0]
+                    for row in conn.execute(self._SELECT_EXPIRED, (cutoff,))
+                    if row[0] not in keep
+                ]
+                for session_id in expired:
+                    conn.execute(self._DELETE_THOUGHTS, (session_id,))
+                    conn.execute(self._DELETE_SESSION, (session_id,))
+            return expired
+        except sqlite3.Error as e:
+            raise StorageError(f"SQLite expire failed: {e}") from e
+
+    def stats(self) -> Dict:
+        conn = self._connection()
+        sessions = conn.execute("SELECT count(*) FROM sessions").fetchone()[0]
+        thoughts = conn.execute("SELECT count(*) FROM thoughts").fetchone()[0]
+        return {"backend": "sqlite", "path": self.path, "sessions": sessions, "thoughts": thoughts}
+
+    def close(self) -> None:
+        with self._connections_lock:
+            self._closed = True
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+class MemoryBackend(StorageBackend):
+    """
+    Store held in this process's memory.
+
+    The in-process working set needs no backend; this one is for a
+    process that owns the sessions on behalf of others, such as the
+    context server. Records of a session are kept in step order, so
+    loads and trims are a bisect and a slice. One lock guards the store.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty MemoryBackend."""
+        # session_id -> [created_at, last_updated, last_step, steps, records]
+        self._sessions: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def append(
+        self, session_id: str, records: Sequence[ThoughtRecord], created_at: float
+    ) -> None:
+        if not records:
+            return
+        last = records[-1]
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = [created_at, 0.0, 0, [], []]
+            elif records[0].step <= session[2]:
+                raise StepConflictError(
+                    f"Step {records[0].step} already stored for session {session_id}"
+                )
+            session[1] = max(session[1], last.created)
+            session[2] = last.step
+            session[3].extend(r.step for r in records)
+            session[4].extend(records)
+
+    def session_state(self, session_id: str) -> Optional[SessionState]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return None if session is None else SessionState(*session[:3])
+
+    def load(
+        self, session_id: str, after_step: int = 0, limit: Optional[int] = None
+    ) -> List[ThoughtRecord]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            records = session[4][bisect_right(session[3], after_step) :]
+        if limit is not None:
+            records = records[-limit:] if limit > 0 else []
+        return records
+
+    def trim(self, session_id: str, before_step: int) -> int:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return 0
+            index = bisect_left(session[3], before_step)
+            del session[3][:index]
+            del session[4][:index]
+            return index
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def expire(self, cutoff: float, keep: Collection[str] = ()) -> List[str]:
+        with self._lock:
+            expired = [
+                sid
+                for sid, session in self._sessions.items()
+                if session[1] < cutoff and sid not in keep
+            ]
+            for session_id in expired:
+                del self._sessions[session_id]
+        return expired
+
+    def stats(self) -> Dict:
+        with self._lock:
+            thoughts = sum(len(session[4]) for session in self._sessions.values())
+            return {"backend": "memory", "sessions": len(self._sessions), "thoughts": thoughts}
+
+
+class WriteBehindBackend(StorageBackend):
+    """
+    Queues writes for another backend and applies them from a worker thread.
+
+    append/trim/delete only enqueue, so add_thought never waits on disk.
+    The worker drains the queue every flush_interval seconds, or as soon
+    as batch_size operations are waiting, and coalesces consecutive
+    appends into one append_batch call. When max_queue operations are
+    pending, writers block until the worker catches up (backpressure).
+
+    Reads go straight to the wrapped backend and do not see queued
+    writes. Step conflicts surface only when a batch is written, so they
+    are logged and counted instead of retried; a session shared with
+    another process should use the synchronous backend.
+    """
+
+    single_writer = True
+
+    def __init__(
+        self,
+        inner: StorageBackend,
+        max_queue: int = 10000,
+        flush_interval: float = 0.05,
+        batch_size: int = 500,
+    ):
+        """
+        Initialize WriteBehindBackend and start its worker.
+
+        Args:
+            inner: Backend that receives the writes
+            max_queue: Pending operations before writers block
+            flush_interval: Seconds between drains of a partial batch
+            batch_size: Operations applied per drain
+        """
+        self.inner = inner
+        self.max_queue = max_queue
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        # (op, session_id, payload): ("append", records, created_at),
+        # ("trim", before_step) or ("delete", None)
+        self._queue: Deque[Tuple[str, str, object]] = deque()
+        self._cond = threading.Condition()
+        self._enqueued = 0
+        self._done = 0
+        self._closed = False
+        self._flush_requested = False
+        self._batches = 0
+        self._failed = 0
+        self._blocked = 0
+        self._thread = threading.Thread(
+            target=self._run, daemon=True, name="ContextManager-WriteBehind"
+        )
+        self._thread.start()
+
+    def _enqueue(self, op: str, session_id: str, payload: object) -> None:
+        with self._cond:
+            if self._closed:
+                raise StorageError("Write-behind backend is closed")
+            if len(self._queue) >= self.max_queue:
+                self._blocked += 1
+                self._cond.notify_all()
+                while len(self._queue) >= self.max_queue and not self._closed:
+                    if not self._thread.is_alive():
+                        raise StorageError("Write-behind worker has stopped")
+                    # Timed so a worker that died is noticed without a notify
+                    self._cond.wait(self.flush_interval)
+                if self._closed:
+                    raise StorageError("Write-behind backend is closed")
+            self._queue.append((op, session_id, payload))
+            self._enqueued += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+
+    def append(
+        self, session_id: str, records: Sequence[ThoughtRecord], created_at: float
+    ) -> None:
+        if records:
+            self._enqueue("append", session_id, (list(records), created_at))
+
+    def trim(self, session_id: str, before_step: int) -> int:
+        """Queue a trim; returns 0 because the outcome is not known yet."""
+        self._enqueue("trim", session_id, before_step)
+        return 0
+
+    def delete(self, session_id: str) -> bool:
+        """Queue a delete; returns False because the outcome is not known yet."""
+        self._enqueue("delete", session_id, None)
+        return False
+
+    def session_state(self, session_id: str) -> Optional[SessionState]:
+        return self.inner.session_state(session_id)
+
+    def load(
+        self, session_id: str, after_step: int = 0, limit: Optional[int] = None
+    ) -> List[ThoughtRecord]:
+        return self.inner.load(session_id, after_step, limit)
+
+    def expire(self, cutoff: float, keep: Collection[str] = ()) -> List[str]:
+        # Pending appends would otherwise resurrect expired sessions
+        self.flush()
+        return self.inner.expire(cutoff, keep)
+
+    def stats(self) -> Dict:
+        stats = dict(self.inner.stats())
+        with self._cond:
+            stats["write_behind"] = {
+                "queued": len(self._queue),
+                "max_queue": self.max_queue,
+                "batches": self._batches,
+                "failed_writes": self._failed,
+                "blocked_writers": self._blocked,
+            }
+        return stats
+
+    def flush(self) -> None:
+        """Block until every write queued so far is stored, then flush the inner backend."""
+        with self._cond:
+            target = self._enqueued
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._done < target and self._thread.is_alive():
+                self._cond.wait()
+        self.inner.flush()
+
+    def close(self) -> None:
+        """Drain the queue, stop the worker and close the inner backend."""
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=5)
+        self.inner.close()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while (
+                    not self._closed
+                    and not self._flush_requested
+                    and len(self._queue) < self.batch_size
+                ):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._queue:
+                    self._flush_requested = False
+                    if self._closed:
+                        return
+                    continue
+                count = min(len(self._queue), self.batch_size)
+                ops = [self._queue.popleft() for _ in range(count)]
+                # Writers blocked on a full queue can proceed
+                self._cond.notify_all()
+
+            self._apply(ops)
+            with self._cond:
+                self._done += len(ops)
+                self._batches += 1
+                self._cond.notify_all()
+
+    def _apply(self, ops: List[Tuple[str, str, object]]) -> None:
+        """Write a drained batch, coalescing runs of appends."""
+        pending: Dict[str, Tuple[List[ThoughtRecord], float]] = {}
+
+        def write_appends() -> None:
+            if not pending:
+                return
+            batch = [(sid, records, created) for sid, (records, created) in pending.items()]
+            pending.clear()
+            try:
+                failures = self.inner.append_batch(batch)
+            except Exception as e:
+                # Any error must not kill the worker: writers would block forever
+                failures = [(sid, e) for sid, _, _ in batch]
+            for session_id, error in failures:
+                self._record_failure("append", session_id, error)
+
+        for op, session_id, payload in ops:
+            if op == "append":
+                records, created_at = payload
+                queued = pending.get(session_id)
+                if queued is None:
+                    pending[session_id] = (list(records), created_at)
+                else:
+                    queued[0].extend(records)
+                continue
+            # Trims and deletes must see the appends queued before them
+            write_appends()
+            try:
+                if op == "trim":
+                    self.inner.trim(session_id, payload)
+                else:
+                    self.inner.delete(session_id)
+            except Exception as e:
+                self._record_failure(op, session_id, e)
+        write_appends()
+
+    def _record_failure(self, op: str, session_id: str, error: Exception) -> None:
+        with self._cond:
+            self._failed += 1
+        logger.error(f"Write-behind {op} failed for session {session_id}: {error}")
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK around a block."""
+
+    __slots__ = ("conn",)
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+
+
+def create_backend(
+    name: str, path: str, shm_size_bytes: int = 32 * 1024 * 1024
+) -> Optional[StorageBackend]:
+    """
+    Build the storage backend named in configuration.
+
+    Args:
+        name: "memory" (in-process store only), "sqlite", "shm" or "socket"
+        path: Backend file path (ignored for memory; names the segment for
+            shm; the context server's socket for socket)
+        shm_size_bytes: Shared memory segment size, if this process creates it
+
+    Returns:
+        StorageBackend instance, or None for the in-process store
+
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    if name == "memory":
+        return None
+    if name == "sqlite":
+        return SQLiteBackend(path)
+    if name == "shm":
+        from src.shm_storage import SharedMemoryBackend
+
+        return SharedMemoryBackend(path, size_bytes=shm_size_bytes)
+    if name == "socket":
+        from src.context_server import SocketBackend
+
+        return SocketBackend(path)
+    raise ValueError(f"Unknown storage backend: {name!r}")
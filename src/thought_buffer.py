@@ -0,0 +1,440 @@
+"""Fixed-capacity windows for per-session thought storage."""
+
+from bisect import bisect_right
+from collections.abc import Sequence
+from typing import Any, Iterator, List, Optional, Union
+
+
+class ThoughtBuffer(Sequence):
+    """
+    Ring buffer holding the most recent thoughts of a session.
+
+    Appending and evicting the oldest entry are O(1). Step numbers are
+    handed out monotonically and keep counting after eviction, so the
+    entries in the window always cover steps first_step..last_step and
+    lookup by step is O(1).
+    """
+
+    __slots__ = ("_slots", "_start", "_count", "_next_step")
+
+    def __init__(self, capacity: int):
+        """
+        Initialize ThoughtBuffer.
+
+        Args:
+            capacity: Maximum number of thoughts kept in the window
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self._slots: List[Any] = [None] * capacity
+        self._start = 0  # Physical index of the oldest entry
+        self._count = 0
+        self._next_step = 1
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of entries held."""
+        return len(self._slots)
+
+    @property
+    def next_step(self) -> int:
+        """Step number the next appended thought will receive."""
+        return self._next_step
+
+    @property
+    def first_step(self) -> int:
+        """Step number of the oldest entry in the window."""
+        return self._next_step - self._count
+
+    @property
+    def last_step(self) -> int:
+        """Step number of the newest entry (0 if nothing was ever added)."""
+        return self._next_step - 1
+
+    def is_full(self) -> bool:
+        """Return True if the next append will evict the oldest entry."""
+        return self._count == len(self._slots)
+
+    def append(self, entry: Any) -> Optional[Any]:
+        """
+        Append an entry, evicting the oldest one if the buffer is full.
+
+        The entry is assigned step number next_step.
+
+        Args:
+            entry: Thought entry to store
+
+        Returns:
+            The evicted entry, or None if nothing was evicted
+        """
+        capacity = len(self._slots)
+        evicted = None
+        if self._count == capacity:
+            evicted = self._slots[self._start]
+            self._slots[self._start] = entry
+            self._start = (self._start + 1) % capacity
+        else:
+            self._slots[(self._start + self._count) % capacity] = entry
+            self._count += 1
+        self._next_step += 1
+        return evicted
+
+    def pop_oldest(self) -> Any:
+        """
+        Remove and return the oldest entry.
+
+        Raises:
+            IndexError: If the buffer is empty
+        """
+        if not self._count:
+            raise IndexError("pop from empty ThoughtBuffer")
+        entry = self._slots[self._start]
+        self._slots[self._start] = None
+        self._start = (self._start + 1) % len(self._slots)
+        self._count -= 1
+        return entry
+
+    def resize(self, capacity: int) -> None:
+        """
+        Change the capacity, keeping the entries and step numbering.
+
+        Args:
+            capacity: New maximum number of entries
+
+        Raises:
+            ValueError: If capacity is below 1 or below the number of
+                entries (pop_oldest first to shrink a full window)
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if capacity < self._count:
+            raise ValueError(f"capacity {capacity} cannot hold {self._count} entries")
+        self._slots = list(self) + [None] * (capacity - self._count)
+        self._start = 0
+
+    def by_step(self, step: int) -> Optional[Any]:
+        """
+        Return the entry for a step number, or None if it is outside the window.
+
+        Args:
+            step: 1-based step number
+        """
+        offset = step - self.first_step
+        if offset < 0 or offset >= self._count:
+            return None
+        return self._slots[(self._start + offset) % len(self._slots)]
+
+    def is_shared(self, step: int) -> bool:
+        """Return True if the entry for a step may be referenced by another window."""
+        return False
+
+    def clear(self) -> None:
+        """Drop all entries; step numbering continues from where it was."""
+        self._slots = [None] * len(self._slots)
+        self._start = 0
+        self._count = 0
+
+    def reset(self, next_step: int) -> None:
+        """
+        Drop all entries and continue numbering at next_step.
+
+        Used when the window is reloaded from durable storage.
+
+        Args:
+            next_step: Step number the next appended entry will receive
+        """
+        self.clear()
+        self._next_step = next_step
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if index < 0 or index >= self._count:
+            raise IndexError("ThoughtBuffer index out of range")
+        return self._slots[(self._start + index) % len(self._slots)]
+
+    def __iter__(self) -> Iterator[Any]:
+        slots = self._slots
+        capacity = len(slots)
+        start = self._start
+        for i in range(self._count):
+            yield slots[(start + i) % capacity]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (ThoughtBuffer, BranchBuffer, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None  # Mutable container
+
+    def __repr__(self) -> str:
+        return (
+            f"ThoughtBuffer(capacity={self.capacity}, steps={self.first_step}"
+            f"..{self.last_step}, entries={list(self)!r})"
+        )
+
+
+class BranchBuffer(Sequence):
+    """
+    Thought window of a forked session, sharing its history copy-on-write.
+
+    The window is a chain of frozen segments shared with other branches,
+    followed by a tail only this branch appends to. Forking freezes the
+    tail and hands both branches the same segment list, so it costs
+    O(segments) however many thoughts the window holds, and neither
+    branch ever writes to a segment. Segments that slide out of the
+    window are dropped from the chain; the records themselves are freed
+    once no branch references them.
+
+    Has the same interface as ThoughtBuffer: step numbering, eviction and
+    lookup by step behave identically.
+    """
+
+    __slots__ = (
+        "_capacity",
+        "_segments",
+        "_segment_firsts",
+        "_tail",
+        "_tail_first",
+        "_count",
+        "_next_step",
+    )
+
+    # Forks beyond this many live segments flatten the window into one
+    MAX_SEGMENTS = 16
+
+    def __init__(self, capacity: int):
+        """
+        Initialize BranchBuffer.
+
+        Args:
+            capacity: Maximum number of thoughts kept in the window
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self._capacity = capacity
+        # Frozen (first_step, count, slots, start) tuples, oldest first;
+        # step s of a segment is slots[(start + s - first_step) % len(slots)]
+        self._segments: List[tuple] = []
+        self._segment_firsts: List[int] = []
+        self._tail: List[Any] = []
+        self._tail_first = 1  # Step of _tail[0]
+        self._count = 0
+        self._next_step = 1
+
+    @classmethod
+    def from_ring(cls, ring: ThoughtBuffer) -> "BranchBuffer":
+        """
+        Take over a ring buffer's window in O(1).
+
+        The ring's slots become the first frozen segment, so the ring must
+        not be used afterwards.
+
+        Args:
+            ring: Ring buffer to wrap
+        """
+        buffer = cls(ring.capacity)
+        if len(ring):
+            buffer._segments.append((ring.first_step, len(ring), ring._slots, ring._start))
+            buffer._segment_firsts.append(ring.first_step)
+        buffer._tail_first = buffer._next_step = ring.next_step
+        buffer._count = len(ring)
+        return buffer
+
+    def fork(self) -> "BranchBuffer":
+        """
+        Return a new branch holding the same window, in O(segments).
+
+        Both branches keep appending independently afterwards.
+        """
+        tail = self._tail
+        if tail:
+            self._segments.append((self._tail_first, len(tail), tail, 0))
+            self._segment_firsts.append(self._tail_first)
+            self._tail = []
+            self._tail_first = self._next_step
+        if len(self._segments) > self.MAX_SEGMENTS:
+            # Keep lookups and iteration short on deep fork chains
+            entries = list(self)
+            self._segments = [(self.first_step, len(entries), entries, 0)]
+            self._segment_firsts = [self.first_step]
+        branch = BranchBuffer(self._capacity)
+        branch._segments = list(self._segments)
+        branch._segment_firsts = list(self._segment_firsts)
+        branch._tail_first = self._tail_first
+        branch._count = self._count
+        branch._next_step = self._next_step
+        return branch
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of entries held."""
+        return self._capacity
+
+    @property
+    def next_step(self) -> int:
+        """Step number the next appended thought will receive."""
+        return self._next_step
+
+    @property
+    def first_step(self) -> int:
+        """Step number of the oldest entry in the window."""
+        return self._next_step - self._count
+
+    @property
+    def last_step(self) -> int:
+        """Step number of the newest entry (0 if nothing was ever added)."""
+        return self._next_step - 1
+
+    @property
+    def shared_segments(self) -> int:
+        """Number of frozen segments in the window's chain."""
+        return len(self._segments)
+
+    def is_full(self) -> bool:
+        """Return True if the next append will evict the oldest entry."""
+        return self._count == self._capacity
+
+    def append(self, entry: Any) -> Optional[Any]:
+        """
+        Append an entry, evicting the oldest one if the window is full.
+
+        Args:
+            entry: Thought entry to store
+
+        Returns:
+            The evicted entry, or None if nothing was evicted
+        """
+        evicted = self.pop_oldest() if self._count == self._capacity else None
+        self._tail.append(entry)
+        self._count += 1
+        self._next_step += 1
+        return evicted
+
+    def pop_oldest(self) -> Any:
+        """
+        Remove and return the oldest entry.
+
+        Raises:
+            IndexError: If the buffer is empty
+        """
+        if not self._count:
+            raise IndexError("pop from empty BranchBuffer")
+        entry = self.by_step(self.first_step)
+        self._count -= 1
+        first_step = self.first_step
+        segments = self._segments
+        if segments:
+            segment_first, segment_count = segments[0][:2]
+            if segment_first + segment_count <= first_step:
+                del segments[0]
+                del self._segment_firsts[0]
+        elif first_step - self._tail_first > len(self._tail) // 2:
+            # Compact the tail once half of it is out of the window
+            del self._tail[: first_step - self._tail_first]
+            self._tail_first = first_step
+        return entry
+
+    def resize(self, capacity: int) -> None:
+        """
+        Change the capacity, keeping the entries and step numbering.
+
+        Args:
+            capacity: New maximum number of entries
+
+        Raises:
+            ValueError: If capacity is below 1 or below the number of
+                entries (pop_oldest first to shrink a full window)
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if capacity < self._count:
+            raise ValueError(f"capacity {capacity} cannot hold {self._count} entries")
+        self._capacity = capacity
+
+    def by_step(self, step: int) -> Optional[Any]:
+        """
+        Return the entry for a step number, or None if it is outside the window.
+
+        Args:
+            step: 1-based step number
+        """
+        if step < self.first_step or step >= self._next_step:
+            return None
+        if step >= self._tail_first:
+            return self._tail[step - self._tail_first]
+        segment_first, _, slots, start = self._segments[
+            bisect_right(self._segment_firsts, step) - 1
+        ]
+        return slots[(start + step - segment_first) % len(slots)]
+
+    def is_shared(self, step: int) -> bool:
+        """
+        Return True if the entry for a step may be referenced by another window.
+
+        Entries in frozen segments may belong to other branches too, so
+        they must not be changed in place; only the tail is this branch's.
+
+        Args:
+            step: 1-based step number
+        """
+        return step < self._tail_first
+
+    def clear(self) -> None:
+        """Drop all entries; step numbering continues from where it was."""
+        self._segments = []
+        self._segment_firsts = []
+        self._tail = []
+        self._tail_first = self._next_step
+        self._count = 0
+
+    def reset(self, next_step: int) -> None:
+        """
+        Drop all entries and continue numbering at next_step.
+
+        Args:
+            next_step: Step number the next appended entry will receive
+        """
+        self._next_step = next_step
+        self.clear()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if index < 0 or index >= self._count:
+            raise IndexError("BranchBuffer index out of range")
+        return self.by_step(self.first_step + index)
+
+    def __iter__(self) -> Iterator[Any]:
+        step = self.first_step
+        for segment_first, count, slots, start in self._segments:
+            size = len(slots)
+            for offset in range(step - segment_first, count):
+                yield slots[(start + offset) % size]
+            step = segment_first + count
+        tail = self._tail
+        for offset in range(step - self._tail_first, len(tail)):
+            yield tail[offset]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (ThoughtBuffer, BranchBuffer, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None  # Mutable container
+
+    def __repr__(self) -> str:
+        return (
+            f"BranchBuffer(capacity={self.capacity}, steps={self.first_step}"
+            f"..{self.last_step}, segments={len(self._segments)}, entries={list(self)!r})"
+        )
@@ -0,0 +1,179 @@
+"""Compact storage record for a single thought."""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+import zlib
+
+from src.tokens import estimate_tokens
+
+
+# Approximate fixed cost of one record: the slotted object, its int step,
+# float timestamp and the str/bytes object header of the payload
+RECORD_OVERHEAD_BYTES = 160
+
+
+def format_timestamp(epoch: float) -> str:
+    """
+    Format an epoch timestamp as a naive UTC ISO-8601 string.
+
+    Matches the format previously produced by datetime.utcnow().isoformat().
+
+    Args:
+        epoch: Seconds since the Unix epoch
+
+    Returns:
+        ISO-8601 string without timezone suffix
+    """
+    return datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+class ThoughtRecord:
+    """
+    One stored thought.
+
+    Uses __slots__ and an epoch float timestamp instead of a three-key dict
+    with an ISO string. The ISO timestamp is only built when read, and the
+    record still supports read-only dict-style access (record["thought"])
+    for callers written against the old layout.
+
+    Cold records can be compressed in place with compress(); the text is
+    then decompressed transparently whenever thought is read.
+
+    The token estimate is computed once (at insert, or on first use for
+    records loaded from storage) and cached for budgeted renders.
+    """
+
+    __slots__ = ("step", "_thought", "created", "_tokens")
+
+    _KEYS: Tuple[str, ...] = ("timestamp", "thought", "step")
+
+    def __init__(
+        self, step: int, thought: str, created: float, tokens: Optional[int] = None
+    ):
+        """
+        Initialize ThoughtRecord.
+
+        Args:
+            step: 1-based step number
+            thought: Thought content
+            created: Creation time in seconds since the epoch
+            tokens: Precomputed token estimate (computed lazily if None)
+        """
+        self.step = step
+        self._thought: Union[str, bytes] = thought
+        self.created = created
+        self._tokens = tokens
+
+    @property
+    def thought(self) -> str:
+        """Thought content (decompressed on read if stored compressed)."""
+        text = self._thought
+        if type(text) is bytes:
+            return zlib.decompress(text).decode("utf-8")
+        return text
+
+    @property
+    def tokens(self) -> int:
+        """Estimated token count of the thought text (cached)."""
+        tokens = self._tokens
+        if tokens is None:
+            tokens = self._tokens = estimate_tokens(self.thought)
+        return tokens
+
+    @property
+    def payload(self) -> Union[str, bytes]:
+        """Stored thought as held: str, or zlib-compressed UTF-8 bytes."""
+        return self._thought
+
+    @property
+    def compressed(self) -> bool:
+        """True if the thought text is stored zlib-compressed."""
+        return type(self._thought) is bytes
+
+    @property
+    def stored_size(self) -> int:
+        """Approximate bytes held by the stored thought payload."""
+        text = self._thought
+        if type(text) is bytes:
+            return len(text)
+        # Lower bound for str storage: one byte per character
+        return len(text) if text.isascii() else len(text.encode("utf-8"))
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate total memory held by this record."""
+        return RECORD_OVERHEAD_BYTES + self.stored_size
+
+    def compress(self, min_length: int = 256, level: int = 6) -> bool:
+        """
+        Compress the stored text in place if that makes it smaller.
+
+        Args:
+            min_length: Skip thoughts shorter than this many characters
+            level: zlib compression level (1-9)
+
+        Returns:
+            True if the record is now stored compressed
+        """
+        text = self._thought
+        if type(text) is bytes:
+            return True
+        if len(text) < min_length:
+            return False
+        raw = text.encode("utf-8")
+        packed = zlib.compress(raw, level)
+        if len(packed) >= len(raw):
+            return False
+        self._thought = packed
+        return True
+
+    @property
+    def timestamp(self) -> str:
+        """Creation time as an ISO-8601 string (formatted on demand)."""
+        return format_timestamp(self.created)
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "thought":
+            return self.thought
+        if key == "step":
+            return self.step
+        if key == "timestamp":
+            return format_timestamp(self.created)
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dict-style get."""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> Tuple[str, ...]:
+        """Dict-style keys."""
+        return self._KEYS
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._KEYS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._KEYS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the legacy dict representation."""
+        return {"timestamp": self.timestamp, "thought": self.thought, "step": self.step}
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ThoughtRecord):
+            return (
+                self.step == other.step
+                and self.thought == other.thought
+                and self.created == other.created
+            )
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None  # Mutable record
+
+    def __repr__(self) -> str:
+        return f"ThoughtRecord(step={self.step}, thought={self.thought!r}, created={self.created})"
@@ -0,0 +1,75 @@
+"""Token estimates and token-budgeted thought selection."""
+
+from typing import Iterable, List
+
+from src.thought_buffer import ThoughtBuffer
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate how many model tokens a text takes.
+
+    Uses the common heuristic of four characters per token for ASCII text
+    and one token per character otherwise (CJK and most other scripts
+    tokenize far less densely). It needs no tokenizer and errs on the
+    high side for non-English text.
+
+    Args:
+        text: Text to estimate
+
+    Returns:
+        Estimated token count (at least 1 for non-empty text)
+    """
+    if text.isascii():
+        return (len(text) + 3) // 4
+    non_ascii = len(text) - len(text.encode("ascii", "ignore"))
+    return (len(text) - non_ascii + 3) // 4 + non_ascii
+
+
+def select_within_budget(
+    buffer: ThoughtBuffer,
+    max_tokens: int,
+    entry_overhead: int = 0,
+    pinned: Iterable[int] = (),
+) -> List[int]:
+    """
+    Choose the steps to return under a token budget.
+
+    Pinned steps still in the window are always included and charged
+    first; the rest of the budget goes to the most recent thoughts,
+    newest first, stopping at the first one that does not fit. Only the
+    cached per-record token counts are read, so the cost is O(k) in the
+    thoughts returned plus the number of pins.
+
+    Args:
+        buffer: Session thought buffer
+        max_tokens: Token budget
+        entry_overhead: Tokens added per thought by the output format
+        pinned: Step numbers to always include
+
+    Returns:
+        Selected step numbers, oldest first
+    """
+    first_step = buffer.first_step
+    remaining = max_tokens
+    pinned_steps = sorted(
+        {step for step in pinned if step >= first_step and buffer.by_step(step) is not None}
+    )
+    for step in pinned_steps:
+        remaining -= buffer.by_step(step).tokens + entry_overhead
+
+    pinned_set = set(pinned_steps)
+    recent: List[int] = []
+    for step in range(buffer.last_step, first_step - 1, -1):
+        if step in pinned_set:
+            continue
+        cost = buffer.by_step(step).tokens + entry_overhead
+        if cost > remaining:
+            break
+        remaining -= cost
+        recent.append(step)
+
+    recent.reverse()
+    if not pinned_steps:
+        return recent
+    return sorted(pinned_set.union(recent))
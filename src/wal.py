@@ -0,0 +1,442 @@
+"""Append-only write-ahead log with periodic snapshots for crash recovery."""
+
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+
+from src.errors import StorageError
+from src.thought_record import ThoughtRecord
+
+logger = logging.getLogger(__name__)
+
+# Frame: payload length, crc32 of payload, payload
+_FRAME = struct.Struct("<II")
+
+# Payload layouts; every payload starts with the op byte and session id length
+OP_APPEND = 1
+OP_CLEAR = 2
+OP_TRIM = 3
+OP_SESSION = 4
+_APPEND = struct.Struct("<BHqdB")  # op, sid length, step, created, compressed flag
+_CLEAR = struct.Struct("<BH")  # op, sid length
+_TRIM = struct.Struct("<BHq")  # op, sid length, first step to keep
+_SESSION = struct.Struct("<BHd")  # op, sid length, created_at
+
+_SNAPSHOT_MAGIC = b"THINKSNAP1\n"
+_SNAPSHOT_RE = re.compile(r"^snapshot-(\d{8})\.bin$")
+_LOG_RE = re.compile(r"^wal-(\d{8})\.log$")
+
+# Replay callback: (op, session_id, value) where value is a ThoughtRecord
+# for OP_APPEND, the first step to keep for OP_TRIM, created_at for
+# OP_SESSION and None for OP_CLEAR
+ReplayHandler = Callable[[int, str, object], None]
+# Snapshot source: yields (session_id, created_at, records oldest first)
+SnapshotSource = Callable[[], Iterable[Tuple[str, float, List[ThoughtRecord]]]]
+
+
+def _frame(payload: bytes) -> bytes:
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def encode_append(session_id: str, record: ThoughtRecord) -> bytes:
+    """Encode an OP_APPEND frame for a thought record."""
+    sid = session_id.encode("utf-8")
+    payload = record.payload
+    compressed = type(payload) is bytes
+    body = payload if compressed else payload.encode("utf-8")
+    return _frame(
+        _APPEND.pack(OP_APPEND, len(sid), record.step, record.created, compressed) + sid + body
+    )
+
+
+def encode_clear(session_id: str) -> bytes:
+    """Encode an OP_CLEAR frame."""
+    sid = session_id.encode("utf-8")
+    return _frame(_CLEAR.pack(OP_CLEAR, len(sid)) + sid)
+
+
+def encode_trim(session_id: str, first_step: int) -> bytes:
+    """Encode an OP_TRIM frame (drop steps before first_step)."""
+    sid = session_id.encode("utf-8")
+    return _frame(_TRIM.pack(OP_TRIM, len(sid), first_step) + sid)
+
+
+def encode_session(session_id: str, created_at: float) -> bytes:
+    """Encode an OP_SESSION frame (session creation time, snapshots only)."""
+    sid = session_id.encode("utf-8")
+    return _frame(_SESSION.pack(OP_SESSION, len(sid), created_at) + sid)
+
+
+def decode_frames(data, start: int = 0) -> Iterator[Tuple[int, int, str, object]]:
+    """
+    Decode frames from a buffer.
+
+    Stops silently at the first truncated or corrupt frame.
+
+    Args:
+        data: bytes-like buffer (e.g. an mmap)
+        start: Offset of the first frame
+
+    Yields:
+        (end offset, op, session_id, value) per valid frame
+    """
+    offset = start
+    size = len(data)
+    while offset + _FRAME.size <= size:
+        length, crc = _FRAME.unpack_from(data, offset)
+        body_start = offset + _FRAME.size
+        end = body_start + length
+        if length == 0 or end > size:
+            return
+        payload = bytes(data[body_start:end])
+        if zlib.crc32(payload) != crc:
+            return
+        op = payload[0]
+        if op == OP_APPEND:
+            _, sid_len, step, created, compressed = _APPEND.unpack_from(payload)
+            head = _APPEND.size
+            session_id = payload[head:head + sid_len].decode("utf-8")
+            body = payload[head + sid_len:]
+            value: object = ThoughtRecord(
+                step, body if compressed else body.decode("utf-8"), created
+            )
+        elif op == OP_CLEAR:
+            _, sid_len = _CLEAR.unpack_from(payload)
+            session_id = payload[_CLEAR.size:_CLEAR.size + sid_len].decode("utf-8")
+            value = None
+        elif op == OP_TRIM:
+            _, sid_len, value = _TRIM.unpack_from(payload)
+            session_id = payload[_TRIM.size:_TRIM.size + sid_len].decode("utf-8")
+        elif op == OP_SESSION:
+            _, sid_len, value = _SESSION.unpack_from(payload)
+            session_id = payload[_SESSION.size:_SESSION.size + sid_len].decode("utf-8")
+        else:
+            return
+        yield end, op, session_id, value
+        offset = end
+
+
+class WriteAheadLog:
+    """
+    Durable log of add_thought/clear_context operations.
+
+    Writers append checksummed, length-prefixed frames. A background
+    thread fsyncs on an interval, and with wait_for_sync every writer
+    blocks until a sync covers its frame: concurrent writers share one
+    fsync (group commit). When the log outgrows snapshot_bytes, the live
+    state is written to a snapshot and older log segments are deleted.
+    Recovery replays the newest complete snapshot plus the log segments
+    written after it, reading both through mmap.
+
+    Replay is idempotent: appends at or below a session's last step are
+    ignored by the caller, so a snapshot overlapping its log is harmless.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        sync_interval: float = 0.01,
+        wait_for_sync: bool = True,
+        snapshot_bytes: int = 16 * 1024 * 1024,
+    ):
+        """
+        Initialize WriteAheadLog (call replay() and then start()).
+
+        Args:
+            directory: Directory holding snapshot and log files
+            sync_interval: Seconds between background fsyncs
+            wait_for_sync: Block writers until their frame is fsynced
+            snapshot_bytes: Log size that triggers a snapshot
+        """
+        self.directory = directory
+        self.sync_interval = sync_interval
+        self.wait_for_sync = wait_for_sync
+        self.snapshot_bytes = snapshot_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._cond = threading.Condition()
+        self._sync_lock = threading.Lock()
+        self._file = None
+        self._generation = 0
+        self._log_bytes = 0
+        self._written_seq = 0
+        self._synced_seq = 0
+        self._closed = False
+        self._snapshot_source: Optional[SnapshotSource] = None
+        self._snapshot_running = False
+        self._thread: Optional[threading.Thread] = None
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self.syncs = 0
+        self.snapshots = 0
+
+    def _path(self, kind: str, generation: int) -> str:
+        if kind == "snapshot":
+            name = f"snapshot-{generation:08d}.bin"
+        else:
+            name = f"wal-{generation:08d}.log"
+        return os.path.join(self.directory, name)
+
+    def _generations(self, pattern: "re.Pattern") -> List[int]:
+        found = []
+        for name in os.listdir(self.directory):
+            match = pattern.match(name)
+            if match:
+                found.append(int(match.group(1)))
+        return sorted(found)
+
+    def replay(self, handler: ReplayHandler) -> int:
+        """
+        Replay the newest snapshot and later log segments through handler.
+
+        A torn frame at the end of the newest segment is truncated away.
+
+        Args:
+            handler: Called with (op, session_id, value) per frame
+
+        Returns:
+            Number of frames replayed
+        """
+        snapshots = self._generations(_SNAPSHOT_RE)
+        base = snapshots[-1] if snapshots else 0
+        count = 0
+        if snapshots:
+            path = self._path("snapshot", base)
+            try:
+                count += self._replay_file(path, handler, len(_SNAPSHOT_MAGIC))[0]
+            except FileNotFoundError:
+                logger.warning(f"Skipping {path}: removed during replay")
+
+        logs = [g for g in self._generations(_LOG_RE) if g >= base]
+        for generation in logs:
+            path = self._path("log", generation)
+            try:
+                replayed, good_end = self._replay_file(path, handler, 0)
+                size = os.path.getsize(path)
+            except FileNotFoundError:
+                # Deleted by a snapshot between listing and reading
+                logger.warning(f"Skipping {path}: removed during replay")
+                continue
+            count += replayed
+            if good_end < size:
+                logger.warning(f"Truncating torn tail of {path} at offset {good_end}")
+                with open(path, "r+b") as f:
+                    f.truncate(good_end)
+        self._generation = max([base] + logs)
+        logger.info(f"WAL replayed {count} frame(s) from {self.directory}")
+        return count
+
+    @staticmethod
+    def _replay_file(path: str, handler: ReplayHandler, start: int) -> Tuple[int, int]:
+        """Replay one file; return (frames replayed, end offset of the last good frame)."""
+        end = start
+        count = 0
+        if os.path.getsize(path) > start:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if start and data[:start] != _SNAPSHOT_MAGIC:
+                    raise StorageError(f"Not a snapshot file: {path}")
+                for end, op, session_id, value in decode_frames(data, start):
+                    handler(op, session_id, value)
+                    count += 1
+        return count, end
+
+    def start(self, snapshot_source: SnapshotSource) -> None:
+        """
+        Open the current log segment for appending and start the sync thread.
+
+        Args:
+            snapshot_source: Yields the live state when a snapshot is taken
+        """
+        self._snapshot_source = snapshot_source
+        path = self._path("log", self._generation)
+        self._file = open(path, "ab")
+        self._log_bytes = self._file.tell()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="ContextManager-WAL")
+        self._thread.start()
+
+    def _write(self, frame: bytes) -> None:
+        with self._cond:
+            if self._file is None:
+                raise StorageError("Write-ahead log is not open")
+            try:
+                self._file.write(frame)
+            except OSError as e:
+                raise StorageError(f"Write-ahead log append failed: {e}") from e
+            self._log_bytes += len(frame)
+            self._written_seq += 1
+            seq = self._written_seq
+            if not self.wait_for_sync:
+                return
+            self._cond.notify_all()
+            while self._synced_seq < seq and not self._closed:
+                self._cond.wait()
+
+    def append_thought(self, session_id: str, record: ThoughtRecord) -> None:
+        """Log a new thought."""
+        self._write(encode_append(session_id, record))
+
+    def append_thoughts(self, session_id: str, records: Iterable[ThoughtRecord]) -> None:
+        """Log several new thoughts of one session with a single sync."""
+        self._write(b"".join(encode_append(session_id, record) for record in records))
+
+    def clear(self, session_id: str) -> None:
+        """Log removal of a session."""
+        self._write(encode_clear(session_id))
+
+    def clear_many(self, session_ids: Iterable[str]) -> None:
+        """Log removal of several sessions with a single sync."""
+        self._write(b"".join(encode_clear(session_id) for session_id in session_ids))
+
+    def trim(self, session_id: str, first_step: int) -> None:
+        """Log dropping a session's steps before first_step."""
+        self._write(encode_trim(session_id, first_step))
+
+    def flush(self) -> None:
+        """Fsync everything written so far."""
+        with self._cond:
+            target = self._written_seq
+        self._sync(target)
+
+    def _sync(self, target: int) -> None:
+        # The sync lock keeps the file from being switched or closed
+        # while its descriptor is being fsynced; writers only take _cond
+        with self._sync_lock:
+            with self._cond:
+                if self._file is None or self._synced_seq >= target:
+                    return
+                self._file.flush()
+                fd = self._file.fileno()
+            os.fsync(fd)
+            with self._cond:
+                if target > self._synced_seq:
+                    self._synced_seq = target
+                self.syncs += 1
+                self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                if self._synced_seq >= self._written_seq:
+                    self._cond.wait(self.sync_interval)
+                target = self._written_seq
+                needs_snapshot = (
+                    self._log_bytes >= self.snapshot_bytes and not self._snapshot_running
+                )
+                if needs_snapshot:
+                    self._snapshot_running = True
+            try:
+                self._sync(target)
+            except Exception as e:
+                logger.error(f"Write-ahead log sync failed: {e}", exc_info=True)
+            if needs_snapshot:
+                # The snapshot source takes session locks whose holders may be
+                # waiting on this thread's next fsync, so it runs separately
+                snapshot_thread = threading.Thread(
+                    target=self._snapshot_in_background,
+                    daemon=True,
+                    name="ContextManager-WAL-Snapshot",
+                )
+                with self._cond:
+                    self._snapshot_thread = snapshot_thread
+                snapshot_thread.start()
+
+    def _snapshot_in_background(self) -> None:
+        try:
+            self._write_snapshot()
+        except Exception as e:
+            logger.error(f"Write-ahead log snapshot failed: {e}", exc_info=True)
+        finally:
+            with self._cond:
+                self._snapshot_running = False
+
+    def snapshot(self) -> None:
+        """
+        Write the live state to a snapshot and drop older segments.
+
+        Appends switch to a fresh log segment first, so writers are only
+        blocked for the switch, not while the snapshot is built.
+        """
+        with self._cond:
+            if self._snapshot_running:
+                return
+            self._snapshot_running = True
+        try:
+            self._write_snapshot()
+        finally:
+            with self._cond:
+                self._snapshot_running = False
+
+    def _write_snapshot(self) -> None:
+        with self._sync_lock:
+            with self._cond:
+                if self._closed or self._file is None or self._snapshot_source is None:
+                    return
+                old_file = self._file
+                old_file.flush()
+                os.fsync(old_file.fileno())
+                old_file.close()
+                self._generation += 1
+                generation = self._generation
+                self._file = open(self._path("log", generation), "ab")
+                self._log_bytes = 0
+                self._synced_seq = self._written_seq
+                self._cond.notify_all()
+
+        final = self._path("snapshot", generation)
+        tmp = final + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_SNAPSHOT_MAGIC)
+            for session_id, created_at, records in self._snapshot_source():
+                f.write(encode_session(session_id, created_at))
+                for record in records:
+                    f.write(encode_append(session_id, record))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, final)
+
+        for old in self._generations(_SNAPSHOT_RE):
+            if old < generation:
+                os.remove(self._path("snapshot", old))
+        for old in self._generations(_LOG_RE):
+            if old < generation:
+                os.remove(self._path("log", old))
+        with self._cond:
+            self.snapshots += 1
+        logger.info(f"WAL snapshot {generation} written")
+
+    def stats(self) -> Dict:
+        """Return log statistics."""
+        with self._cond:
+            return {
+                "directory": self.directory,
+                "generation": self._generation,
+                "log_bytes": self._log_bytes,
+                "syncs": self.syncs,
+                "snapshots": self.snapshots,
+            }
+
+    def close(self) -> None:
+        """Fsync pending frames, stop the sync and snapshot threads and close the log."""
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        # Started by the sync thread, so only read once that has stopped;
+        # a snapshot in progress finishes before the log is closed
+        with self._cond:
+            snapshot_thread = self._snapshot_thread
+        if snapshot_thread is not None and snapshot_thread is not threading.current_thread():
+            snapshot_thread.join(timeout=30)
+        with self._sync_lock, self._cond:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,129 @@
+"""Tests for AsyncContextManager."""
+
+import asyncio
+import threading
+
+import pytest
+
+from src.async_context_manager import AsyncContextManager
+from src.scheduler import get_scheduler
+from src.storage import SQLiteBackend
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestAsyncContextManager:
+    """Test suite for the asyncio front end."""
+
+    def test_add_and_read(self):
+        """Thoughts added by coroutines are read back in order."""
+
+        async def scenario():
+            async with AsyncContextManager() as cm:
+                assert await cm.add_thought("s1", "First") == 1
+                assert await cm.add_thoughts("s1", ["Second", "Third"]) == range(2, 4)
+                thoughts = await cm.get_all_thoughts("s1")
+                formatted = await cm.get_formatted_context("s1")
+                summary = await cm.get_context_summary("s1")
+                return thoughts, formatted, summary
+
+        thoughts, formatted, summary = run(scenario())
+        assert [t["thought"] for t in thoughts] == ["First", "Second", "Third"]
+        assert "Third" in formatted
+        assert summary["total_steps"] == 3
+
+    def test_validation_errors_propagate(self):
+        """Invalid thoughts raise ValueError from the coroutine."""
+
+        async def scenario():
+            async with AsyncContextManager() as cm:
+                await cm.add_thought("s1", "")
+
+        with pytest.raises(ValueError):
+            run(scenario())
+
+    def test_concurrent_sessions(self):
+        """Thousands of coroutines on many sessions lose no thoughts."""
+
+        async def writer(cm, index):
+            for i in range(5):
+                await cm.add_thought(f"session-{index % 100}", f"Thought {index}-{i}")
+
+        async def scenario():
+            async with AsyncContextManager(max_thoughts=1000) as cm:
+                await asyncio.gather(*(writer(cm, i) for i in range(2000)))
+                return await cm.get_stats()
+
+        stats = run(scenario())
+        assert stats["total_sessions"] == 100
+        assert stats["total_thoughts"] == 10000
+
+    def test_durable_store_runs_off_the_loop(self, tmp_path):
+        """With a backend, operations run in executor threads and stay ordered."""
+        loop_threads = set()
+        seen_threads = set()
+
+        async def writer(cm, index):
+            for i in range(10):
+                await cm.add_thought("shared", f"Thought {index}-{i}")
+
+        async def scenario():
+            loop_threads.add(threading.get_ident())
+            backend = SQLiteBackend(str(tmp_path / "async.db"))
+            async with AsyncContextManager(max_thoughts=1000, backend=backend) as cm:
+                original = cm.manager.submit_thoughts
+
+                def spy(*args, **kwargs):
+                    seen_threads.add(threading.get_ident())
+                    return original(*args, **kwargs)
+
+                cm.manager.submit_thoughts = spy
+                await asyncio.gather(*(writer(cm, i) for i in range(20)))
+                steps = [t["step"] for t in await cm.get_all_thoughts("shared")]
+                return steps
+
+        steps = run(scenario())
+        assert steps == list(range(1, 201))
+        assert seen_threads and not seen_threads & loop_threads
+
+    def test_cleanup_task_replaces_scheduler(self):
+        """The manager is not registered with the scheduler thread."""
+
+        async def scenario():
+            async with AsyncContextManager(auto_cleanup=True) as cm:
+                registered = get_scheduler().is_registered(cm.manager)
+                running = cm._cleanup_task is not None and not cm._cleanup_task.done()
+                await cm.add_thought("s1", "Thought")
+                removed = await cm.cleanup_old_sessions(max_age_hours=-1)
+                stats = await cm.get_stats()
+            return registered, running, removed, stats, cm._cleanup_task
+
+        registered, running, removed, stats, task = run(scenario())
+        assert not registered
+        assert running
+        assert removed == 1
+        assert stats["auto_cleanup_enabled"] is True
+        assert task is None
+
+    def test_cleanup_task_runs(self):
+        """The cleanup task sweeps expired sessions on its interval."""
+
+        async def scenario():
+            cm = AsyncContextManager(auto_cleanup=True)
+            # An interval of ~20 ms and a negative age expire everything
+            cm.manager.cleanup_interval_hours = 0.02 / 3600
+            original = cm.manager.cleanup_old_sessions
+            cm.manager.cleanup_old_sessions = lambda max_age_hours=None: original(-1)
+            cm.start()
+            await cm.add_thought("s1", "Thought")
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if not (await cm.get_stats())["total_sessions"]:
+                    break
+            stats = await cm.get_stats()
+            await cm.close()
+            return stats
+
+        assert run(scenario())["total_sessions"] == 0
@@ -0,0 +1,140 @@
+"""Tests for cold-thought compression."""
+
+import pytest
+
+from src.config import PluginConfig
+from src.context_manager import SESSION_OVERHEAD_BYTES, ContextManager
+from src.rendering import RENDERERS, RenderCache
+from src.thought_buffer import ThoughtBuffer
+from src.thought_record import ThoughtRecord
+from src.wal import OP_APPEND
+
+LONG_THOUGHT = "Check the cancellation policy and baggage rules. " * 20
+
+
+def _compressing_manager(hot: int = 2) -> ContextManager:
+    cm = ContextManager(max_thoughts=50)
+    cm.enable_context_compression = True
+    cm.compression_hot_thoughts = hot
+    cm.compression_min_length = 100
+    return cm
+
+
+class TestRecordCompression:
+    """Compression on a single ThoughtRecord."""
+
+    def test_compress_round_trip(self):
+        """Compressed records read back the original text."""
+        record = ThoughtRecord(1, LONG_THOUGHT, 0.0)
+        raw_size = record.stored_size
+        assert record.compress(min_length=100)
+        assert record.compressed
+        assert record.stored_size < raw_size
+        assert record.thought == LONG_THOUGHT
+        assert record["thought"] == LONG_THOUGHT
+
+    def test_short_thoughts_stay_plain(self):
+        """Thoughts under the minimum length are left alone."""
+        record = ThoughtRecord(1, "short", 0.0)
+        assert not record.compress(min_length=100)
+        assert not record.compressed
+
+    def test_incompressible_text_stays_plain(self):
+        """Compression is skipped when it would not save space."""
+        record = ThoughtRecord(1, "".join(chr(33 + (i * 7919) % 90) for i in range(120)), 0.0)
+        record.compress(min_length=10)
+        assert record.thought.startswith("!")
+
+
+class TestContextCompression:
+    """Compression mode in ContextManager."""
+
+    def test_only_cold_thoughts_are_compressed(self):
+        """The newest N thoughts stay uncompressed."""
+        cm = _compressing_manager(hot=2)
+        for i in range(5):
+            cm.add_thought("compress-1", f"{i} {LONG_THOUGHT}")
+        flags = [t.compressed for t in cm.get_all_thoughts("compress-1")]
+        assert flags == [True, True, True, False, False]
+
+    def test_reads_are_transparent(self):
+        """get_all_thoughts and get_formatted_context return plain text."""
+        cm = _compressing_manager(hot=1)
+        for i in range(3):
+            cm.add_thought("compress-2", f"{i} {LONG_THOUGHT}")
+        thoughts = cm.get_all_thoughts("compress-2")
+        assert thoughts[0]["thought"] == f"0 {LONG_THOUGHT}"
+        formatted = cm.get_formatted_context("compress-2", "compact")
+        assert formatted == "".join(f"[{i + 1}] {i} {LONG_THOUGHT}\n" for i in range(3))
+
+    def test_accounting_with_compression(self):
+        """Thought counts and bytes match the window when cold thoughts shrink."""
+        cm = _compressing_manager(hot=2)
+        cm.max_thoughts = 10
+        for i in range(20):
+            cm.add_thought("compress-acct", f"{i} {LONG_THOUGHT}")
+        for i in range(20):
+            cm._replay(OP_APPEND, "compress-replay", ThoughtRecord(i + 1, f"{i} {LONG_THOUGHT}", 0.0))
+        for session_id in ("compress-acct", "compress-replay"):
+            context = cm.get_context(session_id)
+            thoughts = context["thoughts"]
+            assert len(thoughts) == 10
+            assert context["metadata"]["thought_count"] == 10
+            assert context["metadata"]["bytes"] == (
+                SESSION_OVERHEAD_BYTES + 8 * 10 + sum(t.nbytes for t in thoughts)
+            )
+        stats = cm.get_stats()
+        assert stats["total_thoughts"] == 20
+        assert stats["total_bytes"] == sum(
+            cm.get_context(sid)["metadata"]["bytes"] for sid in ("compress-acct", "compress-replay")
+        )
+
+    def test_forked_sessions_keep_their_byte_totals(self):
+        """Compressing in one branch leaves the other branch's bytes alone."""
+        cm = _compressing_manager(hot=2)
+        for i in range(3):
+            cm.add_thought("compress-trunk", f"{i} {LONG_THOUGHT}")
+        cm.fork_session("compress-trunk", "compress-branch")
+        for i in range(3):
+            cm.add_thought("compress-branch", f"branch {i} {LONG_THOUGHT}")
+        for i in range(3):
+            cm.add_thought("compress-trunk", f"trunk {i} {LONG_THOUGHT}")
+        sessions = ("compress-trunk", "compress-branch")
+        for session_id in sessions:
+            context = cm.get_context(session_id)
+            thoughts = context["thoughts"]
+            assert [t.compressed for t in thoughts] == [True, False, False, True, False, False]
+            assert context["metadata"]["bytes"] == (
+                SESSION_OVERHEAD_BYTES + 8 * 50 + sum(t.nbytes for t in thoughts)
+            )
+        assert cm.get_stats()["total_bytes"] == sum(
+            cm.get_context(sid)["metadata"]["bytes"] for sid in sessions
+        )
+
+    def test_disabled_by_default(self):
+        """Nothing is compressed unless the mode is enabled."""
+        cm = ContextManager()
+        for i in range(30):
+            cm.add_thought("compress-3", LONG_THOUGHT)
+        assert not any(t.compressed for t in cm.get_all_thoughts("compress-3"))
+
+    def test_config_validation(self):
+        """Invalid compression settings are rejected."""
+        with pytest.raises(ValueError):
+            PluginConfig(compression_level=0).validate()
+        with pytest.raises(ValueError):
+            PluginConfig(compression_hot_thoughts=-1).validate()
+
+
+class TestBoundedRenderCache:
+    """RenderCache with a chunk limit."""
+
+    def test_bounded_cache_matches_unbounded(self):
+        """Limiting cached chunks does not change the output."""
+        buffer = ThoughtBuffer(5)
+        bounded = RenderCache(RENDERERS["compact"], max_chunks=2)
+        unbounded = RenderCache(RENDERERS["compact"])
+        for i in range(8):
+            buffer.append(ThoughtRecord(buffer.next_step, f"t{i}", 0.0))
+            assert bounded.render(buffer) == unbounded.render(buffer)
+            assert len(bounded._chunks) <= 2
@@ -0,0 +1,151 @@
+"""Tests for configuration snapshots and live reload."""
+
+import dataclasses
+import os
+
+import pytest
+
+from src.config import (
+    ConfigWatcher,
+    PluginConfig,
+    get_config,
+    reload_config,
+    set_config,
+)
+from src.context_manager import ContextManager
+
+
+@pytest.fixture(autouse=True)
+def default_config():
+    """Start every test from defaults and leave defaults behind."""
+    set_config(PluginConfig())
+    yield
+    set_config(PluginConfig())
+
+
+class TestConfigSnapshots:
+    """Test suite for versioned, immutable config snapshots."""
+
+    def test_snapshots_are_immutable(self):
+        """Settings cannot be changed in place."""
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            get_config().max_thoughts = 5
+
+    def test_set_config_publishes_new_version(self):
+        """Every set_config publishes a snapshot with a higher version."""
+        before = get_config()
+        set_config(PluginConfig(max_thoughts=5))
+        after = get_config()
+        assert after.version > before.version
+        assert after.max_thoughts == 5
+        assert before.max_thoughts == 100
+
+    def test_reload_reads_environment(self, monkeypatch):
+        """reload_config publishes changed environment variables."""
+        monkeypatch.setenv("THINK_MAX_THOUGHTS", "7")
+        reloaded = reload_config()
+        assert reloaded.max_thoughts == 7
+        assert get_config() is reloaded
+
+    def test_reload_without_changes_keeps_version(self, monkeypatch):
+        """An unchanged environment does not bump the version."""
+        monkeypatch.delenv("THINK_MAX_THOUGHTS", raising=False)
+        first = reload_config()
+        assert reload_config() is first
+
+    def test_invalid_reload_keeps_current(self, monkeypatch):
+        """Invalid values are rejected and the current snapshot stays."""
+        current = get_config()
+        monkeypatch.setenv("THINK_MAX_THOUGHTS", "0")
+        assert reload_config() is current
+        monkeypatch.setenv("THINK_MAX_THOUGHTS", "many")
+        assert reload_config() is current
+
+    def test_watcher_reloads_changed_file(self, tmp_path, monkeypatch):
+        """Editing the watched env file publishes its values."""
+        pytest.importorskip("dotenv")
+        env_file = tmp_path / ".env"
+        env_file.write_text("THINK_MAX_THOUGHTS=9\n")
+        monkeypatch.setenv("THINK_MAX_THOUGHTS", "100")
+        watcher = ConfigWatcher(str(env_file), interval=3600)
+        try:
+            assert not watcher.check()
+            env_file.write_text("THINK_MAX_THOUGHTS=12\n")
+            stat = env_file.stat()
+            os.utime(env_file, (stat.st_atime, stat.st_mtime + 1))
+            assert watcher.check()
+            assert get_config().max_thoughts == 12
+        finally:
+            watcher.close()
+
+
+class TestLiveReload:
+    """Test suite for applying new snapshots to a running ContextManager."""
+
+    def test_limits_reach_live_manager(self):
+        """A new snapshot's limits apply on the manager's next call."""
+        cm = ContextManager()
+        set_config(PluginConfig(max_thought_length=100, dedup_mode="reject"))
+        with pytest.raises(ValueError):
+            cm.add_thought("s1", "x" * 101)
+        assert cm.dedup_mode == "reject"
+        assert cm.get_stats()["config_version"] == get_config().version
+
+    def test_lower_max_thoughts_trims_lazily(self):
+        """Sessions shrink on their next write or render, not all at once."""
+        cm = ContextManager()
+        cm.add_thoughts("s1", [f"Thought {i}" for i in range(10)])
+        cm.add_thoughts("s2", [f"Thought {i}" for i in range(10)])
+        bytes_before = cm.get_stats()["total_bytes"]
+
+        set_config(PluginConfig(max_thoughts=4))
+        cm.add_thought("s1", "Thought 10")
+        assert [t["step"] for t in cm.get_all_thoughts("s1")] == [8, 9, 10, 11]
+        assert len(cm.get_all_thoughts("s2")) == 10
+        assert cm.get_stats()["total_thoughts"] == 14
+
+        cm.get_formatted_context("s2")
+        assert len(cm.get_all_thoughts("s2")) == 4
+        stats = cm.get_stats()
+        assert stats["total_thoughts"] == 8
+        assert stats["total_bytes"] < bytes_before
+
+    def test_dedup_threshold_applies_to_existing_sessions(self):
+        """A reloaded threshold is used by indexes built before the reload."""
+        base = "We should store sessions in SQLite because it supports concurrent readers"
+        reworded = "We should store sessions in SQLite since it supports concurrent readers"
+        cm = ContextManager()
+        set_config(PluginConfig(dedup_mode="reject", dedup_threshold=0.5))
+        cm.add_thought("s1", base)
+        cm.add_thought("s1", "Completely different idea about caching tokens")
+        assert cm.get_context("s1")["dedup_index"] is not None
+
+        set_config(PluginConfig(dedup_mode="reject", dedup_threshold=0.95))
+        assert cm.submit_thought("s1", reworded).decision == "added"
+
+    def test_raise_max_thoughts_grows_windows(self):
+        """A higher limit lets existing sessions keep more thoughts."""
+        cm = ContextManager()
+        set_config(PluginConfig(max_thoughts=3))
+        cm.add_thoughts("s1", ["a", "b", "c", "d"])
+        set_config(PluginConfig(max_thoughts=5))
+        cm.add_thoughts("s1", ["e", "f"])
+        assert [t["thought"] for t in cm.get_all_thoughts("s1")] == ["b", "c", "d", "e", "f"]
+
+    def test_constructor_override_kept(self):
+        """An explicit max_thoughts is not replaced by reloads."""
+        cm = ContextManager(max_thoughts=3)
+        set_config(PluginConfig(max_thoughts=50, max_thought_length=200))
+        cm.add_thoughts("s1", ["a", "b", "c", "d"])
+        assert cm.max_thoughts == 3
+        assert cm.max_thought_length == 200
+        assert len(cm.get_all_thoughts("s1")) == 3
+
+    def test_older_snapshot_ignored(self):
+        """refresh_config never goes back to an older version."""
+        cm = ContextManager()
+        old = get_config()
+        set_config(PluginConfig(max_thought_length=200))
+        assert cm.refresh_config()
+        assert not cm.refresh_config(old)
+        assert cm.max_thought_length == 200
@@ -126,3 +126,168 @@ class TestContextManager:
         assert "created_at" in summary
         assert "last_updated" in summary
 
+
+    def test_step_numbers_monotonic_after_eviction(self):
+        """Steps keep counting once the oldest thoughts are evicted."""
+        cm = ContextManager(max_thoughts=3)
+        session_id = "test-session-10"
+
+        steps = [cm.add_thought(session_id, f"Thought {i+1}") for i in range(5)]
+
+        assert steps == [1, 2, 3, 4, 5]
+        thoughts = cm.get_all_thoughts(session_id)
+        assert [t["step"] for t in thoughts] == [3, 4, 5]
+        assert cm.get_context(session_id)["metadata"]["total_steps"] == 5
+
+    def test_get_thought_by_step(self):
+        """Thoughts still in the window can be looked up by step."""
+        cm = ContextManager(max_thoughts=2)
+        session_id = "test-session-11"
+
+        for i in range(3):
+            cm.add_thought(session_id, f"Thought {i+1}")
+
+        assert cm.get_thought(session_id, 1) is None
+        assert cm.get_thought(session_id, 3)["thought"] == "Thought 3"
+        assert cm.get_thought("missing-session", 1) is None
+
+    def test_summary_formats_numeric_timestamps(self):
+        """Metadata keeps epoch floats; the summary renders ISO strings."""
+        cm = ContextManager()
+        session_id = "test-session-12"
+
+        cm.add_thought(session_id, "Thought 1")
+
+        metadata = cm.get_context(session_id)["metadata"]
+        assert isinstance(metadata["last_updated"], float)
+        summary = cm.get_context_summary(session_id)
+        assert datetime.fromisoformat(summary["last_updated"])
+
+
+class TestAddThoughts:
+    """Batch submission through add_thoughts/submit_thoughts."""
+
+    def test_returns_step_range(self):
+        """A batch gets consecutive steps after the existing ones."""
+        cm = ContextManager()
+        cm.add_thought("batch", "Thought 1")
+        steps = cm.add_thoughts("batch", ["Thought 2", "Thought 3", "Thought 4"])
+        assert steps == range(2, 5)
+        assert [t["thought"] for t in cm.get_all_thoughts("batch")] == [
+            "Thought 1", "Thought 2", "Thought 3", "Thought 4"
+        ]
+        assert cm.get_context("batch")["metadata"]["total_steps"] == 4
+        assert cm.add_thoughts("batch", []) == range(0)
+
+    def test_invalid_thought_stores_nothing(self):
+        """The whole batch is validated before anything is stored."""
+        cm = ContextManager()
+        with pytest.raises(ValueError, match="Thought 2 of 3"):
+            cm.add_thoughts("invalid", ["ok", "x" * (cm.max_thought_length + 1), "ok"])
+        assert cm.get_all_thoughts("invalid") == []
+
+    def test_batch_larger_than_window(self):
+        """Thoughts evicted by later ones in the same batch are released."""
+        cm = ContextManager(max_thoughts=3)
+        assert cm.add_thoughts("window", [f"Thought {i}" for i in range(1, 6)]) == range(1, 6)
+        assert [t["step"] for t in cm.get_all_thoughts("window")] == [3, 4, 5]
+        single = ContextManager(max_thoughts=3)
+        for i in range(1, 6):
+            single.add_thought("window", f"Thought {i}")
+        assert cm.get_stats()["total_bytes"] == single.get_stats()["total_bytes"]
+
+    def test_duplicates_within_batch(self):
+        """Near-duplicates of earlier thoughts in the batch point at their steps."""
+        cm = ContextManager()
+        cm.dedup_mode = "reject"
+        first = "We should store sessions in SQLite because it supports concurrent readers"
+        cm.add_thought("dedup", first)
+        results = cm.submit_thoughts("dedup", [
+            "Caching tokens in redis with an LRU eviction policy is simpler",
+            first + " now",
+            "Caching tokens in redis with an LRU eviction policy is simpler!",
+        ])
+        assert [r.decision for r in results] == ["added", "rejected", "rejected"]
+        assert [r.step for r in results] == [2, 1, 2]
+        assert len(cm.get_all_thoughts("dedup")) == 2
+
+
+class TestForkSession:
+    """Copy-on-write session branches."""
+
+    def test_fork_shares_history(self):
+        """A branch starts with the parent's thoughts without copying them."""
+        cm = ContextManager()
+        cm.add_thoughts("trunk", ["Plan", "Option A or B?"])
+        cm.pin_thought("trunk", 1)
+        info = cm.fork_session("trunk", "branch-a")
+        assert info == {"session_id": "branch-a", "parent": "trunk", "fork_step": 2}
+        trunk = cm.get_all_thoughts("trunk")
+        branch = cm.get_all_thoughts("branch-a")
+        assert all(a is b for a, b in zip(trunk, branch))
+        assert cm.get_context("branch-a")["pinned"] == [1]
+        assert cm.get_stats()["total_thoughts"] == 4
+
+    def test_branches_diverge(self):
+        """Thoughts added after the fork stay on their own branch."""
+        cm = ContextManager()
+        cm.add_thought("trunk", "Plan")
+        cm.fork_session("trunk", "a")
+        cm.fork_session("trunk", "b")
+        assert cm.add_thought("a", "Try A") == 2
+        assert cm.add_thought("b", "Try B") == 2
+        cm.add_thought("trunk", "Wait")
+        assert "Try A" in cm.get_formatted_context("a")
+        assert "Try B" not in cm.get_formatted_context("a")
+        assert [t["thought"] for t in cm.get_all_thoughts("trunk")] == ["Plan", "Wait"]
+        assert cm.search_thoughts("b", "try")[0]["thought"] == "Try B"
+
+    def test_fork_errors(self):
+        """Forking onto an existing session or onto itself is refused."""
+        cm = ContextManager()
+        cm.add_thought("trunk", "Plan")
+        cm.add_thought("taken", "Other")
+        with pytest.raises(ValueError):
+            cm.fork_session("trunk", "taken")
+        with pytest.raises(ValueError):
+            cm.fork_session("trunk", "trunk")
+
+    def test_merge_appends_branch_thoughts(self):
+        """Merging adds the branch's own thoughts to its parent and drops it."""
+        cm = ContextManager()
+        cm.add_thought("trunk", "Plan")
+        cm.fork_session("trunk", "a")
+        cm.add_thoughts("a", ["Try A", "A works"])
+        cm.add_thought("trunk", "Meanwhile")
+        assert cm.merge_session("a") == range(3, 5)
+        assert [t["thought"] for t in cm.get_all_thoughts("trunk")] == [
+            "Plan", "Meanwhile", "Try A", "A works"
+        ]
+        assert "a" not in cm._contexts
+        with pytest.raises(ValueError):
+            cm.merge_session("trunk")
+
+    def test_discard_releases_only_the_branch(self):
+        """Discarding a branch keeps the parent and the shard totals intact."""
+        cm = ContextManager()
+        cm.add_thoughts("trunk", ["Plan", "Option"])
+        before = cm.get_stats()
+        cm.fork_session("trunk", "a")
+        cm.add_thought("a", "Dead end")
+        assert cm.discard_session("a")
+        assert not cm.discard_session("a")
+        stats = cm.get_stats()
+        assert (stats["total_bytes"], stats["total_thoughts"]) == (
+            before["total_bytes"], before["total_thoughts"]
+        )
+        assert len(cm.get_all_thoughts("trunk")) == 2
+
+    def test_fork_window_eviction(self):
+        """A branch evicts through the shared history like a normal window."""
+        cm = ContextManager(max_thoughts=3)
+        cm.add_thoughts("trunk", ["1", "2", "3"])
+        cm.fork_session("trunk", "a")
+        cm.add_thoughts("a", ["4", "5"])
+        assert [t["step"] for t in cm.get_all_thoughts("a")] == [3, 4, 5]
+        assert [t["step"] for t in cm.get_all_thoughts("trunk")] == [1, 2, 3]
+        assert cm.get_formatted_context("a").count("Step") == 3
@@ -0,0 +1,130 @@
+"""Tests for the context server and its socket backend."""
+
+import pytest
+
+from src.config import PluginConfig
+from src.context_manager import ContextManager
+from src.context_server import ContextServer, SocketBackend
+from src.errors import StepConflictError, StorageError
+from src.storage import MemoryBackend, create_backend
+from src.thought_record import ThoughtRecord
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / "think.sock")
+
+
+@pytest.fixture
+def server(socket_path):
+    server = ContextServer(socket_path).start()
+    yield server
+    server.close()
+
+
+def _records(first_step: int, count: int, created: float = 100.0):
+    return [
+        ThoughtRecord(step, f"Thought {step}", created + step)
+        for step in range(first_step, first_step + count)
+    ]
+
+
+class TestSocketBackend:
+    """Test suite for SocketBackend against a live ContextServer."""
+
+    def test_round_trip(self, server, socket_path):
+        """Every backend operation reaches the server's store."""
+        backend = SocketBackend(socket_path)
+        backend.append("s1", _records(1, 3), created_at=50.0)
+        state = backend.session_state("s1")
+        assert (state.created_at, state.last_updated, state.last_step) == (50.0, 103.0, 3)
+        assert [r.thought for r in backend.load("s1")] == ["Thought 1", "Thought 2", "Thought 3"]
+        assert [r.step for r in backend.load("s1", after_step=1, limit=1)] == [3]
+        assert backend.session_state("missing") is None
+        assert backend.trim("s1", before_step=3) == 2
+        assert backend.expire(cutoff=0.0) == []
+        assert backend.delete("s1")
+        assert not backend.delete("s1")
+        backend.append("ü-session", _records(1, 1), created_at=0.0)
+        assert backend.expire(cutoff=1000.0, keep={"ü-session"}) == []
+        assert backend.expire(cutoff=1000.0) == ["ü-session"]
+        stats = backend.stats()
+        assert stats["sessions"] == 0
+        assert stats["server"]["clients"] == 1
+        backend.close()
+
+    def test_compressed_payload(self, server, socket_path):
+        """Compressed records keep their compressed payload over the wire."""
+        backend = SocketBackend(socket_path)
+        record = ThoughtRecord(1, "policy " * 100, 0.0)
+        record.compress(min_length=10)
+        backend.append("s1", [record], created_at=0.0)
+        loaded = backend.load("s1")[0]
+        assert loaded.compressed
+        assert loaded.thought == "policy " * 100
+        backend.close()
+
+    def test_conflicts(self, server, socket_path):
+        """Step conflicts surface as StepConflictError, per session in a batch."""
+        backend = SocketBackend(socket_path)
+        backend.append("s1", _records(1, 2), created_at=0.0)
+        with pytest.raises(StepConflictError):
+            backend.append("s1", _records(2, 1), created_at=0.0)
+        failures = backend.append_batch(
+            [("s1", _records(2, 1), 0.0), ("s2", _records(1, 2), 0.0), ("s3", [], 0.0)]
+        )
+        assert [(sid, type(e)) for sid, e in failures] == [("s1", StepConflictError)]
+        assert backend.session_state("s2").last_step == 2
+        backend.close()
+
+    def test_server_restart(self, socket_path):
+        """Pooled connections to a restarted server are replaced transparently."""
+        server = ContextServer(socket_path).start()
+        backend = SocketBackend(socket_path)
+        backend.append("s1", _records(1, 1), created_at=0.0)
+        server.close()
+        with pytest.raises(StorageError):
+            backend.ping()
+        server = ContextServer(socket_path).start()
+        backend.append("s1", _records(1, 1), created_at=0.0)
+        assert backend.session_state("s1").last_step == 1
+        backend.close()
+        server.close()
+
+    def test_one_server_per_path(self, server, socket_path):
+        """A second server on the same socket path is refused."""
+        with pytest.raises(StorageError):
+            ContextServer(socket_path)
+
+    def test_create_backend(self, server, socket_path):
+        """The factory and config accept the socket backend."""
+        backend = create_backend("socket", socket_path)
+        assert isinstance(backend, SocketBackend)
+        backend.ping()
+        backend.close()
+        PluginConfig(storage_backend="socket").validate()
+
+
+class TestContextManagerWithServer:
+    """ContextManagers sharing a context server."""
+
+    def test_managers_share_history(self, server, socket_path):
+        """Workers see and continue each other's thoughts through the server."""
+        first = ContextManager(backend=SocketBackend(socket_path))
+        second = ContextManager(backend=SocketBackend(socket_path))
+        first.add_thought("s1", "From first")
+        assert second.add_thoughts("s1", ["From second", "And again"]) == range(2, 4)
+        assert first.add_thought("s1", "First again") == 4
+        assert [t["thought"] for t in first.get_all_thoughts("s1")] == [
+            "From first",
+            "From second",
+            "And again",
+            "First again",
+        ]
+        first.shutdown()
+        # A restarted worker picks the session up from the server
+        restarted = ContextManager(backend=SocketBackend(socket_path))
+        assert restarted.get_context_summary("s1")["total_steps"] == 4
+        restarted.shutdown()
+        second.shutdown()
+        assert isinstance(server.backend, MemoryBackend)
@@ -0,0 +1,112 @@
+"""Tests for near-duplicate thought detection."""
+
+import pytest
+
+from src.config import PluginConfig
+from src.context_manager import ContextManager
+from src.dedup import ENTRY_BYTES, DuplicateIndex, minhash_signature, similarity
+
+BASE = "We should store sessions in SQLite because it supports concurrent readers and WAL mode"
+REWORDED = "We should store sessions in SQLite since it supports concurrent readers and WAL mode"
+UNRELATED = "Completely different idea about caching tokens in redis with an LRU eviction policy"
+
+
+def _manager(mode: str, max_thoughts: int = 100) -> ContextManager:
+    cm = ContextManager(max_thoughts=max_thoughts)
+    cm.dedup_mode = mode
+    return cm
+
+
+class TestMinHash:
+    """Test suite for signatures and DuplicateIndex."""
+
+    def test_similarity_tracks_word_overlap(self):
+        """Rewordings score high, unrelated thoughts low, repeats exactly 1."""
+        base = minhash_signature(BASE)
+        assert similarity(base, minhash_signature(BASE.upper() + "!")) == 1.0
+        assert similarity(base, minhash_signature(REWORDED)) >= 0.7
+        assert similarity(base, minhash_signature(UNRELATED)) < 0.3
+
+    def test_word_order_matters(self):
+        """The same words in another order are not near-duplicates."""
+        forward = minhash_signature("SQLite is faster than Postgres for this workload")
+        reverse = minhash_signature("Postgres is faster than SQLite for this workload")
+        assert similarity(forward, reverse) < 0.8
+
+    def test_text_without_words_has_no_signature(self):
+        """Punctuation-only text is never indexed or matched."""
+        assert minhash_signature("?!...") is None
+        index = DuplicateIndex()
+        assert index.add(1, None) == 0
+        assert index.find(None) is None
+        assert len(index) == 0
+
+    def test_index_find_and_remove(self):
+        """Only indexed steps above the threshold are found."""
+        index = DuplicateIndex(threshold=0.8)
+        assert index.add(1, minhash_signature(BASE)) == ENTRY_BYTES
+        index.add(2, minhash_signature(UNRELATED))
+        assert index.find(minhash_signature(BASE + ".")) == (1, 1.0)
+        assert index.find(minhash_signature("nothing in common here")) is None
+        assert index.remove(1) == ENTRY_BYTES
+        assert index.find(minhash_signature(BASE)) is None
+        assert index.remove(1) == 0
+        with pytest.raises(ValueError):
+            DuplicateIndex(threshold=0)
+
+
+class TestDedupInContextManager:
+    """add_thought/submit_thought with dedup enabled."""
+
+    def test_off_by_default(self):
+        """Without dedup every thought is stored."""
+        cm = ContextManager()
+        assert cm.add_thought("off", BASE) == 1
+        assert cm.submit_thought("off", BASE).decision == "added"
+        assert len(cm.get_all_thoughts("off")) == 2
+
+    def test_reject_mode(self):
+        """Near-duplicates are dropped and reported against the earlier step."""
+        cm = _manager("reject")
+        cm.add_thought("reject", BASE)
+        cm.add_thought("reject", UNRELATED)
+        result = cm.submit_thought("reject", BASE + " again")
+        assert result.decision == "rejected"
+        assert result.step == result.duplicate_of == 1
+        assert len(cm.get_all_thoughts("reject")) == 2
+        stats = cm.get_stats()
+        assert stats["dedup_rejected"] == 1
+        assert stats["dedup_saved_tokens"] > 0
+        assert stats["dedup_saved_bytes"] > len(BASE)
+
+    def test_thoughts_without_words_are_kept(self):
+        """Punctuation-only thoughts are stored, not merged into each other."""
+        cm = _manager("reject")
+        assert [cm.submit_thought("marks", text).decision for text in ("???", "!!!")] == [
+            "added", "added"
+        ]
+        assert cm.add_thoughts("marks", ["...", "---"]) == range(3, 5)
+
+    def test_merge_mode_keeps_window(self):
+        """Repeated thoughts in a loop no longer evict useful history."""
+        cm = _manager("merge", max_thoughts=3)
+        cm.add_thought("loop", "Plan: read the config file first")
+        for _ in range(10):
+            assert cm.add_thought("loop", BASE) == 2
+        assert [t["step"] for t in cm.get_all_thoughts("loop")] == [1, 2]
+        assert cm.get_stats()["dedup_merged"] == 9
+
+    def test_evicted_thoughts_are_not_duplicates(self):
+        """Thoughts that left the window can be added again."""
+        cm = _manager("reject", max_thoughts=2)
+        cm.add_thought("evicted", BASE)
+        cm.add_thought("evicted", UNRELATED)
+        cm.add_thought("evicted", "A third thought about deployment windows")
+        assert cm.submit_thought("evicted", BASE).decision == "added"
+
+    def test_config_validation(self):
+        """Dedup settings are checked."""
+        with pytest.raises(ValueError):
+            PluginConfig(dedup_mode="drop").validate()
+        with pytest.raises(ValueError):
+            PluginConfig(dedup_threshold=1.5).validate()
@@ -0,0 +1,126 @@
+"""Tests for the session expiry index and TTL-based cleanup."""
+
+import time
+
+import pytest
+
+from src.context_manager import ContextManager
+from src.expiry import ExpiryIndex
+from src.storage import MemoryBackend
+
+
+class TestExpiryIndex:
+    """Test suite for ExpiryIndex."""
+
+    def test_idle_sessions_expire_oldest_first(self):
+        """Only sessions touched before the cutoff are returned."""
+        index = ExpiryIndex()
+        index.touch("a", 10.0)
+        index.touch("b", 20.0)
+        index.touch("c", 30.0)
+        index.touch("a", 40.0)  # Refreshing moves "a" to the back
+        assert index.pop_expired(now=100.0, idle_cutoff=25.0, limit=10) == ["b"]
+        assert len(index) == 2
+
+    def test_batch_limit(self):
+        """At most limit sessions are returned per call."""
+        index = ExpiryIndex()
+        for i in range(5):
+            index.touch(f"s{i}", float(i))
+        assert index.pop_expired(100.0, 100.0, limit=2) == ["s0", "s1"]
+        assert index.pop_expired(100.0, 100.0, limit=10) == ["s2", "s3", "s4"]
+
+    def test_absolute_ttl_ignores_touches(self):
+        """Absolute TTLs count from creation regardless of activity."""
+        index = ExpiryIndex()
+        index.touch("a", 0.0)
+        index.set_ttl("a", 50.0, sliding=False, now=10.0, created=0.0)
+        index.touch("a", 40.0)
+        assert index.pop_expired(now=49.0, idle_cutoff=0.0, limit=10) == []
+        assert index.pop_expired(now=50.0, idle_cutoff=0.0, limit=10) == ["a"]
+
+    def test_sliding_ttl_extends_on_touch(self):
+        """Sliding TTLs restart on every touch and skip stale heap entries."""
+        index = ExpiryIndex()
+        index.set_ttl("a", 10.0, sliding=True, now=0.0, created=0.0)
+        index.touch("a", 8.0)
+        assert index.pop_expired(now=12.0, idle_cutoff=0.0, limit=10) == []
+        assert index.pop_expired(now=18.0, idle_cutoff=0.0, limit=10) == ["a"]
+        assert len(index) == 0
+
+    def test_clear_ttl_and_discard(self):
+        """Sessions can return to the default TTL or be forgotten."""
+        index = ExpiryIndex()
+        index.set_ttl("a", 10.0, sliding=True, now=0.0, created=0.0)
+        index.clear_ttl("a", now=5.0)
+        assert index.pop_expired(now=100.0, idle_cutoff=1.0, limit=10) == []
+        index.discard("a")
+        assert "a" not in index
+
+    def test_stale_entries_are_compacted(self):
+        """Repeated sliding touches do not grow the heap without bound."""
+        index = ExpiryIndex()
+        index.set_ttl("a", 10.0, sliding=True, now=0.0, created=0.0)
+        for i in range(1000):
+            index.touch("a", float(i))
+        assert len(index._deadlines) <= 2 * 1 + 65
+
+
+class TestSessionTTL:
+    """TTL behaviour through ContextManager."""
+
+    def test_cleanup_visits_only_expired(self):
+        """Fresh sessions survive; explicit max age still expires all."""
+        cm = ContextManager()
+        for i in range(10):
+            cm.add_thought(f"ttl-session-{i}", "Thought")
+        assert cm.cleanup_old_sessions() == 0
+        assert cm.cleanup_old_sessions(max_age_hours=-1) == 10
+        assert len(cm._contexts) == 0
+
+    def test_per_session_ttl(self):
+        """A short per-session TTL expires ahead of the default."""
+        cm = ContextManager()
+        cm.add_thought("short-lived", "Thought")
+        cm.add_thought("long-lived", "Thought")
+        assert cm.set_session_ttl("short-lived", 0.01, sliding=False)
+        time.sleep(0.02)
+        assert cm.cleanup_old_sessions() == 1
+        assert "short-lived" not in cm._contexts
+        assert "long-lived" in cm._contexts
+
+    def test_stored_history_follows_ttl(self):
+        """Stored history of a session still held with a longer TTL is kept."""
+        backend = MemoryBackend()
+        cm = ContextManager(backend=backend)
+        cm.add_thought("long-lived", "Thought")
+        cm.add_thought("idle", "Thought")
+        cm.set_session_ttl("long-lived", 10 * 3600)
+        assert cm.cleanup_old_sessions(max_age_hours=-1) == 1
+        assert "long-lived" in cm._contexts
+        assert backend.session_state("long-lived") is not None
+        assert backend.session_state("idle") is None
+
+    def test_set_ttl_validation(self):
+        """Missing sessions and invalid TTLs are reported."""
+        cm = ContextManager()
+        assert not cm.set_session_ttl("missing", 10)
+        with pytest.raises(ValueError):
+            cm.set_session_ttl("missing", 0)
+
+    def test_ttl_recorded_in_metadata(self):
+        """The TTL override is visible in session metadata."""
+        cm = ContextManager()
+        cm.add_thought("ttl-meta", "Thought")
+        cm.set_session_ttl("ttl-meta", 60, sliding=False)
+        metadata = cm.get_context("ttl-meta")["metadata"]
+        assert metadata["ttl_seconds"] == 60
+        assert metadata["ttl_mode"] == "absolute"
+
+    def test_batched_cleanup(self):
+        """Sweeps larger than one batch still remove everything."""
+        cm = ContextManager(num_shards=1)
+        cm.cleanup_batch_size = 3
+        for i in range(10):
+            cm.add_thought(f"batch-{i}", "Thought")
+        assert cm.cleanup_old_sessions(max_age_hours=-1) == 10
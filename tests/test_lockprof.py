@@ -0,0 +1,130 @@
+"""Tests for the lock contention profiler."""
+
+import threading
+import time
+
+import pytest
+
+from src.config import PluginConfig
+from src.context_manager import ContextManager
+from src.lockprof import LockProfiler, ProfiledLock
+from src.sharding import ShardedSessionMap
+
+
+def _acquire_here(lock: ProfiledLock) -> None:
+    with lock:
+        time.sleep(0.01)
+
+
+class TestLockProfiler:
+    """Test suite for ProfiledLock and LockProfiler reports."""
+
+    def test_hold_time_attributed_to_caller(self):
+        """Hold time is reported against the function that took the lock."""
+        profiler = LockProfiler()
+        _acquire_here(profiler.lock("test"))
+        [row] = profiler.report()
+        assert row["lock"] == "test"
+        assert row["site"].startswith("_acquire_here (test_lockprof.py:")
+        assert row["acquisitions"] == 1
+        assert row["contended"] == 0
+        assert row["hold_total_ms"] >= 9
+
+    def test_contention_counted(self):
+        """A thread blocked on a held lock counts as contended and waits."""
+        profiler = LockProfiler()
+        lock = profiler.lock("test")
+        lock.acquire()
+        waiter = threading.Thread(target=_acquire_here, args=(lock,))
+        waiter.start()
+        time.sleep(0.02)
+        lock.release()
+        waiter.join()
+        [row] = [r for r in profiler.report() if r["site"].startswith("_acquire_here")]
+        assert row["contended"] == 1
+        assert row["contention_rate"] == 1.0
+        assert row["wait_total_ms"] >= 10
+
+    def test_non_blocking_acquire(self):
+        """A failed non-blocking acquire returns False and records nothing."""
+        profiler = LockProfiler()
+        lock = profiler.lock("test")
+        assert lock.acquire()
+        assert not lock.acquire(blocking=False)
+        assert not lock.acquire(timeout=0.01)
+        assert lock.locked()
+        lock.release()
+        assert profiler.report()[0]["acquisitions"] == 1
+
+    def test_report_sorting_and_limit(self):
+        """Rows sort by the requested key and respect the limit."""
+        profiler = LockProfiler()
+        _acquire_here(profiler.lock("slow"))
+        with profiler.lock("fast"):
+            pass
+        assert [r["lock"] for r in profiler.report(sort_by="hold_total")] == ["slow", "fast"]
+        assert len(profiler.report(limit=1)) == 1
+        assert "hold max" in profiler.format_report()
+        with pytest.raises(ValueError):
+            profiler.report(sort_by="name")
+        profiler.reset()
+        assert profiler.report() == []
+
+
+class TestContextManagerLockProfiling:
+    """Test suite for profiling ContextManager's locks."""
+
+    def test_disabled_by_default(self):
+        """Without profiling the map uses plain locks and reports nothing."""
+        cm = ContextManager()
+        cm.add_thought("s1", "A thought")
+        assert cm.lock_profiler is None
+        assert cm.lock_report() == []
+        assert not isinstance(cm._contexts.session_lock("s1"), ProfiledLock)
+
+    def test_sites_skip_the_session_map(self):
+        """Shard and session locks are attributed to ContextManager methods."""
+        cm = ContextManager(lock_profiler=LockProfiler())
+        cm.add_thought("s1", "A thought")
+        cm.get_stats()
+        cm.cleanup_old_sessions(max_age_hours=-1)
+        rows = cm.lock_report(limit=None)
+        kinds = {row["lock"] for row in rows}
+        assert kinds == {"shard", "session"}
+        assert all(row["site"].startswith("ContextManager.") for row in rows)
+        assert any(row["site"].startswith("ContextManager._cleanup") for row in rows)
+
+    def test_concurrent_writers_stay_consistent(self):
+        """Profiled locks still serialize writers to one session."""
+        cm = ContextManager(max_thoughts=1000, lock_profiler=LockProfiler())
+
+        def add(index: int) -> None:
+            for i in range(50):
+                cm.add_thought("shared", f"Thread {index} thought {i}")
+
+        threads = [threading.Thread(target=add, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(cm.get_all_thoughts("shared")) == 400
+        session_rows = [r for r in cm.lock_report(limit=None) if r["lock"] == "session"]
+        assert sum(r["acquisitions"] for r in session_rows) >= 400
+
+    def test_lock_factory(self):
+        """ShardedSessionMap builds shard and session locks with the factory."""
+        kinds = []
+
+        def factory(kind: str) -> threading.Lock:
+            kinds.append(kind)
+            return threading.Lock()
+
+        sessions = ShardedSessionMap(num_shards=2, lock_factory=factory)
+        sessions.session_lock("s1")
+        assert kinds == ["shard", "shard", "session"]
+
+    def test_config(self, monkeypatch):
+        """THINK_LOCK_PROFILING enables profiling."""
+        monkeypatch.setenv("THINK_LOCK_PROFILING", "true")
+        assert PluginConfig.from_env().lock_profiling is True
+        assert PluginConfig().lock_profiling is False
@@ -0,0 +1,79 @@
+"""Tests for byte accounting and the global memory budget."""
+
+import pytest
+
+from src.config import PluginConfig
+from src.context_manager import SESSION_OVERHEAD_BYTES, ContextManager
+from src.thought_record import RECORD_OVERHEAD_BYTES
+
+
+def _manager(budget: int, max_thoughts: int = 10) -> ContextManager:
+    cm = ContextManager(max_thoughts=max_thoughts, num_shards=4)
+    cm.max_memory_bytes = budget
+    return cm
+
+
+class TestByteAccounting:
+    """Per-session and global byte tracking."""
+
+    def test_bytes_track_adds_and_evictions(self):
+        """Session bytes follow appended and FIFO-evicted thoughts."""
+        cm = _manager(budget=0, max_thoughts=2)
+        base = SESSION_OVERHEAD_BYTES + 8 * 2
+        cm.add_thought("bytes-1", "a" * 100)
+        assert cm.get_context_summary("bytes-1")["bytes"] == base + RECORD_OVERHEAD_BYTES + 100
+        cm.add_thought("bytes-1", "b" * 10)
+        cm.add_thought("bytes-1", "c" * 10)
+        assert cm.get_context_summary("bytes-1")["bytes"] == base + 2 * (RECORD_OVERHEAD_BYTES + 10)
+
+    def test_global_total_drops_on_clear(self):
+        """Clearing and cleanup release their bytes from the total."""
+        cm = _manager(budget=0)
+        cm.add_thought("bytes-2", "a" * 100)
+        cm.add_thought("bytes-3", "a" * 100)
+        total = cm.get_stats()["total_bytes"]
+        cm.clear_context("bytes-2")
+        assert cm.get_stats()["total_bytes"] == total // 2
+        cm.cleanup_old_sessions(max_age_hours=-1)
+        assert cm.get_stats()["total_bytes"] == 0
+
+
+class TestMemoryBudget:
+    """LRU eviction once the budget is exceeded."""
+
+    def test_least_recently_used_session_is_evicted(self):
+        """Going over budget evicts the session touched longest ago."""
+        session_bytes = SESSION_OVERHEAD_BYTES + 80 + RECORD_OVERHEAD_BYTES + 1000
+        cm = _manager(budget=3 * session_bytes)
+        cm.add_thought("lru-a", "a" * 1000)
+        cm.add_thought("lru-b", "b" * 1000)
+        cm.add_thought("lru-c", "c" * 1000)
+        cm.add_thought("lru-a", "x")  # a is now more recent than b
+        cm.add_thought("lru-d", "d" * 1000)
+
+        assert "lru-b" not in cm._contexts
+        assert "lru-a" in cm._contexts
+        stats = cm.get_stats()
+        assert stats["total_bytes"] <= stats["max_memory_bytes"]
+        assert stats["memory_evicted_sessions"] >= 1
+
+    def test_oversized_session_trims_its_own_thoughts(self):
+        """A lone session over budget drops its oldest thoughts, keeping the newest."""
+        cm = _manager(budget=SESSION_OVERHEAD_BYTES + 80 + 2 * (RECORD_OVERHEAD_BYTES + 500))
+        for i in range(5):
+            cm.add_thought("big", f"{i}" * 500)
+        thoughts = cm.get_all_thoughts("big")
+        assert [t["step"] for t in thoughts] == [4, 5]
+        assert cm.get_stats()["memory_evicted_thoughts"] == 3
+
+    def test_zero_budget_disables_eviction(self):
+        """A budget of 0 never evicts."""
+        cm = _manager(budget=0)
+        for i in range(20):
+            cm.add_thought(f"unbounded-{i}", "a" * 1000)
+        assert cm.get_stats()["total_sessions"] == 20
+
+    def test_config_validation(self):
+        """Negative budgets are rejected."""
+        with pytest.raises(ValueError):
+            PluginConfig(max_memory_bytes=-1).validate()
@@ -0,0 +1,212 @@
+"""Tests for the metrics registry, exposition and ContextManager metrics."""
+
+import socket
+import threading
+import urllib.request
+
+import pytest
+
+from src.config import PluginConfig
+from src.context_manager import ContextManager
+from src.metrics import Histogram, MetricsExporter, MetricsRegistry, write_textfile
+
+
+class TestHistogram:
+    """Test suite for bucketed histograms."""
+
+    def test_observations_land_in_buckets(self):
+        """Each observation counts in its bucket and every larger one."""
+        hist = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 5.0):
+            hist.observe(value)
+        cumulative, total, count = hist.snapshot()
+        assert cumulative == [2, 3, 4]
+        assert total == pytest.approx(5.65)
+        assert count == 4
+
+    def test_quantile_interpolates_within_bucket(self):
+        """Quantiles are estimated inside the bucket holding the rank."""
+        hist = Histogram((1.0, 2.0))
+        assert hist.quantile(0.5) == 0.0
+        for _ in range(10):
+            hist.observe(1.5)
+        assert 1.0 < hist.quantile(0.5) <= 2.0
+        hist.observe(10.0)
+        assert hist.quantile(1.0) == 2.0
+
+    def test_concurrent_observe(self):
+        """No observation is lost under contention."""
+        hist = Histogram()
+
+        def observe():
+            for _ in range(1000):
+                hist.observe(0.001)
+
+        threads = [threading.Thread(target=observe) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert hist.snapshot()[2] == 8000
+
+
+class TestMetricsRegistry:
+    """Test suite for registration and Prometheus rendering."""
+
+    def test_same_name_and_labels_share_a_metric(self):
+        """Getting a metric twice returns the same instance."""
+        registry = MetricsRegistry()
+        first = registry.counter("ops_total", "Ops.", kind="a")
+        assert registry.counter("ops_total", "Ops.", kind="a") is first
+        assert registry.counter("ops_total", "Ops.", kind="b") is not first
+        with pytest.raises(ValueError):
+            registry.histogram("ops_total", "Ops.")
+
+    def test_render_prometheus_text(self):
+        """Families render with HELP, TYPE, labels and cumulative buckets."""
+        registry = MetricsRegistry()
+        registry.counter("ops_total", "Ops.", kind='say "hi"').inc(3)
+        registry.gauge("size_bytes", "Size.", lambda: 42)
+        registry.histogram("latency_seconds", "Latency.", (0.5,), op="add").observe(0.25)
+        text = registry.render_prometheus()
+        assert "# HELP ops_total Ops.\n# TYPE ops_total counter\n" in text
+        assert 'ops_total{kind="say \\"hi\\""} 3\n' in text
+        assert "size_bytes 42\n" in text
+        assert 'latency_seconds_bucket{op="add",le="0.5"} 1\n' in text
+        assert 'latency_seconds_bucket{op="add",le="+Inf"} 1\n' in text
+        assert 'latency_seconds_sum{op="add"} 0.25\n' in text
+        assert 'latency_seconds_count{op="add"} 1\n' in text
+
+    def test_snapshot(self):
+        """Snapshots report counters, gauges and histogram summaries."""
+        registry = MetricsRegistry()
+        registry.counter("ops_total", "Ops.").inc()
+        registry.histogram("latency_seconds", "Latency.").observe(0.001)
+        snapshot = registry.snapshot()
+        assert snapshot["ops_total"][""] == 1
+        assert snapshot["latency_seconds"][""]["count"] == 1
+
+
+class TestExporter:
+    """Test suite for the HTTP endpoint and the file dump."""
+
+    def test_http_endpoint(self):
+        """/metrics serves the rendered text on a local port."""
+        # Port 0 disables the server, so pick a free port explicitly
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        exporter = MetricsExporter(lambda: "up 1\n", port=port)
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/metrics") as r:
+                assert r.read() == b"up 1\n"
+                assert r.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        finally:
+            exporter.close()
+
+    def test_file_dump(self, tmp_path):
+        """The file is written on start and rewritten on close."""
+        path = tmp_path / "think.prom"
+        values = iter(range(100))
+        exporter = MetricsExporter(lambda: f"n {next(values)}\n", path=str(path), interval=60)
+        exporter.close()
+        assert path.read_text().startswith("n ")
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_write_textfile_replaces(self, tmp_path):
+        """write_textfile overwrites the previous contents."""
+        path = tmp_path / "think.prom"
+        write_textfile("a 1\n", str(path))
+        write_textfile("a 2\n", str(path))
+        assert path.read_text() == "a 2\n"
+
+
+class TestContextManagerMetrics:
+    """Test suite for the metrics maintained by ContextManager."""
+
+    def test_operations_are_timed(self):
+        """Adds, renders and cleanups each record a latency sample."""
+        cm = ContextManager()
+        cm.add_thought("s1", "First thought")
+        cm.add_thoughts("s1", ["Second thought", "Third thought"])
+        cm.get_formatted_context("s1")
+        cm.cleanup_old_sessions(max_age_hours=-1)
+        durations = cm.metrics.snapshot()["think_operation_duration_seconds"]
+        assert durations["operation=add"]["count"] == 2
+        assert durations["operation=render"]["count"] == 1
+        assert durations["operation=cleanup"]["count"] == 1
+        assert durations["operation=invoke"]["count"] == 0
+        locks = cm.metrics.snapshot()["think_session_lock_hold_seconds"]
+        assert locks[""]["count"] == 2
+
+    def test_counters(self):
+        """Added, rejected, evicted and expired counts are tracked."""
+        cm = ContextManager(max_thoughts=2)
+        cm.add_thoughts("s1", ["one", "two", "three"])
+        with pytest.raises(ValueError):
+            cm.add_thought("s1", "")
+        cm.cleanup_old_sessions(max_age_hours=-1)
+        snapshot = cm.metrics.snapshot()
+        assert snapshot["think_added_thoughts_total"][""] == 3
+        assert snapshot["think_rejected_thoughts_total"]["reason=invalid"] == 1
+        assert snapshot["think_evicted_thoughts_total"]["reason=window"] == 1
+        assert snapshot["think_evicted_sessions_total"]["reason=expired"] == 1
+
+    def test_gauges_follow_store(self):
+        """Session, thought and byte gauges match get_stats."""
+        cm = ContextManager()
+        cm.add_thoughts("s1", ["one", "two"])
+        cm.add_thought("s2", "three")
+        stats = cm.get_stats()
+        snapshot = cm.metrics.snapshot()
+        assert snapshot["think_sessions"][""] == stats["total_sessions"] == 2
+        assert snapshot["think_thoughts"][""] == stats["total_thoughts"] == 3
+        assert snapshot["think_stored_bytes"][""] == stats["total_bytes"]
+
+    def test_thought_count_survives_eviction_and_removal(self):
+        """total_thoughts stays exact through window trims, clears and cleanup."""
+        cm = ContextManager(max_thoughts=3)
+        for i in range(5):
+            cm.add_thought("s1", f"Thought {i}")
+        cm.add_thoughts("s2", ["a", "b"])
+        assert cm.get_stats()["total_thoughts"] == 5
+        cm.clear_context("s2")
+        assert cm.get_stats()["total_thoughts"] == 3
+        cm.cleanup_old_sessions(max_age_hours=-1)
+        assert cm.get_stats()["total_thoughts"] == 0
+
+    def test_invoke_and_errors(self):
+        """observe_invoke and record_error feed the invoke metrics."""
+        cm = ContextManager()
+        cm.observe_invoke(0.002)
+        cm.record_error("invoke")
+        text = cm.render_metrics()
+        assert 'think_operation_duration_seconds_count{operation="invoke"} 1\n' in text
+        assert 'think_errors_total{operation="invoke"} 1\n' in text
+
+
+class TestMetricsConfig:
+    """Test suite for metrics settings."""
+
+    def test_defaults_disable_exposition(self):
+        """Neither the server nor the file dump is on by default."""
+        config = PluginConfig()
+        assert config.metrics_port == 0
+        assert config.metrics_file == ""
+
+    def test_env(self, monkeypatch):
+        """Metrics settings are read from the environment."""
+        monkeypatch.setenv("THINK_METRICS_PORT", "9464")
+        monkeypatch.setenv("THINK_METRICS_FILE", "/tmp/think.prom")
+        monkeypatch.setenv("THINK_METRICS_FILE_INTERVAL", "5")
+        config = PluginConfig.from_env()
+        assert config.metrics_port == 9464
+        assert config.metrics_file == "/tmp/think.prom"
+        assert config.metrics_file_interval_seconds == 5
+
+    def test_validation(self):
+        """Out of range ports and intervals are rejected."""
+        with pytest.raises(ValueError):
+            PluginConfig(metrics_port=70000).validate()
+        with pytest.raises(ValueError):
+            PluginConfig(metrics_file_interval_seconds=0).validate()
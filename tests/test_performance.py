@@ -1,7 +1,11 @@
-"""Performance tests for Claude Think Tool plugin."""
+"""Behaviour under load for Claude Think Tool plugin.
+
+Timing is measured by the benchmark suite (python -m benchmarks.suite),
+which reports latency percentiles against saved baselines; these tests
+only check results at the same load.
+"""
 
 import pytest
-import time
 from unittest.mock import Mock
 import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -19,14 +23,9 @@ class TestPerformance:
         cm = ContextManager(max_thoughts=1000)
         session_id = "perf-test-session"
 
-        # Add many thoughts and measure time
-        start_time = time.time()
         for i in range(100):
             cm.add_thought(session_id, f"Thought {i}")
-        elapsed = time.time() - start_time
 
-        # Should complete 100 additions in reasonable time (< 1 second)
-        assert elapsed < 1.0, f"Took too long: {elapsed:.3f}s"
         assert len(cm.get_all_thoughts(session_id)) == 100
 
     def test_concurrent_access(self):
@@ -66,12 +65,8 @@ class TestPerformance:
         # Create a large thought (1000 characters)
         large_thought = "A" * 1000
         
-        start_time = time.time()
         cm.add_thought(session_id, large_thought)
-        elapsed = time.time() - start_time
-        
-        # Should complete quickly even with large thought
-        assert elapsed < 0.1, f"Took too long: {elapsed:.3f}s"
+
         assert cm.get_all_thoughts(session_id)[0]["thought"] == large_thought
 
     def test_memory_efficiency(self):
@@ -102,13 +97,10 @@ class TestPerformance:
             session_id = f"session-{i}"
             cm.add_thought(session_id, f"Thought for session {i}")
         
-        # Cleanup should be fast
-        start_time = time.time()
         cleaned = cm.cleanup_old_sessions(max_age_hours=-1)  # Clean all (negative hours)
-        elapsed = time.time() - start_time
-        
+
         assert cleaned == num_sessions
-        assert elapsed < 1.0, f"Cleanup took too long: {elapsed:.3f}s"
+        assert cm.get_stats()["total_sessions"] == 0
 
     def test_get_context_performance(self):
         """Test get_context performance."""
@@ -119,14 +111,10 @@ class TestPerformance:
         for i in range(50):
             cm.add_thought(session_id, f"Thought {i}")
         
-        # Measure get_context time
-        start_time = time.time()
         for _ in range(1000):
-            cm.get_context(session_id)
-        elapsed = time.time() - start_time
-        
-        # Should be very fast (< 0.1s for 1000 calls)
-        assert elapsed < 0.1, f"get_context too slow: {elapsed:.3f}s"
+            context = cm.get_context(session_id)
+
+        assert context["metadata"]["total_steps"] == 50
 
     def test_formatted_context_performance(self):
         """Test formatted context generation performance."""
@@ -137,13 +125,8 @@ class TestPerformance:
         for i in range(50):
             cm.add_thought(session_id, f"Thought {i}: " + "A" * 100)
         
-        # Measure formatting time
-        start_time = time.time()
         formatted = cm.get_formatted_context(session_id)
-        elapsed = time.time() - start_time
-        
-        # Should format quickly (< 0.1s)
-        assert elapsed < 0.1, f"Formatting took too long: {elapsed:.3f}s"
+
         assert "Thought" in formatted
         assert len(formatted) > 0
 
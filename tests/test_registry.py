@@ -0,0 +1,112 @@
+"""Tests for the shared ContextManager registry and cleanup scheduler."""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from src.context_manager import ContextManager
+from src.registry import get_context_manager, shutdown_context_manager
+from src.scheduler import CleanupScheduler, get_scheduler
+
+
+class _FakeManager:
+    """Minimal stand-in exposing the scheduler's manager interface."""
+
+    def __init__(self, interval_hours: float):
+        self.cleanup_interval_hours = interval_hours
+        self.calls = 0
+        self.ran = threading.Event()
+
+    def cleanup_old_sessions(self, max_age_hours=None) -> int:
+        self.calls += 1
+        self.ran.set()
+        return 0
+
+
+class TestRegistry:
+    """Test suite for the process-wide registry."""
+
+    def teardown_method(self):
+        shutdown_context_manager()
+
+    def test_import_defers_context_store(self):
+        """Importing the registry loads neither the store nor orjson."""
+        code = (
+            "import sys, src.registry, src.responses; "
+            "print('src.context_manager' in sys.modules, 'orjson' in sys.modules)"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        assert out.split() == ["False", "False"]
+
+    def test_same_instance_returned(self):
+        """Every caller gets the same store."""
+        assert get_context_manager() is get_context_manager()
+
+    def test_thoughts_shared_between_callers(self):
+        """Thoughts added through one handle are visible through another."""
+        get_context_manager().add_thought("shared-session", "Persisted thought")
+        thoughts = get_context_manager().get_all_thoughts("shared-session")
+        assert thoughts[0]["thought"] == "Persisted thought"
+
+    def test_shutdown_resets_store(self):
+        """Shutdown drops the shared store and the next call creates a new one."""
+        first = get_context_manager()
+        shutdown_context_manager()
+        assert get_context_manager() is not first
+
+    def test_shutdown_is_idempotent(self):
+        """Shutdown can be called repeatedly."""
+        shutdown_context_manager()
+        shutdown_context_manager()
+
+
+class TestCleanupScheduler:
+    """Test suite for CleanupScheduler."""
+
+    def test_single_thread_for_many_managers(self):
+        """Creating many managers never spawns more than one cleanup thread."""
+        managers = [ContextManager() for _ in range(5)]
+        cleanup_threads = [
+            t for t in threading.enumerate() if t.name == "ContextManager-Cleanup"
+        ]
+        assert len(cleanup_threads) == 1
+        for cm in managers:
+            cm.shutdown()
+
+    def test_shutdown_unregisters_manager(self):
+        """ContextManager.shutdown removes it from the scheduler."""
+        cm = ContextManager()
+        assert get_scheduler().is_registered(cm)
+        cm.shutdown()
+        assert not get_scheduler().is_registered(cm)
+
+    def test_runs_due_cleanup(self):
+        """A due manager has its cleanup invoked by the worker thread."""
+        scheduler = CleanupScheduler()
+        manager = _FakeManager(interval_hours=0.01 / 3600)
+        scheduler.register(manager)
+        try:
+            assert manager.ran.wait(timeout=2)
+        finally:
+            scheduler.shutdown()
+        assert manager.calls >= 1
+        assert scheduler.thread is None
+
+    def test_dropped_manager_is_forgotten(self):
+        """Managers are weakly referenced by the scheduler."""
+        scheduler = CleanupScheduler()
+        manager = _FakeManager(interval_hours=1)
+        scheduler.register(manager)
+        del manager
+        assert len(scheduler._jobs) == 0
+        scheduler.shutdown()
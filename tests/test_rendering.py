@@ -0,0 +1,99 @@
+"""Tests for formatted context renderers and the render cache."""
+
+import json
+
+import pytest
+
+from src.context_manager import ContextManager
+from src.rendering import RENDERERS, RenderCache, get_renderer
+from src.thought_buffer import ThoughtBuffer
+from src.thought_record import ThoughtRecord
+
+
+def _fill(buffer: ThoughtBuffer, texts):
+    for text in texts:
+        buffer.append(ThoughtRecord(buffer.next_step, text, 0.0))
+
+
+class TestRenderers:
+    """Test suite for the output formats."""
+
+    def test_unknown_format(self):
+        """Unknown formats raise ValueError."""
+        with pytest.raises(ValueError):
+            get_renderer("xml")
+
+    def test_markdown_matches_legacy_layout(self):
+        """Markdown output keeps the original header and step layout."""
+        cm = ContextManager()
+        cm.add_thought("render-1", "First thought")
+        formatted = cm.get_formatted_context("render-1")
+        assert formatted.startswith("Previous thoughts in this session:\n\n")
+        assert "Step 1 (" in formatted
+        assert formatted.endswith("):\nFirst thought\n\n")
+
+    def test_compact_format(self):
+        """Compact output is one line per thought."""
+        cm = ContextManager()
+        cm.add_thought("render-2", "A")
+        cm.add_thought("render-2", "B")
+        assert cm.get_formatted_context("render-2", "compact") == "[1] A\n[2] B\n"
+
+    def test_jsonl_format(self):
+        """JSON Lines output parses back to one object per thought."""
+        cm = ContextManager()
+        cm.add_thought("render-3", 'Quote " and unicode é')
+        lines = cm.get_formatted_context("render-3", "jsonl").splitlines()
+        assert len(lines) == 1
+        entry = json.loads(lines[0])
+        assert entry["step"] == 1
+        assert entry["thought"] == 'Quote " and unicode é'
+        assert cm.get_formatted_context("empty-session", "jsonl") == ""
+
+
+class TestRenderCache:
+    """Test suite for RenderCache."""
+
+    def test_incremental_render_matches_full_render(self):
+        """Rendering after appends and evictions equals a fresh render."""
+        buffer = ThoughtBuffer(3)
+        cache = RenderCache(RENDERERS["compact"])
+        _fill(buffer, ["a", "b"])
+        assert cache.render(buffer) == "[1] a\n[2] b\n"
+
+        _fill(buffer, ["c", "d", "e"])
+        assert cache.render(buffer) == "[3] c\n[4] d\n[5] e\n"
+        assert cache.render(buffer) == RenderCache(RENDERERS["compact"]).render(buffer)
+
+    def test_only_new_thoughts_are_rendered(self):
+        """Previously rendered thoughts are not formatted again."""
+        calls = []
+        renderer = RENDERERS["compact"]
+        counting = type(renderer)(
+            "counting", "", "", lambda r: calls.append(r["step"]) or renderer.render_entry(r)
+        )
+        buffer = ThoughtBuffer(10)
+        cache = RenderCache(counting)
+        _fill(buffer, ["a", "b"])
+        cache.render(buffer)
+        _fill(buffer, ["c"])
+        cache.render(buffer)
+        assert calls == [1, 2, 3]
+
+    def test_rebuild_after_window_jump(self):
+        """A window that moved past every cached chunk is rebuilt."""
+        buffer = ThoughtBuffer(2)
+        cache = RenderCache(RENDERERS["compact"])
+        _fill(buffer, ["a"])
+        cache.render(buffer)
+        _fill(buffer, ["b", "c", "d"])
+        assert cache.render(buffer) == "[3] c\n[4] d\n"
+
+    def test_empty_buffer_resets(self):
+        """Rendering an emptied buffer returns the empty text."""
+        buffer = ThoughtBuffer(2)
+        cache = RenderCache(RENDERERS["markdown"])
+        _fill(buffer, ["a"])
+        cache.render(buffer)
+        buffer.clear()
+        assert cache.render(buffer) == "No thoughts yet in this session."
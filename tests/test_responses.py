@@ -0,0 +1,65 @@
+"""Tests for tool response shaping and JSON encoding."""
+
+import json
+
+import pytest
+
+from src.config import PluginConfig
+from src.responses import dumps, shape_response
+
+STATIC = {"session_id": "s1", "max_thoughts": 100}
+
+
+def _response(**extra):
+    response = {"status": "success", "step": 3, "context_size": 3, "decision": "added"}
+    response.update(extra)
+    return response
+
+
+class TestDumps:
+    """Test suite for the JSON encoder."""
+
+    def test_matches_stdlib(self):
+        """Output equals compact stdlib JSON with non-ASCII kept."""
+        obj = {"step": 1, "thought": "naïve \"quote\"\n", "nested": [1.5, None, True]}
+        assert dumps(obj) == json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+class TestShapeResponse:
+    """Test suite for response modes."""
+
+    def test_full_adds_static_fields(self):
+        """Full mode keeps everything and adds session_id and max_thoughts."""
+        shaped = shape_response(_response(thought="text"), "full", STATIC)
+        assert shaped["thought"] == "text"
+        assert shaped["session_id"] == "s1"
+        assert shaped["max_thoughts"] == 100
+
+    def test_ack_is_minimal(self):
+        """Ack mode returns only status, step and context_size."""
+        shaped = shape_response(_response(thought="text"), "ack", STATIC, new_session=True)
+        assert shaped == {"status": "success", "step": 3, "context_size": 3}
+
+    def test_delta(self):
+        """Delta mode adds dedup decisions and first-call session fields."""
+        assert shape_response(_response(), "delta", STATIC) == {
+            "status": "success", "step": 3, "context_size": 3
+        }
+        merged = shape_response(
+            _response(decision="merged", duplicate_of=2, step=2), "delta", STATIC
+        )
+        assert merged["decision"] == "merged"
+        assert merged["duplicate_of"] == 2
+        first = shape_response(_response(step=1), "delta", STATIC, new_session=True)
+        assert first["session_id"] == "s1"
+        assert "decision" not in first
+
+    def test_batch_fields_kept(self):
+        """Batch responses keep count and per-thought results."""
+        batch = {"status": "success", "count": 2, "results": [{"step": 1}], "context_size": 2}
+        assert shape_response(dict(batch), "ack", STATIC) == batch
+
+    def test_config_validation(self):
+        """response_mode is checked."""
+        with pytest.raises(ValueError):
+            PluginConfig(response_mode="verbose").validate()
@@ -0,0 +1,75 @@
+"""Tests for the per-session inverted index and search API."""
+
+from src.context_manager import ContextManager
+from src.search import POSTING_BYTES, SessionIndex, tokenize
+
+
+class TestSessionIndex:
+    """Test suite for SessionIndex."""
+
+    def test_tokenize(self):
+        """Terms are lowercase words, punctuation dropped."""
+        assert tokenize("Use Redis, not SQLite!") == ["use", "redis", "not", "sqlite"]
+        assert tokenize("Café naïve") == ["café", "naïve"]
+
+    def test_bm25_ranking(self):
+        """Rarer terms and shorter matching thoughts rank higher."""
+        index = SessionIndex()
+        index.add(1, "the cache uses redis")
+        index.add(2, "the database is sqlite and the cache is local")
+        index.add(3, "decided to use sqlite for the database")
+        steps = [step for step, _ in index.search("sqlite database")]
+        assert steps[0] == 3
+        assert set(steps) == {2, 3}
+        assert index.search("missing") == []
+        assert [step for step, _ in index.search("cache", limit=1)] == [1]
+
+    def test_remove_cleans_postings(self):
+        """Removing every thought leaves an empty index and no bytes."""
+        index = SessionIndex()
+        assert index.add(1, "alpha beta beta") == 2 * POSTING_BYTES
+        index.add(2, "beta gamma")
+        assert index.remove(1) == 2 * POSTING_BYTES
+        assert index.remove(1) == 0
+        assert [step for step, _ in index.search("beta")] == [2]
+        index.remove(2)
+        assert len(index) == 0
+        assert index.nbytes == 0
+        assert index._postings == {}
+
+
+class TestSearchThoughts:
+    """ContextManager.search_thoughts behaviour."""
+
+    def test_search_returns_ranked_thoughts(self):
+        """Results carry step, score and text, best first."""
+        cm = ContextManager()
+        cm.add_thought("search", "We should cache results in memory")
+        cm.add_thought("search", "Decision: store sessions in SQLite")
+        cm.add_thought("search", "Unrelated note")
+        results = cm.search_thoughts("search", "what did I decide about sqlite")
+        assert results[0]["step"] == 2
+        assert results[0]["thought"] == "Decision: store sessions in SQLite"
+        assert results[0]["score"] > 0
+        assert cm.search_thoughts("empty-session", "anything") == []
+
+    def test_index_follows_adds_and_evictions(self):
+        """Thoughts added after the first search are found; evicted ones are not."""
+        cm = ContextManager(max_thoughts=3)
+        cm.add_thought("evict", "first topic alpha")
+        assert [r["step"] for r in cm.search_thoughts("evict", "alpha")] == [1]
+        cm.add_thought("evict", "second topic beta")
+        cm.add_thought("evict", "third topic gamma")
+        cm.add_thought("evict", "fourth topic alpha")
+        assert [r["step"] for r in cm.search_thoughts("evict", "alpha")] == [4]
+        assert [r["step"] for r in cm.search_thoughts("evict", "beta")] == [2]
+
+    def test_index_bytes_are_accounted(self):
+        """Index memory counts toward the session and is released on clear."""
+        cm = ContextManager()
+        cm.add_thought("index-bytes", "one two three")
+        before = cm.get_context_summary("index-bytes")["bytes"]
+        cm.search_thoughts("index-bytes", "two")
+        assert cm.get_context_summary("index-bytes")["bytes"] == before + 3 * POSTING_BYTES
+        cm.clear_context("index-bytes")
+        assert cm.get_stats()["total_bytes"] == 0
@@ -0,0 +1,145 @@
+"""Tests for the lock-striped session map."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.config import get_config
+from src.context_manager import ContextManager
+from src.sharding import ShardedSessionMap
+
+
+def _factory(session_id: str) -> dict:
+    return {"session_id": session_id, "thoughts": [], "metadata": {"created_at": 0.0}}
+
+
+def _counted_factory(session_id: str) -> dict:
+    metadata = {"created_at": 0.0, "bytes": 0, "thought_count": 0}
+    return {"session_id": session_id, "metadata": metadata}
+
+
+class TestShardedSessionMap:
+    """Test suite for ShardedSessionMap."""
+
+    def test_invalid_shard_count(self):
+        """At least one shard is required."""
+        with pytest.raises(ValueError):
+            ShardedSessionMap(num_shards=0)
+
+    def test_get_or_create_returns_same_context(self):
+        """A session is created once and then reused."""
+        sessions = ShardedSessionMap(num_shards=4)
+        first = sessions.get_or_create("a", _factory)
+        assert sessions.get_or_create("a", _factory) is first
+        assert "a" in sessions
+        assert len(sessions) == 1
+
+    def test_sessions_spread_across_shards(self):
+        """Many sessions land in more than one shard."""
+        sessions = ShardedSessionMap(num_shards=8)
+        for i in range(100):
+            sessions.get_or_create(f"session-{i}", _factory)
+        populated = [shard for shard in sessions._shards if shard.contexts]
+        assert len(populated) > 1
+        assert len(sessions) == 100
+        assert sorted(sessions) == sorted(f"session-{i}" for i in range(100))
+
+    def test_pop_and_delete(self):
+        """Removing a session drops its context and lock."""
+        sessions = ShardedSessionMap(num_shards=2)
+        sessions.get_or_create("a", _factory)
+        sessions.get_or_create("b", _factory)
+        assert sessions.pop("a")["session_id"] == "a"
+        assert sessions.pop("a") is None
+        del sessions["b"]
+        with pytest.raises(KeyError):
+            del sessions["b"]
+        assert len(sessions) == 0
+        assert all(not shard.session_locks for shard in sessions._shards)
+
+    def test_session_lock_is_per_session(self):
+        """Each session has a stable lock distinct from other sessions."""
+        sessions = ShardedSessionMap(num_shards=1)
+        sessions.get_or_create("a", _factory)
+        assert sessions.session_lock("a") is sessions.session_lock("a")
+        assert sessions.session_lock("a") is not sessions.session_lock("b")
+
+    def test_remove_where(self):
+        """Predicate-driven removal reports removed ids."""
+        sessions = ShardedSessionMap(num_shards=4)
+        for i in range(10):
+            sessions.get_or_create(f"s{i}", _factory)
+        removed = sessions.remove_where(lambda sid, ctx: int(sid[1:]) % 2 == 0)
+        assert sorted(removed) == ["s0", "s2", "s4", "s6", "s8"]
+        assert len(sessions) == 5
+
+    def test_held_lock_survives_removal(self):
+        """Removing a session while its lock is held keeps that lock mapped."""
+        sessions = ShardedSessionMap(num_shards=1)
+        sessions.get_or_create("a", _factory)
+        lock = sessions.acquire_session("a")
+        sessions.pop("a")
+        assert sessions.session_lock("a") is lock
+        lock.release()
+        with sessions.lock_session("a"):
+            assert lock.locked()
+
+    def test_stale_context_deltas_are_ignored(self):
+        """Counter changes for a replaced context do not reach the new one."""
+        sessions = ShardedSessionMap(num_shards=1)
+        old = sessions.get_or_create("a", _counted_factory)
+        sessions.pop("a")
+        new = sessions.get_or_create("a", _counted_factory)
+        sessions.add_bytes("a", 100, 1, old)
+        sessions.touch("a", 1.0, 100, 1, old)
+        assert new["metadata"]["thought_count"] == 0
+        assert (sessions.total_bytes(), sessions.total_thoughts()) == (0, 0)
+        sessions.add_bytes("a", 100, 1, new)
+        assert (sessions.total_bytes(), sessions.total_thoughts()) == (100, 1)
+
+
+class TestShardedContextManager:
+    """ContextManager behaviour on top of the sharded map."""
+
+    def test_num_shards_argument(self):
+        """The shard count is configurable per manager."""
+        cm = ContextManager(num_shards=4)
+        assert cm.get_stats()["lock_shards"] == 4
+        cm.shutdown()
+
+    def test_concurrent_writers_across_sessions(self):
+        """Concurrent writers to many sessions lose no thoughts."""
+        cm = ContextManager(max_thoughts=1000, num_shards=8)
+
+        def writer(worker: int):
+            for i in range(50):
+                cm.add_thought(f"session-{worker % 5}", f"Thought {worker}-{i}")
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            list(executor.map(writer, range(10)))
+
+        stats = cm.get_stats()
+        assert stats["total_sessions"] == 5
+        assert stats["total_thoughts"] == 500
+        cm.shutdown()
+
+    def test_writer_racing_a_clear(self):
+        """A writer still holding a cleared session's lock cannot corrupt its successor."""
+        cm = ContextManager(max_thoughts=10, num_shards=1)
+        cm.add_thought("race", "before clear")
+        stale = cm.get_context("race")
+        lock = cm._contexts.acquire_session("race")  # A writer mid-append
+        cm.clear_context("race")
+        second = threading.Thread(target=cm.add_thought, args=("race", "after clear"))
+        second.start()
+        second.join(0.05)
+        assert second.is_alive()  # Waits for the first writer
+        cm._append_batch("race", stale, [("late", 1)], None, get_config())
+        lock.release()
+        second.join(5)
+        context = cm.get_context("race")
+        assert [t.thought for t in context["thoughts"]] == ["after clear"]
+        assert context["metadata"]["thought_count"] == 1
+        assert cm.get_stats()["total_thoughts"] == 1
+        cm.shutdown()
@@ -0,0 +1,169 @@
+"""Tests for the shared memory storage backend."""
+
+import multiprocessing
+
+import pytest
+
+from src.config import PluginConfig
+from src.context_manager import ContextManager
+from src.errors import StepConflictError, StorageError
+from src.shm_storage import BUCKET_ENTRIES, SharedMemoryBackend
+from src.storage import create_backend
+from src.thought_record import ThoughtRecord
+
+SMALL = 4 * 1024 * 1024
+
+
+@pytest.fixture
+def shm_path(tmp_path):
+    path = str(tmp_path / "think.shm")
+    yield path
+    backend = SharedMemoryBackend(path, size_bytes=SMALL)
+    backend.unlink()
+    backend.close()
+
+
+def _records(first_step: int, count: int, created: float = 100.0, size: int = 0):
+    return [
+        ThoughtRecord(step, f"Thought {step}" + "x" * size, created + step)
+        for step in range(first_step, first_step + count)
+    ]
+
+
+def _append_from_child(path: str, session_id: str, first_step: int, count: int) -> None:
+    backend = SharedMemoryBackend(path, size_bytes=SMALL)
+    backend.append(session_id, _records(first_step, count), created_at=0.0)
+    backend.close()
+
+
+class TestSharedMemoryBackend:
+    """Test suite for SharedMemoryBackend."""
+
+    def test_append_and_load(self, shm_path):
+        """Appends load back in step order with session state."""
+        backend = SharedMemoryBackend(shm_path, size_bytes=SMALL)
+        backend.append("s1", _records(1, 3), created_at=50.0)
+        state = backend.session_state("s1")
+        assert state.created_at == 50.0
+        assert state.last_updated == 103.0
+        assert state.last_step == 3
+        assert [r.thought for r in backend.load("s1")] == ["Thought 1", "Thought 2", "Thought 3"]
+        assert [r.step for r in backend.load("s1", after_step=1, limit=1)] == [3]
+        assert backend.session_state("missing") is None
+        assert backend.load("missing") == []
+        backend.close()
+
+    def test_step_conflict(self, shm_path):
+        """Appending an existing step raises and stores nothing."""
+        backend = SharedMemoryBackend(shm_path, size_bytes=SMALL)
+        backend.append("s1", _records(1, 2), created_at=0.0)
+        with pytest.raises(StepConflictError):
+            backend.append("s1", _records(2, 2), created_at=0.0)
+        assert backend.session_state("s1").last_step == 2
+        assert backend.stats()["thoughts"] == 2
+        backend.close()
+
+    def test_payloads_spanning_slots(self, shm_path):
+        """Long, non-ASCII and compressed thoughts round-trip across slots."""
+        backend = SharedMemoryBackend(shm_path, size_bytes=SMALL, slot_size=64)
+        compressed = ThoughtRecord(2, "policy " * 100, 0.0)
+        compressed.compress(min_length=10)
+        records = [
+            ThoughtRecord(1, "Überlegung → " * 50, 0.0),
+            compressed,
+            ThoughtRecord(3, "", 0.0),
+        ]
+        backend.append("s1", records, created_at=0.0)
+        loaded = backend.load("s1")
+        assert [r.thought for r in loaded] == [r.thought for r in records]
+        assert loaded[1].compressed
+        backend.close()
+
+    def test_trim_delete_expire_free_slots(self, shm_path):
+        """Removed records return their slots, which later appends reuse."""
+        backend = SharedMemoryBackend(shm_path, size_bytes=SMALL)
+        backend.append("old", _records(1, 5, created=0.0, size=500), created_at=0.0)
+        backend.append("new", _records(1, 1, created=1000.0), created_at=1000.0)
+        assert backend.trim("old", before_step=4) == 3
+        assert backend.trim("old", before_step=4) == 0
+        assert [r.step for r in backend.load("old")] == [4, 5]
+        assert backend.expire(cutoff=500.0, keep={"old"}) == []
+        assert backend.expire(cutoff=500.0) == ["old"]
+        assert backend.delete("new")
+        assert not backend.delete("new")
+        stats = backend.stats()
+        assert (stats["sessions"], stats["thoughts"], stats["slots_used"]) == (0, 0, 0)
+
+        backend.append("again", _records(1, 2), created_at=0.0)
+        assert backend.trim("again", before_step=10) == 2
+        assert backend.load("again") == []
+        backend.append("again", _records(3, 1), created_at=0.0)
+        assert [r.step for r in backend.load("again")] == [3]
+        backend.close()
+
+    def test_capacity_errors(self, shm_path):
+        """A full bucket, a full arena or an oversized id raise StorageError."""
+        backend = SharedMemoryBackend(shm_path, size_bytes=SMALL, num_buckets=1)
+        for i in range(BUCKET_ENTRIES):
+            backend.append(f"s{i}", _records(1, 1), created_at=0.0)
+        with pytest.raises(StorageError):
+            backend.append("one-too-many", _records(1, 1), created_at=0.0)
+        slots = backend.stats()["slots_total"]
+        with pytest.raises(StorageError):
+            backend.append("s0", _records(2, 1, size=slots * 256), created_at=0.0)
+        assert backend.session_state("s0").last_step == 1
+        with pytest.raises(StorageError):
+            backend.session_state("x" * 200)
+        backend.close()
+
+    def test_layout_fixed_by_creator(self, shm_path):
+        """Later openers attach with the creator's layout and see its data."""
+        first = SharedMemoryBackend(shm_path, size_bytes=SMALL, slot_size=128)
+        first.append("s1", _records(1, 2), created_at=0.0)
+        second = SharedMemoryBackend(shm_path, size_bytes=2 * SMALL, slot_size=512)
+        assert second.stats()["slot_size"] == 128
+        assert [r.step for r in second.load("s1")] == [1, 2]
+        second.close()
+        # Closing one backend leaves the other's locks and mapping intact
+        first.append("s1", _records(3, 1), created_at=0.0)
+        assert first.session_state("s1").last_step == 3
+        first.close()
+
+    def test_shared_across_processes(self, shm_path):
+        """Records appended by another process are visible here."""
+        backend = SharedMemoryBackend(shm_path, size_bytes=SMALL)
+        backend.append("s1", _records(1, 2), created_at=0.0)
+        child = multiprocessing.Process(target=_append_from_child, args=(shm_path, "s1", 3, 2))
+        child.start()
+        child.join(timeout=30)
+        assert child.exitcode == 0
+        assert [r.step for r in backend.load("s1")] == [1, 2, 3, 4]
+        backend.close()
+
+    def test_create_backend(self, shm_path):
+        """The factory and config accept the shm backend."""
+        backend = create_backend("shm", shm_path, shm_size_bytes=SMALL)
+        assert isinstance(backend, SharedMemoryBackend)
+        backend.close()
+        PluginConfig(storage_backend="shm").validate()
+        with pytest.raises(ValueError):
+            PluginConfig(shm_size_bytes=1024).validate()
+
+
+class TestContextManagerWithSharedMemory:
+    """ContextManager over a shared segment."""
+
+    def test_two_managers_share_history(self, shm_path):
+        """Managers on the same segment see and continue each other's thoughts."""
+        first = ContextManager(backend=SharedMemoryBackend(shm_path, size_bytes=SMALL))
+        second = ContextManager(backend=SharedMemoryBackend(shm_path, size_bytes=SMALL))
+        first.add_thought("s1", "From first")
+        assert second.add_thought("s1", "From second") == 2
+        assert first.add_thought("s1", "First again") == 3
+        assert [t["thought"] for t in second.get_all_thoughts("s1")] == [
+            "From first",
+            "From second",
+            "First again",
+        ]
+        first.shutdown()
+        second.shutdown()
@@ -0,0 +1,336 @@
+"""Tests for durable storage backends."""
+
+import threading
+import time
+
+import pytest
+
+from src.config import PluginConfig
+from src.context_manager import ContextManager
+from src.errors import StepConflictError, StorageError
+from src.storage import MemoryBackend, SQLiteBackend, WriteBehindBackend, create_backend
+from src.thought_record import ThoughtRecord
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "think.db")
+
+
+def _records(first_step: int, count: int, created: float = 100.0):
+    return [
+        ThoughtRecord(step, f"Thought {step}", created + step)
+        for step in range(first_step, first_step + count)
+    ]
+
+
+class TestSQLiteBackend:
+    """Test suite for SQLiteBackend."""
+
+    def test_wal_mode(self, db_path):
+        """Connections run in write-ahead-log mode."""
+        backend = SQLiteBackend(db_path)
+        mode = backend._connection().execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+        backend.close()
+
+    def test_append_and_load(self, db_path):
+        """Batched appends load back in step order with session state."""
+        backend = SQLiteBackend(db_path)
+        backend.append("s1", _records(1, 3), created_at=50.0)
+        state = backend.session_state("s1")
+        assert state.created_at == 50.0
+        assert state.last_step == 3
+        assert [r.thought for r in backend.load("s1")] == ["Thought 1", "Thought 2", "Thought 3"]
+        assert [r.step for r in backend.load("s1", after_step=1, limit=1)] == [3]
+        assert backend.session_state("missing") is None
+        backend.close()
+
+    def test_step_conflict(self, db_path):
+        """Appending an existing step raises and stores nothing."""
+        backend = SQLiteBackend(db_path)
+        backend.append("s1", _records(1, 2), created_at=0.0)
+        with pytest.raises(StepConflictError):
+            backend.append("s1", _records(2, 2), created_at=0.0)
+        assert backend.session_state("s1").last_step == 2
+        backend.close()
+
+    def test_compressed_payload_round_trip(self, db_path):
+        """Compressed records are stored and loaded as compressed bytes."""
+        backend = SQLiteBackend(db_path)
+        record = ThoughtRecord(1, "policy " * 100, 0.0)
+        record.compress(min_length=10)
+        backend.append("s1", [record], created_at=0.0)
+        loaded = backend.load("s1")[0]
+        assert loaded.compressed
+        assert loaded.thought == "policy " * 100
+        backend.close()
+
+    def test_trim_delete_expire(self, db_path):
+        """Trimming, deleting and expiring remove the right rows."""
+        backend = SQLiteBackend(db_path)
+        backend.append("old", _records(1, 5, created=0.0), created_at=0.0)
+        backend.append("new", _records(1, 1, created=1000.0), created_at=1000.0)
+        assert backend.trim("old", before_step=4) == 3
+        assert [r.step for r in backend.load("old")] == [4, 5]
+        assert backend.expire(cutoff=500.0, keep={"old"}) == []
+        assert backend.expire(cutoff=500.0) == ["old"]
+        assert backend.delete("new")
+        assert not backend.delete("new")
+        assert backend.stats()["sessions"] == 0
+        backend.close()
+
+    def test_create_backend(self, db_path):
+        """The factory maps config names to backends."""
+        assert create_backend("memory", db_path) is None
+        backend = create_backend("sqlite", db_path)
+        assert isinstance(backend, SQLiteBackend)
+        backend.close()
+        with pytest.raises(ValueError):
+            create_backend("redis", db_path)
+        with pytest.raises(ValueError):
+            PluginConfig(storage_backend="redis").validate()
+
+
+class TestMemoryBackend:
+    """Test suite for MemoryBackend."""
+
+    def test_operations(self):
+        """Append, load, conflict, trim, delete and expire behave like SQLite."""
+        backend = MemoryBackend()
+        backend.append("old", _records(1, 5, created=0.0), created_at=0.0)
+        backend.append("new", _records(1, 1, created=1000.0), created_at=1000.0)
+        with pytest.raises(StepConflictError):
+            backend.append("old", _records(5, 1), created_at=0.0)
+        assert backend.session_state("old").last_step == 5
+        assert [r.step for r in backend.load("old", after_step=2, limit=2)] == [4, 5]
+        assert backend.load("old", limit=0) == []
+        assert backend.trim("old", before_step=4) == 3
+        assert [r.step for r in backend.load("old")] == [4, 5]
+        assert backend.expire(cutoff=500.0, keep={"old"}) == []
+        assert backend.expire(cutoff=500.0) == ["old"]
+        assert backend.delete("new")
+        assert not backend.delete("new")
+        assert backend.stats()["sessions"] == 0
+
+
+class TestContextManagerWithBackend:
+    """ContextManager write-through and sync behaviour."""
+
+    def test_history_survives_restart(self, db_path):
+        """A new manager on the same database sees earlier thoughts."""
+        first = ContextManager(backend=SQLiteBackend(db_path))
+        first.add_thought("restart", "Before restart")
+        first.shutdown()
+
+        second = ContextManager(backend=SQLiteBackend(db_path))
+        thoughts = second.get_all_thoughts("restart")
+        assert [t["thought"] for t in thoughts] == ["Before restart"]
+        assert second.add_thought("restart", "After restart") == 2
+        second.shutdown()
+
+    def test_two_managers_share_history(self, db_path):
+        """Interleaved writers through separate managers get distinct steps."""
+        a = ContextManager(backend=SQLiteBackend(db_path))
+        b = ContextManager(backend=SQLiteBackend(db_path))
+        assert a.add_thought("shared", "from a") == 1
+        assert b.add_thought("shared", "from b") == 2  # b resyncs after a conflict
+        assert a.add_thought("shared", "from a again") == 3
+        assert [t["thought"] for t in b.get_all_thoughts("shared")] == [
+            "from a",
+            "from b",
+            "from a again",
+        ]
+        assert "from b" in a.get_formatted_context("shared")
+        a.shutdown()
+        b.shutdown()
+
+    def test_batch_renumbers_after_conflict(self, db_path):
+        """A batch that collides with another writer moves past its steps."""
+        a = ContextManager(backend=SQLiteBackend(db_path))
+        b = ContextManager(backend=SQLiteBackend(db_path))
+        a.add_thought("batch", "from a")
+        b.get_context("batch")
+        a.add_thought("batch", "from a again")
+        assert b.add_thoughts("batch", ["b1", "b2"]) == range(3, 5)
+        assert [t["thought"] for t in a.get_all_thoughts("batch")] == [
+            "from a", "from a again", "b1", "b2"
+        ]
+        a.shutdown()
+        b.shutdown()
+
+    def test_window_reload_after_large_gap(self, db_path):
+        """A manager far behind reloads only the newest window."""
+        writer = ContextManager(max_thoughts=3, backend=SQLiteBackend(db_path))
+        reader = ContextManager(max_thoughts=3, backend=SQLiteBackend(db_path))
+        writer.add_thought("gap", "Thought 1")
+        reader.get_context("gap")
+        for i in range(2, 9):
+            writer.add_thought("gap", f"Thought {i}")
+        assert [t["step"] for t in reader.get_all_thoughts("gap")] == [6, 7, 8]
+        writer.shutdown()
+        reader.shutdown()
+
+    def test_clear_and_cleanup_reach_storage(self, db_path):
+        """Clearing and expiring a session also remove it from storage."""
+        backend = SQLiteBackend(db_path)
+        cm = ContextManager(backend=backend)
+        cm.add_thought("cleared", "Thought")
+        cm.add_thought("expired", "Thought")
+        cm.clear_context("cleared")
+        assert backend.session_state("cleared") is None
+        assert cm.cleanup_old_sessions(max_age_hours=-1) == 1
+        assert backend.session_state("expired") is None
+        assert cm.get_stats()["storage"]["backend"] == "sqlite"
+        cm.shutdown()
+
+    def test_fork_is_stored(self, db_path):
+        """A branch's inherited window is stored under its own id."""
+        cm = ContextManager(backend=SQLiteBackend(db_path))
+        cm.add_thoughts("trunk", ["Plan", "Option"])
+        cm.fork_session("trunk", "branch")
+        assert cm.add_thought("branch", "Try it") == 3
+        cm.shutdown()
+
+        restarted = ContextManager(backend=SQLiteBackend(db_path))
+        assert [t["thought"] for t in restarted.get_all_thoughts("branch")] == [
+            "Plan", "Option", "Try it"
+        ]
+        with pytest.raises(ValueError):
+            restarted.fork_session("trunk", "branch")
+        restarted.shutdown()
+
+
+class _GatedBackend(SQLiteBackend):
+    """SQLite backend whose batched writes wait for a gate to open."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.gate = threading.Event()
+        self.batches = 0
+
+    def append_batch(self, batch):
+        self.gate.wait(5)
+        self.batches += 1
+        return super().append_batch(batch)
+
+
+class _FailingBackend(SQLiteBackend):
+    """SQLite backend whose batched writes raise a non-storage error."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.failing = True
+
+    def append_batch(self, batch):
+        if self.failing:
+            raise RuntimeError("disk on fire")
+        return super().append_batch(batch)
+
+
+class TestWriteBehindBackend:
+    """Queued writes, coalescing and backpressure."""
+
+    def test_add_thought_does_not_wait_for_storage(self, db_path):
+        """Thoughts are visible immediately and stored after flush."""
+        inner = _GatedBackend(db_path)
+        cm = ContextManager(
+            max_thoughts=100, backend=WriteBehindBackend(inner, flush_interval=0.001)
+        )
+        for i in range(1, 51):
+            assert cm.add_thought("wb", f"Thought {i}") == i
+        assert len(cm.get_all_thoughts("wb")) == 50
+        assert inner.session_state("wb") is None
+        inner.gate.set()
+        cm._backend.flush()
+        assert inner.session_state("wb").last_step == 50
+        assert inner.batches < 50  # Queued appends were coalesced
+        cm.shutdown()
+
+    def test_backpressure_blocks_writers(self, db_path):
+        """Writers block on a full queue until the worker drains it."""
+        inner = _GatedBackend(db_path)
+        backend = WriteBehindBackend(inner, max_queue=2, flush_interval=0.001, batch_size=1)
+        backend.append("bp", _records(1, 1), created_at=0.0)  # Taken by the worker
+        time.sleep(0.05)
+        backend.append("bp", _records(2, 1), created_at=0.0)
+        backend.append("bp", _records(3, 1), created_at=0.0)
+        writer = threading.Thread(
+            target=backend.append, args=("bp", _records(4, 1), 0.0)
+        )
+        writer.start()
+        writer.join(0.1)
+        assert writer.is_alive()
+        inner.gate.set()
+        writer.join(5)
+        backend.flush()
+        assert backend.stats()["write_behind"]["blocked_writers"] == 1
+        assert [r.step for r in inner.load("bp")] == [1, 2, 3, 4]
+        backend.close()
+
+    def test_operations_keep_order(self, db_path):
+        """A queued delete applies between the appends around it."""
+        backend = WriteBehindBackend(SQLiteBackend(db_path))
+        backend.append("order", _records(1, 2), created_at=0.0)
+        backend.delete("order")
+        backend.append("order", _records(1, 1), created_at=0.0)
+        backend.trim("order", before_step=1)
+        backend.flush()
+        assert [r.step for r in backend.load("order")] == [1]
+        backend.close()
+
+    def test_shutdown_flushes_and_restart_continues(self, db_path):
+        """shutdown() drains the queue; a restarted manager continues the steps."""
+        first = ContextManager(backend=WriteBehindBackend(SQLiteBackend(db_path)))
+        first.add_thought("wb-restart", "Before restart")
+        first.shutdown()
+
+        second = ContextManager(backend=WriteBehindBackend(SQLiteBackend(db_path)))
+        assert second.add_thought("wb-restart", "After restart") == 2
+        second.shutdown()
+        assert [r.thought for r in SQLiteBackend(db_path).load("wb-restart")] == [
+            "Before restart",
+            "After restart",
+        ]
+
+    def test_conflicts_are_counted(self, db_path):
+        """A step stored by another writer is logged as a failed write."""
+        SQLiteBackend(db_path).append("taken", _records(1, 1), created_at=0.0)
+        backend = WriteBehindBackend(SQLiteBackend(db_path))
+        backend.append("taken", _records(1, 1), created_at=0.0)
+        backend.append("free", _records(1, 1), created_at=0.0)
+        backend.flush()
+        assert backend.stats()["write_behind"]["failed_writes"] == 1
+        assert backend.session_state("free").last_step == 1
+        backend.close()
+
+    def test_unexpected_errors_do_not_stop_the_worker(self, db_path):
+        """A non-storage error is counted and later writes still go through."""
+        inner = _FailingBackend(db_path)
+        backend = WriteBehindBackend(inner, max_queue=2, flush_interval=0.001)
+        backend.append("bad", _records(1, 1), created_at=0.0)
+        backend.flush()
+        inner.failing = False
+        for step in range(1, 6):
+            backend.append("good", _records(step, 1), created_at=0.0)
+        backend.flush()
+        assert backend.stats()["write_behind"]["failed_writes"] == 1
+        assert backend.session_state("good").last_step == 5
+        backend.close()
+
+    def test_writers_do_not_wait_on_a_dead_worker(self, db_path):
+        """Backpressure raises instead of blocking once the worker is gone."""
+        backend = WriteBehindBackend(SQLiteBackend(db_path), max_queue=1)
+        with backend._cond:
+            backend._closed = True  # The worker exits as if it had crashed
+            backend._cond.notify_all()
+        backend._thread.join(5)
+        backend._closed = False
+        backend._queue.append(("delete", "s", None))
+        with pytest.raises(StorageError):
+            backend.append("s", _records(1, 1), created_at=0.0)
+
+    def test_queue_size_validation(self):
+        """The write-behind queue must hold at least one operation."""
+        with pytest.raises(ValueError):
+            PluginConfig(write_behind_queue_size=0).validate()
@@ -4,7 +4,7 @@ import pytest
 from unittest.mock import Mock, MagicMock
 from collections.abc import Generator
 
-from tools.think_tool import ThinkTool
+from tools.think_tool import ThinkTool, parse_thoughts
 
 
 class TestThinkTool:
@@ -41,3 +41,50 @@ class TestThinkTool:
         assert len(result) == 1
         assert "Error" in result[0].content or "required" in result[0].content.lower()
 
+    def test_invoke_batch_invalid_json(self):
+        """Test invoke with a 'thoughts' value that is not a JSON array."""
+        runtime = Mock()
+        runtime.workflow_id = "test-workflow"
+        tool = ThinkTool(runtime, Mock())
+
+        params = {"thoughts": "not json"}
+        result = list(tool._invoke(params))
+
+        assert len(result) == 1
+        assert "Error" in result[0].content
+
+    def test_invoke_too_long_thought(self):
+        """An over-length thought is a validation error, not an invoke error."""
+        runtime = Mock()
+        runtime.workflow_id = "test-workflow-too-long"
+        tool = ThinkTool(runtime, Mock())
+        manager = tool.context_manager
+        errors = manager._errors["invoke"].value
+
+        params = {"thought": "x" * (manager.max_thought_length + 1)}
+        result = list(tool._invoke(params))
+
+        assert len(result) == 1
+        assert result[0].content.startswith("Validation error")
+        assert manager._errors["invoke"].value == errors
+
+    def test_static_fields_follow_config_reload(self):
+        """Responses advertise max_thoughts as changed by a config reload."""
+        tool = ThinkTool(Mock(), Mock())
+        manager = tool.context_manager
+        original = manager.max_thoughts
+        try:
+            assert tool._static_fields("s1")["max_thoughts"] == original
+            manager.max_thoughts = original + 5
+            assert tool._static_fields("s1")["max_thoughts"] == original + 5
+        finally:
+            manager.max_thoughts = original
+
+    def test_parse_thoughts(self):
+        """Test parsing of the 'thoughts' parameter."""
+        assert parse_thoughts('["first", "second"]') == ["first", "second"]
+        assert parse_thoughts(["first"]) == ["first"]
+        with pytest.raises(ValueError):
+            parse_thoughts("[]")
+        with pytest.raises(ValueError):
+            parse_thoughts('["ok", 3]')
@@ -0,0 +1,178 @@
+"""Tests for the ring-buffer thought storage."""
+
+import pytest
+
+from src.thought_buffer import BranchBuffer, ThoughtBuffer
+
+
+class TestThoughtBuffer:
+    """Test suite for ThoughtBuffer."""
+
+    def test_invalid_capacity(self):
+        """Capacity must be positive."""
+        with pytest.raises(ValueError):
+            ThoughtBuffer(0)
+
+    def test_empty_buffer(self):
+        """A new buffer is empty and compares equal to an empty list."""
+        buf = ThoughtBuffer(3)
+        assert len(buf) == 0
+        assert buf == []
+        assert buf.next_step == 1
+        assert buf.last_step == 0
+        assert buf.by_step(1) is None
+
+    def test_append_within_capacity(self):
+        """Appends below capacity evict nothing."""
+        buf = ThoughtBuffer(3)
+        assert buf.append("a") is None
+        assert buf.append("b") is None
+        assert list(buf) == ["a", "b"]
+        assert buf == ["a", "b"]
+        assert not buf.is_full()
+
+    def test_fifo_eviction(self):
+        """Appending to a full buffer evicts the oldest entry."""
+        buf = ThoughtBuffer(3)
+        for item in "abc":
+            buf.append(item)
+        assert buf.is_full()
+        assert buf.append("d") == "a"
+        assert buf.append("e") == "b"
+        assert list(buf) == ["c", "d", "e"]
+        assert buf[0] == "c"
+        assert buf[-1] == "e"
+        assert buf[1:] == ["d", "e"]
+
+    def test_steps_are_monotonic_across_eviction(self):
+        """Step numbers keep increasing after the window starts sliding."""
+        buf = ThoughtBuffer(2)
+        for item in "abcd":
+            buf.append(item)
+        assert buf.first_step == 3
+        assert buf.last_step == 4
+        assert buf.next_step == 5
+        assert buf.by_step(2) is None
+        assert buf.by_step(3) == "c"
+        assert buf.by_step(4) == "d"
+        assert buf.by_step(5) is None
+
+    def test_index_out_of_range(self):
+        """Indexing past the window raises IndexError."""
+        buf = ThoughtBuffer(2)
+        buf.append("a")
+        with pytest.raises(IndexError):
+            buf[1]
+        with pytest.raises(IndexError):
+            buf[-2]
+
+    def test_clear_keeps_step_numbering(self):
+        """Clearing drops entries without resetting step numbers."""
+        buf = ThoughtBuffer(2)
+        buf.append("a")
+        buf.clear()
+        assert len(buf) == 0
+        assert buf.next_step == 2
+
+    def test_resize_keeps_entries_and_steps(self):
+        """Resizing re-lays out a wrapped window without renumbering."""
+        buf = ThoughtBuffer(3)
+        for entry in "abcd":
+            buf.append(entry)
+        buf.resize(5)
+        assert buf.capacity == 5
+        assert list(buf) == ["b", "c", "d"]
+        assert buf.append("e") is None
+        assert buf.by_step(5) == "e"
+        buf.pop_oldest()
+        buf.resize(3)
+        assert list(buf) == ["c", "d", "e"]
+        assert buf.append("f") == "c"
+        with pytest.raises(ValueError):
+            buf.resize(2)
+
+
+def _ring(capacity, entries):
+    ring = ThoughtBuffer(capacity)
+    for entry in entries:
+        ring.append(entry)
+    return ring
+
+
+class TestBranchBuffer:
+    """Test suite for BranchBuffer."""
+
+    def test_from_ring_keeps_window(self):
+        """Wrapping a wrapped ring keeps its entries and step numbering."""
+        buf = BranchBuffer.from_ring(_ring(3, "abcd"))
+        assert buf == ["b", "c", "d"]
+        assert (buf.first_step, buf.last_step, buf.capacity) == (2, 4, 3)
+        assert buf.by_step(1) is None
+        assert buf.by_step(3) == "c"
+        assert buf[-1] == "d"
+        assert buf[0:2] == ["b", "c"]
+
+    def test_fork_branches_are_independent(self):
+        """Appends after a fork are only visible to the branch that made them."""
+        parent = BranchBuffer.from_ring(_ring(5, "ab"))
+        child = parent.fork()
+        parent.append("p")
+        child.append("c1")
+        child.append("c2")
+        assert parent == ["a", "b", "p"]
+        assert child == ["a", "b", "c1", "c2"]
+        assert child.by_step(3) == "c1"
+        assert parent.by_step(3) == "p"
+        assert parent.shared_segments == child.shared_segments == 1
+
+    def test_eviction_across_segments(self):
+        """The window slides through shared segments into the tail."""
+        parent = BranchBuffer.from_ring(_ring(3, "ab"))
+        child = parent.fork()
+        child.append("c")
+        child.fork()  # Freezes "c" into a second segment
+        assert child.append("d") == "a"
+        assert child.append("e") == "b"
+        assert child.shared_segments == 1
+        assert child.append("f") == "c"
+        assert child.shared_segments == 0
+        assert child == ["d", "e", "f"]
+        assert [child.by_step(s) for s in range(4, 7)] == ["d", "e", "f"]
+        assert parent == ["a", "b"]
+
+    def test_only_the_tail_is_unshared(self):
+        """Entries frozen by a fork are shared; later appends are not."""
+        ring = ThoughtBuffer(5)
+        ring.append("a")
+        assert not ring.is_shared(1)
+        trunk = BranchBuffer.from_ring(ring)
+        trunk.append("b")
+        branch = trunk.fork()
+        branch.append("c")
+        assert trunk.is_shared(2) and branch.is_shared(2)
+        assert not branch.is_shared(3)
+
+    def test_pop_resize_and_reset(self):
+        """pop_oldest, resize and reset behave like ThoughtBuffer."""
+        buf = BranchBuffer.from_ring(_ring(3, "abc")).fork()
+        assert buf.pop_oldest() == "a"
+        buf.resize(2)
+        assert buf.append("d") == "b"
+        assert buf == ["c", "d"]
+        with pytest.raises(ValueError):
+            buf.resize(1)
+        buf.reset(10)
+        assert len(buf) == 0
+        assert buf.append("x") is None
+        assert buf.by_step(10) == "x"
+        with pytest.raises(IndexError):
+            BranchBuffer(1).pop_oldest()
+
+    def test_deep_fork_chains_are_flattened(self):
+        """Repeated forks keep the segment chain bounded."""
+        buf = BranchBuffer(100)
+        for i in range(BranchBuffer.MAX_SEGMENTS * 2):
+            buf.append(i)
+            buf.fork()
+        assert buf.shared_segments <= BranchBuffer.MAX_SEGMENTS + 1
+        assert list(buf) == list(range(BranchBuffer.MAX_SEGMENTS * 2))
@@ -0,0 +1,41 @@
+"""Tests for the compact thought record."""
+
+from datetime import datetime
+
+import pytest
+
+from src.thought_record import ThoughtRecord, format_timestamp
+
+
+class TestThoughtRecord:
+    """Test suite for ThoughtRecord."""
+
+    def test_slots_only(self):
+        """Records carry no per-instance __dict__."""
+        record = ThoughtRecord(1, "A thought", 0.0)
+        assert not hasattr(record, "__dict__")
+
+    def test_dict_style_access(self):
+        """Legacy keys are readable like a dict."""
+        record = ThoughtRecord(3, "A thought", 86400.0)
+        assert record["thought"] == "A thought"
+        assert record["step"] == 3
+        assert record["timestamp"] == "1970-01-02T00:00:00"
+        assert record.get("missing", "default") == "default"
+        assert "timestamp" in record
+        with pytest.raises(KeyError):
+            record["missing"]
+
+    def test_to_dict_round_trip(self):
+        """to_dict matches the previous dict layout and compares equal."""
+        record = ThoughtRecord(1, "A thought", 1.5)
+        as_dict = record.to_dict()
+        assert set(as_dict) == {"timestamp", "thought", "step"}
+        assert record == as_dict
+        assert dict(zip(record.keys(), (record[k] for k in record))) == as_dict
+
+    def test_format_timestamp_matches_isoformat(self):
+        """Formatted timestamps parse back to the same instant."""
+        epoch = 1700000000.25
+        parsed = datetime.fromisoformat(format_timestamp(epoch))
+        assert parsed == datetime(2023, 11, 14, 22, 13, 20, 250000)
@@ -0,0 +1,108 @@
+"""Tests for token estimates and token-budgeted retrieval."""
+
+import pytest
+
+from src.config import PluginConfig
+from src.context_manager import ContextManager
+from src.rendering import RENDERERS
+from src.thought_buffer import ThoughtBuffer
+from src.thought_record import ThoughtRecord
+from src.tokens import estimate_tokens, select_within_budget
+
+
+def _buffer(token_sizes):
+    buffer = ThoughtBuffer(len(token_sizes))
+    for size in token_sizes:
+        buffer.append(ThoughtRecord(buffer.next_step, "x" * (4 * size), 0.0))
+    return buffer
+
+
+class TestEstimateTokens:
+    """Test suite for estimate_tokens."""
+
+    def test_ascii_and_non_ascii(self):
+        """ASCII counts four characters per token, other scripts one each."""
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("abcd") == 1
+        assert estimate_tokens("abcde") == 2
+        assert estimate_tokens("思考") == 2
+        assert estimate_tokens("abcd思考") == 3
+
+    def test_record_caches_estimate(self):
+        """Records compute their estimate once and keep it."""
+        record = ThoughtRecord(1, "x" * 40, 0.0)
+        assert record._tokens is None
+        assert record.tokens == 10
+        assert record._tokens == 10
+        assert ThoughtRecord(1, "x", 0.0, tokens=7).tokens == 7
+
+
+class TestSelectWithinBudget:
+    """Test suite for select_within_budget."""
+
+    def test_newest_first_until_full(self):
+        """The most recent thoughts that fit are selected, oldest first."""
+        buffer = _buffer([5, 5, 5, 5])
+        assert select_within_budget(buffer, 10) == [3, 4]
+        assert select_within_budget(buffer, 9) == [4]
+        assert select_within_budget(buffer, 100) == [1, 2, 3, 4]
+        assert select_within_budget(buffer, 12, entry_overhead=1) == [3, 4]
+
+    def test_stops_at_first_miss(self):
+        """A thought that does not fit ends the selection."""
+        buffer = _buffer([1, 50, 1])
+        assert select_within_budget(buffer, 10) == [3]
+
+    def test_pinned_always_included(self):
+        """Pinned thoughts are charged first and always returned."""
+        buffer = _buffer([5, 5, 5, 5])
+        assert select_within_budget(buffer, 10, pinned=[1]) == [1, 4]
+        assert select_within_budget(buffer, 0, pinned=[1]) == [1]
+        assert select_within_budget(buffer, 10, pinned=[99]) == [3, 4]
+
+
+class TestBudgetedContext:
+    """ContextManager token-budgeted retrieval."""
+
+    def test_formatted_context_fits_budget(self):
+        """A budgeted render returns only the newest thoughts that fit."""
+        cm = ContextManager()
+        for i in range(1, 11):
+            cm.add_thought("budget", f"Thought {i} " + "x" * 40)
+        renderer = RENDERERS["compact"]
+        per_thought = cm.get_thought("budget", 1).tokens + renderer.entry_tokens
+        formatted = cm.get_formatted_context("budget", "compact", max_tokens=3 * per_thought)
+        assert [line.split()[0] for line in formatted.splitlines()] == ["[8]", "[9]", "[10]"]
+        assert cm.get_formatted_context("budget", "compact", max_tokens=10**6) == (
+            cm.get_formatted_context("budget", "compact")
+        )
+
+    def test_pinned_thought_survives_budget(self):
+        """Pinned early thoughts are included ahead of recent ones."""
+        cm = ContextManager()
+        for i in range(1, 11):
+            cm.add_thought("pins", f"Thought {i}")
+        assert cm.pin_thought("pins", 1)
+        assert not cm.pin_thought("pins", 99)
+        thoughts = cm.get_all_thoughts("pins", max_tokens=12)
+        assert [t["step"] for t in thoughts] == [1, 8, 9, 10]
+        unpinned = cm.get_all_thoughts("pins", max_tokens=12, include_pinned=False)
+        assert [t["step"] for t in unpinned] == [7, 8, 9, 10]
+        assert cm.pin_thought("pins", 1, pinned=False)
+        assert 1 not in [t["step"] for t in cm.get_all_thoughts("pins", max_tokens=12)]
+
+    def test_max_thought_tokens(self):
+        """Thoughts over the token limit are rejected."""
+        cm = ContextManager()
+        cm.max_thought_tokens = 10
+        cm.add_thought("token-cap", "x" * 40)
+        with pytest.raises(ValueError, match="tokens"):
+            cm.add_thought("token-cap", "x" * 41)
+        with pytest.raises(ValueError):
+            PluginConfig(max_thought_tokens=-1).validate()
+
+    def test_insert_caches_tokens(self):
+        """add_thought stores the estimate on the record."""
+        cm = ContextManager()
+        cm.add_thought("cached", "x" * 80)
+        assert cm.get_thought("cached", 1)._tokens == 20
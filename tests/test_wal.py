@@ -0,0 +1,225 @@
+"""Tests for the write-ahead log and crash recovery."""
+
+import os
+import threading
+
+import pytest
+
+from src.config import PluginConfig
+from src.context_manager import ContextManager
+from src.thought_record import ThoughtRecord
+from src.wal import (
+    OP_APPEND,
+    OP_CLEAR,
+    OP_TRIM,
+    WriteAheadLog,
+    _LOG_RE,
+    decode_frames,
+    encode_append,
+    encode_clear,
+    encode_trim,
+)
+
+
+@pytest.fixture
+def wal_dir(tmp_path):
+    return str(tmp_path / "wal")
+
+
+def _manager(wal_dir: str, **kwargs) -> ContextManager:
+    return ContextManager(wal=WriteAheadLog(wal_dir, **kwargs))
+
+
+def _log_files(wal_dir: str):
+    return sorted(name for name in os.listdir(wal_dir) if name.startswith("wal-"))
+
+
+class TestFrames:
+    """Frame encoding and decoding."""
+
+    def test_round_trip(self):
+        """Every op decodes back to what was encoded."""
+        compressed = ThoughtRecord(2, "policy " * 100, 20.0)
+        compressed.compress(min_length=10)
+        data = (
+            encode_append("s1", ThoughtRecord(1, "Thought ü", 10.0))
+            + encode_append("s1", compressed)
+            + encode_trim("s1", 2)
+            + encode_clear("s1")
+        )
+        frames = [frame[1:] for frame in decode_frames(data)]
+        assert [(op, sid) for op, sid, _ in frames] == [
+            (OP_APPEND, "s1"),
+            (OP_APPEND, "s1"),
+            (OP_TRIM, "s1"),
+            (OP_CLEAR, "s1"),
+        ]
+        assert frames[0][2] == ThoughtRecord(1, "Thought ü", 10.0)
+        assert frames[1][2].compressed
+        assert frames[1][2].thought == "policy " * 100
+        assert frames[2][2] == 2
+
+    def test_stops_at_corruption(self):
+        """Decoding stops at a bad checksum or a truncated frame."""
+        good = encode_clear("a")
+        bad = bytearray(encode_clear("b"))
+        bad[-1] ^= 0xFF
+        assert len(list(decode_frames(good + bytes(bad) + good))) == 1
+        assert len(list(decode_frames(good + good[:-1]))) == 1
+
+
+class TestRecovery:
+    """ContextManager recovery from the log."""
+
+    def test_thoughts_survive_restart(self, wal_dir):
+        """A new manager on the same log sees thoughts and clears."""
+        first = _manager(wal_dir)
+        first.add_thought("kept", "Thought 1")
+        first.add_thought("kept", "Thought 2")
+        first.add_thought("cleared", "Gone")
+        first.clear_context("cleared")
+        first.shutdown()
+
+        second = _manager(wal_dir)
+        assert [t["thought"] for t in second.get_all_thoughts("kept")] == ["Thought 1", "Thought 2"]
+        assert "cleared" not in second._contexts
+        assert second.add_thought("kept", "Thought 3") == 3
+        second.shutdown()
+
+    def test_batch_survives_restart(self, wal_dir):
+        """A batch logged with one write replays in order."""
+        first = _manager(wal_dir)
+        first.add_thoughts("batch", ["Thought 1", "Thought 2", "Thought 3"])
+        first.shutdown()
+
+        second = _manager(wal_dir)
+        assert [t["step"] for t in second.get_all_thoughts("batch")] == [1, 2, 3]
+        second.shutdown()
+
+    def test_torn_tail_is_truncated(self, wal_dir):
+        """A partial frame left by a crash is dropped and the log stays usable."""
+        first = _manager(wal_dir)
+        first.add_thought("torn", "Complete")
+        first.shutdown()
+        path = os.path.join(wal_dir, _log_files(wal_dir)[-1])
+        size = os.path.getsize(path)
+        with open(path, "ab") as f:
+            f.write(encode_append("torn", ThoughtRecord(2, "Partial", 0.0))[:-3])
+
+        second = _manager(wal_dir)
+        assert os.path.getsize(path) == size
+        assert second.add_thought("torn", "After crash") == 2
+        second.shutdown()
+
+        third = _manager(wal_dir)
+        assert [t["thought"] for t in third.get_all_thoughts("torn")] == ["Complete", "After crash"]
+        third.shutdown()
+
+    def test_snapshot_compacts_log(self, wal_dir):
+        """A snapshot replaces older segments and recovery still matches."""
+        cm = ContextManager(max_thoughts=3, wal=WriteAheadLog(wal_dir))
+        for i in range(1, 6):
+            cm.add_thought("snap", f"Thought {i}")
+        cm.add_thought("other", "Other")
+        cm.clear_context("other")
+        cm._wal.snapshot()
+        cm.add_thought("snap", "Thought 6")
+        cm.shutdown()
+
+        assert _log_files(wal_dir) == ["wal-00000001.log"]
+        assert "snapshot-00000001.bin" in os.listdir(wal_dir)
+        restored = ContextManager(max_thoughts=3, wal=WriteAheadLog(wal_dir))
+        assert [t["step"] for t in restored.get_all_thoughts("snap")] == [4, 5, 6]
+        assert "other" not in restored._contexts
+        restored.shutdown()
+
+    def test_snapshot_triggers_on_size(self, wal_dir):
+        """The sync thread snapshots once the log outgrows snapshot_bytes."""
+        cm = _manager(wal_dir, snapshot_bytes=4096)
+        for i in range(100):
+            cm.add_thought("size", f"Thought {i} " + "x" * 100)
+        cm._wal.flush()
+        for _ in range(200):
+            if cm._wal.snapshots:
+                break
+            threading.Event().wait(0.01)
+        assert cm.get_stats()["wal"]["snapshots"] >= 1
+        cm.shutdown()
+
+    def test_close_waits_for_background_snapshot(self, wal_dir):
+        """close() joins a running snapshot, so nothing touches the files afterwards."""
+        gate = threading.Event()
+
+        def source():
+            gate.wait(5)
+            return iter(())
+
+        wal = WriteAheadLog(wal_dir, snapshot_bytes=1)
+        wal.replay(lambda *frame: None)
+        wal.start(source)
+        wal.append_thought("s1", ThoughtRecord(1, "Thought", 0.0))
+        for _ in range(500):
+            if wal._snapshot_thread is not None:
+                break
+            threading.Event().wait(0.01)
+        threading.Timer(0.05, gate.set).start()
+        wal.close()
+        assert not wal._snapshot_thread.is_alive()
+        assert wal.snapshots == 1
+        assert sorted(os.listdir(wal_dir)) == ["snapshot-00000001.bin", "wal-00000001.log"]
+
+    def test_replay_skips_removed_segments(self, wal_dir):
+        """A segment deleted between listing and reading is skipped."""
+        first = _manager(wal_dir)
+        first.add_thought("kept", "Thought")
+        first.shutdown()
+
+        wal = WriteAheadLog(wal_dir)
+        listed = wal._generations
+        wal._generations = lambda pattern: listed(pattern) + ([7] if pattern is _LOG_RE else [])
+        restored = ContextManager(wal=wal)
+        assert [t["thought"] for t in restored.get_all_thoughts("kept")] == ["Thought"]
+        restored.shutdown()
+
+    def test_cleanup_and_memory_eviction_are_logged(self, wal_dir):
+        """Sessions removed by expiry or the memory budget stay removed."""
+        first = _manager(wal_dir)
+        first.add_thought("expired", "Thought")
+        assert first.cleanup_old_sessions(max_age_hours=-1) == 1
+        first.max_memory_bytes = 1
+        first.add_thought("victim", "Thought")
+        first.add_thought("survivor", "Thought")
+        first.shutdown()
+
+        second = _manager(wal_dir)
+        assert list(second._contexts) == ["survivor"]
+        second.shutdown()
+
+
+class TestGroupCommit:
+    """fsync batching across writers."""
+
+    def test_concurrent_writers_share_syncs(self, wal_dir):
+        """Waiting writers are covered by fewer fsyncs than writes."""
+        wal = WriteAheadLog(wal_dir, sync_interval=0.05)
+        wal.replay(lambda op, sid, value: None)
+        wal.start(lambda: [])
+
+        def write(worker: int) -> None:
+            for step in range(1, 21):
+                wal.append_thought(f"w{worker}", ThoughtRecord(step, "Thought", 0.0))
+
+        threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert wal.syncs < 160
+        wal.close()
+
+    def test_config_validation(self):
+        """WAL settings are range-checked."""
+        with pytest.raises(ValueError):
+            PluginConfig(wal_sync_interval_ms=0).validate()
+        with pytest.raises(ValueError):
+            PluginConfig(wal_snapshot_bytes=10).validate()
@@ -1,19 +1,53 @@
 """Think tool implementation for structured multi-step reasoning."""
 
 from collections.abc import Generator
-from typing import Any
+from typing import TYPE_CHECKING, Any
+import json
 import logging
+import time
 
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 
-from src.context_manager import ContextManager
-from src.config import get_config
+from src.registry import get_context_manager
+from src.config import PluginConfig, get_config
 from src.errors import ThoughtValidationError, ThoughtLengthError, ContextError
+from src.responses import shape_response
+
+if TYPE_CHECKING:
+    from src.context_manager import ContextManager
 
 logger = logging.getLogger(__name__)
 
 
+def parse_thoughts(value: Any) -> list[str]:
+    """
+    Read the optional 'thoughts' parameter as a list of thoughts.
+
+    Dify passes LLM parameters as strings, so a JSON array of strings is
+    expected; a list (from callers that pass one directly) is also accepted.
+
+    Args:
+        value: Raw parameter value
+
+    Returns:
+        Thoughts in order
+
+    Raises:
+        ValueError: If the value is not a non-empty array of strings
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"'thoughts' must be a JSON array of strings: {e}") from None
+    if not isinstance(value, (list, tuple)) or not all(isinstance(t, str) for t in value):
+        raise ValueError("'thoughts' must be a JSON array of strings")
+    if not value:
+        raise ValueError("'thoughts' parameter cannot be empty")
+    return list(value)
+
+
 class ThinkTool(Tool):
     """
     Think tool implementation.
@@ -29,23 +63,53 @@ class ThinkTool(Tool):
             session: Session context from Dify
         """
         super().__init__(runtime, session)
-        self.context_manager = ContextManager()
+        # session_id and max_thoughts, rebuilt when either changes (see _static_fields)
+        self._static: dict[str, Any] | None = None
         logger.info("ThinkTool initialized")
 
+    @property
+    def context_manager(self) -> "ContextManager":
+        """
+        Shared, process-wide store: thoughts survive across tool instances.
+
+        Looked up on first use so that loading and constructing the tool
+        stays cheap; the store itself is created by the first invocation.
+        """
+        return get_context_manager()
+
     def _invoke(
         self, tool_parameters: dict[str, Any]
     ) -> Generator[ToolInvokeMessage, None, None]:
         """
-        Invoke the think tool.
+        Invoke the think tool, recording its latency.
 
         Args:
             tool_parameters: Dictionary containing:
                 - thought (str): The thought to think about
+                - thoughts (str, optional): JSON array of thoughts to record
+                  in order with one call; used instead of thought
 
         Yields:
             ToolInvokeMessage: Formatted response message
         """
+        start = time.perf_counter()
+        try:
+            yield from self._handle(tool_parameters)
+        except Exception:
+            self.context_manager.record_error("invoke")
+            raise
+        finally:
+            self.context_manager.observe_invoke(time.perf_counter() - start)
+
+    def _handle(
+        self, tool_parameters: dict[str, Any]
+    ) -> Generator[ToolInvokeMessage, None, None]:
+        """Validate the parameters and record the thought(s); see _invoke."""
         config = get_config()
+
+        if tool_parameters.get("thoughts") not in (None, ""):
+            yield from self._invoke_batch(tool_parameters["thoughts"], config)
+            return
         
         # Extract thought from parameters
         thought = tool_parameters.get("thought", "")
@@ -68,18 +132,7 @@ class ThinkTool(Tool):
             yield self.create_text_message(error_msg)
             return
         
-        # Get session context
-        # Try to get session_id from various sources
-        session_id = None
-        
-        # First, try to get from runtime attributes (workflow_id or session_id)
-        session_id = getattr(self.runtime, "workflow_id", None) or getattr(
-            self.runtime, "session_id", None
-        )
-        
-        # If not found, use "default" as fallback
-        if not session_id:
-            session_id = "default"
+        session_id = self._session_id()
 
         logger.debug(f"Processing thought for session: {session_id}, length={len(thought)}")
 
@@ -88,19 +141,29 @@ class ThinkTool(Tool):
             context = self.context_manager.get_context(session_id)
 
             # Add thought to context (this will validate length)
-            step = self.context_manager.add_thought(
-                session_id=session_id, thought=thought, context=context
+            result = self.context_manager.submit_thought(
+                session_id=session_id, thought=thought, context=context, config=config
             )
+            step = result.step
 
-            # Format response
+            # Format response; ack and delta modes skip echoing the thought
             response = {
-                "status": "success",
+                "status": "rejected" if result.decision == "rejected" else "success",
                 "step": step,
-                "thought": thought,
                 "context_size": len(context.get("thoughts", [])),
-                "session_id": session_id,
-                "max_thoughts": self.context_manager.max_thoughts,
+                # added, merged or rejected (near-duplicate detection)
+                "decision": result.decision,
             }
+            if config.response_mode == "full":
+                response["thought"] = thought
+            if result.duplicate_of is not None:
+                response["duplicate_of"] = result.duplicate_of
+            response = shape_response(
+                response,
+                config.response_mode,
+                self._static_fields(session_id),
+                new_session=step == 1 and result.decision == "added",
+            )
 
             logger.info(
                 f"Thought added successfully: session={session_id}, "
@@ -109,8 +172,8 @@ class ThinkTool(Tool):
             )
             yield self.create_json_message(response)
 
-        except (ThoughtValidationError, ThoughtLengthError) as e:
-            # Specific validation errors
+        except (ThoughtValidationError, ThoughtLengthError, ValueError) as e:
+            # Specific validation errors; ValueError covers over-long thoughts
             error_msg = f"Validation error: {str(e)}"
             logger.warning(f"{error_msg}, session_id={session_id}")
             yield self.create_text_message(error_msg)
@@ -123,5 +186,106 @@ class ThinkTool(Tool):
             # Unexpected errors
             error_msg = f"Unexpected error processing thought: {str(e)}"
             logger.error(f"{error_msg}, session_id={session_id}", exc_info=True)
+            self.context_manager.record_error("invoke")
             yield self.create_text_message(error_msg)
 
+    def _session_id(self) -> str:
+        """Session identifier from the runtime (workflow_id or session_id)."""
+        session_id = getattr(self.runtime, "workflow_id", None) or getattr(
+            self.runtime, "session_id", None
+        )
+        # If not found, use "default" as fallback
+        return session_id or "default"
+
+    def _static_fields(self, session_id: str) -> dict[str, Any]:
+        """Response fields that stay the same across calls for a session."""
+        # max_thoughts changes when a config reload reaches the manager
+        max_thoughts = self.context_manager.max_thoughts
+        static = self._static
+        if (
+            static is None
+            or static["session_id"] != session_id
+            or static["max_thoughts"] != max_thoughts
+        ):
+            static = self._static = {"session_id": session_id, "max_thoughts": max_thoughts}
+        return static
+
+    def _invoke_batch(
+        self, raw_thoughts: Any, config: PluginConfig
+    ) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        Record several thoughts with one call.
+
+        Args:
+            raw_thoughts: Value of the 'thoughts' parameter
+            config: Current plugin configuration
+
+        Yields:
+            ToolInvokeMessage: Formatted response message
+        """
+        try:
+            thoughts = parse_thoughts(raw_thoughts)
+        except ValueError as e:
+            error_msg = f"Error: {e}"
+            logger.error(error_msg)
+            yield self.create_text_message(error_msg)
+            return
+
+        if not config.allow_empty_thoughts:
+            for position, thought in enumerate(thoughts, 1):
+                if not thought.strip():
+                    error_msg = f"Error: thought {position} of 'thoughts' cannot be empty"
+                    logger.error(error_msg)
+                    yield self.create_text_message(error_msg)
+                    return
+
+        session_id = self._session_id()
+        logger.debug(f"Processing {len(thoughts)} thoughts for session: {session_id}")
+
+        try:
+            context = self.context_manager.get_context(session_id)
+
+            # One lock acquisition and one storage write for the whole batch
+            results = self.context_manager.submit_thoughts(
+                session_id=session_id, thoughts=thoughts, context=context, config=config
+            )
+
+            entries = []
+            for result in results:
+                entry = {"step": result.step, "decision": result.decision}
+                if result.duplicate_of is not None:
+                    entry["duplicate_of"] = result.duplicate_of
+                entries.append(entry)
+            all_rejected = all(result.decision == "rejected" for result in results)
+            response = shape_response(
+                {
+                    "status": "rejected" if all_rejected else "success",
+                    "count": len(results),
+                    "results": entries,
+                    "context_size": len(context.get("thoughts", [])),
+                },
+                config.response_mode,
+                self._static_fields(session_id),
+                new_session=results[0].step == 1 and results[0].decision == "added",
+            )
+
+            logger.info(
+                f"Thoughts added successfully: session={session_id}, "
+                f"count={len(results)}, context_size={response['context_size']}"
+            )
+            yield self.create_json_message(response)
+
+        except ValueError as e:
+            # The batch is validated as a whole; nothing was stored
+            error_msg = f"Validation error: {str(e)}"
+            logger.warning(f"{error_msg}, session_id={session_id}")
+            yield self.create_text_message(error_msg)
+        except ContextError as e:
+            error_msg = f"Context error: {str(e)}"
+            logger.error(f"{error_msg}, session_id={session_id}", exc_info=True)
+            yield self.create_text_message(error_msg)
+        except Exception as e:
+            error_msg = f"Unexpected error processing thoughts: {str(e)}"
+            logger.error(f"{error_msg}, session_id={session_id}", exc_info=True)
+            self.context_manager.record_error("invoke")
+            yield self.create_text_message(error_msg)